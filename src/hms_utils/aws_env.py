@@ -307,6 +307,8 @@ def confirm(message: str) -> bool:
 
 
 def run_concurrently(functions: Iterable[Callable], nthreads: int = 4) -> None:
+    # FYI: Deliberately a copy of (the thread-based subset of) hms_utils.threading_utils.run_concurrently,
+    # because this file is installed standalone (see aws_env.install.bash), without the hms_utils package.
     # FYI: Not pulling in from dcicutils.misc_utils becausethere is
     # a call to logging.basicConfig() which is (for some reason) causing
     # exceptions within the asynchronous function calls to be output.
@@ -0,0 +1,157 @@
+# Benchmark comparing hms_utils.threading_utils.run_concurrently with threads (via requests, with a
+# pooled PortalSession), and run_coroutines with coroutines (via a minimal asyncio HTTP/1.1 client with
+# keep-alive connections), for I/O-bound fan-out, against a local stub HTTP server which responds
+# to each (GET) request after a given latency, i.e. simulating a Portal request.
+#
+# Example:
+#
+# python -m hms_utils.dev.benchmark_concurrency --requests 2000 --latency 50 --threads 50 --coroutines 200
+#
+import asyncio
+from functools import partial
+import json
+import sys
+import threading
+import time
+from typing import Optional, Tuple
+from hms_utils.argv import ARGV
+from hms_utils.chars import chars
+from hms_utils.portal.portal_session import PortalSession
+from hms_utils.threading_utils import run_concurrently, run_coroutines
+
+
+def main() -> int:
+
+    argv = ARGV({
+        ARGV.OPTIONAL(int, 2000): ["--requests", "--count"],
+        ARGV.OPTIONAL(int, 50): ["--latency"],
+        ARGV.OPTIONAL([int]): ["--threads", "--nthreads"],
+        ARGV.OPTIONAL([int]): ["--coroutines", "--concurrency"],
+        ARGV.OPTIONAL(int, 1024): ["--response-size", "--size"]
+    })
+
+    threads = argv.threads or [50]
+    coroutines = argv.coroutines or [200]
+    server, port = _start_stub_server(latency=argv.latency / 1000, response_size=argv.response_size)
+    url = f"http://127.0.0.1:{port}"
+
+    print(f"Requests: {argv.requests} {chars.dot} latency: {argv.latency}ms"
+          f" {chars.dot} response size: {argv.response_size} bytes")
+    for nthreads in threads:
+        session = PortalSession(pool_size=nthreads)
+        started = time.time()
+        results = run_concurrently([lambda index=index: len(session.get(f"{url}/items/{index}").content)
+                                    for index in range(argv.requests)], nthreads=nthreads)
+        _print_result(f"threads ({nthreads})", results, time.time() - started, session.report()["connections"])
+        session.close()
+    for concurrency in coroutines:
+        client = _AsyncHttpClient("127.0.0.1", port, max_connections=concurrency)
+        async def run() -> list:  # noqa
+            try:
+                return await run_coroutines([partial(client.get, f"/items/{index}")
+                                             for index in range(argv.requests)], concurrency=concurrency)
+            finally:
+                await client.close()
+        started = time.time()
+        results = asyncio.run(run())
+        _print_result(f"coroutines ({concurrency})", [len(result) for result in results],
+                      time.time() - started, client.connections)
+
+    server.call_soon_threadsafe(server.stop)
+    return 0
+
+
+def _print_result(name: str, results: list, duration: float, connections: int) -> None:
+    print(f"{name}: responses: {len([result for result in results if result])}"
+          f" {chars.dot} connections: {connections}"
+          f" {chars.dot} duration: {duration:.3f} seconds"
+          f" {chars.dot} requests/second: {len(results) / duration:.1f}")
+
+
+class _AsyncHttpClient:
+    # Minimal asyncio HTTP/1.1 GET client (for the benchmark only) with a pool of keep-alive connections;
+    # assumes (as is the case for the stub server) that responses have a Content-Length header.
+
+    def __init__(self, host: str, port: int, max_connections: int = 100) -> None:
+        self._host = host
+        self._port = port
+        self._max_connections = max_connections
+        self._idle = []
+        self._semaphore = None
+        self.connections = 0
+
+    async def get(self, path: str) -> bytes:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_connections)
+        async with self._semaphore:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self._host, self._port)
+                self.connections += 1
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {self._host}\r\nConnection: keep-alive\r\n\r\n".encode())
+            await writer.drain()
+            content_length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                if line.lower().startswith(b"content-length:"):
+                    content_length = int(line.split(b":", 1)[1])
+            body = await reader.readexactly(content_length)
+            self._idle.append((reader, writer))
+            return body
+
+    async def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+class _StubServer:
+
+    def __init__(self, latency: float, response_size: int) -> None:
+        self._latency = latency
+        self._body = json.dumps({"data": "x" * max(response_size - 12, 0)}).encode()
+        self._loop = None
+        self._stopped = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while await reader.readline():
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                await asyncio.sleep(self._latency)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: " + str(len(self._body)).encode() + b"\r\n\r\n" + self._body)
+                await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    def call_soon_threadsafe(self, function) -> None:
+        self._loop.call_soon_threadsafe(function)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def serve(self, started: threading.Event, port: list) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self.handle, "127.0.0.1", 0, backlog=1024)
+        port.append(server.sockets[0].getsockname()[1])
+        started.set()
+        async with server:
+            await self._stopped.wait()
+
+
+def _start_stub_server(latency: float, response_size: Optional[int] = None) -> Tuple[_StubServer, int]:
+    server = _StubServer(latency=latency, response_size=response_size or 0)
+    started = threading.Event()
+    port = []
+    threading.Thread(target=lambda: asyncio.run(server.serve(started, port)), daemon=True).start()
+    started.wait()
+    return server, port[0]
+
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status if isinstance(status, int) else 0)
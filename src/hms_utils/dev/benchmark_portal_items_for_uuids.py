@@ -0,0 +1,64 @@
+# Benchmark comparing the per-uuid and batched (search) paths of hms_utils.portal.portal_read for
+# fetching a set of Portal items by uuid, e.g. as is done to resolve references with --refs.
+# The uuids are those referenced by the items returned by the given query (or given explicitly).
+# Note that the batched path is only used for the raw frame, i.e. with --raw or --inserts.
+#
+# Example:
+#
+# python -m hms_utils.dev.benchmark_portal_items_for_uuids --env smaht-data /files?limit=200 --inserts
+#
+import sys
+import time
+from hms_utils.argv import ARGV
+from hms_utils.chars import chars
+from hms_utils.datetime_utils import format_duration
+from hms_utils.dictionary_utils import get_referenced_uuids
+from hms_utils.portal.portal_read import Portal, _get_portal_items_for_uuids, _portal_get
+from hms_utils.portal.portal_read import _ITEM_IGNORE_REF_PROPERTIES, _PORTAL_SEARCH_UUIDS_BATCH_SIZE
+
+
+def main() -> int:
+
+    argv = ARGV({
+        ARGV.REQUIRED(str): ["query"],
+        ARGV.OPTIONAL(str): ["--env", "--e"],
+        ARGV.OPTIONAL(str): ["--app"],
+        ARGV.OPTIONAL(bool): ["--raw"],
+        ARGV.OPTIONAL(bool): ["--inserts", "--insert"],
+        ARGV.OPTIONAL(int, 50): ["--nthreads", "--threads"],
+        ARGV.OPTIONAL([int]): ["--batch-size", "--batch"],
+        ARGV.OPTIONAL(bool): ["--verbose"],
+        ARGV.OPTIONAL(bool): ["--debug"]
+    })
+
+    if not (portal := Portal.create(argv.env, app=argv.app, verbose=argv.verbose, debug=argv.debug)):
+        return 1
+
+    if not isinstance(items := portal.GET(argv.query, metadata=True, raw=argv.raw or argv.inserts), dict):
+        print(f"Cannot retrieve items for query: {argv.query}")
+        return 1
+    items = items.get("@graph", [items])
+    uuids = get_referenced_uuids(items, exclude_uuid=True, include_paths=True,
+                                 exclude_properties=_ITEM_IGNORE_REF_PROPERTIES)
+    print(f"Items fetched for query: {len(items)} {chars.dot} referenced uuids to fetch: {len(uuids)}")
+    print(f"Threads: {argv.nthreads} {chars.dot} raw: {argv.raw} {chars.dot} inserts: {argv.inserts}")
+
+    batch_sizes = [0] + (argv.batch_size or [_PORTAL_SEARCH_UUIDS_BATCH_SIZE])
+    for batch_size in batch_sizes:
+        _portal_get.cache_clear()
+        calls_before = portal.get_metadata_call_count + portal.get_call_count
+        started = time.time()
+        fetched_items = _get_portal_items_for_uuids(portal, uuids, raw=argv.raw, inserts=argv.inserts,
+                                                    nthreads=argv.nthreads, batch_size=batch_size)
+        duration = time.time() - started
+        calls = portal.get_metadata_call_count + portal.get_call_count - calls_before
+        print(f"{'per-uuid' if batch_size == 0 else f'batched ({batch_size})'}:"
+              f" items: {len([item for item in fetched_items if isinstance(item, dict)])}"
+              f" {chars.dot} round trips: {calls}"
+              f" {chars.dot} duration: {format_duration(duration)} ({duration:.3f} seconds)")
+    return 0
+
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status if isinstance(status, int) else 0)
@@ -0,0 +1,137 @@
+# Micro-benchmark for hms_utils.dictionary_utils.get_referenced_uuids (and get_referenced_uuids_from_items)
+# on synthetic Portal-shaped items, i.e. items with uuids, @id paths, linkTo (uuid) properties, lists of
+# embedded objects, and plenty of (non-uuid) string values; compared against the original (recursive,
+# list-based) implementation, included here (only) as the baseline, whose results must be the same.
+#
+# Example:
+#
+# python -m hms_utils.dev.benchmark_referenced_uuids --items 1000 --items 10000 --items 50000
+#
+import random
+import sys
+import time
+from typing import Any, List, Optional
+import uuid as uuid_module
+from hms_utils.argv import ARGV
+from hms_utils.chars import chars
+from hms_utils.dictionary_utils import get_referenced_uuids, get_referenced_uuids_from_items
+from hms_utils.type_utils import is_uuid
+
+_BASELINE_MAX_ITEMS = 20000  # The baseline is quadratic; beyond this it takes (far) too long.
+
+
+def main() -> int:
+
+    argv = ARGV({
+        ARGV.OPTIONAL([int]): ["--items", "--count"],
+        ARGV.OPTIONAL(int, 25): ["--references", "--refs"],
+        ARGV.OPTIONAL(bool): ["--include-paths", "--paths"],
+        ARGV.OPTIONAL(bool): ["--nobaseline"],
+        ARGV.OPTIONAL(int, 1): ["--seed"]
+    })
+
+    random.seed(argv.seed)
+    for nitems in (argv.items or [1000, 10000, 50000]):
+        items = _generate_items(nitems, nreferences=argv.references)
+        print(f"Items: {nitems} {chars.dot} include paths: {argv.include_paths is True}")
+        kwargs = {"exclude_uuid": True, "include_paths": argv.include_paths is True}
+        started = time.time()
+        uuids = get_referenced_uuids(items, **kwargs)
+        duration = time.time() - started
+        print(f"- get_referenced_uuids: {len(uuids)} uuids {chars.dot} {duration:.3f} seconds")
+        started = time.time()
+        batch_uuids = get_referenced_uuids_from_items(iter(items), **kwargs)
+        print(f"- get_referenced_uuids_from_items (generator): {len(batch_uuids)} uuids"
+              f" {chars.dot} {time.time() - started:.3f} seconds")
+        started = time.time()
+        for item in items:
+            get_referenced_uuids(item, **kwargs)
+        print(f"- get_referenced_uuids (per item): {time.time() - started:.3f} seconds")
+        if not argv.nobaseline:
+            if nitems > _BASELINE_MAX_ITEMS:
+                print(f"- baseline: skipped (more than {_BASELINE_MAX_ITEMS} items)")
+            else:
+                started = time.time()
+                baseline_uuids = _get_referenced_uuids_baseline(items, **kwargs)
+                baseline_duration = time.time() - started
+                print(f"- baseline: {len(baseline_uuids)} uuids {chars.dot} {baseline_duration:.3f} seconds"
+                      f"{f' {chars.dot} speedup: {baseline_duration / duration:.1f}x' if duration > 0 else ''}"
+                      f" {chars.dot} same: {chars.check if baseline_uuids == uuids else chars.xmark}")
+                if baseline_uuids != uuids:
+                    return 1
+    return 0
+
+
+def _generate_items(nitems: int, nreferences: int = 25) -> List[dict]:
+    # Items referencing a pool of other items (about half of which are themselves among the items),
+    # shaped roughly like Portal (e.g. file) items, with @id paths and embedded (quality metric) objects.
+    item_uuids = [str(uuid_module.uuid4()) for _ in range(nitems)]
+    other_uuids = [str(uuid_module.uuid4()) for _ in range(nitems)]
+    pool = item_uuids + other_uuids
+    items = []
+    for index, item_uuid in enumerate(item_uuids):
+        references = random.sample(pool, min(nreferences, len(pool)))
+        items.append({
+            "uuid": item_uuid,
+            "@id": f"/output-files/{item_uuid}/",
+            "@type": ["OutputFile", "File", "SubmittedItem", "Item"],
+            "accession": f"SMAFI{index:07d}",
+            "display_title": f"SMAFI{index:07d}.bam",
+            "status": "released",
+            "date_created": "2024-10-31T12:34:56.789012+00:00",
+            "md5sum": uuid_module.uuid4().hex,
+            "file_size": random.randint(1, 10 ** 12),
+            "description": "Aligned reads for the sample, with duplicates marked, per the standard pipeline.",
+            "submitted_by": references[0],
+            "submission_centers": [references[1]],
+            "file_sets": references[2:4],
+            "derived_from": [f"/submitted-files/{reference}/" for reference in references[4:6]],
+            "quality_metrics": [{"uuid": reference, "name": f"metric-{n}", "value": random.random(),
+                                 "qc_values": [{"key": "coverage", "value": "30X", "flag": "pass"}]}
+                                for n, reference in enumerate(references[6:])]
+        })
+    return items
+
+
+def _get_referenced_uuids_baseline(item: Any, ignore_uuids: Optional[List[str]] = None,
+                                   exclude_uuid: bool = False, exclude_properties: Optional[List[str]] = None,
+                                   uuid_property_name: Optional[str] = None,
+                                   include_paths: bool = False) -> List[str]:
+    # The original implementation of get_referenced_uuids.
+    referenced_uuids = []
+    def find_referenced_uuids(item: Any) -> None:  # noqa
+        if isinstance(item, dict):
+            for key in item:
+                if (not isinstance(exclude_properties, list)) or (key not in exclude_properties):
+                    find_referenced_uuids(item[key])
+        elif isinstance(item, (list, tuple)):
+            for element in item:
+                find_referenced_uuids(element)
+        elif uuids := get_uuids_from_value(item):
+            for uuid in uuids:
+                if (uuid not in ignore_uuids) and (uuid not in referenced_uuids):
+                    referenced_uuids.append(uuid)
+    def get_uuids_from_value(value: str) -> List[str]:  # noqa
+        uuids = []
+        if isinstance(value, str):
+            if is_uuid(value):
+                uuids.append(value)
+            elif include_paths is True:
+                for component in value.split("/"):
+                    if is_uuid(component := component.strip()):
+                        uuids.append(component)
+        return uuids
+    ignore_uuids = list(ignore_uuids) if isinstance(ignore_uuids, list) else []
+    if not (isinstance(uuid_property_name, str) and uuid_property_name):
+        uuid_property_name = "uuid"
+    for element in (item if isinstance(item, list) else [item]):
+        if ((exclude_uuid is True) and isinstance(element, dict) and
+            (uuid := element.get(uuid_property_name)) and (uuid not in ignore_uuids)):  # noqa
+            ignore_uuids.append(uuid)
+    find_referenced_uuids(item)
+    return referenced_uuids
+
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status if isinstance(status, int) else 0)
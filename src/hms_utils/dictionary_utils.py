@@ -1,13 +1,16 @@
 from __future__ import annotations
-from collections import defaultdict, deque
+from collections import deque
 from copy import deepcopy
+from functools import lru_cache
 import glob
 import io
 import json
 import os
-from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from hms_utils.type_utils import is_uuid, to_non_empty_string_list
 
+_UUID_LENGTH = 36
+
 
 def delete_paths_from_dictionary(data: dict, paths: List[str], separator: str = "/", copy: bool = True):
     """
@@ -95,44 +98,64 @@ def get_referenced_uuids(item: Union[dict, List[dict]],
     is named "uuid" (or named for the give uuid_property_name). If the given included_paths
     flag is set then also looks for uuid values as a part of slash-separated path values.
     """
-    referenced_uuids = []
-    def find_referenced_uuids(item: Any) -> None:  # noqa
-        nonlocal referenced_uuids, ignore_uuids
-        if isinstance(item, dict):
-            for key in item:
-                if (not isinstance(exclude_properties, list)) or (key not in exclude_properties):
-                    find_referenced_uuids(item[key])
-        elif isinstance(item, (list, tuple)):
-            for element in item:
-                find_referenced_uuids(element)
-        elif uuids := get_uuids_from_value(item):
-            for uuid in uuids:
-                if (uuid not in ignore_uuids) and (uuid not in referenced_uuids):
-                    referenced_uuids.append(uuid)
-    def get_uuids_from_value(value: str) -> List[str]:  # noqa
-        uuids = []
-        if isinstance(value, str):
-            if is_uuid(value):
-                uuids.append(value)
-            elif include_paths is True:
-                for component in value.split("/"):
-                    if is_uuid(component := component.strip()):
-                        uuids.append(component)
-        return uuids
-    if not isinstance(ignore_uuids, list):
-        ignore_uuids = []
+    return get_referenced_uuids_from_items(item if isinstance(item, list) else [item],
+                                           ignore_uuids=ignore_uuids, exclude_uuid=exclude_uuid,
+                                           exclude_properties=exclude_properties,
+                                           uuid_property_name=uuid_property_name, include_paths=include_paths)
+
+
+def get_referenced_uuids_from_items(items: Iterable[Any],
+                                    ignore_uuids: Optional[List[str]] = None,
+                                    exclude_uuid: bool = False,
+                                    exclude_properties: Optional[List[str]] = None,
+                                    uuid_property_name: Optional[str] = None,
+                                    include_paths: bool = False) -> List[str]:
+    """
+    Same as get_referenced_uuids but for any number of the given items (e.g. a generator of items
+    streamed from a file), in a single pass, i.e. consuming the items once; the uuids are returned
+    in the order of their first appearance. If the exclude_uuid flag is set then the uuids of all of
+    the given (dictionary) items are ignored, wherever they appear (e.g. before the item itself).
+    The items are traversed iteratively (with an explicit stack), so deeply nested items are fine.
+    """
+    referenced_uuids = {}  # Ordered set, i.e. in order of first appearance.
+    item_uuids = set()
     if not (isinstance(uuid_property_name, str) and uuid_property_name):
         uuid_property_name = "uuid"
-    if isinstance(item, dict):
-        if (exclude_uuid is True) and (uuid := item.get(uuid_property_name)) and (uuid not in ignore_uuids):
-            ignore_uuids.append(uuid)
-    elif isinstance(item, list):
-        for element in item:
-            if ((exclude_uuid is True) and isinstance(element, dict) and
-                (uuid := element.get(uuid_property_name)) and (uuid not in ignore_uuids)):  # noqa
-                ignore_uuids.append(uuid)
-    find_referenced_uuids(item)
-    return referenced_uuids
+    if not isinstance(exclude_properties, list):
+        exclude_properties = None
+    elif exclude_properties:
+        exclude_properties = set(exclude_properties)
+    for item in items:
+        if (exclude_uuid is True) and isinstance(item, dict) and (uuid := item.get(uuid_property_name)):
+            item_uuids.add(uuid)
+        stack = [item]
+        while stack:
+            if isinstance(value := stack.pop(), dict):
+                # Pushed in reverse so that values are visited in order, i.e. as the recursive traversal would.
+                if exclude_properties:
+                    stack.extend(reversed([value[key] for key in value if key not in exclude_properties]))
+                else:
+                    stack.extend(reversed(value.values()))
+            elif isinstance(value, (list, tuple)):
+                stack.extend(reversed(value))
+            elif isinstance(value, str) and (len(value) >= _UUID_LENGTH):
+                if _is_uuid_candidate(value) and is_uuid(value):
+                    referenced_uuids[value] = True
+                elif include_paths is True:
+                    for component in value.split("/"):
+                        if len(component) >= _UUID_LENGTH:
+                            if _is_uuid_candidate(component := component.strip()) and is_uuid(component):
+                                referenced_uuids[component] = True
+    if isinstance(ignore_uuids, (list, set, tuple)):
+        item_uuids.update(ignore_uuids)
+    return [uuid for uuid in referenced_uuids if uuid not in item_uuids]
+
+
+def _is_uuid_candidate(value: str) -> bool:
+    # Cheap check before the (more expensive) uuid regular expression match; nearly all
+    # (non-uuid) string values fail this on their length or on the first dash position.
+    return ((len(value) == _UUID_LENGTH) and (value[8] == "-") and
+            (value[13] == "-") and (value[18] == "-") and (value[23] == "-"))
 
 
 def get_referenced_uuids_from_file(file: str,
@@ -146,15 +169,14 @@ def get_referenced_uuids_from_file(file: str,
 
 def get_referenced_uuids_from_files(directory: str,
                                     ignore_uuids: Optional[List[str]] = None, exclude_uuid: bool = False) -> List[str]:
-    referenced_uuids = []
+    referenced_uuids = {}  # Ordered set.
     try:
         for file in glob.glob(os.path.join(directory, '*.json')):
             for uuid in get_referenced_uuids_from_file(file, ignore_uuids=ignore_uuids, exclude_uuid=exclude_uuid):
-                if uuid not in referenced_uuids:
-                    referenced_uuids.append(uuid)
+                referenced_uuids[uuid] = True
     except Exception:
         pass
-    return referenced_uuids
+    return list(referenced_uuids)
 
 
 def get_uuids(data: Union[dict, list], uuid_property_name: Optional[str] = None) -> List[str]:
@@ -229,16 +251,7 @@ def get_property(data: dict, name: str, fallback: Optional[Any] = None) -> Optio
     nested dictionaries within the given dictionary; returns None if not found.
     """
     if isinstance(data, dict) and isinstance(name, str) and name:
-        if keys := name.split("."):
-            nkeys = len(keys) ; key_index_max = nkeys - 1  # noqa
-            for key_index in range(nkeys):
-                if (value := data.get(keys[key_index], None)) is not None:
-                    if key_index == key_index_max:
-                        return value
-                    elif isinstance(value, dict):
-                        data = value
-                        continue
-                break
+        return compile_property_path(name).get(data, fallback)
     return fallback
 
 
@@ -251,30 +264,96 @@ def get_properties(data: dict, name: str, fallback: Optional[Any] = None, sort:
     each within the list of returned values.
     """
     if isinstance(data, dict) and isinstance(name, str) and name:
-        if keys := name.split("."):
-            nkeys = len(keys) ; key_index_max = nkeys - 1  # noqa
-            for key_index in range(nkeys):
-                if (value := data.get(keys[key_index], None)) is not None:
-                    if key_index == key_index_max:
-                        return [value]
-                    elif isinstance(value, dict):
-                        data = value
-                        continue
-                    elif isinstance(value, list) and value and ((sub_key_index := key_index + 1) < nkeys):
-                        sub_key = ".".join(keys[sub_key_index:])
-                        values = []
-                        for element in value:
-                            if isinstance(element_value := get_properties(element, sub_key), list):
-                                for element_value_item in element_value:
-                                    if (element_value_item is not None) and (element_value_item not in values):
-                                        values.append(element_value_item)
-                            elif (element_value is not None) and (element_value not in values):
-                                values.append(element_value)
-                        return sorted(values) if (sort is True) else values
-                break
+        return compile_property_path(name).get_all(data, fallback, sort=sort)
     return fallback if isinstance(fallback, list) else ([] if fallback is None else [fallback])
 
 
+@lru_cache(maxsize=1024)
+def compile_property_path(name: str) -> PropertyPath:
+    """
+    Returns the PropertyPath for the given (dot-separated) property name; cached per property name, so
+    that it can be used freely (e.g. per item) while only parsing the property name once.
+    """
+    return PropertyPath(name)
+
+
+class PropertyPath:
+    """
+    A (dot-separated) property name, e.g. file_sets.libraries.analytes.samples.code, parsed once, so that it
+    can be used to get its value(s) from (many) dictionaries more cheaply than via get_property/get_properties
+    (which themselves use this, via compile_property_path); get is the same as get_property and get_all is the
+    same as get_properties. Create via compile_property_path.
+    """
+    __slots__ = ("_name", "_keys", "_last")
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._keys = tuple(name.split(".")) if isinstance(name, str) and name else ()
+        self._last = len(self._keys) - 1
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def get(self, data: dict, fallback: Optional[Any] = None) -> Optional[Any]:
+        if not (isinstance(data, dict) and self._keys):
+            return fallback
+        keys = self._keys
+        for index in range(self._last):
+            if not isinstance(data := data.get(keys[index]), dict):
+                return fallback
+        return value if (value := data.get(keys[self._last])) is not None else fallback
+
+    def get_all(self, data: dict, fallback: Optional[Any] = None, sort: bool = False) -> List[Any]:
+        if isinstance(data, dict) and self._keys and ((values := self._get_all(data, 0)) is not None):
+            if len(values) > 1:
+                values = _unique_values(values)
+                return sorted(values) if (sort is True) else values
+            return values
+        return fallback if isinstance(fallback, list) else ([] if fallback is None else [fallback])
+
+    def _get_all(self, data: dict, index: int) -> Optional[List[Any]]:
+        # Returns the (not yet unique) values at (and beyond) the given key index within the given dictionary,
+        # fanning out through any lists along the way; or None if not found, i.e. the (top-level) fallback.
+        keys = self._keys
+        while (value := data.get(keys[index])) is not None:
+            if index == self._last:
+                return [value]
+            elif isinstance(value, dict):
+                data = value
+                index += 1
+            elif isinstance(value, list) and value:
+                values = []
+                if (index + 1 == self._last) and (not keys[self._last]):
+                    return values  # E.g. for a.b. i.e. an empty (so invalid) sub-property name for the list elements.
+                for element in value:
+                    if isinstance(element, dict) and (element_values := self._get_all(element, index + 1)):
+                        values.extend(element_values)
+                return values
+            else:
+                break
+        return None
+
+    def __repr__(self) -> str:
+        return f"PropertyPath({self._name!r})"
+
+
+def _unique_values(values: List[Any]) -> List[Any]:
+    # Unique values in order of first appearance; values may be unhashable (e.g. lists).
+    unique_values = []
+    seen = set()
+    for value in values:
+        try:
+            if value in seen:
+                continue
+            seen.add(value)
+        except TypeError:
+            if value in unique_values:
+                continue
+        unique_values.append(value)
+    return unique_values
+
+
 def select_items(items: List[dict], predicate: Callable) -> List[dict]:
     if not (isinstance(items, list) and items):
         return []
@@ -300,12 +379,13 @@ def group_items_by(items: list[dict], grouping: str,
     # though if sort is True then this is irrelevant.
     non_unique_item_count = 0
     results = {None: 0 if noitems is True else []}
+    grouping_path = compile_property_path(grouping)
     for item in items:
         if identifying_property and ((identifying_value := item.get(identifying_property)) is not None):
             item_identity = identifying_value
         else:
             item_identity = item
-        if grouping_values := get_properties(item, grouping):
+        if grouping_values := grouping_path.get_all(item):
             for grouping_value in grouping_values:
                 # This prefixing with the grouping name was added later when we realized it is useful to have,
                 # for each individual item grouped, the name of the grouping for which it is from.
@@ -359,47 +439,119 @@ def group_items_by_groupings(items: List[dict], groupings: List[str],
                              map_grouping_value: Optional[Callable] = None,
                              prefix_grouping_value: bool = False,
                              identifying_property: Optional[str] = "uuid") -> dict:
+    """
+    Groups the given items by the first of the given groupings (property names), as group_items_by does,
+    then each of those groups (recursively) by the next grouping, and so on. Each item is processed just
+    once, being inserted into a tree of groups (by its values for each grouping), which is then turned
+    into the same (nested) result as grouping each (sub) group by the next grouping would produce; where
+    items are identified (in sub groups) by the given identifying_property, i.e. items without it are not
+    included in sub groups.
+    """
     if not (isinstance(items, list) and items):
         return {}
     if isinstance(groupings, str) and groupings:
         groupings = [groupings]
     elif not (isinstance(groupings, list) and groupings):
         return {}
+    if not (isinstance(groupings[0], str) and (grouping := groupings[0].strip())):
+        return {}
+    groupings = [grouping] + [grouping.strip() for grouping in groupings[1:]
+                              if isinstance(grouping, str) and grouping.strip()]
+    if not callable(map_grouping_value):
+        map_grouping_value = None
     if not (isinstance(identifying_property, str) and (identifying_property := identifying_property.strip())):
         identifying_property = None
-    if not (grouped_items := group_items_by(items, groupings[0], sort=sort,
-                                            omit_unique_items_count=omit_unique_items_count,
-                                            map_grouping_value=map_grouping_value,
-                                            prefix_grouping_value=prefix_grouping_value,
-                                            identifying_property=identifying_property)):
-        return {}
-    def sub_group_items_by(group_items: dict, grouping: str) -> None:  # noqa
-        nonlocal items, sort, omit_unique_items_count, map_grouping_value, identifying_property
-        for grouped_item_key in group_items:
-            if isinstance(group_items[grouped_item_key], list):
-                sub_items = select_items(
-                    items, lambda item: item.get(identifying_property) in group_items[grouped_item_key])
-                group_items[grouped_item_key] = group_items_by(
-                    sub_items, grouping, sort=sort,
-                    omit_unique_items_count=omit_unique_items_count,
-                    map_grouping_value=map_grouping_value,
-                    prefix_grouping_value=prefix_grouping_value,
-                    identifying_property=identifying_property)
-            elif isinstance(group_items[grouped_item_key], dict):
-                sub_group_items_by(group_items[grouped_item_key]["group_items"], grouping)
-    for grouping in groupings[1:]:
-        if isinstance(grouping, str) and (grouping := grouping.strip()):
-            sub_group_items_by(grouped_items["group_items"], grouping)
-    if noitems is True:
-        def change_group_items_list_to_group_items_count(grouped_items: dict) -> None:
-            if isinstance(group_items := grouped_items.get("group_items"), dict):
-                for group_item_key in group_items:
-                    if isinstance(group_items[group_item_key], dict):
-                        change_group_items_list_to_group_items_count(group_items[group_item_key])
-                    elif isinstance(group_items[group_item_key], list):
-                        group_items[group_item_key] = len(group_items[group_item_key])
-        change_group_items_list_to_group_items_count(grouped_items)
-    return grouped_items
+    nlevels = len(groupings)
+    grouping_paths = [compile_property_path(grouping) for grouping in groupings]
+    def get_grouping_values(item: dict, grouping: str, grouping_path: PropertyPath) -> list:  # noqa
+        # Same as in group_items_by: values mapped to None are dropped; no values at all means the None group.
+        if not (grouping_values := grouping_path.get_all(item)):
+            return [None]
+        values = []
+        for grouping_value in grouping_values:
+            if map_grouping_value:
+                if (grouping_value := map_grouping_value(grouping, grouping_value)) is None:
+                    continue
+            if prefix_grouping_value is True:
+                grouping_value = f"{grouping}:{grouping_value}"
+            values.append(grouping_value)
+        return values
+    def insert_item(group: _ItemsGroup, item_index: int, item_identity: Any, identified: bool,  # noqa
+                    item_values: List[list], level: int) -> None:
+        if group.last_item_index == item_index:
+            return  # Already in this group, i.e. via a duplicate grouping value.
+        group.last_item_index = item_index
+        group.unique_item_count += 1
+        for grouping_value in item_values[level]:
+            group.item_count += 1
+            if level == nlevels - 1:
+                if (group_items := group.groups.get(grouping_value)) is None:
+                    group.groups[grouping_value] = (group_items := [])
+                group_items.append(item_identity)
+            else:
+                if (sub_group := group.groups.get(grouping_value)) is None:
+                    group.groups[grouping_value] = (sub_group := _ItemsGroup())
+                sub_group.count += 1
+                # Sub groups are made up of the items identified (by identifying_property) by their parent group.
+                if identified:
+                    insert_item(sub_group, item_index, item_identity, identified, item_values, level + 1)
+    def grouped_items(group: _ItemsGroup, level: int) -> dict:  # noqa
+        group_items = {}
+        if None in group.groups:
+            group_items[None] = group.groups[None]
+        for grouping_value in group.groups:
+            if grouping_value is not None:
+                group_items[grouping_value] = group.groups[grouping_value]
+        if not group_items:
+            return {}
+        if sort is True:
+            # Same as in group_items_by: descending order of the number of items in each group (at this level),
+            # and secondarily by the group value; for sub groups the number of items grouped into it at this level.
+            def group_item_count(value: Union[list, _ItemsGroup]) -> int:  # noqa
+                return len(value) if isinstance(value, list) else value.count
+            group_items = dict(sorted(group_items.items(),
+                                      key=lambda item: (-group_item_count(item[1]), item[0] is None, item[0] or "")))
+        for grouping_value, value in group_items.items():
+            if isinstance(value, _ItemsGroup):
+                group_items[grouping_value] = grouped_items(value, level + 1) if value.unique_item_count else {}
+            elif noitems is True:
+                group_items[grouping_value] = len(value)
+        results = {
+            "group": groupings[level],
+            "item_count": group.item_count,
+            "unique_item_count": group.unique_item_count,
+            "group_count": len(group_items),
+            "group_items": group_items
+        }
+        if omit_unique_items_count is True:
+            del results["unique_item_count"]
+        return results
+    root = _ItemsGroup()
+    for item_index, item in enumerate(items):
+        if identifying_property and ((identifying_value := item.get(identifying_property)) is not None):
+            item_identity = identifying_value
+            identified = True
+        else:
+            item_identity = item
+            identified = False
+        item_values = [get_grouping_values(item, grouping, grouping_path)
+                       for grouping, grouping_path in zip(groupings, grouping_paths)]
+        insert_item(root, item_index, item_identity, identified, item_values, 0)
+    return grouped_items(root, 0)
+
+
+class _ItemsGroup:
+    # A (non-leaf) group in the tree of groups built by group_items_by_groupings; groups maps each grouping
+    # value to either its sub group, or, for the last grouping, its list of item identities; count is the
+    # number of times an item was grouped into this group (by its parent), i.e. the length its list would be.
+    __slots__ = ("groups", "count", "item_count", "unique_item_count", "last_item_index")
+
+    def __init__(self) -> None:
+        self.groups = {}
+        self.count = 0
+        self.item_count = 0
+        self.unique_item_count = 0
+        self.last_item_index = None
 
 
 def compare_dictionaries_ordered(a: dict, b: dict) -> bool:
@@ -444,70 +596,226 @@ def order_dictionary_by_dependencies(items: List[dict],
     property names of identifying values, or a callable which returns the identifying values for
     a given item. There must be a single identifying value for each record whose property name
     is specified by the given identifying_property_name argument, or is "uuid" if none.
-    Returns the ordered list of items; does NOT make changes in place.
-    CAVEAT: This function was adapted from ChatGPT generated code.
+    Returns the ordered list of items; does NOT make changes in place. The items are in the order
+    of the layers of order_dictionary_by_dependency_layers (which see), and a DependencyCycleError
+    (a ValueError) is raised if there are cyclic dependencies.
     """
     if not isinstance(items, list):
         return []
+    if not _get_dependencies_function(dependencies):
+        return items
+    return order_dictionary_by_dependency_layers(items, dependencies, identifying_property_name).items
+
+
+def order_dictionary_by_dependency_layers(items: List[dict],
+                                          dependencies: Union[List[str], str, Callable],
+                                          identifying_property_name: str = "uuid") -> DependencyLayers:
+    """
+    Orders the given list of items (dictionaries), with dependencies as for order_dictionary_by_dependencies,
+    into (Kahn) layers, such that the items in each layer depend only on items in previous layers, i.e. no
+    item in a layer depends on another in the same layer, so each layer can be processed concurrently once
+    the previous layers are done; within each layer the items are in their given order. Dependencies on
+    identifying values which are not among the given items are ignored for ordering, and reported as the
+    external_dependencies of the returned DependencyLayers. If there are cyclic dependencies then raises a
+    DependencyCycleError, whose cycles are the shortest cycle (of identifying values) within each group of
+    items which (transitively) depend on each other. Raises ValueError on duplicate identifying values.
+    """
     if not (isinstance(identifying_property_name, str) and identifying_property_name):
         identifying_property_name = "uuid"
-    if not callable(dependencies):
-        dependent_property_names = []
-        if isinstance(dependencies, list):
-            for dependency in dependencies:
-                if isinstance(dependency, str) and dependency:
-                    dependent_property_names.append(dependency)
-        elif isinstance(dependencies, str) and dependencies:
-            dependent_property_names = [dependencies]
-        if not dependent_property_names:
-            return items
-        def get_dependencies(item: dict) -> List[str]:  # noqa
-            nonlocal dependent_property_names
-            dependency_values = []
-            for dependent_property_name in dependent_property_names:
-                if (dependency_value := item.get(dependent_property_name)) is not None:
-                    if isinstance(dependency_value_list := dependency_value, list):
-                        for dependency_value in dependency_value_list:
-                            if dependency_value is not None:
-                                dependency_values.append(dependency_value)
-                    else:
-                        dependency_values.append(dependency_value)
-            return dependency_values
-        dependencies = get_dependencies
-
-    # Create a map from identifying-value to item.
-    identifying_value_to_item_map = {item[identifying_property_name]: item for item in items}
-
-    # Create adjacency list and in-degree count for topological sort.
-    adjacency_list = defaultdict(list)
-    in_degree = defaultdict(int)
-
-    # Build graph.
-    for item in items:
-        identifying_value = item[identifying_property_name]
-        if isinstance(dependency_values := dependencies(item), list):
-            for dependency_value in dependency_values:
-                if dependency_value is not None:
-                    adjacency_list[dependency_value].append(identifying_value)
-                    in_degree[identifying_value] += 1
-
-    # Topological sort.
-    sorted_items = []
-    zero_in_degree = deque([identifying_value for identifying_value in identifying_value_to_item_map
-                            if in_degree[identifying_value] == 0])
-    while zero_in_degree:
-        current_identifying_value = zero_in_degree.popleft()
-        sorted_items.append(identifying_value_to_item_map[current_identifying_value])
-        for dependent_value in adjacency_list[current_identifying_value]:
-            in_degree[dependent_value] -= 1
-            if in_degree[dependent_value] == 0:
-                zero_in_degree.append(dependent_value)
-
-    # Check for cycles (unsatisfied dependencies).
-    if len(sorted_items) != len(items):
-        raise ValueError("The input contains cyclic dependencies and cannot be ordered.")
-
-    return sorted_items
+    if not isinstance(items, list):
+        items = []
+    get_dependencies = _get_dependencies_function(dependencies) or (lambda item: [])
+
+    # Map identifying values to item indices; and each item index to the indices of its (internal)
+    # dependencies (depends_on) and to the indices of the items which depend on it (dependents).
+    identifying_values = [item[identifying_property_name] for item in items]
+    identifying_value_to_index = {}
+    for index, identifying_value in enumerate(identifying_values):
+        if identifying_value in identifying_value_to_index:
+            raise ValueError(f"Duplicate identifying value ({identifying_property_name}): {identifying_value}")
+        identifying_value_to_index[identifying_value] = index
+    depends_on = [[] for _ in items]
+    dependents = [[] for _ in items]
+    external_dependencies = {}
+    for index, item in enumerate(items):
+        if not isinstance(dependency_values := get_dependencies(item), list):
+            continue
+        for dependency_value in dependency_values:
+            if dependency_value is None:
+                continue
+            if (dependency_index := identifying_value_to_index.get(dependency_value)) is None:
+                if dependency_value not in (item_external_dependencies := external_dependencies.setdefault(
+                                            identifying_values[index], [])):  # noqa
+                    item_external_dependencies.append(dependency_value)
+            elif dependency_index not in depends_on[index]:
+                depends_on[index].append(dependency_index)
+                dependents[dependency_index].append(index)
+
+    # Kahn's algorithm, a layer at a time.
+    in_degree = [len(item_depends_on) for item_depends_on in depends_on]
+    layers = []
+    layer = [index for index in range(len(items)) if in_degree[index] == 0]
+    nordered = 0
+    while layer:
+        layers.append(layer)
+        nordered += len(layer)
+        next_layer = []
+        for index in layer:
+            for dependent_index in dependents[index]:
+                in_degree[dependent_index] -= 1
+                if in_degree[dependent_index] == 0:
+                    next_layer.append(dependent_index)
+        layer = sorted(next_layer)
+
+    if nordered != len(items):
+        unordered = [index for index in range(len(items)) if in_degree[index] > 0]
+        cycles = [[identifying_values[index] for index in cycle]
+                  for cycle in _get_dependency_cycles(unordered, depends_on)]
+        raise DependencyCycleError(cycles)
+
+    return DependencyLayers([[items[index] for index in layer] for layer in layers], external_dependencies)
+
+
+class DependencyLayers:
+    """
+    The result of order_dictionary_by_dependency_layers: the layers, each a list of items, in order; and the
+    external dependencies, i.e. a dictionary of identifying values of items to the list of their dependencies
+    (identifying values) which are not among the items (only for items with any).
+    """
+
+    def __init__(self, layers: List[List[dict]], external_dependencies: Dict[Any, List[Any]]) -> None:
+        self.layers = layers
+        self.external_dependencies = external_dependencies
+
+    @property
+    def items(self) -> List[dict]:
+        return [item for layer in self.layers for item in layer]
+
+    @property
+    def max_layer_size(self) -> int:
+        return max((len(layer) for layer in self.layers), default=0)
+
+
+class DependencyCycleError(ValueError):
+    """
+    Raised by order_dictionary_by_dependency_layers when there are cyclic dependencies; cycles is a list
+    of cycles, each a list of identifying values, each depending on the next, ending with the first again.
+    """
+
+    def __init__(self, cycles: List[List[Any]]) -> None:
+        self.cycles = cycles
+        super().__init__(f"The input contains cyclic dependencies and cannot be ordered: "
+                         f"{'; '.join(' -> '.join(str(value) for value in cycle) for cycle in cycles)}")
+
+
+def _get_dependencies_function(dependencies: Union[List[str], str, Callable]) -> Optional[Callable]:
+    if callable(dependencies):
+        return dependencies
+    dependent_property_names = []
+    if isinstance(dependencies, list):
+        for dependency in dependencies:
+            if isinstance(dependency, str) and dependency:
+                dependent_property_names.append(dependency)
+    elif isinstance(dependencies, str) and dependencies:
+        dependent_property_names = [dependencies]
+    if not dependent_property_names:
+        return None
+    def get_dependencies(item: dict) -> List[str]:  # noqa
+        dependency_values = []
+        for dependent_property_name in dependent_property_names:
+            if (dependency_value := item.get(dependent_property_name)) is not None:
+                if isinstance(dependency_value_list := dependency_value, list):
+                    for dependency_value in dependency_value_list:
+                        if dependency_value is not None:
+                            dependency_values.append(dependency_value)
+                else:
+                    dependency_values.append(dependency_value)
+        return dependency_values
+    return get_dependencies
+
+
+def _get_dependency_cycles(indices: List[int], depends_on: List[List[int]]) -> List[List[int]]:
+    # Returns the shortest cycle within each of the strongly connected components (of more than one item, or
+    # of an item depending on itself) of the dependency graph of the given item indices, i.e. those which could
+    # not be ordered; each cycle is a list of item indices, ending with the first, in order of their first item.
+    nodes = set(indices)
+    edges = {index: [other for other in depends_on[index] if other in nodes] for index in indices}
+    cycles = []
+    for component in _get_strongly_connected_components(indices, edges):
+        if (len(component) == 1) and (component[0] not in edges[component[0]]):
+            continue
+        component_nodes = set(component)
+        shortest_cycle = None
+        for start in sorted(component):
+            if cycle := _get_shortest_cycle(start, edges, component_nodes):
+                if (shortest_cycle is None) or (len(cycle) < len(shortest_cycle)):
+                    shortest_cycle = cycle
+                    if len(cycle) <= 2:
+                        break
+        if shortest_cycle:
+            cycles.append(shortest_cycle)
+    return sorted(cycles, key=lambda cycle: min(cycle))
+
+
+def _get_shortest_cycle(start: int, edges: Dict[int, List[int]], nodes: set) -> Optional[List[int]]:
+    # Breadth-first search from the given node back to itself, within the given nodes.
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for successor in edges[node]:
+            if successor == start:
+                cycle = [start]
+                while node is not None:
+                    cycle.append(node)
+                    node = parents[node]
+                return list(reversed(cycle))
+            if (successor in nodes) and (successor not in parents):
+                parents[successor] = node
+                queue.append(successor)
+    return None
+
+
+def _get_strongly_connected_components(nodes: List[int], edges: Dict[int, List[int]]) -> List[List[int]]:
+    # Tarjan's algorithm, iteratively (with an explicit stack of (node, next edge index) work items).
+    node_index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in nodes:
+        if root in node_index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, edge_index = work.pop()
+            if edge_index == 0:
+                node_index[node] = lowlink[node] = len(node_index)
+                stack.append(node)
+                on_stack.add(node)
+            successors = edges[node]
+            while edge_index < len(successors):
+                successor = successors[edge_index]
+                edge_index += 1
+                if successor not in node_index:
+                    work.append((node, edge_index))
+                    work.append((successor, 0))
+                    break
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], node_index[successor])
+            else:
+                if lowlink[node] == node_index[node]:
+                    component = []
+                    while True:
+                        component.append(member := stack.pop())
+                        on_stack.discard(member)
+                        if member == node:
+                            break
+                    components.append(component)
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+    return components
 
 
 # THIS WILL GO AWAY (and using one in dicationary_parented) WHEN hms_config is obsoleted to config/cli.
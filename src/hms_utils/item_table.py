@@ -0,0 +1,299 @@
+from __future__ import annotations
+from array import array
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple, Union
+from hms_utils.datetime_utils import parse_datetime_string
+from hms_utils.dictionary_utils import PropertyPath, compile_property_path
+
+try:
+    import numpy
+except ImportError:  # Optional; without it the same operations are done in (plain) Python.
+    numpy = None
+
+_MISSING = -1  # Code for a missing value in an encoded column.
+
+
+class ItemTable:
+    """
+    Compact columnar table of selected properties (columns) of (many) items, e.g. Portal items from a (large)
+    search result, or streamed from a file, rather than holding the (full) item dictionaries themselves.
+    Each column is defined by a property path (compiled via compile_property_path), or list of them, in which
+    case the first one with a value is used, or a function of an item; and a type, str (the default), int, or
+    float. A str column is dictionary-encoded, i.e. stored as an array of codes into its (distinct) values,
+    since these are typically highly repetitive (e.g. status, type, dates, submitter), where a (list) value is
+    stored as a tuple; and an int or float column is stored as a typed array; each with a validity mask for
+    missing values (for an encoded column the missing code). Provides group-by counts, sorting, and month
+    bucketing, by column, over the (or the given) row indices; using NumPy, if installed, for group-by counts
+    and sorting.
+
+    The columns are given as a list of property names (each column named for its property name), or as a
+    dictionary of column names to property names, lists of property names, or functions, or tuples of any
+    of those and a type.
+    """
+
+    def __init__(self, columns: Union[List[str], Dict[str, Union[str, List[str], Tuple]]],
+                 use_numpy: Optional[bool] = None) -> None:
+        if isinstance(columns, list):
+            columns = {column: column for column in columns}
+        if not (isinstance(columns, dict) and columns):
+            raise ValueError("No columns given for ItemTable.")
+        self._columns = {}
+        for name, column in columns.items():
+            column_type = str
+            if isinstance(column, tuple) and (len(column) == 2):
+                column, column_type = column
+            if isinstance(column, str):
+                column = [column]
+            if callable(column):
+                get_value = column
+            elif isinstance(column, list) and column and all(isinstance(path, str) and path for path in column):
+                get_value = _get_value_function([compile_property_path(path) for path in column])
+            else:
+                raise ValueError(f"Invalid ItemTable column property name(s): {name}")
+            if column_type is str:
+                self._columns[name] = _EncodedColumn(get_value)
+            elif column_type in (int, float):
+                self._columns[name] = _NumericColumn(get_value, column_type)
+            else:
+                raise ValueError(f"Unsupported ItemTable column type: {name}: {column_type}")
+        self._use_numpy = (numpy is not None) if use_numpy is None else ((use_numpy is True) and (numpy is not None))
+        self._nrows = 0
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict], columns: Union[List[str], Dict[str, Union[str, List[str], Tuple]]],
+                   use_numpy: Optional[bool] = None) -> ItemTable:
+        table = cls(columns, use_numpy=use_numpy)
+        table.extend(items)
+        return table
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self._nrows
+
+    def append(self, item: dict) -> None:
+        if not isinstance(item, dict):
+            item = {}
+        for column in self._columns.values():
+            column.append(item)
+        self._nrows += 1
+
+    def extend(self, items: Iterable[dict]) -> None:
+        for item in items:
+            self.append(item)
+
+    def get(self, row: int, column: str) -> Optional[Any]:
+        return self._column(column).get(row)
+
+    def row(self, row: int) -> dict:
+        return {name: column.get(row) for name, column in self._columns.items()}
+
+    def rows(self, rows: Optional[Iterable[int]] = None) -> Generator[dict, None, None]:
+        for row in (range(self._nrows) if rows is None else rows):
+            yield self.row(row)
+
+    def column(self, column: str, rows: Optional[Iterable[int]] = None) -> List[Optional[Any]]:
+        column = self._column(column)
+        return [column.get(row) for row in (range(self._nrows) if rows is None else rows)]
+
+    def group_counts(self, column: str, rows: Optional[Iterable[int]] = None, sort: bool = False) -> dict:
+        """
+        Returns a dictionary of the (distinct) values of the given column, for the given rows, or all, to
+        their counts; None (for missing values) first, if any, then in order of their first appearance.
+        If sort is True then ordered by descending count, then by value, as group_items_by does.
+        """
+        column = self._column(column)
+        if isinstance(column, _EncodedColumn):
+            counts = self._encoded_counts(column, rows)
+            results = {None: counts[0]} if counts[0] else {}
+            for code, value in enumerate(column.values):
+                if count := counts[code + 1]:
+                    results[value] = count
+        else:
+            results = {}
+            for row in (range(self._nrows) if rows is None else rows):
+                value = column.get(row)
+                results[value] = results.get(value, 0) + 1
+            if None in results:
+                results = {None: results.pop(None), **results}
+        if sort is True:
+            results = dict(sorted(results.items(), key=lambda item: (-item[1], item[0] is None, _sort_key(item[0]))))
+        return results
+
+    def group_rows(self, column: str, rows: Optional[Iterable[int]] = None) -> Dict[Any, List[int]]:
+        """
+        Returns a dictionary of the (distinct) values of the given column, for the given rows, or all,
+        to the list of their row indices; in order of their first appearance, with None for missing values.
+        """
+        column = self._column(column)
+        results = {}
+        for row in (range(self._nrows) if rows is None else rows):
+            if (group_rows := results.get(value := column.get(row))) is None:
+                results[value] = (group_rows := [])
+            group_rows.append(row)
+        return results
+
+    def sort_rows(self, column: str, rows: Optional[Iterable[int]] = None, reverse: bool = False) -> List[int]:
+        """
+        Returns the given row indices, or all, (stably) sorted by the values of the given column,
+        ascending, or descending if reverse is True; rows with missing values are always last.
+        """
+        column = self._column(column)
+        valid_rows = []
+        keys = []
+        missing_rows = []
+        if isinstance(column, _EncodedColumn):
+            ranks = column.ranks()
+            for row in (range(self._nrows) if rows is None else rows):
+                if (code := column.codes[row]) == _MISSING:
+                    missing_rows.append(row)
+                else:
+                    valid_rows.append(row)
+                    keys.append(ranks[code])
+        else:
+            for row in (range(self._nrows) if rows is None else rows):
+                if column.valid[row]:
+                    valid_rows.append(row)
+                    keys.append(column.data[row])
+                else:
+                    missing_rows.append(row)
+        if self._use_numpy and valid_rows:
+            keys = numpy.array(keys)
+            order = numpy.argsort(-keys if reverse is True else keys, kind="stable").tolist()
+        else:
+            order = sorted(range(len(valid_rows)), key=keys.__getitem__, reverse=reverse is True)
+        return [valid_rows[index] for index in order] + missing_rows
+
+    def month_buckets(self, column: str, rows: Optional[Iterable[int]] = None,
+                      parse: Optional[Callable] = None) -> Dict[str, List[int]]:
+        """
+        Returns a dictionary of months, i.e. YYYY-MM, of the (date/time) values of the given column, for the
+        given rows, or all, to the list of their row indices, in order of their first appearance; values which
+        are missing, or cannot be parsed (via the given parse function, or parse_datetime_string), are omitted.
+        For an encoded column each distinct value is parsed just once.
+        """
+        column = self._column(column)
+        if not callable(parse):
+            parse = parse_datetime_string
+        def get_month(value: Any) -> Optional[str]:  # noqa
+            try:
+                if value := parse(value):
+                    return f"{value.year}-{value.month:02}"
+            except Exception:
+                pass
+            return None
+        results = {}
+        months = {}
+        for row in (range(self._nrows) if rows is None else rows):
+            if isinstance(column, _EncodedColumn):
+                if (code := column.codes[row]) == _MISSING:
+                    continue
+                if (month := months.get(code, _MISSING)) == _MISSING:
+                    months[code] = (month := get_month(column.values[code]))
+            elif (month := get_month(column.get(row))) is None:
+                continue
+            if month is not None:
+                if (month_rows := results.get(month)) is None:
+                    results[month] = (month_rows := [])
+                month_rows.append(row)
+        return results
+
+    def _column(self, column: str) -> Union[_EncodedColumn, _NumericColumn]:
+        if (table_column := self._columns.get(column)) is None:
+            raise KeyError(f"Unknown ItemTable column: {column}")
+        return table_column
+
+    def _encoded_counts(self, column: _EncodedColumn, rows: Optional[Iterable[int]] = None) -> List[int]:
+        # Counts by code plus one, i.e. the count of missing values first.
+        if self._use_numpy and self._nrows:
+            codes = numpy.frombuffer(column.codes, dtype=numpy.int64)
+            if rows is not None:
+                codes = codes[numpy.fromiter(rows, dtype=numpy.int64)]
+            return numpy.bincount(codes + 1, minlength=len(column.values) + 1).tolist()
+        counts = [0] * (len(column.values) + 1)
+        codes = column.codes
+        for row in (range(self._nrows) if rows is None else rows):
+            counts[codes[row] + 1] += 1
+        return counts
+
+
+class _EncodedColumn:
+
+    def __init__(self, get_value: Callable[[dict], Any]) -> None:
+        self.get_value = get_value
+        self.codes = array("q")
+        self.values = []
+        self._index = {}
+        self._ranks = None
+
+    def append(self, item: dict) -> None:
+        value = self.get_value(item)
+        if isinstance(value, list):
+            value = tuple(value)
+        try:
+            if (code := self._index.get(value)) is None:
+                if value is None:
+                    code = _MISSING
+                else:
+                    self._index[value] = (code := len(self.values))
+                    self.values.append(value)
+                    self._ranks = None
+        except TypeError:  # Unhashable, e.g. a dictionary (or a list of them).
+            code = _MISSING
+        self.codes.append(code)
+
+    def get(self, row: int) -> Optional[Any]:
+        return self.values[code] if (code := self.codes[row]) != _MISSING else None
+
+    def ranks(self) -> List[int]:
+        # The rank of each (distinct) value, by code, in sorted order of the values.
+        if self._ranks is None:
+            self._ranks = [0] * len(self.values)
+            for rank, code in enumerate(sorted(range(len(self.values)), key=lambda code: _sort_key(self.values[code]))):
+                self._ranks[code] = rank
+        return self._ranks
+
+
+class _NumericColumn:
+
+    def __init__(self, get_value: Callable[[dict], Any], column_type: type) -> None:
+        self.get_value = get_value
+        self.type = column_type
+        self.data = array("q" if column_type is int else "d")
+        self.valid = bytearray()
+
+    def append(self, item: dict) -> None:
+        value = self.get_value(item)
+        try:
+            if isinstance(value, bool) or (value is None):
+                raise ValueError
+            self.data.append(self.type(value))
+            self.valid.append(1)
+        except (ValueError, TypeError, OverflowError):
+            self.data.append(0)
+            self.valid.append(0)
+
+    def get(self, row: int) -> Optional[Union[int, float]]:
+        return self.data[row] if self.valid[row] else None
+
+
+def _get_value_function(paths: List[PropertyPath]) -> Callable[[dict], Any]:
+    # Returns a function returning the value of the first of the given property paths with a value for an item.
+    if len(paths) == 1:
+        return paths[0].get
+    def get_value(item: dict) -> Optional[Any]:  # noqa
+        for path in paths:
+            if (value := path.get(item)) is not None:
+                return value
+        return None
+    return get_value
+
+
+def _sort_key(value: Any) -> Tuple:
+    # Orders values of mixed types, e.g. numbers and strings, by type first.
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    if isinstance(value, str):
+        return (1, 0, value)
+    return (2, 0, str(value))
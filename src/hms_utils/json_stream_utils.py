@@ -0,0 +1,292 @@
+from __future__ import annotations
+import io
+import json
+import os
+import tempfile
+from typing import Any, Callable, Generator, Optional, Set, TextIO, Tuple, Union
+
+_JSON_STREAM_CHUNK_SIZE = 1024 * 1024
+_JSON_WHITESPACE = " \t\n\r"
+
+
+def iterate_json_array(file: Union[str, TextIO], chunk_size: Optional[int] = None) -> Generator[Any, None, None]:
+    """
+    Generator yielding, one at a time, the elements of the top-level JSON array in the given file
+    (path or text file object), reading and decoding it incrementally, a chunk at a time, so that
+    (only) one element at a time need be in memory. Raises ValueError if the file does not contain
+    a (top-level) JSON array or is otherwise not valid JSON.
+    """
+    for _, element in iterate_json_items(file, dictionary=False, chunk_size=chunk_size):
+        yield element
+
+
+def iterate_json_items(file: Union[str, TextIO], dictionary: Optional[bool] = None,
+                       chunk_size: Optional[int] = None,
+                       skip: Optional[Callable[[str], Any]] = None) -> Generator[Tuple[Optional[str], Any], None, None]:
+    """
+    Generator yielding, one at a time, the items in the given file (path or text file object) containing
+    either a top-level JSON array of items, for which each is yielded as a tuple of None and the item, or
+    a top-level JSON object whose values are arrays of items, e.g. an inserts dictionary of item type
+    names to lists of items, for which each item is yielded as a tuple of its key and the item (in order).
+    Read and decoded incrementally as for iterate_json_array. If dictionary is True (or False) then the file
+    must contain an object (or array). Raises ValueError if the file does not contain such an array or
+    object, or if any value of the object is not an array (unless a skip function is given, in which case
+    that value is skipped, and the function called with its key), or is otherwise not valid JSON.
+    """
+    if isinstance(file, str):
+        with io.open(file, "r") as f:
+            yield from iterate_json_items(f, dictionary=dictionary, chunk_size=chunk_size, skip=skip)
+        return
+    stream = _JsonStream(file, chunk_size=chunk_size)
+    if stream.expect("[{" if dictionary is None else ("{" if dictionary is True else "[")) == "[":
+        for element in stream.array():
+            yield None, element
+    elif not stream.peek("}"):
+        while True:
+            if not isinstance(key := stream.value(), str):
+                raise ValueError("Expected string key in JSON object stream.")
+            stream.expect(":")
+            if not stream.peek("["):
+                if not callable(skip):
+                    raise ValueError(f"Expected array value for key ({key}) in JSON object stream.")
+                stream.value()
+                skip(key)
+            else:
+                stream.expect("[")
+                for element in stream.array():
+                    yield key, element
+            if stream.expect(",}") == "}":
+                break
+    stream.end()
+
+
+def iterate_ndjson(file: Union[str, TextIO]) -> Generator[Any, None, None]:
+    """
+    Generator yielding, one at a time, the JSON values in the given NDJSON (newline delimited JSON)
+    file (path or text file object), one per (non-blank) line. Raises ValueError if invalid.
+    """
+    if isinstance(file, str):
+        with io.open(file, "r") as f:
+            yield from iterate_ndjson(f)
+        return
+    for line_number, line in enumerate(file, start=1):
+        if line := line.strip():
+            try:
+                yield json.loads(line)
+            except Exception:
+                raise ValueError(f"Invalid JSON on line {line_number} of NDJSON stream.")
+
+
+class JsonArrayWriter:
+    """
+    Writes a JSON array to the given text file object, an element at a time, identically to how
+    json.dump would write the equivalent list, with the given indent (or none if indent is None).
+    Use as a context manager, or call close (which writes the closing bracket, but does not close
+    the underlying file).
+    """
+
+    def __init__(self, file: TextIO, indent: Optional[int] = None) -> None:
+        self._file = file
+        self._indent = indent if isinstance(indent, int) and (indent > 0) else None
+        self._count = 0
+        self._closed = False
+        self._file.write("[")
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def write(self, element: Any) -> None:
+        if self._indent:
+            prefix = " " * self._indent
+            self._file.write(",\n" if self._count > 0 else "\n")
+            self._file.write(prefix + json.dumps(element, indent=self._indent).replace("\n", "\n" + prefix))
+        else:
+            if self._count > 0:
+                self._file.write(", ")
+            self._file.write(json.dumps(element))
+        self._count += 1
+
+    def close(self) -> None:
+        if not self._closed:
+            self._file.write("\n]" if (self._indent and (self._count > 0)) else "]")
+            self._closed = True
+
+    def __enter__(self) -> JsonArrayWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class AtomicFileWriter:
+    """
+    Context manager returning a text file object to write in place of the given file; this is actually
+    a temporary file in the same directory which, on successful exit, replaces (atomically) the given
+    file; on exception the temporary file is removed and the given file is left unchanged.
+    """
+
+    def __init__(self, file: str, mode: str = "w") -> None:
+        self._file = file
+        self._mode = mode
+        self._temporary_file = None
+        self._f = None
+
+    def __enter__(self) -> TextIO:
+        directory = os.path.dirname(os.path.abspath(self._file))
+        fd, self._temporary_file = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self._file)}.",
+                                                    suffix=".tmp")
+        self._f = os.fdopen(fd, self._mode)
+        return self._f
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._f.close()
+        if exc_type is None:
+            try:
+                os.chmod(self._temporary_file,
+                         (os.stat(self._file).st_mode & 0o777) if os.path.exists(self._file) else 0o644)
+            except Exception:
+                pass
+            os.replace(self._temporary_file, self._file)
+        else:
+            try:
+                os.remove(self._temporary_file)
+            except Exception:
+                pass
+
+
+class JsonArraysDictionaryWriter:
+    """
+    Writes a JSON object whose values are arrays, e.g. an inserts dictionary of item type names to lists of
+    items, to the given text file object, an element at a time, identically to how json.dump would write the
+    equivalent dictionary, with the given indent (or none if indent is None). Call start with a key to start
+    its array, then write for each of its elements. Use as a context manager, or call close (which writes
+    the closing brackets, but does not close the underlying file).
+    """
+
+    def __init__(self, file: TextIO, indent: Optional[int] = None) -> None:
+        self._file = file
+        self._indent = indent if isinstance(indent, int) and (indent > 0) else None
+        self._keys = set()
+        self._array = None
+        self._closed = False
+        self._file.write("{")
+
+    @property
+    def keys(self) -> Set[str]:
+        return self._keys
+
+    def start(self, key: str) -> None:
+        if key in self._keys:
+            raise ValueError(f"Duplicate key ({key}) for JSON object.")
+        self._end_array()
+        if self._indent:
+            self._file.write(",\n" if self._keys else "\n")
+            self._file.write(" " * self._indent + json.dumps(key) + ": ")
+            self._array = JsonArrayWriter(_IndentingWriter(self._file, " " * self._indent), indent=self._indent)
+        else:
+            self._file.write(", " if self._keys else "")
+            self._file.write(json.dumps(key) + ": ")
+            self._array = JsonArrayWriter(self._file)
+        self._keys.add(key)
+
+    def write(self, element: Any) -> None:
+        if not self._array:
+            raise ValueError("No key started for JSON object element.")
+        self._array.write(element)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._end_array()
+            self._file.write("\n}" if (self._indent and self._keys) else "}")
+            self._closed = True
+
+    def _end_array(self) -> None:
+        if self._array:
+            self._array.close()
+            self._array = None
+
+    def __enter__(self) -> JsonArraysDictionaryWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class _IndentingWriter:
+    # Writes to the given text file object with the given prefix after each newline.
+    def __init__(self, file: TextIO, prefix: str) -> None:
+        self._file = file
+        self._prefix = prefix
+
+    def write(self, text: str) -> None:
+        self._file.write(text.replace("\n", "\n" + self._prefix))
+
+
+class _JsonStream:
+    # Incremental JSON decoding of a text file object, a chunk at a time; see iterate_json_items.
+
+    def __init__(self, file: TextIO, chunk_size: Optional[int] = None) -> None:
+        self._file = file
+        self._chunk_size = chunk_size if isinstance(chunk_size, int) and (chunk_size > 0) else _JSON_STREAM_CHUNK_SIZE
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def skip_whitespace(self) -> bool:
+        # Skips whitespace in the buffer, reading more as needed; returns False iff at the end of the file.
+        while True:
+            while (self._position < len(self._buffer)) and (self._buffer[self._position] in _JSON_WHITESPACE):
+                self._position += 1
+            if self._position < len(self._buffer):
+                return True
+            if self._eof:
+                return False
+            self._buffer = self._file.read(self._chunk_size) ; self._position = 0  # noqa
+            self._eof = not self._buffer
+
+    def peek(self, characters: str) -> bool:
+        # Returns True iff the next (non-whitespace) character is one of the given characters,
+        # in which case, if it is a closing bracket, it is consumed.
+        if self.skip_whitespace() and (self._buffer[self._position] in characters):
+            if self._buffer[self._position] in "]}":
+                self._position += 1
+            return True
+        return False
+
+    def expect(self, characters: str) -> str:
+        if (not self.skip_whitespace()) or (self._buffer[self._position] not in characters):
+            raise ValueError(f"Expected one of {list(characters)} in JSON stream.")
+        self._position += 1
+        return self._buffer[self._position - 1]
+
+    def value(self) -> Any:
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+                # A number at the very end of the buffer may be truncated, e.g. 123 of 12345.
+                if (end < len(self._buffer)) or self._eof:
+                    break
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise ValueError("Invalid JSON in stream.")
+            if not (more := self._file.read(self._chunk_size)):
+                self._eof = True
+            self._buffer = self._buffer[self._position:] + more ; self._position = 0  # noqa
+        self._position = end
+        return value
+
+    def array(self) -> Generator[Any, None, None]:
+        # Yields the elements of the array whose opening bracket has just been consumed.
+        if self.peek("]"):
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                break
+
+    def end(self) -> None:
+        if self.skip_whitespace():
+            raise ValueError("Extra data after JSON stream.")
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import re
+import requests
+import threading
+import time
+from typing import Callable, Generator, Iterable, List, Optional, Union
+from urllib.parse import quote
+from dcicutils.ff_utils import search_metadata
+from hms_utils.chars import chars
+from hms_utils.datetime_utils import format_duration
+from hms_utils.portal.portal_utils import Portal
+from hms_utils.threading_utils import RateLimiter, run_concurrently
+
+DEFAULT_PORTAL_BULK_PATCH_THREADS = 8
+DEFAULT_PORTAL_BULK_PATCH_RETRIES = 3
+DEFAULT_PORTAL_BULK_PATCH_BACKOFF = 1.0  # Seconds; doubled after each retry.
+DEFAULT_PORTAL_BULK_PATCH_LATENCY = 0.5  # Seconds; assumed per request latency for a dryrun projection.
+
+_SEARCH_FIELDS = ["uuid", "@type"]
+# The status code in the message of an exception from a (dcicutils) request, or from webtest (for a vapp).
+_ERROR_STATUS_CODE_PATTERN = re.compile(r"Bad (?:status code for \w+ request for \S+|response): (\d{3})\b")
+
+
+class PortalBulkPatch:
+    """
+    Patches (many) Portal items, i.e. the items from a given search query or iterable (e.g. generator),
+    each with the patch (dictionary) returned for it by a given patch function (None meaning no patch).
+    The patch function is called serially, as the items are consumed; the patch requests are made
+    concurrently, with a constant number (nthreads) of them in flight, rather than in batches (which
+    wait for their slowest request); limited to (at most) rate requests per second, if given; and each
+    retried (retries times) with exponential backoff on failure. With dryrun no requests are made, but the
+    patch function is still called, and the projected number of requests and duration are reported.
+    Only server (5xx) and connection errors are retried; client (4xx) errors, e.g. validation, are not.
+    Counters are thread-safe; run returns True iff no patch failed.
+    """
+
+    def __init__(self, portal: Portal, nthreads: int = DEFAULT_PORTAL_BULK_PATCH_THREADS,
+                 rate: Optional[float] = None, retries: int = DEFAULT_PORTAL_BULK_PATCH_RETRIES,
+                 backoff: float = DEFAULT_PORTAL_BULK_PATCH_BACKOFF, skip_links: bool = False,
+                 dryrun: bool = False, latency: float = DEFAULT_PORTAL_BULK_PATCH_LATENCY,
+                 verbose: bool = False, debug: bool = False) -> None:
+        self._portal = portal
+        self._nthreads = nthreads if isinstance(nthreads, int) and (nthreads > 0) else DEFAULT_PORTAL_BULK_PATCH_THREADS
+        self._rate_limiter = RateLimiter(rate)
+        self._retries = retries if isinstance(retries, int) and (retries >= 0) else DEFAULT_PORTAL_BULK_PATCH_RETRIES
+        self._backoff = (backoff if isinstance(backoff, (int, float)) and (backoff >= 0)
+                         else DEFAULT_PORTAL_BULK_PATCH_BACKOFF)
+        self._latency = (latency if isinstance(latency, (int, float)) and (latency > 0)
+                         else DEFAULT_PORTAL_BULK_PATCH_LATENCY)
+        self._skip_links = skip_links is True
+        self._dryrun = dryrun is True
+        self._verbose = verbose
+        self._debug = debug
+        self._lock = threading.Lock()
+        self._started = None
+        self._finished = None
+        self.items = 0
+        self.skipped = 0
+        self.patched = 0
+        self.failed = 0
+        self.requests = 0
+        self.retries = 0
+
+    @property
+    def dryrun(self) -> bool:
+        return self._dryrun
+
+    @property
+    def duration(self) -> float:
+        if self._started is None:
+            return 0
+        return (self._finished or time.time()) - self._started
+
+    @property
+    def projected_requests(self) -> int:
+        # For a dryrun, the number of patch requests which would have been made (assuming no retries).
+        return self.patched if self._dryrun else self.requests
+
+    @property
+    def projected_duration(self) -> float:
+        # For a dryrun, the time the patch requests would take, given the assumed per request latency
+        # (spread across the threads), but no faster than the rate limit, if any.
+        interval = self._latency / self._nthreads
+        if self._rate_limiter.rate:
+            interval = max(interval, 1 / self._rate_limiter.rate)
+        return self.projected_requests * interval
+
+    def run(self, items: Union[str, Iterable[dict]], patch: Callable[[dict], Optional[dict]],
+            limit: int = 0, fields: Optional[List[str]] = None) -> bool:
+        """
+        Patches each of the given items (or the items from the given search query) with the patch
+        returned for it by the given patch function, if any; at most limit items are patched, if given.
+        For a search query, the items have only their uuid and @type, and the given fields, i.e. whatever
+        properties the patch function needs.
+        """
+        self._started = time.time()
+        self._finished = None
+        if isinstance(items, str):
+            items = self._search(items, fields)
+        try:
+            run_concurrently((lambda uuid=uuid, data=data: self._patch(uuid, data)
+                              for uuid, data in self._patches(items, patch, limit)), nthreads=self._nthreads)
+        finally:
+            self._finished = time.time()
+        return self.failed == 0
+
+    def summary(self) -> str:
+        if self._dryrun:
+            return (f"Items: {self.items} {chars.dot} to patch: {self.patched} {chars.dot} skipped: {self.skipped}"
+                    f" {chars.dot} projected requests: {self.projected_requests}"
+                    f" {chars.dot} projected duration: {format_duration(self.projected_duration)}"
+                    f" {chars.dot} dryrun")
+        duration = self.duration
+        return (f"Items: {self.items} {chars.dot} patched: {self.patched} {chars.dot} skipped: {self.skipped}"
+                f"{f' {chars.dot} failed: {self.failed}' if self.failed else ''}"
+                f" {chars.dot} requests: {self.requests} {chars.dot} retries: {self.retries}"
+                f" {chars.dot} duration: {format_duration(duration)}"
+                f"{f' {chars.dot} requests/second: {self.requests / duration:.1f}' if duration > 0 else ''}")
+
+    def _patches(self, items: Iterable[dict], patch: Callable[[dict], Optional[dict]],
+                 limit: int = 0) -> Generator[tuple, None, None]:
+        # Generator yielding (uuid, patch) tuples, for the items to patch; called (only) from the run thread.
+        npatches = 0
+        for item in items:
+            if not (isinstance(item, dict) and (uuid := item.get("uuid"))):
+                continue
+            if isinstance(limit, int) and (limit > 0) and (npatches >= limit):
+                if self._verbose:
+                    _print(f"Reached limit: {limit}")
+                break
+            with self._lock:
+                self.items += 1
+            if not (data := patch(item)):
+                with self._lock:
+                    self.skipped += 1
+                continue
+            npatches += 1
+            if self._dryrun:
+                with self._lock:
+                    self.patched += 1
+                continue
+            yield uuid, data
+
+    def _patch(self, uuid: str, data: dict) -> bool:
+        path = f"{uuid}?skip_links=true" if self._skip_links else uuid
+        for attempt in range(self._retries + 1):
+            if attempt > 0:
+                time.sleep(self._backoff * (2 ** (attempt - 1)))
+                with self._lock:
+                    self.retries += 1
+            self._rate_limiter.wait()
+            with self._lock:
+                self.requests += 1
+            try:
+                self._portal.patch_metadata(path, data)
+                with self._lock:
+                    self.patched += 1
+                if self._verbose:
+                    _print(f"Patched: {uuid} {chars.check}"
+                           f"{f' {chars.dot} attempts: {attempt + 1}' if attempt > 0 else ''}")
+                return True
+            except Exception as e:
+                if self._debug:
+                    _print(f"DEBUG: Patch request failed (attempt {attempt + 1}): {uuid}: {e}")
+                error = e
+                if not _is_retryable_error(e):
+                    break
+        with self._lock:
+            self.failed += 1
+        _print(f"ERROR: Cannot patch {uuid} (after {attempt + 1} attempt{'s' if attempt > 0 else ''}): {error}")
+        return False
+
+    def _search(self, query: str, fields: Optional[List[str]] = None) -> list:
+        # The search results are read completely before any are patched, since patching can change which items
+        # match the query (e.g. one for items without some property), and so shift the (later) search pages;
+        # so only their uuid and @type, and the given fields, are fetched (via field), not the full items.
+        if not query.startswith("/"):
+            query = f"/search/?{query.lstrip('?')}"
+        query += "&" if "?" in query else "?"
+        query += "&".join(f"field={quote(field)}" for field in dict.fromkeys([*_SEARCH_FIELDS, *(fields or [])]))
+        return list(search_metadata(query, key=self._portal.key, is_generator=True))
+
+
+def _is_retryable_error(e: Exception) -> bool:
+    # Returns True iff the given (patch request) exception is for a server (5xx) or connection error.
+    if isinstance(e, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(status_code := getattr(getattr(e, "response", None), "status_code", None), int):
+        return status_code >= 500
+    if match := _ERROR_STATUS_CODE_PATTERN.search(str(e)):
+        return int(match.group(1)) >= 500
+    return str(e).startswith("Error with ")  # From dcicutils for a request which raised, e.g. connection error.
+
+
+def _print(*args, **kwargs) -> None:
+    print(*args, **kwargs, flush=True)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+from collections import OrderedDict
+import functools
+import json
+import sys
+import threading
+from typing import Any, Callable, Optional
+
+_PORTAL_RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_PORTAL_RESPONSE_SIZE = threading.local()  # See set_portal_response_size.
+
+
+class PortalResponseCache:
+    """
+    Thread-safe in-memory cache for Portal responses, with least-recently-used eviction bounded by the
+    (approximate) total size in bytes of the cached responses, rather than by their count. Concurrent
+    requests for the same key are coalesced ("single-flight"), i.e. only the first caller actually
+    fetches (via the given fetch function) and the others wait for and share its result; if the fetch
+    raises an exception it is raised to every waiting caller and nothing is cached. Responses larger
+    than max_item_bytes (or max_bytes if not given) are returned but not cached. The size of a response
+    is taken from the size(s) given (e.g. the content length) via set_portal_response_size while fetching
+    it, if any, otherwise computed (via sizeof); it is not computed at all if caching is disabled (zero).
+    """
+
+    class _InFlight:
+        def __init__(self) -> None:
+            self.event = threading.Event()
+            self.value = None
+            self.exception = None
+
+    def __init__(self, max_bytes: Optional[int] = None, max_item_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None) -> None:
+        self._max_bytes = max_bytes if isinstance(max_bytes, int) and (max_bytes >= 0) \
+                          else _PORTAL_RESPONSE_CACHE_MAX_BYTES  # noqa
+        self._max_item_bytes = max_item_bytes if isinstance(max_item_bytes, int) and (max_item_bytes >= 0) else None
+        self._sizeof = sizeof if callable(sizeof) else PortalResponseCache.sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._inflight = {}
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._uncached = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int) -> None:
+        if isinstance(value, int) and (value >= 0):
+            with self._lock:
+                self._max_bytes = value
+                self._evict()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def coalesced(self) -> int:
+        return self._coalesced
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    def get(self, key: Any, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if (inflight := self._inflight.get(key)) is not None:
+                self._coalesced += 1
+                owner = False
+            else:
+                self._inflight[key] = (inflight := PortalResponseCache._InFlight())
+                self._misses += 1
+                owner = True
+        if not owner:
+            inflight.event.wait()
+            if inflight.exception is not None:
+                raise inflight.exception
+            return inflight.value
+        _PORTAL_RESPONSE_SIZE.nbytes = 0
+        try:
+            value = fetch()
+        except BaseException as e:
+            inflight.exception = e
+            with self._lock:
+                del self._inflight[key]
+            inflight.event.set()
+            raise
+        finally:
+            nbytes = _PORTAL_RESPONSE_SIZE.nbytes
+            _PORTAL_RESPONSE_SIZE.nbytes = None
+        if (caching := (self._max_bytes > 0) and (self._max_item_bytes != 0)) and (not nbytes):
+            nbytes = self._sizeof(value)
+        inflight.value = value
+        with self._lock:
+            del self._inflight[key]
+            max_item_bytes = self._max_item_bytes if self._max_item_bytes is not None else self._max_bytes
+            if not caching:
+                pass
+            elif nbytes <= max_item_bytes:
+                self._entries[key] = (value, nbytes)
+                self._nbytes += nbytes
+                self._evict()
+            else:
+                self._uncached += 1
+        inflight.event.set()
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "uncached": self._uncached,
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "max_bytes": self._max_bytes
+            }
+
+    def _evict(self) -> None:
+        # Assumes the lock is held.
+        while (self._nbytes > self._max_bytes) and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= nbytes
+            self._evictions += 1
+
+    @staticmethod
+    def sizeof(value: Any) -> int:
+        # Approximates the in-memory footprint of a response by its JSON serialized size,
+        # which is (much) cheaper to compute than walking it and is proportional enough.
+        if isinstance(value, (dict, list)):
+            try:
+                return len(json.dumps(value, default=str))
+            except Exception:
+                pass
+        return sys.getsizeof(value)
+
+
+def set_portal_response_size(nbytes: int) -> None:
+    """
+    Gives the size in bytes, e.g. the content length, of a response received in the current thread; if this
+    is while fetching a response for PortalResponseCache.get (in the same thread) then it is used as (or if
+    more than one, e.g. per page, summed into) the size of the response cached, rather than computing it.
+    """
+    if isinstance(nbytes, int) and (getattr(_PORTAL_RESPONSE_SIZE, "nbytes", None) is not None):
+        _PORTAL_RESPONSE_SIZE.nbytes += nbytes
+
+
+def portal_response_cache(max_bytes: Optional[int] = None, max_item_bytes: Optional[int] = None) -> Callable:
+    """
+    Decorator, used like functools.lru_cache, to cache the results of the decorated function
+    in a PortalResponseCache keyed by its arguments (which must be hashable). The decorated
+    function has cache (the PortalResponseCache object), cache_info, and cache_clear attributes.
+    """
+    def decorator(function: Callable) -> Callable:
+        cache = PortalResponseCache(max_bytes=max_bytes, max_item_bytes=max_item_bytes)
+        @functools.wraps(function)  # noqa
+        def wrapper(*args, **kwargs) -> Any:
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            return cache.get(key, lambda: function(*args, **kwargs))
+        wrapper.cache = cache
+        wrapper.cache_info = cache.cache_info
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Set, Union
+from hms_utils.dictionary_utils import get_referenced_uuids
+from hms_utils.type_utils import to_non_empty_string_list
+
+_ITEM_UUID_PROPERTY_NAME = "uuid"
+
+
+class PortalReferenceCrawler:
+    """
+    Breadth-first crawler over the graph of Portal items which reference each other by uuid.
+    Starting from a given set of (already fetched) items, fetches (via the given fetch_items function)
+    every item referenced by those items, then every item referenced by those, and so on, until there
+    are no more unvisited references, or until the given max_depth is reached. Each uuid is fetched at
+    most once; visited and frontier uuids are tracked as sets so each item is only ever scanned for
+    references once, as soon as it arrives. The given fetch_items function is called once per depth
+    level with the list of uuids to fetch and a callback which it should call with each fetched item
+    as soon as it is available (possibly from multiple threads); this callback is thread-safe.
+
+    If include_types is given then only items of those types are kept and followed; if exclude_types
+    is given then items of those types are dropped and not followed. If max_items_per_depth is given
+    then at most that many uuids are fetched at any one depth level. The given on_item callback is
+    called with each kept item (and its depth) as soon as it arrives; and on_progress is called with
+    this crawler object after each depth level is done.
+    """
+
+    def __init__(self,
+                 fetch_items: Callable[[List[str], Callable[[dict], None]], None],
+                 get_item_type: Optional[Callable[[dict], Optional[str]]] = None,
+                 get_item_references: Optional[Callable[[dict], List[str]]] = None,
+                 max_depth: Optional[int] = None,
+                 max_items_per_depth: Optional[int] = None,
+                 include_types: Optional[Union[List[str], Set[str]]] = None,
+                 exclude_types: Optional[Union[List[str], Set[str]]] = None,
+                 on_item: Optional[Callable[[dict, int], None]] = None,
+                 on_progress: Optional[Callable[[PortalReferenceCrawler], None]] = None,
+                 uuid_property_name: Optional[str] = None) -> None:
+        if not callable(fetch_items):
+            raise Exception("PortalReferenceCrawler requires a fetch_items function.")
+        self._fetch_items = fetch_items
+        self._get_item_type = get_item_type if callable(get_item_type) else lambda item: None
+        self._get_item_references = get_item_references if callable(get_item_references) else None
+        self._max_depth = max_depth if isinstance(max_depth, int) and (max_depth >= 0) else None
+        self._max_items_per_depth = (max_items_per_depth
+                                     if isinstance(max_items_per_depth, int) and (max_items_per_depth > 0) else None)
+        self._include_types = set(to_non_empty_string_list(list(include_types or [])))
+        self._exclude_types = set(to_non_empty_string_list(list(exclude_types or [])))
+        self._on_item = on_item if callable(on_item) else None
+        self._on_progress = on_progress if callable(on_progress) else None
+        self._uuid_property_name = (uuid_property_name
+                                    if isinstance(uuid_property_name, str) and uuid_property_name
+                                    else _ITEM_UUID_PROPERTY_NAME)
+        self._lock = threading.Lock()
+        self._visited = set()
+        self._frontier = {}  # Used as an ordered set.
+        self._depth = 0
+        self._item_count = 0
+        self._fetch_count = 0
+        self._missing_count = 0
+        self._excluded_count = 0
+        self._truncated_count = 0
+        self._started = None
+        self._duration = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    @property
+    def item_count(self) -> int:
+        return self._item_count
+
+    @property
+    def fetch_count(self) -> int:
+        return self._fetch_count
+
+    @property
+    def missing_count(self) -> int:
+        return self._missing_count
+
+    @property
+    def excluded_count(self) -> int:
+        return self._excluded_count
+
+    @property
+    def truncated_count(self) -> int:
+        return self._truncated_count
+
+    @property
+    def visited_count(self) -> int:
+        return len(self._visited)
+
+    @property
+    def frontier_size(self) -> int:
+        return len(self._frontier)
+
+    @property
+    def duration(self) -> float:
+        return (time.time() - self._started) if self._started is not None else self._duration
+
+    @property
+    def items_per_second(self) -> float:
+        return (self._item_count / duration) if (duration := self.duration) > 0 else 0.0
+
+    def crawl(self, items: Union[List[dict], dict]) -> List[dict]:
+        """
+        Crawls the items referenced, directly or indirectly, by the given item(s) and returns the list
+        of referenced items, in the order in which they arrived; the given item(s) are not included.
+        """
+        if isinstance(items, dict):
+            items = [items]
+        elif not isinstance(items, list):
+            return []
+        referenced_items = []
+        self._started = time.time()
+        self._depth = 0
+        for item in items:
+            if isinstance(item, dict) and (uuid := item.get(self._uuid_property_name)):
+                self._visited.add(uuid)
+        for item in items:
+            self._add_item_references_to_frontier(item)
+        try:
+            while self._frontier and ((self._max_depth is None) or (self._depth < self._max_depth)):
+                self._depth += 1
+                uuids = list(self._frontier) ; self._frontier = {}  # noqa
+                if self._max_items_per_depth and (len(uuids) > self._max_items_per_depth):
+                    self._truncated_count += len(uuids) - self._max_items_per_depth
+                    uuids = uuids[:self._max_items_per_depth]
+                self._visited.update(uuids)
+                self._fetch_count += len(uuids)
+                def on_fetched_item(item: dict, depth: int = self._depth) -> None:  # noqa
+                    if (item := self._process_fetched_item(item)) is not None:
+                        referenced_items.append(item)
+                        if self._on_item:
+                            self._on_item(item, depth)
+                self._fetch_items(uuids, on_fetched_item)
+                if self._on_progress:
+                    self._on_progress(self)
+        finally:
+            self._duration = time.time() - self._started
+            self._started = None
+        return referenced_items
+
+    def _process_fetched_item(self, item: dict) -> Optional[dict]:
+        if not isinstance(item, dict):
+            with self._lock:
+                self._missing_count += 1
+            return None
+        if self._include_types or self._exclude_types:
+            item_type = self._get_item_type(item)
+            if (self._include_types and (item_type not in self._include_types)) or (item_type in self._exclude_types):
+                with self._lock:
+                    self._excluded_count += 1
+                return None
+        # Scan for references outside of the lock; only the frontier/visited bookkeeping is locked.
+        references = self._get_references(item)
+        with self._lock:
+            self._item_count += 1
+            for uuid in references:
+                if uuid not in self._visited:
+                    self._frontier[uuid] = True
+        return item
+
+    def _add_item_references_to_frontier(self, item: dict) -> None:
+        for uuid in self._get_references(item):
+            if uuid not in self._visited:
+                self._frontier[uuid] = True
+
+    def _get_references(self, item: dict) -> Iterable[str]:
+        if self._get_item_references:
+            return self._get_item_references(item) or []
+        return get_referenced_uuids(item, exclude_uuid=True, include_paths=True,
+                                    uuid_property_name=self._uuid_property_name)
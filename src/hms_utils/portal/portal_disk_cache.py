@@ -0,0 +1,235 @@
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import zlib
+
+DEFAULT_PORTAL_DISK_CACHE_FILE = "~/.cache/hms/portal-cache.sqlite"
+DEFAULT_PORTAL_DISK_CACHE_MAX_AGE = 0  # Seconds; zero means always revalidate.
+
+_ITEM_UUID_PROPERTY_NAME = "uuid"
+_ITEM_DATE_MODIFIED_PROPERTY_NAME = "last_modified.date_modified"
+
+
+class PortalDiskCache:
+    """
+    Persistent (SQLite) cache of Portal responses, shared across runs, keyed by Portal environment,
+    query, frame (e.g. raw, database, metadata, limit, offset), and field selection. Entries younger
+    than max_age seconds are used as-is; older ones are used only if they are revalidated via the
+    given revalidate function, e.g. by ETag (see conditional request), or, for raw frame responses
+    only, by comparing their last_modified.date_modified value(s) with the current one(s) from a
+    (cheap) search requesting only that field (see revalidate_by_date_modified). Responses are
+    stored compressed JSON.
+    Thread-safe; a single connection is shared by all threads and serialized by a lock.
+    """
+
+    class Entry:
+        def __init__(self, data: Any, etag: Optional[str], date_modified: Optional[str],
+                     fetched: float, max_age: float) -> None:
+            self.data = data
+            self.etag = etag
+            self.date_modified = date_modified
+            self.fetched = fetched
+            self.age = time.time() - fetched
+            self.fresh = self.age <= max_age
+
+    def __init__(self, env: str, file: Optional[str] = None, max_age: Optional[float] = None) -> None:
+        if not (isinstance(env, str) and env):
+            raise Exception("PortalDiskCache requires a Portal environment name.")
+        if not (isinstance(file, str) and file):
+            file = DEFAULT_PORTAL_DISK_CACHE_FILE
+        if (directory := os.path.dirname(file := os.path.expanduser(file))):
+            os.makedirs(directory, exist_ok=True)
+        self._env = env
+        self._file = file
+        self._max_age = max_age if isinstance(max_age, (int, float)) and (max_age >= 0) \
+                        else DEFAULT_PORTAL_DISK_CACHE_MAX_AGE  # noqa
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS responses ("
+                                 "env TEXT NOT NULL, query TEXT NOT NULL, frame TEXT NOT NULL, field TEXT NOT NULL,"
+                                 " etag TEXT, date_modified TEXT, fetched REAL NOT NULL, data BLOB NOT NULL,"
+                                 " PRIMARY KEY (env, query, frame, field))")
+        self._connection.commit()
+        self._hits = 0
+        self._revalidated = 0
+        self._stale = 0
+        self._misses = 0
+        self._stores = 0
+
+    @property
+    def env(self) -> str:
+        return self._env
+
+    @property
+    def file(self) -> str:
+        return self._file
+
+    @property
+    def max_age(self) -> float:
+        return self._max_age
+
+    def lookup(self, query: str, frame: Optional[str] = None,
+               field: Optional[str] = None) -> Optional[PortalDiskCache.Entry]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, date_modified, fetched, data FROM responses"
+                " WHERE env = ? AND query = ? AND frame = ? AND field = ?",
+                (self._env, query, frame or "", field or "")).fetchone()
+        if not row:
+            return None
+        try:
+            data = json.loads(zlib.decompress(row[3]))
+        except Exception:
+            return None
+        return PortalDiskCache.Entry(data, etag=row[0], date_modified=row[1], fetched=row[2], max_age=self._max_age)
+
+    def get(self, query: str, frame: Optional[str] = None, field: Optional[str] = None,
+            revalidate: Optional[Callable[[PortalDiskCache.Entry], bool]] = None) -> Optional[Any]:
+        """
+        Returns the cached response for the given query/frame/field iff it exists and it is either
+        fresh (younger than max_age) or it is revalidated by the given revalidate function (which is
+        called with the cache entry and should return True iff it is unchanged); otherwise None.
+        """
+        if (entry := self.lookup(query, frame, field)) is None:
+            with self._lock:
+                self._misses += 1
+            return None
+        if entry.fresh:
+            with self._lock:
+                self._hits += 1
+            return entry.data
+        if callable(revalidate):
+            try:
+                if revalidate(entry) is True:
+                    self.touch(query, frame, field)
+                    with self._lock:
+                        self._revalidated += 1
+                    return entry.data
+            except Exception:
+                pass
+        with self._lock:
+            self._stale += 1
+        return None
+
+    def store(self, query: str, data: Any, frame: Optional[str] = None, field: Optional[str] = None,
+              etag: Optional[str] = None, date_modified: Optional[str] = None) -> None:
+        if not isinstance(data, (dict, list)):
+            return
+        if date_modified is None:
+            date_modified = PortalDiskCache.get_date_modified(data)
+        blob = zlib.compress(json.dumps(data, default=str, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO responses"
+                                     " (env, query, frame, field, etag, date_modified, fetched, data)"
+                                     " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                     (self._env, query, frame or "", field or "",
+                                      etag, date_modified, time.time(), blob))
+            self._connection.commit()
+            self._stores += 1
+
+    def touch(self, query: str, frame: Optional[str] = None, field: Optional[str] = None) -> None:
+        with self._lock:
+            self._connection.execute("UPDATE responses SET fetched = ?"
+                                     " WHERE env = ? AND query = ? AND frame = ? AND field = ?",
+                                     (time.time(), self._env, query, frame or "", field or ""))
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses WHERE env = ?", (self._env,))
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "revalidated": self._revalidated,
+                "stale": self._stale,
+                "misses": self._misses,
+                "stores": self._stores
+            }
+
+    @staticmethod
+    def frame(metadata: bool = False, raw: bool = False, database: bool = False, inserts: bool = False,
+              limit: Optional[int] = None, offset: Optional[int] = None, deleted: bool = False) -> str:
+        frame = []
+        if metadata is True:
+            frame.append("metadata")
+        if raw is True:
+            frame.append("raw")
+        if database is True:
+            frame.append("database")
+        if inserts is True:
+            frame.append("inserts")
+        if deleted is True:
+            frame.append("deleted")
+        if isinstance(limit, int):
+            frame.append(f"limit={limit}")
+        if isinstance(offset, int):
+            frame.append(f"offset={offset}")
+        return ";".join(frame)
+
+    @staticmethod
+    def get_date_modified(item: Any) -> Optional[str]:
+        if isinstance(item, dict) and isinstance(last_modified := item.get("last_modified"), dict):
+            if isinstance(date_modified := last_modified.get("date_modified"), str):
+                return date_modified
+        return None
+
+    @staticmethod
+    def get_dates_modified(response: Any) -> Dict[str, Optional[str]]:
+        # Returns a dictionary mapping uuid to last_modified.date_modified for the items in the given response.
+        dates_modified = {}
+        if isinstance(response, dict):
+            for item in (graph if isinstance(graph := response.get("@graph"), list) else [response]):
+                if isinstance(item, dict) and (uuid := item.get(_ITEM_UUID_PROPERTY_NAME)):
+                    dates_modified[uuid] = PortalDiskCache.get_date_modified(item)
+        return dates_modified
+
+    @staticmethod
+    def uuids_date_modified_query(uuids: List[str]) -> str:
+        # Search query to get (only) the uuid and last_modified.date_modified of each of the given uuids.
+        return (f"/search/?type=Item&{'&'.join(f'uuid={uuid}' for uuid in uuids)}"
+                f"&field={_ITEM_UUID_PROPERTY_NAME}&field={_ITEM_DATE_MODIFIED_PROPERTY_NAME}")
+
+    @staticmethod
+    def revalidate_by_date_modified(query: str, entry: PortalDiskCache.Entry,
+                                    get: Callable[[str], Any]) -> bool:
+        """
+        Returns True iff the given cache entry, for the given query, is unchanged, according to the
+        last_modified.date_modified value(s) of the item(s) it contains vs the current one(s) from
+        a search for only those fields, via the given get function (which should not use the cache).
+        For a single item the search is by its uuid; for a (search or collection) response with an
+        @graph the same query is used, with only those fields, and the uuids and dates must match.
+        Only valid for raw frame responses; in an embedded frame, a change to an embedded item does
+        not change the last_modified.date_modified of the item embedding it.
+        """
+        if not isinstance(data := entry.data, dict):
+            return False
+        if isinstance(graph := data.get("@graph"), list):
+            dates_modified = PortalDiskCache.get_dates_modified(data)
+            if (len(dates_modified) != len(graph)) or (None in dates_modified.values()):
+                return False
+            if not query.startswith("/"):
+                query = f"/{query}"
+            query += ("&" if "?" in query else "?")
+            query += f"field={_ITEM_UUID_PROPERTY_NAME}&field={_ITEM_DATE_MODIFIED_PROPERTY_NAME}"
+            if not isinstance(response := get(query), dict):
+                return False
+            if response.get("total") != data.get("total"):
+                return False
+            return PortalDiskCache.get_dates_modified(response) == dates_modified
+        if (uuid := data.get(_ITEM_UUID_PROPERTY_NAME)) and (date_modified := entry.date_modified):
+            if not isinstance(response := get(PortalDiskCache.uuids_date_modified_query([uuid])), dict):
+                return False
+            return PortalDiskCache.get_dates_modified(response).get(uuid) == date_modified
+        return False
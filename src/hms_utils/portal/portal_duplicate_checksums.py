@@ -0,0 +1,260 @@
+# ------------------------------------------------------------------------------------------------------
+# Command-line utility to find (file) items with duplicate checksums (e.g. md5sum) across any number of
+# (inserts or export) files, and/or the results of a Portal search, reporting the duplicates as JSON.
+# ------------------------------------------------------------------------------------------------------
+# Example commands:
+#
+# hms-portal-duplicate-checksums file_processed.json file_submitted.ndjson --output duplicates.json
+# hms-portal-duplicate-checksums --env smaht-data --query "type=File" --checksum md5sum --checksum content_md5sum
+#
+# Files may contain a JSON list of items, a JSON dictionary of lists of items by type (i.e. inserts), or NDJSON
+# (if named *.ndjson), and are streamed. Items are grouped by each given checksum property (--checksum; default
+# md5sum), and with --size also by file_size, so that items with the same checksum but different sizes are not
+# duplicates. Each group of two or more (distinct, by uuid) items is reported, noting whether they also agree on
+# the (other) checksum properties and file size. Memory is bounded regardless of the number of items: (at most)
+# --max-records records are held in memory at once; beyond that, sorted runs of them are written to temporary
+# files which are then merged (heapq.merge), so that only one group of duplicates at a time need be in memory.
+# ------------------------------------------------------------------------------------------------------
+
+from __future__ import annotations
+from contextlib import nullcontext
+import heapq
+import io
+import json
+import os
+import sys
+from typing import Generator, Iterable, List, Optional, Tuple
+from dcicutils.tmpfile_utils import temporary_directory
+from hms_utils.argv import ARGV
+from hms_utils.chars import chars
+from hms_utils.json_stream_utils import JsonArrayWriter, iterate_json_items, iterate_ndjson
+from hms_utils.portal.portal_utils import Portal
+
+_CHECKSUM_PROPERTY_NAMES = ["md5sum", "content_md5sum"]
+_DEFAULT_CHECKSUM_PROPERTY_NAME = "md5sum"
+_FILE_SIZE_PROPERTY_NAME = "file_size"
+_UUID_PROPERTY_NAME = "uuid"
+_DEFAULT_MAX_RECORDS = 1_000_000
+_SEARCH_PAGE_SIZE = 1000
+_SEARCH_TIMEOUT = 120  # Seconds; per search page.
+
+# A record is a tuple of: key, uuid, file_size, md5sum, content_md5sum, source; where the key is the
+# checksum property name and value, and, if grouping by size, the file size, e.g. md5sum:abc123:1024.
+_RECORD_KEY = 0
+_RECORD_UUID = 1
+_RECORD_FILE_SIZE = 2
+_RECORD_MD5SUM = 3
+_RECORD_CONTENT_MD5SUM = 4
+_RECORD_SOURCE = 5
+
+
+def main():
+
+    argv = ARGV({
+        ARGV.OPTIONAL([str]): "files",
+        ARGV.OPTIONAL(str): "--env",
+        ARGV.OPTIONAL(str): "--app",
+        ARGV.OPTIONAL(str): ["--query", "--search"],
+        ARGV.OPTIONAL([str]): ["--checksum", "--checksums"],
+        ARGV.OPTIONAL(bool, False): "--size",
+        ARGV.OPTIONAL(int, _DEFAULT_MAX_RECORDS): ["--max-records", "--memory"],
+        ARGV.OPTIONAL(str): ["--tmpdir", "--temporary-directory"],
+        ARGV.OPTIONAL(str): "--output",
+        ARGV.OPTIONAL(bool, False): "--noformat",
+        ARGV.OPTIONAL(bool, False): "--verbose",
+        ARGV.OPTIONAL(bool, False): "--debug"
+    })
+
+    if not (argv.files or argv.query):
+        _print("No files or --query given.")
+        return 1
+    if invalid_checksums := [checksum for checksum in (argv.checksum or [])
+                             if checksum not in _CHECKSUM_PROPERTY_NAMES]:
+        _print(f"Unsupported checksum property (supported: {', '.join(_CHECKSUM_PROPERTY_NAMES)}):"
+               f" {', '.join(invalid_checksums)}")
+        return 1
+    for file in (argv.files or []):
+        if not os.path.isfile(os.path.expanduser(file)):
+            _print(f"Cannot find file: {file}")
+            return 1
+
+    portal = None
+    if argv.query and not (portal := Portal.create(argv.env, app=argv.app, verbose=argv.verbose, debug=argv.debug)):
+        return 1
+
+    checksums = argv.checksum or [_DEFAULT_CHECKSUM_PROPERTY_NAME]
+    items = _read_items([os.path.expanduser(file) for file in (argv.files or [])], portal=portal, query=argv.query)
+    records = _get_records(items, checksums=checksums, size=argv.size)
+    statistics = {}
+    ngroups = 0
+    nduplicates = 0
+
+    def write_duplicates(f: io.TextIOBase) -> None:  # noqa
+        nonlocal ngroups, nduplicates
+        with JsonArrayWriter(f, indent=None if argv.noformat else 4) as writer:
+            for group in find_duplicates(records, max_records=argv.max_records, tmpdir=argv.tmpdir,
+                                         statistics=statistics):
+                writer.write(_get_duplicates_report(group))
+                ngroups += 1
+                nduplicates += len(group)
+        f.write("\n")
+
+    if argv.output:
+        with io.open(os.path.expanduser(argv.output), "w") as f:
+            write_duplicates(f)
+    else:
+        write_duplicates(sys.stdout)
+
+    if argv.verbose or argv.output:
+        _print(f"Checksums: {', '.join(checksums)}{f' (and {_FILE_SIZE_PROPERTY_NAME})' if argv.size else ''}"
+               f" {chars.dot} records: {statistics.get('records', 0)}"
+               f" {chars.dot} sorted runs: {statistics.get('runs', 0)}"
+               f" {chars.dot} duplicate groups: {ngroups} {chars.dot} duplicate items: {nduplicates}"
+               f"{f' {chars.dot} output: {argv.output}' if argv.output else ''}", file=sys.stderr)
+    return 1 if ngroups else 0
+
+
+def find_duplicates(records: Iterable[Tuple], max_records: int = _DEFAULT_MAX_RECORDS, tmpdir: Optional[str] = None,
+                    statistics: Optional[dict] = None) -> Generator[List[Tuple], None, None]:
+    """
+    Generator yielding, for each key (first element) of the given records (tuples of JSON serializable values,
+    the second being the uuid) with two or more distinct (by uuid) records, the list of those records, in order
+    by key. At most max_records records are held in memory; beyond that, (key) sorted runs of them are written to
+    temporary files (in tmpdir, if given) which are then merged; so memory is bounded by max_records (plus the
+    largest group). If a statistics dictionary is given, its records and runs counts are set.
+    """
+    if not (isinstance(max_records, int) and (max_records > 0)):
+        max_records = _DEFAULT_MAX_RECORDS
+    if tmpdir:
+        os.makedirs(tmpdir := os.path.expanduser(tmpdir), exist_ok=True)
+    with temporary_directory() if not tmpdir else nullcontext(tmpdir) as directory:
+        runs = []
+        buffer = []
+        nrecords = 0
+        for record in records:
+            buffer.append(record)
+            nrecords += 1
+            if len(buffer) >= max_records:
+                runs.append(_write_sorted_run(buffer, directory, len(runs)))
+                buffer = []
+        buffer.sort(key=_record_sort_key)
+        if isinstance(statistics, dict):
+            statistics["records"] = nrecords
+            statistics["runs"] = len(runs)
+        sorted_records = heapq.merge(*[_read_sorted_run(run) for run in runs], buffer, key=_record_sort_key)
+        try:
+            group = []
+            for record in sorted_records:
+                if group and (record[_RECORD_KEY] != group[0][_RECORD_KEY]):
+                    if len(group) > 1:
+                        yield group
+                    group = []
+                if not any(record[_RECORD_UUID] == grouped[_RECORD_UUID] for grouped in group):
+                    group.append(record)
+            if len(group) > 1:
+                yield group
+        finally:
+            for run in runs:
+                os.remove(run)
+
+
+def _record_sort_key(record: Tuple) -> Tuple[str, str]:
+    return record[_RECORD_KEY], record[_RECORD_UUID]
+
+
+def _write_sorted_run(records: List[Tuple], directory: str, run_number: int) -> str:
+    records.sort(key=_record_sort_key)
+    with io.open(run := os.path.join(directory, f"run-{os.getpid()}-{run_number:06d}.ndjson"), "w") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")))
+            f.write("\n")
+    return run
+
+
+def _read_sorted_run(run: str) -> Generator[Tuple, None, None]:
+    with io.open(run, "r") as f:
+        for line in f:
+            yield tuple(json.loads(line))
+
+
+def _get_records(items: Iterable[Tuple[dict, str]], checksums: List[str],
+                 size: bool = False) -> Generator[Tuple, None, None]:
+    # Yields a record for each checksum property of each of the given (item, source) tuples (with a uuid).
+    for item, source in items:
+        if not (isinstance(item, dict) and isinstance(uuid := item.get(_UUID_PROPERTY_NAME), str)):
+            continue
+        file_size = item.get(_FILE_SIZE_PROPERTY_NAME)
+        for checksum in checksums:
+            if isinstance(value := item.get(checksum), str) and value:
+                key = f"{checksum}:{value}:{file_size}" if size else f"{checksum}:{value}"
+                yield (key, uuid, file_size, item.get("md5sum"), item.get("content_md5sum"), source)
+
+
+def _read_items(files: List[str], portal: Optional[Portal] = None,
+                query: Optional[str] = None) -> Generator[Tuple[dict, str], None, None]:
+    # Yields (item, source) tuples, streamed from each of the given files, then from the given search query.
+    for file in files:
+        try:
+            if file.endswith(".ndjson"):
+                for item in iterate_ndjson(file):
+                    yield item, file
+            else:
+                for _, item in iterate_json_items(file):
+                    yield item, file
+        except ValueError:
+            _print(f"WARNING: Cannot read (all) items from file: {file}")
+    if portal and query:
+        for item in _search_items(portal, query):
+            yield item, "search"
+
+
+def _search_items(portal: Portal, query: str, page_size: int = _SEARCH_PAGE_SIZE) -> Generator[dict, None, None]:
+    # Generator yielding the items (just their uuid, file size, and checksum properties) for the given search query,
+    # fetched a page (of page_size items) at a time, via successive limit/from requests, each starting after the
+    # items actually returned by the previous one (the server may cap the page size), while less than the total,
+    # if returned, otherwise until an empty page. An item shifted onto the next page by items created during
+    # pagination may be yielded twice, but the same uuid again is not a duplicate (see find_duplicates).
+    if not (isinstance(page_size, int) and (page_size > 0)):
+        page_size = _SEARCH_PAGE_SIZE
+    if not query.startswith("/"):
+        query = f"/search/?{query.lstrip('?')}"
+    query += "&" if "?" in query else "?"
+    query += "&".join(f"field={name}"
+                      for name in [_UUID_PROPERTY_NAME, _FILE_SIZE_PROPERTY_NAME, *_CHECKSUM_PROPERTY_NAMES])
+    offset = 0
+    while True:
+        page_query = f"{query}&limit={page_size}&from={offset}"
+        if (response := portal.get(page_query, timeout=_SEARCH_TIMEOUT)).status_code == 404:
+            return  # No results for a search is a 404.
+        if response.status_code != 200:
+            _print(f"ERROR: Search failed ({response.status_code}): {page_query}")
+            return
+        if not isinstance(graph := (page := response.json()).get("@graph"), list) or not graph:
+            return
+        yield from graph
+        offset += len(graph)
+        if isinstance(total := page.get("total"), int) and (offset >= total):
+            return
+
+
+def _get_duplicates_report(group: List[Tuple]) -> dict:
+    # Notes whether the duplicates (by the checksum of the group) also agree on file size and the other checksum.
+    checksum, value = group[0][_RECORD_KEY].split(":")[0:2]
+    report = {"checksum": checksum, "value": value, "count": len(group)}
+    report["same_file_size"] = len(set(record[_RECORD_FILE_SIZE] for record in group)) == 1
+    for other_checksum, index in [("md5sum", _RECORD_MD5SUM), ("content_md5sum", _RECORD_CONTENT_MD5SUM)]:
+        if other_checksum != checksum:
+            report[f"same_{other_checksum}"] = len(set(record[index] for record in group)) == 1
+    report["items"] = [{"uuid": record[_RECORD_UUID], "file_size": record[_RECORD_FILE_SIZE],
+                        "md5sum": record[_RECORD_MD5SUM], "content_md5sum": record[_RECORD_CONTENT_MD5SUM],
+                        "source": record[_RECORD_SOURCE]} for record in group]
+    return report
+
+
+def _print(*args, **kwargs) -> None:
+    print(*args, **kwargs, flush=True)
+
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status if isinstance(status, int) else 0)
@@ -2,16 +2,19 @@ from datetime import date, datetime, timedelta
 import json
 from prettytable import PrettyTable, HRuleStyle as PrettyTableHorizontalStyle
 import sys
-from typing import List, Optional, Tuple, Union
+from typing import Generator, Iterable, List, Optional, Tuple, Union
 from dcicutils.datetime_utils import format_date, format_time
 from dcicutils.misc_utils import format_size
 from hms_utils.argv import ARGV
 from hms_utils.chars import chars
 from hms_utils.datetime_utils import parse_datetime_string
-from hms_utils.dictionary_utils import get_property
+from hms_utils.dictionary_utils import compile_property_path
+from hms_utils.item_table import ItemTable
 from hms_utils.portal.portal_utils import Portal
 from hms_utils.type_utils import to_non_empty_string_list
 
+_SEARCH_PAGE_SIZE = 1000
+
 
 def main():
 
@@ -72,7 +75,6 @@ def main():
 
     query = "&".join(to_non_empty_string_list([
         f"/files",
-        f"limit={argv.limit}",
         f"sort={'' if argv.sort_reverse else '-'}{date_property_name}" if not argv.nosort else None,
         f"status={status}" if status else None,
         f"data_category!=Quality Control" if argv.noqc else None,
@@ -86,11 +88,7 @@ def main():
     if argv.debug:
         _debug(f"Executing portal query: {query}")
 
-    if not (items := portal.get_metadata(query, raise_exception=False)):
-        return 1
-
-    if not isinstance(items := items.get("@graph"), list):
-        _error(f"Query did not return a list as expected: {query}")
+    items = _search_files(portal, query, limit=argv.limit, offset=argv.offset)
 
     # Example record:
     # {
@@ -136,53 +134,93 @@ def main():
     #     "status": "released"
     # }
 
+    if argv.dump:
+        if not (items := list(items)):
+            return 1
+        _print(json.dumps(_group_by_month(items, date_property_name) if argv.group else items, indent=4))
+        return 0
+
+    # Tabulated from the search pages as they arrive, so only the (few) properties tabulated are kept,
+    # in compact columns, rather than the full items.
+    if not (table := _get_file_table(items, date_property_name)):
+        return 1
     if argv.group:
-        grouped_items = _group_by_month(items, date_property_name)
-        if argv.dump:
-            _print(json.dumps(grouped_items, indent=4))
-        else:
-            for month in grouped_items:
-                items = grouped_items[month]
-                _print(f"\n{chars.rarrow} MONTH: {month}")
-                _print_file_table(items, date_property_name=date_property_name, argv=argv)
+        for month, rows in table.month_buckets("released").items():
+            _print(f"\n{chars.rarrow} MONTH: {month}")
+            _print_file_table(table, argv, rows)
     else:
-        if argv.dump:
-            _print(json.dumps(grouped_items, indent=4))
-        else:
-            _print_file_table(items, date_property_name=date_property_name, argv=argv)
+        _print_file_table(table, argv)
 
     return 0
 
 
-def _print_file_table(items: List[dict], date_property_name: str, argv: ARGV) -> None:
+def _search_files(portal: Portal, query: str, limit: int, offset: int = 0,
+                  page_size: int = _SEARCH_PAGE_SIZE) -> Generator[dict, None, None]:
+    # Generator yielding (up to the given limit of) the items for the given query, from the given offset,
+    # fetched a page (of up to page_size items) at a time, via successive limit/from requests, each starting
+    # after the items actually returned by the previous one, until the limit, the total, or an empty page.
+    if not (isinstance(page_size, int) and (page_size > 0)):
+        page_size = _SEARCH_PAGE_SIZE
+    query += "&" if "?" in query else "?"
+    offset = max(offset, 0) if isinstance(offset, int) else 0
+    while limit > 0:
+        page_query = f"{query}limit={min(limit, page_size)}&from={offset}"
+        if not (page := portal.get_metadata(page_query, raise_exception=False)):
+            return  # No results for a search is a 404.
+        if not isinstance(graph := page.get("@graph"), list):
+            _error(f"Query did not return a list as expected: {page_query}")
+        if not (graph := graph[:limit]):
+            return
+        yield from graph
+        offset += len(graph)
+        limit -= len(graph)
+        if isinstance(total := page.get("total"), int) and (offset >= total):
+            return
+
+
+def _get_file_table(items: Iterable[dict], date_property_name: str) -> ItemTable:
+    return ItemTable.from_items(items, {
+        "uuid": "uuid",
+        "type": Portal.get_item_type,
+        "status": "status",
+        "description": "description",
+        "name": ["filename", "display_title"],
+        "size": ("file_size", int),
+        "category": "data_category",
+        "date": [date_property_name, "last_modified.date_modified"],
+        "by": ["submitted_by.display_title", "last_modified.modified_by.display_title"],
+        "released": date_property_name
+    })
+
+
+def _print_file_table(table: ItemTable, argv: ARGV, rows: Optional[Iterable[int]] = None) -> None:
 
-    table = PrettyTable()
+    pretty_table = PrettyTable()
     if argv.verbose:
-        table.field_names = ["N", "FILE", "TYPE / SIZE", "STATUS", "CATEGORY", "DATE"]
+        pretty_table.field_names = ["N", "FILE", "TYPE / SIZE", "STATUS", "CATEGORY", "DATE"]
     else:
-        table.field_names = ["N", "FILE", "TYPE / SIZE", "STATUS", "DATE"]
-    table.align = "l"
-    table.align["N"] = "r"
+        pretty_table.field_names = ["N", "FILE", "TYPE / SIZE", "STATUS", "DATE"]
+    pretty_table.align = "l"
+    pretty_table.align["N"] = "r"
     if argv.verbose:
-        table.hrules = PrettyTableHorizontalStyle.ALL
+        pretty_table.hrules = PrettyTableHorizontalStyle.ALL
 
     nitems = 0
 
-    for item in items:
+    for row in table.rows(rows):
 
         nitems += 1
-        uuid = item.get("uuid", "")
-        type = Portal.get_item_type(item)
-        status = item.get("status", "")
-        description = item.get("description", "")
-        name = item.get("filename", item.get("display_title", ""))
-        size = item.get("file_size", "")
-        if isinstance(category := item.get("data_category", ""), list):
+        uuid = row["uuid"] or ""
+        type = row["type"]
+        status = row["status"] or ""
+        description = row["description"] or ""
+        name = row["name"] or ""
+        size = row["size"] if row["size"] is not None else ""
+        if isinstance(category := row["category"] or "", tuple):
             if (category := "\n".join(category)) == "Quality Control":
                 category = "QC"
-        date = get_property(item, date_property_name, get_property(item, "last_modified.date_modified"))
-        by = get_property(item, "submitted_by.display_title",
-                                get_property(item, "last_modified.modified_by.display_title"))
+        date = row["date"]
+        by = row["by"]
 
         type_and_size = f"{type}\n{format_size(size)}"
 
@@ -198,11 +236,11 @@ def _print_file_table(items: List[dict], date_property_name: str, argv: ARGV) ->
             date = f"{format_date(date)}"
 
         if argv.verbose:
-            table.add_row([nitems, name, type_and_size, status, category, date])
+            pretty_table.add_row([nitems, name, type_and_size, status, category, date])
         else:
-            table.add_row([nitems, name, type_and_size, status, date])
+            pretty_table.add_row([nitems, name, type_and_size, status, date])
 
-    print(table)
+    print(pretty_table)
 
 
 def _parse_from_and_thru_date_args(argv: ARGV) -> Tuple[Optional[str], Optional[str]]:
@@ -249,8 +287,9 @@ def _get_first_and_last_date_of_month(day: Optional[Union[datetime, date]] = Non
 def _group_by_month(items: List[dict], date_property_name: str) -> dict:
     grouped_items = {}
     if isinstance(items, list):
+        date_path = compile_property_path(date_property_name)
         for item in items:
-            if ((value := get_property(item, date_property_name)) and (value := parse_datetime_string(value))):
+            if ((value := date_path.get(item)) and (value := parse_datetime_string(value))):
                 month = f"{value.year}-{value.month:02}"
                 if not grouped_items.get(month):
                     grouped_items[month] = []
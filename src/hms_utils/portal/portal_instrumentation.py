@@ -0,0 +1,249 @@
+from __future__ import annotations
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any, Callable, Generator, Iterable, List, Optional, Set
+from urllib.parse import urlparse
+from hms_utils.type_utils import is_uuid
+
+ENDPOINT_ITEM = "item"
+ENDPOINT_SEARCH = "search"
+ENDPOINT_SCHEMA = "schema"
+ENDPOINT_OTHER = "other"
+
+
+class PortalInstrumentation:
+    """
+    Collects per-endpoint-class (item, search, schema, other) instrumentation for Portal HTTP requests:
+    latency percentiles, response bytes, status code counts, and retries; and the number of requests
+    in flight over time, i.e. its maximum, its time-weighted mean, the fraction of (wall) time during
+    which at least one request was in flight (busy), and its maximum per one-second interval (timeline).
+    The latter helps to tell whether a run is bound by the Portal/network (busy fraction near one) or
+    by local (post) processing (busy fraction low). Thread-safe. Requests are recorded either directly
+    via the request context manager, or via wrap, which wraps a get function (e.g. of a PortalSession).
+    Retries are those done within a request by the (urllib3) retry policy of the session, plus repeated
+    requests for the same URL within a logical request (see logical_request). A single component path is
+    classified as a search only if it is one of the given (known) collections, e.g. from the schema names;
+    otherwise as an item, e.g. an accession or alias; see endpoint.
+    """
+
+    _thread_local = threading.local()
+
+    class Request:
+        def __init__(self, url: str) -> None:
+            self.url = url
+            self.status_code = None
+            self.nbytes = None
+            self.retries = 0
+
+    def __init__(self, server: Optional[str] = None, collections: Optional[Iterable[str]] = None) -> None:
+        self._server = server.rstrip("/") if isinstance(server, str) and server else None
+        self._collections = PortalInstrumentation.collection_names(collections)
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._endpoints = {}
+        self._in_flight = 0
+        self._in_flight_max = 0
+        self._in_flight_area = 0.0
+        self._in_flight_busy = 0.0
+        self._in_flight_changed = self._started
+        self._timeline = {}
+
+    @property
+    def server(self) -> Optional[str]:
+        return self._server
+
+    @property
+    def collections(self) -> Set[str]:
+        return self._collections
+
+    @collections.setter
+    def collections(self, value: Optional[Iterable[str]]) -> None:
+        self._collections = PortalInstrumentation.collection_names(value)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def request(self, url: str) -> Generator[PortalInstrumentation.Request, None, None]:
+        """
+        Context manager to record a single HTTP request for the given URL; the caller should set the
+        status_code, nbytes, and retries of the yielded request object (if known); an exception is recorded as
+        an error (status code "error") and reraised.
+        """
+        request = PortalInstrumentation.Request(url)
+        self._change_in_flight(1)
+        started = time.time()
+        try:
+            yield request
+        except Exception:
+            request.status_code = "error"
+            raise
+        finally:
+            duration = time.time() - started
+            self._change_in_flight(-1)
+            self._record(request, duration)
+
+    @contextmanager
+    def logical_request(self) -> Generator[None, None, None]:
+        """
+        Context manager delimiting a logical request (e.g. Portal.GET) within which each HTTP request
+        (in the same thread) for the same URL after the first is counted as a retry.
+        """
+        previous = getattr(PortalInstrumentation._thread_local, "urls", None)
+        PortalInstrumentation._thread_local.urls = set()
+        try:
+            yield
+        finally:
+            PortalInstrumentation._thread_local.urls = previous
+
+    def report(self) -> dict:
+        with self._lock:
+            now = time.time()
+            duration = now - self._started
+            in_flight_area = self._in_flight_area + self._in_flight * (now - self._in_flight_changed)
+            in_flight_busy = self._in_flight_busy + ((now - self._in_flight_changed) if self._in_flight > 0 else 0)
+            endpoints = {}
+            for endpoint, data in sorted(self._endpoints.items()):
+                latencies = sorted(data["latencies"])
+                endpoints[endpoint] = {
+                    "requests": len(latencies),
+                    "retries": data["retries"],
+                    "bytes": data["bytes"],
+                    "status_codes": {str(status_code): count
+                                     for status_code, count in sorted(data["status_codes"].items(), key=str)},
+                    "latency": {
+                        "min": _round(latencies[0]) if latencies else None,
+                        "mean": _round(sum(latencies) / len(latencies)) if latencies else None,
+                        "p50": _round(_percentile(latencies, 50)),
+                        "p95": _round(_percentile(latencies, 95)),
+                        "p99": _round(_percentile(latencies, 99)),
+                        "max": _round(latencies[-1]) if latencies else None,
+                        "total": _round(sum(latencies))
+                    }
+                }
+            return {
+                "duration": _round(duration),
+                "requests": sum(endpoint["requests"] for endpoint in endpoints.values()),
+                "bytes": sum(endpoint["bytes"] for endpoint in endpoints.values()),
+                "endpoints": endpoints,
+                "in_flight": {
+                    "max": self._in_flight_max,
+                    "mean": _round(in_flight_area / duration) if duration > 0 else 0,
+                    "busy": _round(in_flight_busy / duration) if duration > 0 else 0,
+                    "timeline": [self._timeline[second] for second in sorted(self._timeline)]
+                }
+            }
+
+    def wrap(self, get: Callable) -> Callable:
+        """
+        Returns a function wrapping the given (requests.get like) function so that the requests
+        made through it are recorded by this instrumentation object (only); see PortalSession.instrument.
+        """
+        def instrumented_get(url, *args, **kwargs):  # noqa
+            return self._call(get, url, *args, **kwargs)
+        return instrumented_get
+
+    @staticmethod
+    def endpoint(url: str, collections: Optional[Set[str]] = None) -> str:
+        """
+        Returns the endpoint class (item, search, schema, or other) for the given Portal URL (or path). A single
+        component (non-uuid) path is a search only if it is one of the given collections (see collection_names),
+        e.g. /files or /FileFormat; otherwise it is an item, e.g. /SMAFI1234ABCD (accession) or /some-alias.
+        """
+        if not isinstance(url, str):
+            return ENDPOINT_OTHER
+        parsed_url = urlparse(url)
+        if not (components := [component for component in parsed_url.path.split("/") if component]):
+            return ENDPOINT_OTHER
+        if components[0] in ["profiles", "schemas"]:
+            return ENDPOINT_SCHEMA
+        if components[0] == "search":
+            return ENDPOINT_SEARCH
+        if is_uuid(components[0]) or (len(components) > 1):
+            return ENDPOINT_ITEM
+        if components[0].startswith("@@") or ("indexing" in components[0]) or (components[0] == "health"):
+            return ENDPOINT_OTHER
+        if collections and (_normalize_collection_name(components[0]) in collections):
+            # E.g. /files or /files/?type=... (collections are served as searches).
+            return ENDPOINT_SEARCH
+        return ENDPOINT_ITEM
+
+    @staticmethod
+    def collection_names(names: Optional[Iterable[str]]) -> Set[str]:
+        """
+        Returns the (normalized) collection names for the given type (e.g. schema) names, i.e. for each,
+        the name itself and its (likely) plural, e.g. for FileFormat: fileformat and fileformats (matching
+        /FileFormat and /file-formats), or for Library: library and libraries.
+        """
+        collections = set()
+        for name in (names or []):
+            if isinstance(name, str) and (name := _normalize_collection_name(name)):
+                collections.add(name)
+                if name.endswith("y"):
+                    collections.add(f"{name[:-1]}ies")
+                elif name.endswith("is"):
+                    collections.add(f"{name[:-2]}es")
+                elif name.endswith(("s", "x", "ch", "sh")):
+                    collections.add(f"{name}es")
+                else:
+                    collections.add(f"{name}s")
+        return collections
+
+    def _change_in_flight(self, delta: int) -> None:
+        with self._lock:
+            now = time.time()
+            if self._in_flight > 0:
+                self._in_flight_busy += now - self._in_flight_changed
+            self._in_flight_area += self._in_flight * (now - self._in_flight_changed)
+            self._in_flight_changed = now
+            self._in_flight += delta
+            self._in_flight_max = max(self._in_flight_max, self._in_flight)
+            second = int(now - self._started)
+            self._timeline[second] = max(self._timeline.get(second, 0), self._in_flight)
+
+    def _record(self, request: PortalInstrumentation.Request, duration: float) -> None:
+        endpoint = PortalInstrumentation.endpoint(request.url, self._collections)
+        retry = False
+        if (urls := getattr(PortalInstrumentation._thread_local, "urls", None)) is not None:
+            if request.url in urls:
+                retry = True
+            else:
+                urls.add(request.url)
+        with self._lock:
+            if not (data := self._endpoints.get(endpoint)):
+                self._endpoints[endpoint] = (data := {"latencies": [], "retries": 0, "bytes": 0, "status_codes": {}})
+            data["latencies"].append(duration)
+            data["bytes"] += request.nbytes or 0
+            data["status_codes"][request.status_code] = data["status_codes"].get(request.status_code, 0) + 1
+            data["retries"] += (request.retries or 0) + (1 if retry else 0)
+
+    def _call(self, get: Callable, url: str, *args, **kwargs) -> Any:
+        with self.request(str(url)) as request:
+            response = get(url, *args, **kwargs)
+            request.status_code = getattr(response, "status_code", None)
+            try:
+                request.nbytes = len(response.content)
+            except Exception:
+                pass
+            # Retries done within the request by the (urllib3) retry policy of the session; see PortalSession.
+            if history := getattr(getattr(getattr(response, "raw", None), "retries", None), "history", None):
+                request.retries = len(history)
+            return response
+
+
+def _normalize_collection_name(name: str) -> str:
+    return name.replace("-", "").replace("_", "").lower()
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+    # Nearest-rank percentile of the given (already sorted) values.
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-percentile * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if isinstance(value, float) else value
@@ -5,15 +5,25 @@ import io
 import json
 import os
 import sys
-from typing import Any, Callable, List, Optional, Union
+import time
+from typing import Any, Callable, Dict, Generator, List, Optional, Union
+from urllib.parse import quote
 from dcicutils.portal_utils import Portal as PortalFromUtils
 from hms_utils.argv import ARGV
 from hms_utils.chars import chars
 from hms_utils.dictionary_utils import sort_dictionary
+from hms_utils.json_stream_utils import iterate_json_array
 from hms_utils.portal.portal_utils import Portal as Portal
 from hms_utils.threading_utils import run_concurrently
 
 _ITEM_UUID_PROPERTY_NAME = "uuid"
+_INDEX_SEARCH_PAGE_SIZE = 1000
+_INDEX_SEARCH_SORT = "uuid"
+# The (union of the) item statuses, for types whose schema does not enumerate its status values; the default
+# search omits some of these (e.g. deleted, replaced), though they are still resolved by (a GET of) their paths.
+_ITEM_STATUSES = ["current", "released", "public", "restricted", "in review", "in progress", "draft", "shared",
+                  "uploading", "uploaded", "upload failed", "archived", "obsolete", "replaced", "deleted"]
+_INDEX_FILE_VERSION = 1
 
 
 def main():
@@ -24,6 +34,9 @@ def main():
         ARGV.OPTIONAL(str): ["--app"],
         ARGV.OPTIONAL(int, 32): ["--threads"],
         ARGV.OPTIONAL(bool): ["--ping"],
+        ARGV.OPTIONAL(bool, False): ["--index"],
+        ARGV.OPTIONAL(str): ["--index-file"],
+        ARGV.OPTIONAL(bool, False): ["--refresh-index", "--index-refresh"],
         ARGV.OPTIONAL(bool, False): ["--verbose"],
         ARGV.OPTIONAL(bool, False): ["--debug"],
     })
@@ -34,19 +47,21 @@ def main():
 
     nitems_total = 0
     nfiles_total = 0
+    item_types = set()
 
     for file in glob.glob(os.path.join(directory, "*.json")):
-        if not Portal.schema_name(file):
+        if not (item_type := Portal.schema_name(file)):
             print(f"WARNING: File name does not corresond to known item type name: {file}")
             continue
         try:
-            with io.open(file, "r") as f:
-                if not isinstance(items := json.load(f), list):
-                    print(f"WARNING: File does not contain JSON list: {file}")
-                    continue
-                nfiles_total += 1
-                nitems = len(items)
-                nitems_total += nitems
+            # Streamed, i.e. only counted, not loaded; files may be (very) large.
+            nitems = sum(1 for _ in iterate_json_array(file))
+            nfiles_total += 1
+            item_types.add(item_type)
+            nitems_total += nitems
+        except ValueError:
+            print(f"WARNING: File does not contain JSON list: {file}")
+            continue
         except Exception:
             print(f"WARNING: Exception loading JSON from file: {file}")
             continue
@@ -64,44 +79,68 @@ def main():
         if argv.threads > 1:
             print(f"Checking concurrency: {argv.threads} threads")
 
+    index = None
+    if argv.index or argv.index_file:
+        # Resolve all conflict checks in memory, via a (bulk exported, or previously saved) index
+        # of the identifying values of the existing Portal items of the types to check.
+        if argv.index_file and os.path.exists(index_file := os.path.expanduser(argv.index_file)) and (
+           not argv.refresh_index):  # noqa
+            if not (index := PortalItemIndex.load(index_file)):
+                print(f"Cannot load index file: {index_file}")
+                return 1
+            if (index.server and portal.server) and (index.server != portal.server):
+                print(f"WARNING: Index file ({index_file}) is for a different Portal: {index.server}")
+            if missing_item_types := sorted(item_type for item_type in item_types if not index.has_type(item_type)):
+                index.export(portal, missing_item_types, threads=argv.threads, verbose=argv.verbose)
+                index.save(index_file)
+        else:
+            index = PortalItemIndex().export(portal, sorted(item_types), threads=argv.threads, verbose=argv.verbose)
+            if argv.index_file:
+                index.save(os.path.expanduser(argv.index_file))
+        if argv.verbose:
+            print(f"Index of existing items: {index.count} {chars.dot} identifying values: {index.nvalues}"
+                  f"{f' {chars.dot} file: {argv.index_file}' if argv.index_file else ''}")
+
     for file in glob.glob(os.path.join(directory, "*.json")):
-        check_file_for_conflicts(portal, file, threads=argv.threads, verbose=argv.verbose, debug=argv.debug)
+        check_file_for_conflicts(portal, file, threads=argv.threads, index=index,
+                                 verbose=argv.verbose, debug=argv.debug)
 
 
-def check_file_for_conflicts(portal: Portal, file: str,
-                             threads: int = 0, verbose: bool = False, debug: bool = False) -> None:
+def check_file_for_conflicts(portal: Portal, file: str, threads: int = 0,
+                             index: Optional[PortalItemIndex] = None,
+                             verbose: bool = False, debug: bool = False) -> None:
 
     if not (item_type := Portal.schema_name(file)):
         print(f"WARNING: File name does not corresond to known item type name: {file}")
         return
-    try:
-        with io.open(file, "r") as f:
-            if not isinstance(items := json.load(f), list):
-                print(f"WARNING: File does not contain JSON list: {file}")
-                return
-    except Exception:
-        print(f"WARNING: Exception loading JSON from file: {file}")
-        return
+    # The items are streamed from the file, i.e. parsed incrementally, never all in memory,
+    # and each is checked (concurrently) as it is parsed, while parsing continues.
+    def items() -> Generator[dict, None, None]:  # noqa
+        try:
+            yield from iterate_json_array(file)
+        except ValueError:
+            print(f"WARNING: File does not contain (valid) JSON list: {file}")
+        except Exception:
+            print(f"WARNING: Exception loading JSON from file: {file}")
 
     def check_item_for_conflicts_function(item: dict) -> None:  # noqa
         nonlocal portal, file, item_type
         check_item_for_conflicts(portal, item=item, item_type=item_type, item_source=file,
-                                 report=True, debug=debug)
+                                 index=index, report=True, debug=debug)
     if (verbose is True) or (debug is True):
         print(f"Checking file for conflicts: {file}")
     if isinstance(threads, int) and (threads > 0):
-        check_item_for_conflicts_functions = []
-        for item in items:
-            check_item_for_conflicts_functions.append(lambda item=item: check_item_for_conflicts_function(item))
-        run_concurrently(check_item_for_conflicts_functions, nthreads=threads)
+        run_concurrently((lambda item=item: check_item_for_conflicts_function(item) for item in items()),
+                         nthreads=threads)
     else:
-        for item in items:
+        for item in items():
             check_item_for_conflicts(portal, item=item, item_type=item_type, item_source=file,
-                                     report=True, debug=debug)
+                                     index=index, report=True, debug=debug)
 
 
 def check_item_for_conflicts(portal: Portal, item: dict, item_type: Optional[str] = None,
                              item_source: Optional[str] = None,
+                             index: Optional[PortalItemIndex] = None,
                              report: bool = False, printf: Optional[Callable] = None,
                              debug: bool = False) -> Union[List[dict], bool]:
 
@@ -148,8 +187,8 @@ def check_item_for_conflicts(portal: Portal, item: dict, item_type: Optional[str
             if not isinstance(identifying_values, list):
                 identifying_values = [identifying_values]
             for identifying_value in identifying_values:
-                if (existing_item := get_portal_item_metadata(portal, item_type,
-                                                              identifying_property, identifying_value)) is not None:
+                if (existing_item := _get_existing_item(portal, item_type, identifying_property,
+                                                        identifying_value, index)) is not None:
                     existing_items_found += 1
                     if (existing_item_uuid := existing_item.get(_ITEM_UUID_PROPERTY_NAME)) != item_uuid:
                         item_conflicts.append({
@@ -171,7 +210,7 @@ def check_item_for_conflicts(portal: Portal, item: dict, item_type: Optional[str
             }
         })
 
-    if (existing_item := get_portal_item_metadata(portal, item_type, _ITEM_UUID_PROPERTY_NAME, item_uuid)) is not None:
+    if (existing_item := _get_existing_item(portal, item_type, _ITEM_UUID_PROPERTY_NAME, item_uuid, index)) is not None:
         item_conflicts = []
         existing_items_found += 1
         for identifying_property in identifying_properties:
@@ -221,6 +260,154 @@ def get_portal_item_metadata(portal: Portal, item_type: str,
     return portal.get_metadata(f"/{item_type}/{identifying_value}", raw=True, raise_exception=False)
 
 
+def _get_existing_item(portal: Portal, item_type: str, identifying_property: str, identifying_value: Any,
+                       index: Optional[PortalItemIndex] = None) -> Optional[dict]:
+    if index and index.has_type(item_type):
+        return index.get(item_type, identifying_value)
+    return get_portal_item_metadata(portal, item_type, identifying_property, identifying_value)
+
+
+class PortalItemIndex:
+    """
+    In-memory (hash) index, by item type, of the uuid and identifying property values (e.g. accession,
+    aliases, submitted_id) of all existing Portal items of the given types (including deleted items),
+    bulk exported via paged searches (for only these properties), so that lookups of existing items
+    by identifying value, as for conflict checks, resolve locally rather than with a GET for each.
+    As with a GET of /{item_type}/{identifying_value}, a value matches an item via any of its identifying
+    properties. The items in the index have only these properties. May be saved to, and loaded from, a file.
+    """
+
+    def __init__(self, server: Optional[str] = None) -> None:
+        self._server = server
+        self._types = {}  # item type -> {"items": {uuid: item}, "values": {identifying value: uuid}}
+
+    @property
+    def server(self) -> Optional[str]:
+        return self._server
+
+    @property
+    def count(self) -> int:
+        return sum(len(data["items"]) for data in self._types.values())
+
+    @property
+    def nvalues(self) -> int:
+        return sum(len(data["values"]) for data in self._types.values())
+
+    def has_type(self, item_type: str) -> bool:
+        return item_type in self._types
+
+    def get(self, item_type: str, identifying_value: Any) -> Optional[dict]:
+        if (identifying_value is not None) and (data := self._types.get(item_type)):
+            if (uuid := data["values"].get(str(identifying_value))) is not None:
+                return data["items"].get(uuid)
+        return None
+
+    def add(self, item_type: str, item: dict, identifying_properties: Optional[List[str]] = None) -> None:
+        if not (isinstance(item, dict) and isinstance(uuid := item.get(_ITEM_UUID_PROPERTY_NAME), str)):
+            return
+        if not (data := self._types.get(item_type)):
+            self._types[item_type] = (data := {"items": {}, "values": {}})
+        data["items"][uuid] = item
+        data["values"][uuid] = uuid
+        for identifying_property in (identifying_properties or item.keys()):
+            if (identifying_values := item.get(identifying_property)) is None:
+                continue
+            for identifying_value in (identifying_values if isinstance(identifying_values, list)
+                                      else [identifying_values]):
+                if isinstance(identifying_value, (str, int, float)):
+                    data["values"][str(identifying_value)] = uuid
+
+    def export(self, portal: Portal, item_types: List[str], threads: int = 1,
+               page_size: Optional[int] = None, verbose: bool = False) -> PortalItemIndex:
+        """
+        Adds to this index all existing items of the given types from the given Portal, of every status
+        (per the schema of each type), i.e. including those omitted by the default search; returns self.
+        """
+        if not (isinstance(page_size, int) and (page_size > 0)):
+            page_size = _INDEX_SEARCH_PAGE_SIZE
+        self._server = self._server or portal.server
+        for item_type in item_types:
+            started = time.time()
+            if not (identifying_properties := portal.get_identifying_property_names(item_type)):
+                continue
+            if _ITEM_UUID_PROPERTY_NAME not in identifying_properties:
+                identifying_properties = [_ITEM_UUID_PROPERTY_NAME, *identifying_properties]
+            query = (f"/search/?type={quote(item_type)}&"
+                     f"{'&'.join(f'field={quote(name)}' for name in identifying_properties)}&"
+                     f"{'&'.join(f'status={quote(status)}' for status in _get_statuses(portal, item_type))}&"
+                     f"sort={_INDEX_SEARCH_SORT}")
+            self._types[item_type] = {"items": {}, "values": {}}
+            for item in PortalItemIndex._search(portal, query, page_size=page_size, threads=threads):
+                self.add(item_type, {name: item[name] for name in identifying_properties if name in item},
+                         identifying_properties)
+            if verbose:
+                print(f"Indexed existing {item_type} items: {len(self._types[item_type]['items'])}"
+                      f" {chars.dot} {time.time() - started:.1f} seconds")
+        return self
+
+    def save(self, file: str) -> None:
+        with io.open(file, "w") as f:
+            json.dump({"version": _INDEX_FILE_VERSION, "server": self._server, "created": int(time.time()),
+                       "types": {item_type: list(data["items"].values()) for item_type, data in self._types.items()}},
+                      f)
+
+    @staticmethod
+    def load(file: str) -> Optional[PortalItemIndex]:
+        try:
+            with io.open(file, "r") as f:
+                if (data := json.load(f)).get("version") != _INDEX_FILE_VERSION:
+                    return None
+            index = PortalItemIndex(server=data.get("server"))
+            for item_type, items in data["types"].items():
+                index._types[item_type] = {"items": {}, "values": {}}
+                for item in items:
+                    index.add(item_type, item)
+            return index
+        except Exception:
+            return None
+
+    @staticmethod
+    def _search(portal: Portal, query: str, page_size: int, threads: int = 1) -> List[dict]:
+        # Returns all items for the given (stably sorted) search query, the first page first (for the total),
+        # then the remaining pages concurrently; raises an exception on any (non-empty) error, or if any page
+        # does not have the expected number of items (e.g. if items were added or removed while paging).
+        # If the first page is smaller than requested (the server may cap the page size), that is the page size.
+        def search(offset: int) -> Dict[str, Any]:  # noqa
+            response = portal.get(f"{query}&limit={page_size}&from={offset}")
+            if (response.status_code == 404) and isinstance((result := response.json()), dict) and (
+               "@graph" in result):  # noqa
+                return result  # No results for a search is a 404.
+            if response.status_code != 200:
+                raise Exception(f"Bad status code for search: {query}: {response.status_code}")
+            return response.json()
+        def search_page(offset: int) -> List[dict]:  # noqa
+            if len(items := search(offset).get("@graph", [])) != (expected := min(page_size, total - offset)):
+                raise Exception(f"Unexpected number of items for search: {query}: {len(items)} vs {expected}"
+                                f" from {offset} of {total}")
+            return items
+        items = (result := search(0)).get("@graph", [])
+        if isinstance(total := result.get("total"), int) and (total > len(items)):
+            if not items:
+                raise Exception(f"No items for search: {query}: of {total}")
+            page_size = min(page_size, len(items))
+            for page in run_concurrently([lambda offset=offset: search_page(offset)
+                                          for offset in range(page_size, total, page_size)],
+                                         nthreads=max(threads, 1), raise_exception=True):
+                items.extend(page)
+        return items
+
+
+def _get_statuses(portal: Portal, item_type: str) -> List[str]:
+    # Returns the (enumerated) status values of the given type, per its schema, or else _ITEM_STATUSES.
+    try:
+        if (isinstance(statuses := portal.get_schema(item_type)["properties"]["status"]["enum"], list) and
+                statuses and all(isinstance(status, str) for status in statuses)):
+            return statuses
+    except Exception:
+        pass
+    return _ITEM_STATUSES
+
+
 if __name__ == "__main__":
     status = main()
     sys.exit(status if isinstance(status, int) else 0)
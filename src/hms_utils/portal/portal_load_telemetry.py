@@ -0,0 +1,140 @@
+from __future__ import annotations
+import re
+import threading
+import time
+from typing import Callable, Optional
+from hms_utils.portal.portal_instrumentation import _percentile, _round
+
+DEFAULT_PORTAL_LOAD_TELEMETRY_INTERVAL = 10  # Seconds
+
+_UNRESOLVED_LINK_PATTERN = re.compile(r"Unable to resolve link:\s*/?([^/\s\"']+)/([^\s\"'\\]+)")
+_BAD_RESPONSE_PATTERN = re.compile(r"Bad response:\s*(\d{3}\s+[A-Za-z][A-Za-z ]*?)\s*\(")
+
+
+class PortalLoadTelemetry:
+    """
+    Collects throughput telemetry for a (snovault) loadxl load, i.e. for each item yielded by load_all_gen:
+    per schema type throughput (items per second, over the total time spent on its items, since the items
+    of a type are not contiguous, e.g. across the loadxl passes), per action (POST, PATCH, SKIP, CHECK, ERROR)
+    counts, and per item latency (the time since the previous item was yielded, as loadxl loads serially, so
+    this is the time spent on the item); overall progress and ETA (given the expected total); and errors,
+    clustered by response status and by the schema type of unresolved links (an item counted once per type).
+    A snapshot is emitted (via the given emit function) at most every interval seconds; the summary is the
+    final (JSON serializable) report.
+    """
+
+    def __init__(self, total: int = 0, interval: Optional[float] = None,
+                 emit: Optional[Callable[[dict], None]] = None) -> None:
+        self._total = total if isinstance(total, int) and (total > 0) else 0
+        self._interval = interval if isinstance(interval, (int, float)) and (interval > 0) else None
+        self._emit = emit if callable(emit) else None
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._previous = self._started
+        self._emitted = self._started
+        self._count = 0
+        self._actions = {}
+        self._types = {}
+        self._errors = {}
+        self._unresolved = {}
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def record(self, item_type: Optional[str], action: str, message: Optional[str] = None) -> None:
+        """
+        Records an item (of the given schema type, if known) yielded by loadxl with the given action;
+        for an error the message (i.e. the loadxl output line) is used to cluster errors.
+        """
+        with self._lock:
+            now = time.time()
+            latency = now - self._previous
+            self._previous = now
+            self._count += 1
+            action = action.upper() if isinstance(action, str) else "UNKNOWN"
+            self._actions[action] = self._actions.get(action, 0) + 1
+            item_type = item_type or "unknown"
+            if not (data := self._types.get(item_type)):
+                self._types[item_type] = (data := {"actions": {}, "latencies": []})
+            data["actions"][action] = data["actions"].get(action, 0) + 1
+            data["latencies"].append(latency)
+            if (action == "ERROR") and isinstance(message, str):
+                self._record_error(item_type, message)
+            emit = self._emit and self._interval and ((now - self._emitted) >= self._interval)
+            if emit:
+                self._emitted = now
+        if emit:
+            self._emit(self.snapshot())
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current progress, i.e. items done, rate, and ETA, and the per action counts.
+        """
+        with self._lock:
+            duration = time.time() - self._started
+            rate = self._count / duration if duration > 0 else 0
+            remaining = max(self._total - self._count, 0) if self._total else None
+            return {
+                "elapsed": _round(duration),
+                "items": self._count,
+                "total": self._total or None,
+                "items_per_second": _round(rate),
+                "eta": _round(remaining / rate) if (remaining is not None) and (rate > 0) else None,
+                "actions": dict(sorted(self._actions.items()))
+            }
+
+    def summary(self) -> dict:
+        """
+        Returns the final report: the snapshot, plus per schema type statistics (ordered by the total
+        time spent loading each type, descending), and the error clusters.
+        """
+        snapshot = self.snapshot()
+        with self._lock:
+            types = {}
+            for item_type, data in self._types.items():
+                latencies = sorted(data["latencies"])
+                duration = sum(latencies)
+                types[item_type] = {
+                    "items": len(latencies),
+                    "actions": dict(sorted(data["actions"].items())),
+                    "items_per_second": _round(len(latencies) / duration) if duration > 0 else None,
+                    "latency": {
+                        "mean": _round(sum(latencies) / len(latencies)) if latencies else None,
+                        "p50": _round(_percentile(latencies, 50)),
+                        "p95": _round(_percentile(latencies, 95)),
+                        "max": _round(latencies[-1]) if latencies else None,
+                        "total": _round(duration)
+                    }
+                }
+            types = dict(sorted(types.items(), key=lambda item: item[1]["latency"]["total"], reverse=True))
+            return {
+                **snapshot,
+                "types": types,
+                "errors": {
+                    "responses": dict(sorted(self._errors.items(), key=lambda item: item[1], reverse=True)),
+                    "unresolved_links": {
+                        link_type: {"links": len(data["links"]), "items": data["items"],
+                                    "referencing_types": dict(sorted(data["referencing_types"].items()))}
+                        for link_type, data in sorted(self._unresolved.items(),
+                                                      key=lambda item: item[1]["items"], reverse=True)
+                    }
+                }
+            }
+
+    def _record_error(self, item_type: str, message: str) -> None:
+        # Called with the lock held.
+        if match := _BAD_RESPONSE_PATTERN.search(message):
+            response = " ".join(match.group(1).split())
+        else:
+            response = "other"
+        self._errors[response] = self._errors.get(response, 0) + 1
+        links = {}
+        for link_type, link in _UNRESOLVED_LINK_PATTERN.findall(message):
+            links.setdefault(link_type, set()).add(link)
+        for link_type, link_type_links in links.items():
+            if not (data := self._unresolved.get(link_type)):
+                self._unresolved[link_type] = (data := {"links": set(), "items": 0, "referencing_types": {}})
+            data["links"].update(link_type_links)
+            data["items"] += 1
+            data["referencing_types"][item_type] = data["referencing_types"].get(item_type, 0) + 1
@@ -1,27 +1,35 @@
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from enum import Enum, auto as enum_auto
-from functools import lru_cache
 import hashlib
 import io
 import json
 import os
 import re
-import requests
 import sys
+import threading
 import time
-from typing import Any, Callable, List, Optional, Set, Tuple, Union
+from typing import Any, Callable, Generator, List, Optional, Set, Tuple, Union
+from urllib.parse import parse_qs
 from uuid import uuid4
 import yaml
 from dcicutils.command_utils import yes_or_no
-from dcicutils.misc_utils import to_snake_case
+from dcicutils.misc_utils import get_error_message, to_snake_case
 from hms_utils.argv import ARGV
 from hms_utils.chars import chars
 from hms_utils.datetime_utils import format_duration
-from hms_utils.dictionary_utils import contains_uuid, delete_properties_from_dictionaries, find_dictionary_item
-from hms_utils.dictionary_utils import get_property, get_uuids, get_referenced_uuids, sort_dictionary
+from hms_utils.dictionary_utils import contains_uuid, delete_properties_from_dictionaries
+from hms_utils.dictionary_utils import compile_property_path, get_uuids, get_referenced_uuids, sort_dictionary
+from hms_utils.json_stream_utils import AtomicFileWriter, JsonArraysDictionaryWriter, JsonArrayWriter
+from hms_utils.json_stream_utils import iterate_json_array, iterate_json_items, iterate_ndjson
+from hms_utils.portal.portal_cache import portal_response_cache
+from hms_utils.portal.portal_crawler import PortalReferenceCrawler
+from hms_utils.portal.portal_disk_cache import DEFAULT_PORTAL_DISK_CACHE_FILE, PortalDiskCache
+from hms_utils.portal.portal_instrumentation import PortalInstrumentation
 from hms_utils.portal.portal_utils import Portal as PortalFromUtils
 from hms_utils.threading_utils import run_concurrently
-from hms_utils.type_utils import is_uuid
+from hms_utils.type_utils import is_uuid, to_non_empty_string_list
 from hms_utils.version_utils import get_version
 
 _ITEM_SID_PROPERTY_NAME = "sid"
@@ -31,6 +39,13 @@ _ITEM_TYPE_PSEUDO_PROPERTY_NAME = "@@@__TYPE__@@@"
 _ITEM_IGNORE_REF_PROPERTIES = ["viewconfig", "higlass_uid", "blob_id"]  # "static_content"
 _ITEM_MD5SUM_PROPERTY_NAME = "md5sum"
 
+# Default number of uuids per (batched) search request when fetching referenced items (e.g. for --refs);
+# kept modest so that the resultant URL (about 42 characters per uuid) stays well under server limits.
+_PORTAL_SEARCH_UUIDS_BATCH_SIZE = 100
+
+# Default number of items per page when paginating (limit/from) through search or collection results.
+_PORTAL_PAGE_SIZE = 1000
+
 _ITEM_IGNORE_PROPERTIES_INSERTS = [
     "date_created",
     "last_modified",
@@ -53,6 +68,11 @@ class Portal(PortalFromUtils):
         NO_ACCESS = enum_auto()
         ERROR = enum_auto()
 
+    class AccessError(Exception):
+        def __init__(self, access: Portal.Access, query: Optional[str] = None) -> None:
+            super().__init__(f"Portal access error{f' for {query}' if query else ''}: {access.name}")
+            self.access = access
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self._get_call_count = 0
@@ -61,6 +81,9 @@ class Portal(PortalFromUtils):
         self._get_metadata_call_duration = 0
         self._raise_exception = kwargs.get("raise_exception") is True
         self._ignore_properties = []
+        self._disk_cache = None
+        self._instrumentation = PortalInstrumentation(server=self.server)
+        self.session.instrument(self._instrumentation.wrap)
 
     @property
     def get_call_count(self) -> int:
@@ -86,43 +109,165 @@ class Portal(PortalFromUtils):
     def ignore_properties(self, value: List[str]) -> None:
         self._ignore_properties = value if isinstance(value, list) else []
 
+    @property
+    def instrumentation(self) -> PortalInstrumentation:
+        return self._instrumentation
+
+    @property
+    def disk_cache(self) -> Optional[PortalDiskCache]:
+        return self._disk_cache
+
+    @disk_cache.setter
+    def disk_cache(self, value: Optional[PortalDiskCache]) -> None:
+        self._disk_cache = value if isinstance(value, PortalDiskCache) else None
+
     def GET(self, query: str, metadata: bool = False, raw: bool = False, database: bool = False,
             limit: Optional[int] = None, offset: Optional[int] = None,
             field: Optional[str] = None, deleted: bool = False,
-            raise_exception: bool = False) -> Optional[Union[List[dict], dict]]:
-        items = None
-        try:
-            _debug(f"portal.get{'_metadata' if metadata else ''}: {query}"
-                   f"{f' {chars.dot} raw' if raw else ''}"
-                   f"{f' {chars.dot} database' if database else ''}"
-                   f"{f' {chars.dot} limit: {limit}' if isinstance(limit, int) else ''}"
-                   f"{f' {chars.dot} offset: {offset}' if isinstance(offset, int) else ''}"
-                   f"{f' {chars.dot} field: {field}' if field else ''}"
-                   f"{f' {chars.dot} deleted' if deleted else ''}")
-            if metadata:
-                self._get_metadata_call_count += 1
-                started = time.time()
-                items = self.get_metadata(query, raw=raw, database=database,
-                                          limit=limit, offset=offset, deleted=deleted, field=field)
-                self._get_metadata_call_duration += time.time() - started
-            else:
-                self._get_call_count += 1
-                started = time.time()
-                items = self.get(query, raw=raw, database=database,
-                                 limit=limit, offset=offset, deleted=deleted, field=field)
-                if items.status_code == 404:
-                    return Portal.Access.NOT_FOUND
-                elif items.status_code == 403:
-                    return Portal.Access.NO_ACCESS
-                items = items.json()
-                self._get_call_duration += time.time() - started
-        except Exception as e:
-            if (raise_exception is True) or self._raise_exception:
-                raise
-            return Portal._get_access_status(e)
-        if self._ignore_properties and items:
-            delete_properties_from_dictionaries(items, self._ignore_properties)
-        return items
+            raise_exception: bool = False, nocache: bool = False,
+            noignore: bool = False) -> Optional[Union[List[dict], dict]]:
+        with self._instrumentation.logical_request():
+            items = None
+            response = None
+            if (disk_cache := self._disk_cache if nocache is not True else None) is not None:
+                frame = PortalDiskCache.frame(metadata=metadata, raw=raw, database=database,
+                                              limit=limit, offset=offset, deleted=deleted)
+                def revalidate(entry: PortalDiskCache.Entry) -> bool:  # noqa
+                    nonlocal response
+                    if entry.etag and not metadata:
+                        # Conditional request; the Portal responds with 304 (Not Modified) if the ETag still matches,
+                        # otherwise with the full (200) response, which is then used (below) rather than refetched.
+                        response = self.get(query, raw=raw, database=database, limit=limit, offset=offset,
+                                            deleted=deleted, field=field,
+                                            headers={"Content-type": Portal.MIME_TYPE_JSON,
+                                                     "Accept": Portal.MIME_TYPE_JSON, "If-None-Match": entry.etag})
+                        return response.status_code == 304
+                    if not raw:
+                        # In an embedded (non-raw) frame a change to an embedded item does not change the
+                        # last_modified.date_modified of the item embedding it; so only max-age (or ETag) applies.
+                        return False
+                    return PortalDiskCache.revalidate_by_date_modified(
+                        query, entry, lambda query: self.GET(query, metadata=False, limit=limit, offset=offset,
+                                                             deleted=deleted, nocache=True, noignore=True))
+                if (items := disk_cache.get(query, frame=frame, field=field, revalidate=revalidate)) is not None:
+                    _debug(f"portal.get{'_metadata' if metadata else ''}: {query} {chars.dot} from disk cache")
+                    if self._ignore_properties and items and (noignore is not True):
+                        delete_properties_from_dictionaries(items, self._ignore_properties)
+                    return items
+            etag = None
+            try:
+                _debug(f"portal.get{'_metadata' if metadata else ''}: {query}"
+                       f"{f' {chars.dot} raw' if raw else ''}"
+                       f"{f' {chars.dot} database' if database else ''}"
+                       f"{f' {chars.dot} limit: {limit}' if isinstance(limit, int) else ''}"
+                       f"{f' {chars.dot} offset: {offset}' if isinstance(offset, int) else ''}"
+                       f"{f' {chars.dot} field: {field}' if field else ''}"
+                       f"{f' {chars.dot} deleted' if deleted else ''}")
+                if metadata:
+                    self._get_metadata_call_count += 1
+                    started = time.time()
+                    items = self.get_metadata(query, raw=raw, database=database,
+                                              limit=limit, offset=offset, deleted=deleted, field=field)
+                    self._get_metadata_call_duration += time.time() - started
+                else:
+                    self._get_call_count += 1
+                    started = time.time()
+                    if (items := response) is None or (response.status_code != 200):
+                        items = self.get(query, raw=raw, database=database,
+                                         limit=limit, offset=offset, deleted=deleted, field=field)
+                    if items.status_code == 404:
+                        return Portal.Access.NOT_FOUND
+                    elif items.status_code == 403:
+                        return Portal.Access.NO_ACCESS
+                    etag = items.headers.get("ETag")
+                    items = items.json()
+                    self._get_call_duration += time.time() - started
+            except Exception as e:
+                if (raise_exception is True) or self._raise_exception:
+                    raise
+                return Portal._get_access_status(e)
+            if disk_cache is not None:
+                # Stored before the ignored properties are deleted, so that last_modified is there for revalidation.
+                disk_cache.store(query, items, frame=frame, field=field, etag=etag)
+            if self._ignore_properties and items and (noignore is not True):
+                delete_properties_from_dictionaries(items, self._ignore_properties)
+            return items
+
+    def get_schema_names(self) -> Set[str]:
+        # Cached on this Portal object, i.e. per environment; not cached if the schemas cannot be fetched.
+        if (schema_names := getattr(self, "_schema_names", None)) is None:
+            try:
+                schemas = self.get_schemas()
+            except Exception:
+                return set()
+            self._schema_names = (schema_names := set(schemas.keys()) if isinstance(schemas, dict) else set())
+            self._instrumentation.collections = schema_names
+        return schema_names
+
+    def paginate(self, query: str, metadata: bool = False, raw: bool = False, database: bool = False,
+                 limit: Optional[int] = None, offset: Optional[int] = None, deleted: bool = False,
+                 page_size: Optional[int] = None, prefetch: bool = True,
+                 get: Optional[Callable] = None) -> Generator[dict, None, None]:
+        """
+        Generator yielding, one at a time, the items for the given (search or collection) query, fetched a
+        page (of page_size items) at a time, via successive limit/from requests, starting at the given offset,
+        and up to the given limit of items in total, if any. Each page starts after the items actually returned
+        by the previous one, since the server may cap the page size below the requested one; so pages continue
+        while the offset is less than the total, if returned, otherwise until an empty page. If prefetch is True
+        then the next page is fetched (in a background thread) while the items of the current page are being
+        consumed. If the query is for a single item (i.e. no @graph) then just yields that item. Items with a
+        uuid on the previous page, e.g. shifted onto the next page by items created during pagination, are not
+        yielded again; only the uuids of the previous and current pages are kept, so memory use stays flat.
+        If the given get function is specified it is used to fetch each page, called with the query, limit,
+        and offset; otherwise uses Portal.GET. Raises Portal.AccessError if a page cannot be fetched.
+        """
+        if not (isinstance(page_size, int) and (page_size > 0)):
+            page_size = _PORTAL_PAGE_SIZE
+        if not (isinstance(offset, int) and (offset >= 0)):
+            offset = 0
+        if not (isinstance(limit, int) and (limit >= 0)):
+            limit = None
+        if not callable(get):
+            def get(query: str, limit: int, offset: int) -> Optional[Union[dict, Portal.Access]]:  # noqa
+                return self.GET(query, metadata=metadata, raw=raw, database=database,
+                                limit=limit, offset=offset, deleted=deleted)
+        def get_page_limit(page_offset: int) -> int:  # noqa
+            return page_size if limit is None else min(page_size, limit - (page_offset - offset))
+        previous_page_uuids = set()
+        page_offset = offset
+        if (page_limit := get_page_limit(page_offset)) <= 0:
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page_future = executor.submit(get, query, page_limit, page_offset) if prefetch else None
+            while True:
+                page = page_future.result() if page_future else get(query, page_limit, page_offset)
+                if isinstance(page, Portal.Access):
+                    raise Portal.AccessError(page, query)
+                elif not isinstance(page, dict):
+                    return
+                elif not isinstance(graph := page.get("@graph"), list):
+                    yield page
+                    return
+                if limit is not None:
+                    graph = graph[:page_limit]
+                next_page_offset = page_offset + len(graph)
+                next_page_limit = get_page_limit(next_page_offset)
+                more = (len(graph) > 0) and (next_page_limit > 0)
+                if more and isinstance(total := page.get("total"), int):
+                    more = next_page_offset < total
+                if more and prefetch:
+                    page_future = executor.submit(get, query, next_page_limit, next_page_offset)
+                page_uuids = set()
+                for item in graph:
+                    if isinstance(item, dict) and (uuid := item.get(_ITEM_UUID_PROPERTY_NAME)):
+                        if (uuid in previous_page_uuids) or (uuid in page_uuids):
+                            continue
+                        page_uuids.add(uuid)
+                    yield item
+                if not more:
+                    return
+                previous_page_uuids = page_uuids
+                page_offset, page_limit = next_page_offset, next_page_limit
 
     def access(self, query: str, metadata: bool = False, raw: bool = False, inserts: bool = False,
                report: bool = False, printf: Optional[Callable] = None) -> Portal.Access:
@@ -220,7 +365,15 @@ def main() -> int:
         ARGV.OPTIONAL(bool): ["--deleted"],
         ARGV.OPTIONAL(bool): ["--json"],
         ARGV.OPTIONAL(bool): ["--yaml", "--yml"],
+        ARGV.OPTIONAL(bool): ["--ndjson", "--jsonl", "--stream"],
+        ARGV.OPTIONAL(int, _PORTAL_PAGE_SIZE): ["--page-size", "--page"],
+        ARGV.OPTIONAL(bool): ["--noprefetch"],
         ARGV.OPTIONAL(bool): ["--refs", "--ref"],
+        ARGV.OPTIONAL(int): ["--refs-depth", "--ref-depth", "--depth"],
+        ARGV.OPTIONAL([str]): ["--refs-types", "--refs-type", "--ref-types", "--ref-type"],
+        ARGV.OPTIONAL([str]): ["--refs-exclude-types", "--refs-exclude-type",
+                               "--ref-exclude-types", "--ref-exclude-type"],
+        ARGV.OPTIONAL(int): ["--refs-max-per-depth", "--ref-max-per-depth"],
         ARGV.OPTIONAL(bool): ["--noignore-properties", "--noignore", "--no-ignore-properties", "--no-ignore" "--all"],
         ARGV.OPTIONAL([str]): ["--ignore-properties", "--ignore"],
         ARGV.OPTIONAL(bool): ["--nocruft"],
@@ -241,11 +394,23 @@ def main() -> int:
         ARGV.OPTIONAL(bool): ["--verbose"],
         ARGV.OPTIONAL(bool): ["--debug"],
         ARGV.OPTIONAL(int, 50): ["--nthreads", "--threads"],
+        ARGV.OPTIONAL(int, _PORTAL_SEARCH_UUIDS_BATCH_SIZE): ["--batch-size", "--batch"],
+        ARGV.OPTIONAL(int): ["--pool-size", "--pool", "--connections"],
+        ARGV.OPTIONAL(int): ["--retries", "--retry"],
+        ARGV.OPTIONAL(int): ["--cache-size", "--cache-max-size"],
+        ARGV.OPTIONAL(bool): ["--cache", "--disk-cache"],
+        ARGV.OPTIONAL(str): ["--cache-file"],
+        ARGV.OPTIONAL(int): ["--cache-max-age", "--cache-age"],
+        ARGV.OPTIONAL(bool): ["--cache-clear"],
         ARGV.OPTIONAL(bool): ["--sanity-check", "--sanity"],
         ARGV.OPTIONAL(bool): ["--timing", "--time", "--times"],
         ARGV.OPTIONAL(bool): ["--noheader"],
         ARGV.OPTIONAL(bool): ["--argv"],
         ARGV.AT_MOST_ONE_OF: ["--inserts", "--raw"],
+        ARGV.AT_MOST_ONE_OF: ["--ndjson", "--refs"],
+        ARGV.AT_MOST_ONE_OF: ["--ndjson", "--yaml"],
+        ARGV.AT_MOST_ONE_OF: ["--ndjson", "--uuids"],
+        ARGV.AT_MOST_ONE_OF: ["--ndjson", "--pick"],
         ARGV.AT_MOST_ONE_OF: ["--inserts-files", "--raw"],
         ARGV.AT_MOST_ONE_OF: ["--metadata", "--nometadata"],
         ARGV.OPTIONAL(bool): ["--exceptions", "--exception", "--except"],
@@ -254,6 +419,10 @@ def main() -> int:
 
     _setup_debugging(argv)
 
+    if isinstance(argv.cache_size, int) and (argv.cache_size >= 0):
+        # Maximum (approximate) size of the in-memory Portal response cache in megabytes; zero disables it.
+        _portal_get.cache.max_bytes = argv.cache_size * 1024 * 1024
+
     if argv.version:
         print(f"hms-portal-read: {get_version()}")
 
@@ -262,6 +431,22 @@ def main() -> int:
                                     ping=argv.ping, raise_exception=argv.exceptions, printf=_info)):
         return 1
 
+    # The connection pool is sized to the number of threads (plus one for the page prefetch, see paginate),
+    # so that each has a (kept-alive) connection to reuse, rather than opening and discarding extra ones.
+    portal.session.configure(pool_size=argv.pool_size or (max(argv.nthreads, 1) + 1), retries=argv.retries)
+    if argv.debug:
+        portal.session.instrument(_debug_requests_get)
+    if argv.timing:
+        # So that the (per-endpoint) instrumentation can tell collections (searches) from items; see endpoint.
+        portal.get_schema_names()
+
+    if argv.cache or argv.cache_file or argv.cache_clear:
+        if not (disk_cache := _create_disk_cache(portal, file=argv.cache_file, max_age=argv.cache_max_age)):
+            return 1
+        if argv.cache_clear:
+            disk_cache.clear()
+        portal.disk_cache = disk_cache
+
     if not argv.query:
         return 0
 
@@ -296,6 +481,11 @@ def main() -> int:
         return 0 if portal.access(argv.query, metadata=metadata, raw=argv.raw, inserts=argv.inserts,
                                   report=True, printf=_print) == Portal.Access.OK else 1
 
+    if argv.ndjson and not argv.merge:
+        status = _write_ndjson(portal, argv, metadata=metadata)
+        _print_timing(portal, argv, started)
+        return status
+
     items = _portal_get(portal, argv.query, metadata=metadata, raw=argv.raw, inserts=argv.inserts,
                         limit=argv.limit, offset=argv.offset, database=argv.database,
                         deleted=argv.deleted, nthreads=argv.nthreads)
@@ -309,9 +499,20 @@ def main() -> int:
         items = [items]
 
     if argv.refs:
-        items.extend(_get_portal_referenced_items(
-            portal, items, raw=argv.raw, metadata=argv.metadata,
-            inserts=argv.inserts, database=argv.database, nthreads=argv.nthreads))
+        def get_referenced_items(callback: Optional[Callable] = None) -> List[dict]:  # noqa
+            return _get_portal_referenced_items(
+                portal, items, raw=argv.raw, metadata=argv.metadata,
+                inserts=argv.inserts, database=argv.database, nthreads=argv.nthreads, batch_size=argv.batch_size,
+                max_depth=argv.refs_depth, max_items_per_depth=argv.refs_max_per_depth,
+                include_types=argv.refs_types, exclude_types=argv.refs_exclude_types, callback=callback)
+        if _is_streamable_output(argv):
+            # Each referenced item is written as soon as it arrives, rather than after the whole crawl.
+            with _open_streamed_output(argv) as write_item:
+                for item in items:
+                    write_item(item)
+                items.extend(get_referenced_items(callback=lambda item, depth: write_item(item)))
+            return _print_items_summary(portal, argv, items, started)
+        items.extend(get_referenced_items())
 
     if argv.inserts:
         items = _insertize_items(items)
@@ -320,20 +521,10 @@ def main() -> int:
         items = sort_dictionary(items)
 
     if argv.reorganize:
-        # Simply put uuid and @type at the top of each item.
-        def reorganize_item(item: dict) -> None:  # noqa
-            if isinstance(item, dict):
-                if (item_type := item.get("@type")) is not None:
-                    del item["@type"]
-                    item = {"@type": item_type, **item}
-                if (item_uuid := item.get(_ITEM_UUID_PROPERTY_NAME)) is not None:
-                    del item[_ITEM_UUID_PROPERTY_NAME]
-                    item = {_ITEM_UUID_PROPERTY_NAME: item_uuid, **item}
-            return item
         def reorganize_items(items: List[dict]) -> None:  # noqa
             if isinstance(items, list):
                 for index in range(len(items)):
-                    items[index] = reorganize_item(items[index])
+                    items[index] = _reorganize_item(items[index])
         if isinstance(items, list):
             reorganize_items(items)
         elif isinstance(items, dict):
@@ -361,10 +552,11 @@ def main() -> int:
             if isinstance(items, list) and isinstance(names, list) and callable(write):
                 if not isinstance(separator, str):
                     separator = " "
+                paths = [compile_property_path(name) for name in names]
                 for item in items:
                     values = []
-                    for name in names:
-                        if value := get_property(item, name):
+                    for path in paths:
+                        if value := path.get(item):
                             values.append(str(value))
                     write(separator.join(values))
         if not isinstance(items, list):
@@ -390,14 +582,20 @@ def main() -> int:
     elif argv.output:
         if argv.inserts and (os.path.isdir(argv.output) or argv.output.endswith(os.sep)):
             _write_inserts_output_files(items, argv.output, noformat=argv.noformat,
-                                        overwrite=argv.overwrite, merge=argv.merge, append=argv.append)
+                                        overwrite=argv.overwrite, merge=argv.merge, append=argv.append,
+                                        ndjson=argv.ndjson)
         else:
             _write_output_file(items, argv.output, inserts=argv.inserts, noformat=argv.noformat,
-                               overwrite=argv.overwrite, merge=argv.merge, append=argv.append)
+                               overwrite=argv.overwrite, merge=argv.merge, append=argv.append,
+                               ndjson=argv.ndjson and not argv.inserts)
 
     else:
         _write_data(items, argv)
 
+    return _print_items_summary(portal, argv, items, started)
+
+
+def _print_items_summary(portal: Portal, argv: ARGV, items: Union[List[dict], dict], started: float) -> int:
     if argv.refs and argv.sanity_check:
         _verbose("Sanity checking for missing referenced items ...", end="")
         started_sanity_check = time.time()
@@ -420,22 +618,52 @@ def main() -> int:
         if argv.verbose and argv.inserts and isinstance(items, dict):
             type_count = len(set(items.keys()))
             _verbose(f"Total item types fetched: {type_count}")
+    _print_timing(portal, argv, started)
+    return 0
+
+
+def _print_timing(portal: Portal, argv: ARGV, started: float) -> None:
     if argv.timing or argv.debug:
         _info(f"Calls to portal.get_metadata: {portal.get_metadata_call_count}"
               f" {chars.dot} {format_duration(portal.get_metadata_call_duration)}")
         _info(f"Calls to portal.get: {portal.get_call_count} {chars.dot} {format_duration(portal.get_call_duration)}")
+        cache_info = _portal_get.cache_info()
+        _info(f"Portal response cache hits: {cache_info['hits']}"
+              f" {chars.dot} misses: {cache_info['misses']}"
+              f" {chars.dot} coalesced: {cache_info['coalesced']}"
+              f" {chars.dot} evictions: {cache_info['evictions']}"
+              f" {chars.dot} entries: {cache_info['entries']}"
+              f" {chars.dot} bytes: {cache_info['bytes']}")
+        if portal.disk_cache:
+            cache_info = portal.disk_cache.cache_info()
+            _info(f"Portal disk cache hits: {cache_info['hits']}"
+                  f" {chars.dot} revalidated: {cache_info['revalidated']}"
+                  f" {chars.dot} stale: {cache_info['stale']}"
+                  f" {chars.dot} misses: {cache_info['misses']}"
+                  f" {chars.dot} stores: {cache_info['stores']}")
+        session_report = portal.session.report()
+        _info(f"Portal session requests: {session_report['requests']}"
+              f" {chars.dot} connections: {session_report['connections']}"
+              f" {chars.dot} reused: {session_report['reused']}"
+              f" {chars.dot} retries: {session_report['retries']}"
+              f" {chars.dot} pool size: {session_report['pool_size']}")
+    if argv.timing:
+        # Per-endpoint (item/search/schema) latency percentiles, bytes, status codes, retries, and
+        # requests in flight; a low in_flight.busy fraction means time spent outside of the Portal.
+        _info(json.dumps({"portal_requests": portal.instrumentation.report(),
+                          "portal_session": portal.session.report()}, indent=4))
     if argv.verbose or argv.timing or argv.debug:
         duration = time.time() - started
         _info(f"Duration: {format_duration(duration)}")
-    return 0
 
 
 def _write_inserts_output_files(items: dict, output_directory: str, noformat: bool = False,
-                                overwrite: bool = False, merge: bool = False, append: bool = False) -> None:
+                                overwrite: bool = False, merge: bool = False, append: bool = False,
+                                ndjson: bool = False) -> None:
     os.makedirs(output_directory, exist_ok=True)
     for item_type in items:
         item_type_items = items[item_type]
-        output_file = os.path.join(output_directory, f"{to_snake_case(item_type)}.json")
+        output_file = os.path.join(output_directory, f"{to_snake_case(item_type)}.{'ndjson' if ndjson else 'json'}")
         overwrite_output_file = False
         merge_into_output_file = False
         append_to_output_file = False
@@ -457,48 +685,34 @@ def _write_inserts_output_files(items: dict, output_directory: str, noformat: bo
                         overwrite_output_file = True
                 else:
                     merge_into_output_file = True
-            if merge_into_output_file or append_to_output_file:
-                try:
-                    with io.open(output_file, "r") as f:
-                        if not isinstance(existing_items := json.load(f), list):
-                            _warning(f"JSON file does not contain a list: {output_file}")
-                            continue
-                except Exception:
-                    _warning(f"Cannot load file as JSON: {output_file}")
-                    continue
+        if merge_into_output_file or append_to_output_file:
+            try:
                 if merge_into_output_file:
-                    merge_identifying_property_name = _ITEM_UUID_PROPERTY_NAME
-                    for item in item_type_items:
-                        index = find_dictionary_item(existing_items,
-                                                     property_value=item.get(merge_identifying_property_name),
-                                                     property_name=merge_identifying_property_name)
-                        if index is not None:
-                            existing_items[index] = item
-                        else:
-                            existing_items.append(item)
-                elif append_to_output_file:
-                    existing_items.extend(item_type_items)
-                item_type_items = existing_items
+                    _debug(f"Merging into output file: {output_file}")
+                    _merge_items_into_file(item_type_items, output_file, ndjson=ndjson, noformat=noformat)
+                    _verbose(f"Output file merged into: {output_file}")
+                else:
+                    _debug(f"Appending to output file: {output_file}")
+                    _append_items_to_file(item_type_items, output_file, ndjson=ndjson, noformat=noformat)
+                    _verbose(f"Output file appended to: {output_file}")
+            except ValueError:
+                _warning(f"Cannot load file as {'NDJSON' if ndjson else 'a JSON list'}: {output_file}")
+            continue
         with io.open(output_file, "w") as f:
             if overwrite_output_file:
                 _debug(f"Overwriting output file: {output_file}")
-            elif merge_into_output_file:
-                _debug(f"Merging into output file: {output_file}")
             else:
                 _debug(f"Writing output file: {output_file}")
-            json.dump(item_type_items, f, indent=None if (noformat is True) else 4)
+            _write_items(item_type_items, f, ndjson=ndjson, noformat=noformat)
             if overwrite_output_file:
                 _verbose(f"Output file overwritten: {output_file}")
-            elif merge_into_output_file:
-                _verbose(f"Output file merged into: {output_file}")
-            elif append_to_output_file:
-                _verbose(f"Output file appended to: {output_file}")
             else:
                 _verbose(f"Output file written: {output_file}")
 
 
 def _write_output_file(items: dict, output_file: str, inserts: bool = False, noformat: bool = False,
-                       overwrite: bool = False, merge: bool = False, append: bool = False) -> None:
+                       overwrite: bool = False, merge: bool = False, append: bool = False,
+                       ndjson: bool = False) -> None:
     overwrite_output_file = False
     merge_into_output_file = False
     append_to_output_file = False
@@ -522,57 +736,31 @@ def _write_output_file(items: dict, output_file: str, inserts: bool = False, nof
                     overwrite_output_file = True
             else:
                 merge_into_output_file = True
-        if merge_into_output_file or append_to_output_file:
+        if (merge_into_output_file or append_to_output_file) and (not inserts):
+            # Streamed (rather than loaded) and written atomically; see _merge_items_into_file.
             try:
-                with io.open(output_file, "r") as f:
-                    existing_items = json.load(f)
-                    if inserts:
-                        if not isinstance(existing_items, dict):
-                            _error(f"JSON file does not contain a dictionary: {output_file}")
-                    elif not isinstance(existing_items, list):
-                        _error(f"JSON file does not contain a list: {output_file}")
-            except Exception:
-                _error(f"Cannot load file as JSON: {output_file}")
-            if merge_into_output_file:
-                merge_identifying_property_name = _ITEM_UUID_PROPERTY_NAME
-                if inserts:
-                    for item_type in items:
-                        if existing_item_type_items := existing_items.get(item_type):
-                            if isinstance(existing_item_type_items, list):
-                                for item in items[item_type]:
-                                    index = find_dictionary_item(
-                                        existing_item_type_items,
-                                        property_value=item.get(merge_identifying_property_name),
-                                        property_name=merge_identifying_property_name)
-                                    if index is not None:
-                                        existing_item_type_items[index] = item
-                                    else:
-                                        existing_item_type_items.append(item)
-                        else:
-                            existing_items[item_type] = items[item_type]
-                else:
-                    for item in items:
-                        index = find_dictionary_item(
-                            existing_items,
-                            property_value=item.get(merge_identifying_property_name),
-                            property_name=merge_identifying_property_name)
-                        if index is not None:
-                            existing_items[index] = item
-                        else:
-                            existing_items.append(item)
-            elif append_to_output_file:
-                if inserts:
-                    for item_type in items:
-                        if existing_item_type_items := existing_items.get(item_type):
-                            if isinstance(existing_item_type_items, list):
-                                existing_item_type_items.append(items[item_type])
-                        else:
-                            existing_items[item_type] = items[item_type]
+                if merge_into_output_file:
+                    _merge_items_into_file(items, output_file, ndjson=ndjson, noformat=noformat)
+                    _verbose(f"Output file merged into: {output_file}")
                 else:
-                    existing_items.extend(items)
-            items = existing_items
+                    _append_items_to_file(items, output_file, ndjson=ndjson, noformat=noformat)
+                    _verbose(f"Output file appended to: {output_file}")
+            except ValueError:
+                _error(f"Cannot load file as {'NDJSON' if ndjson else 'a JSON list'}: {output_file}")
+            return
+        if merge_into_output_file or append_to_output_file:
+            # Streamed (rather than loaded) and written atomically; see _merge_inserts_into_file.
+            try:
+                _merge_inserts_into_file(items, output_file, append=append_to_output_file, noformat=noformat)
+            except ValueError:
+                _error(f"Cannot load file as a JSON dictionary of item lists: {output_file}")
+            _verbose(f"Output file {'appended to' if append_to_output_file else 'merged into'}: {output_file}")
+            return
     with io.open(output_file, "w") as f:
-        json.dump(items, f, indent=None if noformat else 4)
+        if isinstance(items, list):
+            _write_items(items, f, ndjson=ndjson, noformat=noformat)
+        else:
+            json.dump(items, f, indent=None if noformat else 4)
     if overwrite_output_file:
         _verbose(f"Output file overwritten: {output_file}")
     elif merge_into_output_file:
@@ -583,6 +771,241 @@ def _write_output_file(items: dict, output_file: str, inserts: bool = False, nof
         _verbose(f"Output file written: {output_file}")
 
 
+def _write_items(items: List[dict], f: io.TextIOWrapper, ndjson: bool = False, noformat: bool = False) -> None:
+    if ndjson:
+        for item in items:
+            f.write(json.dumps(item))
+            f.write("\n")
+    else:
+        json.dump(items, f, indent=None if noformat else 4)
+
+
+def _merge_items_into_file(items: List[dict], output_file: str, ndjson: bool = False, noformat: bool = False) -> None:
+    # Merges the given items into the given existing (JSON list or NDJSON) file, replacing the (first) existing
+    # item with the same uuid, and appending those not already there (in order); the given items are indexed
+    # by uuid once, and the existing file is streamed, i.e. never fully loaded, into a temporary file which
+    # then (atomically) replaces it; so linear time (existing plus new) and memory only proportional to new.
+    # Raises ValueError if the existing file is not valid; in which case the existing file is unchanged.
+    merge_items = {}
+    for item in items:
+        if isinstance(item, dict) and ((uuid := item.get(_ITEM_UUID_PROPERTY_NAME)) is not None):
+            merge_items[uuid] = item
+    merged_uuids = set()
+    with AtomicFileWriter(output_file) as f, _ItemsWriter(f, ndjson=ndjson, noformat=noformat) as writer:
+        for existing_item in (iterate_ndjson if ndjson else iterate_json_array)(output_file):
+            if (isinstance(existing_item, dict) and
+                ((uuid := existing_item.get(_ITEM_UUID_PROPERTY_NAME)) in merge_items) and
+                (uuid not in merged_uuids)):  # noqa
+                writer.write(merge_items[uuid])
+                merged_uuids.add(uuid)
+            else:
+                writer.write(existing_item)
+        for item in items:
+            if isinstance(item, dict) and ((uuid := item.get(_ITEM_UUID_PROPERTY_NAME)) is not None):
+                if uuid not in merged_uuids:
+                    writer.write(merge_items[uuid])
+                    merged_uuids.add(uuid)
+            else:
+                writer.write(item)
+
+
+def _append_items_to_file(items: List[dict], output_file: str, ndjson: bool = False, noformat: bool = False) -> None:
+    # Appends the given items to the given existing (JSON list or NDJSON) file; for NDJSON this is simply
+    # an append, i.e. proportional only to the number of new items; otherwise streamed as for a merge.
+    if ndjson:
+        with io.open(output_file, "a") as f:
+            _write_items(items, f, ndjson=True)
+        return
+    with AtomicFileWriter(output_file) as f, _ItemsWriter(f, noformat=noformat) as writer:
+        for existing_item in iterate_json_array(output_file):
+            writer.write(existing_item)
+        for item in items:
+            writer.write(item)
+
+
+def _merge_inserts_into_file(items: dict, output_file: str, append: bool = False, noformat: bool = False) -> None:
+    # Merges (or if append is True, appends) the given inserts, i.e. dictionary of item lists by item type, into
+    # the given existing inserts file, per item type with the same semantics as _merge_items_into_file (or
+    # _append_items_to_file); item types not already there are added at the end. The existing file is streamed
+    # (see iterate_json_items), never fully loaded, into a temporary file which then (atomically) replaces it.
+    # Raises ValueError if the existing file is not valid; in which case the existing file is unchanged.
+    item_type = None
+    merge_items = {}
+    merged_uuids = set()
+    def end_item_type(writer: JsonArraysDictionaryWriter) -> None:  # noqa
+        for item in items.get(item_type, []):
+            if append or not (isinstance(item, dict) and ((uuid := item.get(_ITEM_UUID_PROPERTY_NAME)) is not None)):
+                writer.write(item)
+            elif uuid not in merged_uuids:
+                writer.write(merge_items[uuid])
+                merged_uuids.add(uuid)
+    indent = None if noformat else 4
+    with AtomicFileWriter(output_file) as f, JsonArraysDictionaryWriter(f, indent=indent) as writer:
+        for existing_item_type, existing_item in iterate_json_items(output_file, dictionary=True):
+            if existing_item_type != item_type:
+                end_item_type(writer) if item_type is not None else None
+                writer.start(item_type := existing_item_type)
+                merge_items = {} if append else {uuid: item for item in items.get(item_type, [])
+                                                 if isinstance(item, dict) and
+                                                 ((uuid := item.get(_ITEM_UUID_PROPERTY_NAME)) is not None)}
+                merged_uuids = set()
+            if (isinstance(existing_item, dict) and
+                ((uuid := existing_item.get(_ITEM_UUID_PROPERTY_NAME)) in merge_items) and
+                (uuid not in merged_uuids)):  # noqa
+                writer.write(merge_items[uuid])
+                merged_uuids.add(uuid)
+            else:
+                writer.write(existing_item)
+        end_item_type(writer) if item_type is not None else None
+        for item_type in [item_type for item_type in items if item_type not in writer.keys]:
+            writer.start(item_type)
+            for item in items[item_type]:
+                writer.write(item)
+
+
+class _ItemsWriter:
+    # Writes items one at a time as either a JSON list (see JsonArrayWriter) or NDJSON.
+    def __init__(self, f: io.TextIOWrapper, ndjson: bool = False, noformat: bool = False) -> None:
+        self._f = f
+        self._writer = JsonArrayWriter(f, indent=None if noformat else 4) if not ndjson else None
+
+    def write(self, item: Any) -> None:
+        if self._writer:
+            self._writer.write(item)
+        else:
+            self._f.write(json.dumps(item))
+            self._f.write("\n")
+
+    def __enter__(self) -> _ItemsWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self._writer and (exc_type is None):
+            self._writer.close()
+
+
+def _is_streamable_output(argv: ARGV) -> bool:
+    # True iff the (--refs) items can be written one at a time, as they arrive, i.e. as a JSON list to stdout
+    # or to a new (or overwritten) output file, with no option which needs all of the items at once.
+    if argv.inserts or argv.uuids or argv.pick or argv.yaml or argv.merge or argv.append:
+        return False
+    if argv.output:
+        return (not os.path.isdir(argv.output)) and ((not os.path.exists(argv.output)) or argv.overwrite)
+    return not argv.noformat
+
+
+@contextmanager
+def _open_streamed_output(argv: ARGV) -> Generator[Callable[[dict], None], None, None]:
+    # Yields a (thread-safe) function which writes an item, processed per the --sort, --reorganize, et cetera
+    # options, to the JSON list output (see _is_streamable_output); identical to what is written otherwise.
+    lock = threading.Lock()
+    output_file_exists = bool(argv.output) and os.path.exists(argv.output)
+    f = io.open(argv.output, "w") if argv.output else sys.stdout
+    try:
+        with _ItemsWriter(f, noformat=bool(argv.output) and argv.noformat) as writer:
+            def write_item(item: dict) -> None:  # noqa
+                if argv.sort:
+                    item = sort_dictionary(item)
+                if argv.reorganize:
+                    item = _reorganize_item(item)
+                if not argv.noscrub_sids:
+                    _scrub_sids_from_items(item)
+                if argv.randomize_md5sum_values:
+                    _randomize_md5sum_values(item)
+                with lock:
+                    writer.write(item)
+                    f.flush()
+            yield write_item
+    finally:
+        if argv.output:
+            f.close()
+            _verbose(f"Output file {'overwritten' if output_file_exists else 'written'}: {argv.output}")
+        else:
+            f.write("\n")
+            f.flush()
+
+
+def _write_ndjson(portal: Portal, argv: ARGV, metadata: bool = False) -> int:
+    # Streams the items for the query, a page at a time, as NDJSON (newline delimited JSON, i.e. one
+    # item per line) to stdout or the output file; or for --inserts, to a .ndjson file per item type
+    # in the output directory; so that memory use stays flat regardless of the number of items.
+    output_files = {}
+    def get_page(query: str, limit: int, offset: int) -> Optional[Union[dict, Portal.Access]]:  # noqa
+        if argv.inserts:
+            return _portal_get_inserts(portal, query, metadata=metadata, database=argv.database,
+                                       limit=limit, offset=offset, deleted=argv.deleted, nthreads=argv.nthreads)
+        return portal.GET(query, metadata=metadata, raw=argv.raw, database=argv.database,
+                          limit=limit, offset=offset, deleted=argv.deleted)
+    def open_output_file(output_file: str) -> Optional[io.TextIOWrapper]:  # noqa
+        if os.path.isdir(output_file):
+            _error(f"Specified output file already exists as a directory: {output_file}")
+        if os.path.exists(output_file) and not (argv.overwrite or argv.append):
+            _print(f"Specified output file already exists: {output_file}")
+            if yes_or_no("Overwrite this file?"):
+                return io.open(output_file, "w")
+            elif yes_or_no("Append to this file?"):
+                return io.open(output_file, "a")
+            return None
+        return io.open(output_file, "a" if argv.append else "w")
+    def get_output_file(item: dict) -> Optional[io.TextIOWrapper]:  # noqa
+        if argv.inserts:
+            item_type = item.pop(_ITEM_TYPE_PSEUDO_PROPERTY_NAME, None)
+            output_file = os.path.join(argv.output, f"{to_snake_case(item_type or 'unknown')}.ndjson")
+        else:
+            output_file = argv.output
+        if not (output_file_object := output_files.get(output_file)):
+            if not (output_file_object := open_output_file(output_file)):
+                _error(f"Not writing output file: {output_file}")
+            output_files[output_file] = output_file_object
+        return output_file_object
+    if argv.inserts:
+        if not argv.output:
+            _error("The --ndjson option with --inserts requires an --output directory.")
+        os.makedirs(argv.output, exist_ok=True)
+    item_count = 0
+    try:
+        for item in portal.paginate(argv.query, metadata=metadata, raw=argv.raw, database=argv.database,
+                                    limit=argv.limit, offset=argv.offset, deleted=argv.deleted,
+                                    page_size=argv.page_size, prefetch=not argv.noprefetch, get=get_page):
+            if not isinstance(item, dict):
+                continue
+            output_file = get_output_file(item) if argv.output else None
+            if argv.sort:
+                item = sort_dictionary(item)
+            if argv.reorganize:
+                item = _reorganize_item(item)
+            if not argv.noscrub_sids:
+                _scrub_sids_from_items(item)
+            if argv.randomize_md5sum_values:
+                _randomize_md5sum_values(item)
+            if output_file:
+                output_file.write(json.dumps(item))
+                output_file.write("\n")
+            else:
+                _print(json.dumps(item))
+            item_count += 1
+    except Portal.AccessError as e:
+        portal.report_access_status(e.access, query=argv.query, verbose=True)
+        return 1
+    finally:
+        for output_file in output_files.values():
+            output_file.close()
+    _verbose(f"Total items written: {item_count}"
+             f"{f' {chars.dot} files: {len(output_files)}' if len(output_files) > 1 else ''}")
+    return 0
+
+
+def _reorganize_item(item: dict) -> dict:
+    # Simply put uuid and @type at the top of the item; returns a new item, i.e. the given one is not changed,
+    # as it may still be in use, e.g. by the --refs crawl, which needs the uuid of each (streamed) root item.
+    if isinstance(item, dict):
+        leading_properties = {name: item[name] for name in (_ITEM_UUID_PROPERTY_NAME, "@type")
+                              if item.get(name) is not None}
+        item = {**leading_properties, **{name: value for name, value in item.items()
+                                         if name not in leading_properties}}
+    return item
+
+
 def _write_data(data: Any, argv: ARGV) -> None:
     if argv.yaml is True:
         _print(yaml.dump(data).strip())
@@ -592,10 +1015,13 @@ def _write_data(data: Any, argv: ARGV) -> None:
         _print(json.dumps(data, indent=4))
 
 
-def _get_portal_referenced_items(portal: Portal, item: dict, metadata: bool = False,
+def _get_portal_referenced_items(portal: Portal, item: Union[List[dict], dict], metadata: bool = False,
                                  raw: bool = False, inserts: bool = False, database: bool = False,
-                                 nthreads: Optional[int] = None) -> List[dict]:
-    referenced_items = [] ; ignore_uuids = [] ; referenced_items_batch = item ; referenced_uuids_last = None  # noqa
+                                 nthreads: Optional[int] = None, batch_size: Optional[int] = None,
+                                 max_depth: Optional[int] = None, max_items_per_depth: Optional[int] = None,
+                                 include_types: Optional[List[str]] = None,
+                                 exclude_types: Optional[List[str]] = None,
+                                 callback: Optional[Callable] = None) -> List[dict]:
     if isinstance(item, dict):
         debug_item = item.get(_ITEM_UUID_PROPERTY_NAME)
     elif isinstance(item, list):
@@ -605,40 +1031,91 @@ def _get_portal_referenced_items(portal: Portal, item: dict, metadata: bool = Fa
             debug_item = f"{len(item)} items"
     else:
         debug_item = "unknown"
-    _debug(f"Retrieving items referenced by:"
-           f" {debug_item} {chars.dot} ignored: {len(ignore_uuids)}")
-    while referenced_uuids := get_referenced_uuids(referenced_items_batch, ignore_uuids=ignore_uuids,
-                                                   exclude_uuid=True, include_paths=True,
-                                                   exclude_properties=_ITEM_IGNORE_REF_PROPERTIES):
-        _debug(f"Retrieved UUIDs referenced by {debug_item}:"
-               f" {len(referenced_uuids)} {chars.dot} ignored: {len(ignore_uuids)}")
-        if (referenced_uuids := set(referenced_uuids)) == referenced_uuids_last:
-            _debug(f"No more refrenced UUID: {len(referenced_uuids)}"
-                   f"{chars.dot} ignored: {len(ignore_uuids)} {chars.dot} {len(referenced_uuids)}")
-            break
-        referenced_uuids_last = referenced_uuids
-        referenced_items_batch = _get_portal_items_for_uuids(
-            portal, referenced_uuids, metadata=metadata, raw=raw, inserts=inserts, database=database, nthreads=nthreads)
-        for referenced_item in referenced_items_batch:
-            if isinstance(referenced_item, dict):
-                referenced_items.append(referenced_item)
-        for item in referenced_items_batch:
-            if isinstance(item, dict):
-                if item_uuid := item.get(_ITEM_UUID_PROPERTY_NAME):
-                    if item_uuid not in ignore_uuids:
-                        ignore_uuids.append(item_uuid)
-    _debug(f"Retrieved items referenced by {debug_item}: {len(referenced_items)}")
+    _debug(f"Retrieving items referenced by: {debug_item}")
+    def fetch_items(uuids: List[str], on_item: Callable) -> None:  # noqa
+        _get_portal_items_for_uuids(portal, uuids, metadata=metadata, raw=raw, inserts=inserts,
+                                    database=database, nthreads=nthreads, batch_size=batch_size,
+                                    callback=on_item)
+    def get_item_type(item: dict) -> Optional[str]:  # noqa
+        if inserts is True:
+            return item.get(_ITEM_TYPE_PSEUDO_PROPERTY_NAME)
+        return Portal.get_item_type(item)
+    def get_item_references(item: dict) -> List[str]:  # noqa
+        return get_referenced_uuids(item, exclude_uuid=True, include_paths=True,
+                                    exclude_properties=_ITEM_IGNORE_REF_PROPERTIES)
+    def report_progress(crawler: PortalReferenceCrawler) -> None:  # noqa
+        _verbose(f"Retrieved referenced items: {crawler.item_count}"
+                 f" {chars.dot} depth: {crawler.depth}"
+                 f" {chars.dot} frontier: {crawler.frontier_size}"
+                 f"{f' {chars.dot} truncated: {crawler.truncated_count}' if crawler.truncated_count else ''}"
+                 f" {chars.dot} {crawler.items_per_second:.1f} items/sec")
+    crawler = PortalReferenceCrawler(fetch_items,
+                                     get_item_type=get_item_type,
+                                     get_item_references=get_item_references,
+                                     max_depth=max_depth, max_items_per_depth=max_items_per_depth,
+                                     include_types=_expand_item_types(portal, include_types),
+                                     exclude_types=_expand_item_types(portal, exclude_types),
+                                     on_item=callback, on_progress=report_progress)
+    referenced_items = crawler.crawl(item)
+    _debug(f"Retrieved items referenced by {debug_item}: {len(referenced_items)}"
+           f" {chars.dot} depth: {crawler.depth}"
+           f" {chars.dot} missing: {crawler.missing_count}"
+           f" {chars.dot} excluded: {crawler.excluded_count}"
+           f" {chars.dot} {format_duration(crawler.duration)}")
+    if crawler.truncated_count:
+        _warning(f"Referenced items not retrieved due to the per depth limit ({max_items_per_depth}):"
+                 f" {crawler.truncated_count}")
     return referenced_items
 
 
+def _create_disk_cache(portal: Portal, file: Optional[str] = None,
+                       max_age: Optional[int] = None) -> Optional[PortalDiskCache]:
+    if not (env := portal.env or portal.server):
+        _error("Cannot use disk cache without a Portal environment or server.", exit=False)
+        return None
+    try:
+        disk_cache = PortalDiskCache(env, file=file, max_age=max_age)
+    except Exception as e:
+        _error(f"Cannot open disk cache: {file or DEFAULT_PORTAL_DISK_CACHE_FILE} ({get_error_message(e)})",
+               exit=False)
+        return None
+    _verbose(f"Using disk cache: {disk_cache.file} {chars.dot} max-age: {disk_cache.max_age} seconds")
+    return disk_cache
+
+
+def _expand_item_types(portal: Portal, item_types: Optional[List[str]]) -> Set[str]:
+    # Includes the (sub) types of each of the given types, e.g. so File implies FileProcessed, et cetera.
+    expanded_item_types = set()
+    for item_type in to_non_empty_string_list(item_types):
+        expanded_item_types.add(item_type)
+        try:
+            expanded_item_types.update(portal.get_schema_subtype_names(item_type) or [])
+        except Exception:
+            pass
+    return expanded_item_types
+
+
 def _get_portal_items_for_uuids(portal: Portal, uuids: Union[List[str], Set[str], Tuple[str], str],
                                 metadata: bool = False, raw: bool = False, inserts: bool = False,
-                                database: bool = False, nthreads: Optional[int] = None) -> List[dict]:
+                                database: bool = False, nthreads: Optional[int] = None,
+                                batch_size: Optional[int] = None,
+                                callback: Optional[Callable] = None) -> List[dict]:
+    # If the given callback is specified then it is called with each item as soon as it is fetched;
+    # note that this is called from multiple threads if nthreads is greater than one. If the given
+    # batch_size is greater than one then fetches the items in batches, via searches for (up to)
+    # batch_size uuids at a time, and then fetches individually only those items not returned by
+    # these searches (e.g. deleted or otherwise unsearchable items); not for the database datastore
+    # since searches are necessarily served from ElasticSearch. Only for the raw frame (i.e. raw or
+    # inserts), the one frame in which search results are the same as individually fetched items.
     items = []
     if not isinstance(uuids, (list, set, tuple)):
         if not is_uuid(uuids):
             return []
         uuids = [uuids]
+    if (isinstance(batch_size, int) and (batch_size > 1) and
+        ((raw is True) or (inserts is True)) and (database is not True)):  # noqa
+        return _get_portal_items_for_uuids_batched(portal, uuids, metadata=metadata, raw=raw, inserts=inserts,
+                                                   nthreads=nthreads, batch_size=batch_size, callback=callback)
     fetch_portal_item_functions = []
     def fetch_portal_item(uuid: str) -> Optional[dict]:  # noqa
         nonlocal portal, metadata, raw, database, items
@@ -646,62 +1123,172 @@ def _get_portal_items_for_uuids(portal: Portal, uuids: Union[List[str], Set[str]
                                raw=raw, inserts=inserts, database=database, nthreads=nthreads):
             if not isinstance(item, dict):
                 _debug(f"Cannot retrieve item: {uuid} [{item}]")
-            items.append(item)  # TODO: make thread-safe.
+            items.append(item)
+            if callback:
+                callback(item)
     if fetch_portal_item_functions := [lambda uuid=uuid: fetch_portal_item(uuid) for uuid in uuids if is_uuid(uuid)]:
         run_concurrently(fetch_portal_item_functions, nthreads=nthreads)
     return items
 
 
-@lru_cache(maxsize=1024)
+def _get_portal_items_for_uuids_batched(portal: Portal, uuids: Union[List[str], Set[str], Tuple[str]],
+                                        metadata: bool = False, raw: bool = False, inserts: bool = False,
+                                        nthreads: Optional[int] = None, batch_size: Optional[int] = None,
+                                        callback: Optional[Callable] = None) -> List[dict]:
+    items = [] ; found_uuids = set() ; lock = threading.Lock()  # noqa
+    if not (isinstance(batch_size, int) and (batch_size > 0)):
+        batch_size = _PORTAL_SEARCH_UUIDS_BATCH_SIZE
+    if not (uuids := list(dict.fromkeys(uuid for uuid in uuids if is_uuid(uuid)))):
+        return items
+    disk_cache = portal.disk_cache
+    disk_cache_frame = PortalDiskCache.frame(metadata=True, raw=raw or inserts, inserts=inserts)
+    def add_item(uuid: str, item: dict) -> bool:  # noqa
+        nonlocal items, found_uuids
+        with lock:
+            if uuid in found_uuids:
+                return False
+            found_uuids.add(uuid)
+            items.append(item)
+        if callback:
+            callback(item)
+        return True
+    def fetch_portal_items_from_disk_cache(batch_uuids: List[str]) -> List[str]:  # noqa
+        # Uses the cached items which are fresh, or which are unchanged according to their date_modified values
+        # from a single (cheap, fields only) search for the whole batch, done lazily, i.e. only if any cached
+        # item is not fresh; and returns the uuids which are not (validly) cached and so need to be fetched.
+        dates_modified = None
+        def get_dates_modified() -> dict:  # noqa
+            nonlocal dates_modified
+            if dates_modified is None:
+                dates_modified = PortalDiskCache.get_dates_modified(
+                    portal.GET(PortalDiskCache.uuids_date_modified_query(batch_uuids),
+                               metadata=True, limit=len(batch_uuids), nocache=True, noignore=True))
+            return dates_modified
+        uncached_uuids = []
+        for uuid in batch_uuids:
+            if (item := disk_cache.get(uuid, frame=disk_cache_frame, revalidate=lambda entry, uuid=uuid: (
+                    entry.date_modified is not None) and (entry.date_modified == get_dates_modified().get(uuid)))):
+                if portal.ignore_properties:
+                    delete_properties_from_dictionaries(item, portal.ignore_properties)
+                add_item(uuid, item)
+            else:
+                uncached_uuids.append(uuid)
+        return uncached_uuids
+    def fetch_portal_items(batch_uuids: List[str]) -> None:  # noqa
+        nonlocal portal, raw, inserts
+        if disk_cache is not None:
+            if not (batch_uuids := fetch_portal_items_from_disk_cache(batch_uuids)):
+                return
+        query = f"/search/?type=Item&{'&'.join(f'uuid={uuid}' for uuid in batch_uuids)}"
+        # If using the disk cache then get the items with the ignored properties (e.g. last_modified)
+        # so they are cached intact (i.e. independently of these); and delete them after caching.
+        result = _portal_get(portal, query, metadata=metadata, raw=raw, inserts=inserts, limit=len(batch_uuids),
+                             nthreads=nthreads, nocache=disk_cache is not None, noignore=disk_cache is not None)
+        if not (isinstance(result, dict) and isinstance(graph := result.get("@graph"), list)):
+            _debug(f"Cannot retrieve batch of {len(batch_uuids)} items [{result}]")
+            return
+        batch_uuids = set(batch_uuids)
+        for item in graph:
+            if isinstance(item, dict) and ((uuid := item.get(_ITEM_UUID_PROPERTY_NAME)) in batch_uuids):
+                if disk_cache is not None:
+                    disk_cache.store(uuid, item, frame=disk_cache_frame)
+                    if portal.ignore_properties:
+                        delete_properties_from_dictionaries(item, portal.ignore_properties)
+                add_item(uuid, item)
+    run_concurrently([lambda batch_uuids=uuids[i:i + batch_size]: fetch_portal_items(batch_uuids)
+                      for i in range(0, len(uuids), batch_size)], nthreads=nthreads)
+    if missing_uuids := [uuid for uuid in uuids if uuid not in found_uuids]:
+        _debug(f"Retrieving items not returned by batched search individually: {len(missing_uuids)}")
+        items.extend(_get_portal_items_for_uuids(portal, missing_uuids, metadata=metadata, raw=raw, inserts=inserts,
+                                                 nthreads=nthreads, batch_size=0, callback=callback))
+    return items
+
+
+@portal_response_cache()
 def _portal_get(portal: Portal, query: str, metadata: bool = False, raw: bool = False,
                 inserts: bool = False, database: bool = False,
                 limit: Optional[int] = None, offset: Optional[int] = None, deleted: bool = False,
-                nthreads: Optional[int] = None) -> dict:
+                nthreads: Optional[int] = None, nocache: bool = False, noignore: bool = False) -> dict:
     if inserts is True:
         return _portal_get_inserts(portal, query, metadata=metadata, database=database,
-                                   limit=limit, offset=offset, deleted=deleted, nthreads=nthreads)
-    return portal.GET(query, metadata=metadata, raw=raw,
-                      database=database, limit=limit, offset=offset, deleted=deleted)
+                                   limit=limit, offset=offset, deleted=deleted, nthreads=nthreads,
+                                   nocache=nocache, noignore=noignore)
+    return portal.GET(query, metadata=metadata, raw=raw, database=database, limit=limit, offset=offset,
+                      deleted=deleted, nocache=nocache, noignore=noignore)
 
 
-@lru_cache(maxsize=1024)
 def _portal_get_inserts(portal: Portal, query: str, metadata: bool = False, database: bool = False,
                         limit: Optional[int] = None, offset: Optional[int] = None,
                         deleted: bool = False,
-                        nthreads: Optional[int] = None) -> dict:
+                        nthreads: Optional[int] = None, nocache: bool = False, noignore: bool = False) -> dict:
     item = None ; item_noraw = None  # noqa
     def fetch_portal_item() -> None:  # noqa
         nonlocal portal, query, database, item
         item = portal.GET(query, metadata=metadata, raw=True,
-                          database=database, limit=limit, offset=offset, deleted=deleted)
+                          database=database, limit=limit, offset=offset, deleted=deleted,
+                          nocache=nocache, noignore=noignore)
     def fetch_portal_item_noraw() -> None:  # noqa
         # This is to get the non-raw frame item format which has the type information (the raw frame does not).
         nonlocal portal, query, metadata, database, item_noraw
         item_noraw = portal.GET(query, metadata=metadata, raw=False,
                                 database=database, limit=limit, offset=offset, deleted=deleted,
-                                field=_ITEM_UUID_PROPERTY_NAME)
-    run_concurrently([fetch_portal_item, fetch_portal_item_noraw], nthreads=min(2, nthreads))
+                                field=_ITEM_UUID_PROPERTY_NAME, nocache=nocache, noignore=noignore)
+    if query_item_type := _get_item_type_from_query(portal, query):
+        # All items for this query are known to be of this type so no need for the non-raw frame request.
+        fetch_portal_item()
+    else:
+        # The (returned, and so cached) raw frame item is fetched in this thread, so that its size is known to
+        # the cache (see set_portal_response_size), while the non-raw one (just for the types) is in another.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            item_noraw_future = executor.submit(fetch_portal_item_noraw)
+            try:
+                fetch_portal_item()
+            except Exception:
+                pass
+            if item_noraw_future.exception() is not None:
+                item_noraw = None
     if not item:
         return {}
     elif item in [Portal.Access.NOT_FOUND, Portal.Access.NO_ACCESS, Portal.Access.ERROR]:
         return item
     if isinstance(graph := item.get("@graph"), list):
-        if isinstance(item_noraw_graph := item_noraw.get("@graph"), list):
-            def find_item_type(uuid: str) -> Optional[str]:
-                nonlocal item_noraw, item_noraw_graph
-                for item_element in item_noraw_graph:
-                    if item_element.get(_ITEM_UUID_PROPERTY_NAME) == uuid:
-                        return Portal.get_item_type(item_element)
-                return None
+        if query_item_type:
             for graph_item in graph:
-                if graph_item_type := find_item_type(graph_item.get(_ITEM_UUID_PROPERTY_NAME)):
+                graph_item[_ITEM_TYPE_PSEUDO_PROPERTY_NAME] = query_item_type
+        elif isinstance(item_noraw, dict) and isinstance(item_noraw_graph := item_noraw.get("@graph"), list):
+            item_types = {}
+            for item_element in item_noraw_graph:
+                if (uuid := item_element.get(_ITEM_UUID_PROPERTY_NAME)) and (uuid not in item_types):
+                    item_types[uuid] = Portal.get_item_type(item_element)
+            for graph_item in graph:
+                if graph_item_type := item_types.get(graph_item.get(_ITEM_UUID_PROPERTY_NAME)):
                     graph_item[_ITEM_TYPE_PSEUDO_PROPERTY_NAME] = graph_item_type
-    else:
-        if item_type := Portal.get_item_type(item_noraw):
-            item[_ITEM_TYPE_PSEUDO_PROPERTY_NAME] = item_type
+    elif item_type := (query_item_type or Portal.get_item_type(item_noraw)):
+        item[_ITEM_TYPE_PSEUDO_PROPERTY_NAME] = item_type
     return item
 
 
+def _get_item_type_from_query(portal: Portal, query: str) -> Optional[str]:
+    # Returns the type of all items returned by the given query iff it can be determined from the query
+    # itself, i.e. a search with a single type=Xyz parameter, or a path of the form /Xyz/..., where Xyz
+    # is a schema type with no sub-types; otherwise returns None.
+    if not (isinstance(query, str) and query.startswith("/")):
+        return None
+    path, _, query_string = query.partition("?")
+    if item_types := parse_qs(query_string).get("type"):
+        if len(item_types) != 1:
+            return None
+        item_type = item_types[0]
+    elif (components := [component for component in path.split("/") if component]) and (components[0] != "search"):
+        item_type = components[0]
+    else:
+        return None
+    if ((item_type != "Item") and (item_type in portal.get_schema_names()) and
+        (not portal.get_schema_subtype_names(item_type))):  # noqa
+        return item_type
+    return None
+
+
 def _insertize_items(items: dict) -> dict:
     items_by_type = {}
     for item in items:
@@ -780,14 +1367,8 @@ def _nofunction(*args, **kwargs) -> None:
     pass
 
 
-def _setup_debugging(argv: ARGV) -> None:
-
-    global _verbose, _debug, _nofunction
-    if argv.nowarnings: _warning = _nofunction  # noqa
-    if not argv.verbose: _verbose = _nofunction  # noqa
-    if not argv.debug: _debug = _nofunction  # noqa
-
-    original_requests_get = requests.get
+def _debug_requests_get(get: Callable) -> Callable:
+    # Wrapper for the Portal session get function (see PortalSession.instrument) to debug requests.
     def requests_get(*args, **kwargs):  # noqa
         if isinstance(args, tuple) and (len(args) > 0):
             message = f"{args[0]}"
@@ -800,8 +1381,16 @@ def _setup_debugging(argv: ARGV) -> None:
         else:
             message += f" {chars.dot} {str(kwargs)}"
         _debug(f"request.get: {message}")
-        return original_requests_get(*args, **kwargs)
-    requests.get = requests_get
+        return get(*args, **kwargs)
+    return requests_get
+
+
+def _setup_debugging(argv: ARGV) -> None:
+
+    global _verbose, _debug, _nofunction
+    if argv.nowarnings: _warning = _nofunction  # noqa
+    if not argv.verbose: _verbose = _nofunction  # noqa
+    if not argv.debug: _debug = _nofunction  # noqa
 
     if argv.argv:
         _print(json.dumps(argv._dict, indent=4))
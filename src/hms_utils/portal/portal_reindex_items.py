@@ -1,21 +1,300 @@
-from hms_utils.portal.portal_utils import Portal
+# ------------------------------------------------------------------------------------------------------
+# Command-line utility to (bulk) reindex Portal items, i.e. queue them for indexing.
+# ------------------------------------------------------------------------------------------------------
+# Example commands:
+#
+# hms-portal-reindex --env smaht-data uuid [uuid...]
+# hms-portal-reindex --env smaht-data --file uuids.txt [--file more-uuids.json]
+# some-command-producing-uuids | hms-portal-reindex --env smaht-data --file -
+# hms-portal-reindex --env smaht-data --query "type=SubmittedFile&status=released" --chunk-size 1000 --wait
+#
+# UUIDs may be given on the command-line, from files (or stdin via -), one or more per line, or as a
+# JSON list (of uuids or of items with uuids), and/or from a Portal search query; duplicates are ignored.
+# They are queued for indexing in chunks (of --chunk-size), with (at most) --threads chunks in progress at
+# a time, each retried (--retries times) with exponential backoff (--backoff) on failure. With --wait,
+# the indexing queue is then polled (every --interval seconds) until it is drained (or --timeout), with
+# the rate at which it is draining reported at each poll.
+# --------------------------------------------------------------------------------------------------
+
+import io
+import sys
+import threading
+import time
+from typing import Generator, Iterable, List, Optional
 from hms_utils.argv import ARGV
+from hms_utils.chars import chars
+from hms_utils.datetime_utils import format_duration
+from hms_utils.json_stream_utils import iterate_json_array
+from hms_utils.portal.portal_utils import Portal
+from hms_utils.threading_utils import run_concurrently
+from hms_utils.type_utils import is_uuid
+
+_DEFAULT_CHUNK_SIZE = 500
+_DEFAULT_THREADS = 4
+_DEFAULT_RETRIES = 3
+_DEFAULT_BACKOFF = 1.0  # Seconds; doubled after each retry.
+_DEFAULT_POLL_INTERVAL = 10  # Seconds
+_SEARCH_PAGE_SIZE = 1000
+_SEARCH_TIMEOUT = 120  # Seconds; per search page.
+_INDEXING_QUEUE_NAMES = ["primary_waiting", "primary_inflight", "secondary_waiting", "secondary_inflight"]
 
 
 def main():
 
     argv = ARGV({
-        ARGV.REQUIRED(str): "--env",
-        ARGV.REQUIRED([str]): "uuids"
+        ARGV.OPTIONAL(str): "--env",
+        ARGV.OPTIONAL(str): "--app",
+        ARGV.OPTIONAL([str]): ["--file", "--files"],
+        ARGV.OPTIONAL(str): ["--query", "--search"],
+        ARGV.OPTIONAL(int, _DEFAULT_CHUNK_SIZE): ["--chunk-size", "--chunk"],
+        ARGV.OPTIONAL(int, _DEFAULT_THREADS): ["--threads", "--nthreads"],
+        ARGV.OPTIONAL(int, _DEFAULT_RETRIES): "--retries",
+        ARGV.OPTIONAL(float, _DEFAULT_BACKOFF): "--backoff",
+        ARGV.OPTIONAL(bool, False): "--wait",
+        ARGV.OPTIONAL(int, _DEFAULT_POLL_INTERVAL): "--interval",
+        ARGV.OPTIONAL(int, 0): "--timeout",
+        ARGV.OPTIONAL(bool, False): ["--dryrun", "--dry-run"],
+        ARGV.OPTIONAL(bool, False): "--verbose",
+        ARGV.OPTIONAL(bool, False): "--debug",
+        ARGV.OPTIONAL([str]): "uuids"
     })
 
-    portal = Portal(argv.env)
-    if portal.reindex_metadata(argv.uuids):
-        print("OK")
+    if not (argv.uuids or argv.file or argv.query):
+        if sys.stdin.isatty():
+            _print("No uuids given; use uuid arguments, --file (- for stdin), or --query.")
+            return 1
+        argv.file = ["-"]
+
+    if not (portal := Portal.create(argv.env, app=argv.app, verbose=argv.verbose, debug=argv.debug)):
+        return 1
+
+    uuids = _read_uuids(portal, uuids=argv.uuids, files=argv.file, query=argv.query, verbose=argv.verbose)
+    if argv.dryrun:
+        _print(f"Items to reindex: {sum(1 for _ in uuids)} {chars.dot} dryrun")
+        return 0
+
+    started = time.time()
+    submission = _Submission(portal, chunk_size=argv.chunk_size, retries=argv.retries,
+                             backoff=argv.backoff, verbose=argv.verbose, debug=argv.debug)
+    submission.submit(uuids, nthreads=argv.threads)
+    duration = time.time() - started
+    _print(f"Items queued for reindexing: {submission.queued}"
+           f"{f' {chars.dot} failed: {submission.failed}' if submission.failed else ''}"
+           f" {chars.dot} chunks: {submission.chunks} {chars.dot} retries: {submission.retries}"
+           f" {chars.dot} duration: {format_duration(duration)}"
+           f"{f' {chars.dot} items/second: {submission.queued / duration:.1f}' if duration > 0 else ''}")
+
+    if argv.wait and submission.queued:
+        _wait_for_indexing(portal, interval=argv.interval, timeout=argv.timeout)
+
+    return 1 if submission.failed else 0
+
+
+def _read_uuids(portal: Portal, uuids: Optional[List[str]] = None, files: Optional[List[str]] = None,
+                query: Optional[str] = None, verbose: bool = False) -> Generator[str, None, None]:
+    # Generator yielding the (unique) uuids from the given uuids, files, and search query, in that order;
+    # files are read, and the search query results fetched (a page at a time), as the uuids are consumed.
+    seen = set()
+    ninvalid = 0
+    def unique(values: Iterable[str]) -> Generator[str, None, None]:  # noqa
+        nonlocal ninvalid
+        for value in values:
+            if not is_uuid(value):
+                ninvalid += 1
+                if verbose:
+                    _print(f"WARNING: Ignoring invalid uuid: {value}")
+            elif value not in seen:
+                seen.add(value)
+                yield value
+    yield from unique(uuids or [])
+    for file in (files or []):
+        yield from unique(_read_uuids_from_file(file))
+    if query:
+        yield from unique(_search_uuids(portal, query))
+    if ninvalid > 0:
+        _print(f"WARNING: Invalid uuids ignored: {ninvalid}")
+
+
+def _read_uuids_from_file(file: str) -> Generator[str, None, None]:
+    # A file (or - for stdin) containing either a JSON list (of uuids, or of items with uuids),
+    # or uuids one or more per line (separated by whitespace or commas).
+    if file == "-":
+        f = sys.stdin
     else:
-        print("ERROR")
+        try:
+            f = io.open(file, "r")
+        except Exception:
+            _print(f"ERROR: Cannot open file: {file}")
+            return
+    try:
+        line = f.readline()
+        if line.lstrip().startswith("["):
+            for item in iterate_json_array(_PrefixedFile(line, f)):
+                yield item.get("uuid") if isinstance(item, dict) else str(item)
+            return
+        while line:
+            yield from line.replace(",", " ").split()
+            line = f.readline()
+    except ValueError:
+        _print(f"ERROR: Cannot read JSON list from file: {file}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _search_uuids(portal: Portal, query: str, page_size: int = _SEARCH_PAGE_SIZE) -> Generator[str, None, None]:
+    # Generator yielding the uuids for the given search query, fetched a page (of page_size items) at a time,
+    # via successive limit/from requests, each starting after the items actually returned by the previous one
+    # (the server may cap the page size), while less than the total, if returned, otherwise until an empty page.
+    # The query may be a search URL path (e.g. /search/?type=File) or just its query string (e.g. type=File).
+    if not (isinstance(page_size, int) and (page_size > 0)):
+        page_size = _SEARCH_PAGE_SIZE
+    if not query.startswith("/"):
+        query = f"/search/?{query.lstrip('?')}"
+    query += f"{'&' if '?' in query else '?'}field=uuid"
+    offset = 0
+    while True:
+        page_query = f"{query}&limit={page_size}&from={offset}"
+        response = portal.get(page_query, timeout=_SEARCH_TIMEOUT)
+        if response.status_code == 404:
+            return  # No results for a search is a 404.
+        if response.status_code != 200:
+            _print(f"ERROR: Search failed ({response.status_code}): {page_query}")
+            return
+        if not isinstance(graph := (page := response.json()).get("@graph"), list) or not graph:
+            return
+        for item in graph:
+            if isinstance(item, dict):
+                yield item.get("uuid")
+        offset += len(graph)
+        if isinstance(total := page.get("total"), int) and (offset >= total):
+            return
+
+
+class _Submission:
+    # Queues uuids for indexing, in chunks, concurrently, each retried with exponential backoff.
+
+    def __init__(self, portal: Portal, chunk_size: int = _DEFAULT_CHUNK_SIZE, retries: int = _DEFAULT_RETRIES,
+                 backoff: float = _DEFAULT_BACKOFF, verbose: bool = False, debug: bool = False) -> None:
+        self._portal = portal
+        self._chunk_size = chunk_size if isinstance(chunk_size, int) and (chunk_size > 0) else _DEFAULT_CHUNK_SIZE
+        self._retries = retries if isinstance(retries, int) and (retries >= 0) else _DEFAULT_RETRIES
+        self._backoff = backoff if isinstance(backoff, (int, float)) and (backoff >= 0) else _DEFAULT_BACKOFF
+        self._verbose = verbose
+        self._debug = debug
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.failed = 0
+        self.chunks = 0
+        self.retries = 0
+
+    def submit(self, uuids: Iterable[str], nthreads: int = _DEFAULT_THREADS) -> None:
+        if not (isinstance(nthreads, int) and (nthreads > 0)):
+            nthreads = _DEFAULT_THREADS
+        run_concurrently((lambda chunk=chunk: self._submit_chunk(chunk) for chunk in self._chunks(uuids)),
+                         nthreads=nthreads)
+
+    def _chunks(self, uuids: Iterable[str]) -> Generator[List[str], None, None]:
+        chunk = []
+        for uuid in uuids:
+            chunk.append(uuid)
+            if len(chunk) >= self._chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _submit_chunk(self, uuids: List[str]) -> bool:
+        for attempt in range(self._retries + 1):
+            if attempt > 0:
+                time.sleep(self._backoff * (2 ** (attempt - 1)))
+                with self._lock:
+                    self.retries += 1
+            try:
+                if self._portal.reindex_metadata(uuids, raise_exception=True):
+                    with self._lock:
+                        self.queued += len(uuids)
+                        self.chunks += 1
+                        queued = self.queued
+                    if self._verbose:
+                        _print(f"Items queued for reindexing: {queued}"
+                               f"{f' {chars.dot} attempts: {attempt + 1}' if attempt > 0 else ''}")
+                    return True
+            except Exception as e:
+                if self._debug:
+                    _print(f"DEBUG: Reindex request failed (attempt {attempt + 1}): {e}")
+        with self._lock:
+            self.failed += len(uuids)
+        _print(f"ERROR: Cannot queue {len(uuids)} items for reindexing (after {self._retries + 1} attempts);"
+               f" first: {uuids[0]}")
+        return False
+
+
+def _wait_for_indexing(portal: Portal, interval: float = _DEFAULT_POLL_INTERVAL, timeout: float = 0) -> bool:
+    # Polls the indexing status until the (primary and secondary) indexing queues are empty, reporting at each
+    # poll the number of items queued, and the rate at which, and so the estimated time until, it is draining.
+    if not (isinstance(interval, (int, float)) and (interval > 0)):
+        interval = _DEFAULT_POLL_INTERVAL
+    started = time.time()
+    initial_queued = None
+    while True:
+        if (status := _get_indexing_status(portal)) is None:
+            _print("ERROR: Cannot get indexing status.")
+            return False
+        queued = _get_indexing_queue_count(status)
+        elapsed = time.time() - started
+        if initial_queued is None:
+            initial_queued = queued
+        rate = (initial_queued - queued) / elapsed if elapsed > 0 else 0
+        _print(f"Indexing queue: {queued}"
+               f" {chars.dot} primary: {status.get('primary_waiting', 0)}/{status.get('primary_inflight', 0)}"
+               f" {chars.dot} secondary: {status.get('secondary_waiting', 0)}/{status.get('secondary_inflight', 0)}"
+               f"{f' {chars.dot} DLQ: {dlq}' if (dlq := status.get('dlq_waiting')) else ''}"
+               f" {chars.dot} elapsed: {format_duration(elapsed)}"
+               f"{f' {chars.dot} draining: {rate:.1f}/second' if rate > 0 else ''}"
+               f"{f' {chars.dot} ETA: {format_duration(queued / rate)}' if (rate > 0) and queued else ''}")
+        if queued == 0:
+            _print(f"Indexing queue drained {chars.check}")
+            return True
+        if (isinstance(timeout, (int, float)) and (timeout > 0)) and (elapsed + interval > timeout):
+            _print(f"Timed out waiting for indexing queue to drain: {queued} {chars.xmark}")
+            return False
+        time.sleep(interval)
+
+
+def _get_indexing_status(portal: Portal) -> Optional[dict]:
+    try:
+        if (response := portal.get("/indexing_status?format=json")).status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return None
+
+
+def _get_indexing_queue_count(status: dict) -> int:
+    return sum(value for name in _INDEXING_QUEUE_NAMES if isinstance(value := status.get(name), int))
+
+
+class _PrefixedFile:
+    # Text file object reading the given (already read) prefix first, then the rest of the given file.
+    def __init__(self, prefix: str, f: io.TextIOBase) -> None:
+        self._prefix = prefix
+        self._f = f
+
+    def read(self, size: int = -1) -> str:
+        if self._prefix:
+            if (size < 0) or (size >= len(self._prefix)):
+                prefix, self._prefix = self._prefix, ""
+                return prefix
+            prefix, self._prefix = self._prefix[:size], self._prefix[size:]
+            return prefix
+        return self._f.read(size)
+
+
+def _print(*args, **kwargs) -> None:
+    print(*args, **kwargs, flush=True)
 
 
 if __name__ == "__main__":
-    main()
-    pass
+    status = main()
+    sys.exit(status if isinstance(status, int) else 0)
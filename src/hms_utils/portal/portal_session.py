@@ -0,0 +1,147 @@
+from __future__ import annotations
+import threading
+from typing import Callable, List, Optional
+import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_PORTAL_SESSION_POOL_SIZE = DEFAULT_POOLSIZE
+DEFAULT_PORTAL_SESSION_RETRIES = 3
+DEFAULT_PORTAL_SESSION_BACKOFF = 0.5  # Seconds; sleeps 0, 1, 2, ... times this between retries.
+DEFAULT_PORTAL_SESSION_TIMEOUT = 60  # Seconds; same as the default for dcicutils.ff_utils requests.
+
+_PORTAL_SESSION_RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+_PORTAL_SESSION_RETRY_METHODS = ["GET", "HEAD", "OPTIONS"]
+_PORTAL_SESSION_HOSTS = 4
+
+
+class PortalSession:
+    """
+    Shared (thread-safe) HTTP session for Portal requests, i.e. a requests.Session with keep-alive
+    connections, gzip, and a connection pool of (at most) pool_size connections per host, which
+    should be (at least) the number of threads making requests concurrently (a thread waits for a
+    free connection if all are in use, rather than opening, and then discarding, an extra one).
+    Connection errors and 429/5xx responses to (idempotent) GETs are retried (retries times) with
+    exponential backoff. The get function may be wrapped (see instrument), e.g. for instrumentation
+    or debugging; report returns the number of requests and connections, i.e. the connection reuse.
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, retries: Optional[int] = None,
+                 backoff: Optional[float] = None, timeout: Optional[float] = None) -> None:
+        self._session = requests.Session()
+        self._session.headers["Accept-Encoding"] = "gzip, deflate"
+        self._session.headers["Connection"] = "keep-alive"
+        self._lock = threading.Lock()
+        self._pool_size = DEFAULT_PORTAL_SESSION_POOL_SIZE
+        self._retries = DEFAULT_PORTAL_SESSION_RETRIES
+        self._backoff = DEFAULT_PORTAL_SESSION_BACKOFF
+        self._timeout = DEFAULT_PORTAL_SESSION_TIMEOUT
+        self._adapter = None
+        self._requests = 0
+        self._retried = 0
+        self._get = self._session_get
+        self.configure(pool_size=pool_size, retries=retries, backoff=backoff, timeout=timeout)
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @property
+    def retries(self) -> int:
+        return self._retries
+
+    @property
+    def backoff(self) -> float:
+        return self._backoff
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout
+
+    def configure(self, pool_size: Optional[int] = None, retries: Optional[int] = None,
+                  backoff: Optional[float] = None, timeout: Optional[float] = None) -> PortalSession:
+        """
+        Sets the connection pool size (per host), the number of retries, the backoff factor, and/or the
+        (default) timeout; any not given are left as is. Returns self. Changing the pool size or retries
+        replaces (and closes) the connection pools, so this is best done before any requests are made.
+        """
+        with self._lock:
+            if isinstance(timeout, (int, float)) and (timeout > 0):
+                self._timeout = timeout
+            changed = self._adapter is None
+            if isinstance(pool_size, int) and (pool_size > 0) and (pool_size != self._pool_size):
+                self._pool_size = pool_size ; changed = True  # noqa
+            if isinstance(retries, int) and (retries >= 0) and (retries != self._retries):
+                self._retries = retries ; changed = True  # noqa
+            if isinstance(backoff, (int, float)) and (backoff >= 0) and (backoff != self._backoff):
+                self._backoff = backoff ; changed = True  # noqa
+            if not changed:
+                return self
+            retry = Retry(total=self._retries, connect=self._retries, read=self._retries, status=self._retries,
+                          backoff_factor=self._backoff, status_forcelist=_PORTAL_SESSION_RETRY_STATUS_CODES,
+                          allowed_methods=_PORTAL_SESSION_RETRY_METHODS, raise_on_status=False,
+                          respect_retry_after_header=True)
+            adapter = HTTPAdapter(pool_connections=_PORTAL_SESSION_HOSTS, pool_maxsize=self._pool_size,
+                                  pool_block=True, max_retries=retry)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            if self._adapter is not None:
+                # Closes the connection pools of the replaced adapter; it is no longer mounted.
+                self._adapter.close()
+            self._adapter = adapter
+        return self
+
+    def instrument(self, wrapper: Callable[[Callable], Callable]) -> PortalSession:
+        """
+        Wraps the get function (with the same signature as requests.get) used for all
+        requests via this session with the given wrapper, e.g. for instrumentation or debugging;
+        the wrapper is called with the current get function and returns the new one. Returns self.
+        """
+        if callable(wrapper) and callable(get := wrapper(self._get)):
+            self._get = get
+        return self
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self._timeout
+        return self._get(url, **kwargs)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def report(self) -> dict:
+        """
+        Returns the number of requests made (excluding retries), retries, connections opened,
+        and connections reused (requests which did not need a new connection), over all (current) pools.
+        """
+        requests_count = 0
+        connections = 0
+        for pool in PortalSession._get_connection_pools(self._adapter):
+            requests_count += getattr(pool, "num_requests", 0)
+            connections += getattr(pool, "num_connections", 0)
+        with self._lock:
+            return {
+                "pool_size": self._pool_size,
+                "requests": self._requests,
+                "retries": self._retried,
+                "connections": connections,
+                "reused": max(0, requests_count - connections),
+                "reuse": round(1 - connections / requests_count, 4) if requests_count > 0 else 0
+            }
+
+    def _session_get(self, url: str, **kwargs) -> requests.Response:
+        response = self._session.get(url, **kwargs)
+        retried = len(history) if (history := getattr(getattr(response.raw, "retries", None), "history", None)) else 0
+        with self._lock:
+            self._requests += 1
+            self._retried += retried
+        return response
+
+    @staticmethod
+    def _get_connection_pools(adapter: HTTPAdapter) -> List[object]:
+        try:
+            pools = adapter.poolmanager.pools
+            with pools.lock:
+                return list(pools._container.values())
+        except Exception:
+            return []
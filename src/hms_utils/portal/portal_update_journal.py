@@ -0,0 +1,116 @@
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from typing import List, Optional, Set, Tuple
+
+DEFAULT_PORTAL_UPDATE_JOURNAL_FILE = "~/.cache/hms/portal-update-journal.ndjson"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class PortalUpdateJournal:
+    """
+    Append-only (NDJSON) journal of the items completed (or failed) by Portal updates, i.e. by
+    hms-portal-update --post/--patch/--upsert/--load, each recorded with a key identifying the
+    update, i.e. its target (Portal server or INI file), action, and input file content hash,
+    so that an interrupted (or partly failed) update can be resumed, skipping the items already
+    completed (for the same key, i.e. same target, action, and unchanged input file content).
+    Items which failed are not skipped when resuming (the most recent record for an item wins).
+    Thread-safe; each record is flushed as it is written, so a crash loses at most a partial
+    (last) line, which is ignored when read.
+    """
+
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(self, file: Optional[str] = None, resume: bool = False) -> None:
+        if not (isinstance(file, str) and file):
+            file = DEFAULT_PORTAL_UPDATE_JOURNAL_FILE
+        if (directory := os.path.dirname(file := os.path.expanduser(file))):
+            os.makedirs(directory, exist_ok=True)
+        self._file = file
+        self._resume = resume is True
+        self._lock = threading.Lock()
+        self._completed = self._read_completed() if resume is True else set()
+        self._f = io.open(file, "a")
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    @property
+    def file(self) -> str:
+        return self._file
+
+    @property
+    def resume(self) -> bool:
+        return self._resume
+
+    @staticmethod
+    def key(target: Optional[str], action: str, content_hash: str) -> str:
+        return f"{target or ''}|{action}|{content_hash}"
+
+    def is_completed(self, key: str, identity: str) -> bool:
+        # Returns True iff the given item (for the given key) was completed per the journal read on resume;
+        # and if so counts it as skipped.
+        if (key, identity) in self._completed:
+            with self._lock:
+                self.skipped += 1
+            return True
+        return False
+
+    def record(self, key: str, identity: str, completed: bool, message: Optional[str] = None) -> None:
+        record = {"key": key, "item": identity,
+                  "status": PortalUpdateJournal.COMPLETED if completed is True else PortalUpdateJournal.FAILED,
+                  "time": round(time.time(), 3)}
+        if message:
+            record["message"] = message
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+            if completed is True:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+    @staticmethod
+    def hash_file(file: str) -> str:
+        return PortalUpdateJournal.hash_files([file])
+
+    @staticmethod
+    def hash_files(files: List[str]) -> str:
+        # Hash of the contents (and base names) of the given files, in sorted order by base name.
+        hasher = hashlib.sha256()
+        for file in sorted(files, key=lambda file: os.path.basename(file)):
+            hasher.update(os.path.basename(file).encode("utf-8") + b"\0")
+            with io.open(file, "rb") as f:
+                while chunk := f.read(_HASH_CHUNK_SIZE):
+                    hasher.update(chunk)
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def _read_completed(self) -> Set[Tuple[str, str]]:
+        completed = set()
+        if not os.path.exists(self._file):
+            return completed
+        with io.open(self._file, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key_and_identity = (record["key"], record["item"])
+                    if record["status"] == PortalUpdateJournal.COMPLETED:
+                        completed.add(key_and_identity)
+                    else:
+                        completed.discard(key_and_identity)
+                except Exception:
+                    continue
+        return completed
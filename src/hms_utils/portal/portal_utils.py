@@ -1,7 +1,9 @@
 from __future__ import annotations
 import os
 import pyramid
+import requests
 import sys
+import threading
 import webtest
 from typing import Callable, List, Optional, Union
 from webob.multidict import MultiDict
@@ -10,18 +12,78 @@ from dcicutils.portal_utils import Portal as PortalFromUtils
 from dcicutils.ff_utils import delete_field, delete_metadata, purge_metadata
 from dcicutils.common import APP_SMAHT, ORCHESTRATED_APPS
 from hms_utils.chars import chars
+from hms_utils.portal.portal_cache import set_portal_response_size
+from hms_utils.portal.portal_session import PortalSession
 from hms_utils.type_utils import is_uuid, to_non_empty_string_list
 
+_PORTAL_SESSION_LOCK = threading.Lock()
+
 
 class Portal(PortalFromUtils):
 
+    @property
+    def session(self) -> PortalSession:
+        # Shared (pooled, keep-alive) HTTP session for the GET requests of this Portal object;
+        # created lazily, so that it may be (re)configured, e.g. sized to the number of threads.
+        if (session := getattr(self, "_session", None)) is None:
+            with _PORTAL_SESSION_LOCK:
+                if (session := getattr(self, "_session", None)) is None:
+                    self._session = (session := PortalSession())
+        return session
+
+    def get(self, url: str, follow: bool = True,
+            raw: bool = False, database: bool = False,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            field: Optional[str] = None, deleted: bool = False,
+            raise_for_status: bool = False, **kwargs) -> Optional[requests.Response]:
+        if self.vapp:
+            return super().get(url, follow=follow, raw=raw, database=database, limit=limit, offset=offset,
+                               field=field, deleted=deleted, raise_for_status=raise_for_status, **kwargs)
+        url = self.url(url, raw, database)
+        if isinstance(limit, int) and (limit >= 0):
+            url += ("&" if "?" in url else "?") + f"limit={limit}"
+        if isinstance(offset, int) and (offset >= 0):
+            url += ("&" if "?" in url else "?") + f"from={offset}"
+        if isinstance(field, str) and field:
+            url += ("&" if "?" in url else "?") + f"field={field}"
+        if deleted is True:
+            url += ("&" if "?" in url else "?") + "status=deleted"
+        response = self.session.get(url, allow_redirects=follow, **self._kwargs(**kwargs))
+        if isinstance(content := response.content, bytes):
+            set_portal_response_size(len(content))
+        if raise_for_status:
+            response.raise_for_status()
+        return response
+
     def get_metadata(self, object_id: str, raw: bool = False, database: bool = False,
                      limit: Optional[int] = None, offset: Optional[int] = None,
                      field: Optional[str] = None, deleted: bool = False,
                      raise_exception: bool = True) -> Optional[dict]:
         if isinstance(object_id, str):
             object_id = object_id.lstrip("/")
-        return super().get_metadata(object_id, raw, database, limit, offset, field, deleted, raise_exception)
+        if self.vapp or not isinstance(object_id, str):
+            return super().get_metadata(object_id, raw, database, limit, offset, field, deleted, raise_exception)
+        # Same as dcicutils.ff_utils.get_metadata but via the (pooled) session, which does the retries;
+        # and with the same error message for a bad status code (see portal_read.Portal._get_access_status).
+        try:
+            response = self.get(f"/{object_id}", raw=raw, database=database,
+                                limit=limit, offset=offset, field=field, deleted=deleted)
+            if response.status_code >= 400:
+                try:
+                    reason = response.json()
+                except Exception:
+                    reason = response.reason
+                raise Exception(f"Bad status code for GET request for {response.url}:"
+                                f" {response.status_code}. Reason: {reason}")
+            try:
+                return response.json()
+            except Exception:
+                raise Exception(f"Cannot get json for request to {response.url}."
+                                f" Status code: {response.status_code}. Response text: {response.text}")
+        except Exception:
+            if raise_exception:
+                raise
+            return None
 
     def delete_metadata(self, object_id: str) -> Optional[dict]:
         if self.key:
@@ -12,18 +12,29 @@
 # a list of objects, which which case the file name for the target schema name, or if not, then
 # the --schema option must be used to specified the target schema; or the JSON must be a dictionary
 # of schema names, where the value of each is a list of objects for that schema.
+#
+# For --post, --patch, and --upsert, the items from all files are ordered into layers by their references
+# to each other, and the items within each layer are updated concurrently (see --threads); an item is
+# never updated before the items it references (within the given files).
+#
+# Each item completed (or failed) by --post, --patch, --upsert, or --load is recorded in an append-only journal
+# (see --journal and --nojournal), keyed by the target Portal, action, and input file content hash; with --resume,
+# items already completed for the same (unchanged) input are skipped, so an interrupted update can be restarted.
 # --------------------------------------------------------------------------------------------------
 
 import argparse
 from functools import lru_cache
 import glob
 import io
+from itertools import chain
 import json
 import os
 import re
 import shutil
 import sys
-from typing import Callable, List, Optional, Tuple, Union
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import quote
 from dcicutils.captured_output import captured_output
 from dcicutils.command_utils import yes_or_no
 from dcicutils.common import ORCHESTRATED_APPS, APP_CGAP, APP_FOURFRONT, APP_SMAHT
@@ -31,6 +42,13 @@ from dcicutils.ff_utils import delete_metadata, purge_metadata
 from dcicutils.misc_utils import get_error_message, ignored, normalize_string, PRINT, to_camel_case, to_snake_case
 from dcicutils.portal_utils import Portal as PortalFromUtils
 from dcicutils.tmpfile_utils import temporary_directory
+from hms_utils.chars import chars
+from hms_utils.dictionary_utils import DependencyCycleError, order_dictionary_by_dependency_layers
+from hms_utils.json_stream_utils import AtomicFileWriter, iterate_json_items, JsonArrayWriter
+from hms_utils.portal.portal_load_telemetry import DEFAULT_PORTAL_LOAD_TELEMETRY_INTERVAL, PortalLoadTelemetry
+from hms_utils.portal.portal_update_journal import DEFAULT_PORTAL_UPDATE_JOURNAL_FILE, PortalUpdateJournal
+from hms_utils.threading_utils import run_concurrently
+from hms_utils.type_utils import is_uuid
 
 
 class Portal(PortalFromUtils):
@@ -49,6 +67,8 @@ class Portal(PortalFromUtils):
 _DEFAULT_APP = "smaht"
 _SMAHT_ENV_ENVIRON_NAME = "SMAHT_ENV"
 _DEFAULT_INI_FILE_FOR_LOAD = "development.ini"
+_DEFAULT_THREADS = 8
+_EXISTENCE_SEARCH_BATCH_SIZE = 100
 
 # Schema properties to ignore (by default) for the view schema usage.
 _IGNORE_PROPERTIES_ON_UPDATE = [
@@ -144,10 +164,30 @@ def main():
     parser.add_argument("--unresolved-output", "--unresolved", type=str,
                         help="Output file to write unresolved references to for --load only.")
     parser.add_argument("--confirm", action="store_true", required=False, default=False, help="Confirm before action.")
+    parser.add_argument("--nodiff", action="store_true", required=False, default=False,
+                        help="PATCH all given fields, even if unchanged (default: only changed; skip if none).")
+    parser.add_argument("--confirm-missing", action="store_true", required=False, default=False,
+                        help="Confirm (via GET) each item not found by the (bulk) existence searches,"
+                             " which may lag, before a POST (default: trust the searches).")
+    parser.add_argument("--threads", "--nthreads", type=int, required=False, default=_DEFAULT_THREADS,
+                        help=f"Maximum concurrent updates (within a dependency layer); default: {_DEFAULT_THREADS}.")
+    parser.add_argument("--resume", action="store_true", required=False, default=False,
+                        help="Skip items already completed (per the journal) for the same (unchanged) input.")
+    parser.add_argument("--journal", type=str, required=False, default=None,
+                        help=f"Journal file of completed/failed items; default: {DEFAULT_PORTAL_UPDATE_JOURNAL_FILE}")
+    parser.add_argument("--nojournal", action="store_true", required=False, default=False,
+                        help="Do not record completed/failed items in the journal (cannot use with --resume).")
     parser.add_argument("--skip-links", "--skiplinks", action="store_true", required=False, default=False,
                         help="Use skip_links=true for --load.")
     parser.add_argument("--verbose", action="store_true", required=False, default=False, help="Verbose output.")
     parser.add_argument("--quiet", action="store_true", required=False, default=False, help="Quiet output.")
+    parser.add_argument("--telemetry", nargs="?", const="-", type=str, required=False, default=None,
+                        help="Throughput telemetry for --load: periodic progress snapshots and a final JSON summary,"
+                             " appended (as NDJSON) to the given file, or if none, to stdout.")
+    parser.add_argument("--telemetry-interval", type=float, required=False,
+                        default=DEFAULT_PORTAL_LOAD_TELEMETRY_INTERVAL,
+                        help=f"Seconds between --telemetry snapshots;"
+                             f" default: {DEFAULT_PORTAL_LOAD_TELEMETRY_INTERVAL}.")
     parser.add_argument("--noprogress", action="store_true", required=False, default=False,
                         help="No progress bar output for --load.")
     parser.add_argument("--debug", action="store_true", required=False, default=False, help="Debugging output.")
@@ -163,17 +203,25 @@ def main():
     if not (args.post or args.patch or args.upsert or args.delete or args.purge or args.load):
         usage()
 
+    if args.resume and args.nojournal:
+        usage("Cannot use --resume with --nojournal.")
+
     if not (portal := _create_portal(env=args.env, ini=args.ini, app=args.app, load=args.load,
                                      verbose=args.verbose, debug=args.debug, quiet=args.quiet)):
         exit(1)
 
+    journal = None
+    if (not args.nojournal) and (args.post or args.patch or args.upsert or args.load):
+        journal = PortalUpdateJournal(args.journal, resume=args.resume)
+
     if args.load:
         if args.load == "-":
             args.load = "/dev/stdin"
         _load_data(portal=portal, load=args.load, ini_file=args.ini, explicit_schema_name=args.schema,
                    unresolved_output=args.unresolved_output, skip_links=args.skip_links,
                    verbose=args.verbose, debug=args.debug, noprogress=args.noprogress,
-                   nohack=args.nohack)
+                   nohack=args.nohack, journal=journal,
+                   telemetry=args.telemetry, telemetry_interval=args.telemetry_interval)
 
     if explicit_schema_name := args.schema:
         schema, explicit_schema_name = _get_schema(portal, explicit_schema_name)
@@ -187,7 +235,9 @@ def main():
                                  update_function=_post_data,
                                  update_action_name="POST",
                                  noignore=args.noignore, ignore=args.ignore,
-                                 confirm=args.confirm, verbose=args.verbose, quiet=args.quiet, debug=args.debug)
+                                 confirm=args.confirm, verbose=args.verbose, quiet=args.quiet, debug=args.debug,
+                                 nthreads=args.threads, nodiff=args.nodiff, journal=journal,
+                                 confirm_missing=args.confirm_missing)
     if args.patch:
         _post_or_patch_or_upsert(portal=portal,
                                  file_or_directory=args.patch,
@@ -196,7 +246,9 @@ def main():
                                  update_action_name="PATCH",
                                  patch_delete_fields=args.delete,
                                  noignore=args.noignore, ignore=args.ignore,
-                                 confirm=args.confirm, verbose=args.verbose, quiet=args.quiet, debug=args.debug)
+                                 confirm=args.confirm, verbose=args.verbose, quiet=args.quiet, debug=args.debug,
+                                 nthreads=args.threads, nodiff=args.nodiff, journal=journal,
+                                 confirm_missing=args.confirm_missing)
         args.delete = None
     if args.upsert:
         _post_or_patch_or_upsert(portal=portal,
@@ -206,9 +258,17 @@ def main():
                                  update_action_name="UPSERT",
                                  patch_delete_fields=args.delete,
                                  noignore=args.noignore, ignore=args.ignore,
-                                 confirm=args.confirm, verbose=args.verbose, quiet=args.quiet, debug=args.debug)
+                                 confirm=args.confirm, verbose=args.verbose, quiet=args.quiet, debug=args.debug,
+                                 nthreads=args.threads, nodiff=args.nodiff, journal=journal,
+                                 confirm_missing=args.confirm_missing)
         args.delete = None
 
+    if journal:
+        journal.close()
+        if (args.verbose or args.resume) and not args.quiet:
+            _print(f"Journal items completed: {journal.completed} {chars.dot} failed: {journal.failed}"
+                   f" {chars.dot} skipped (resumed): {journal.skipped} {chars.dot} journal: {journal.file}")
+
     if args.delete:
         if not portal.get_metadata(args.delete, raise_exception=False):
             _print(f"Cannot find given object: {args.delete}")
@@ -231,14 +291,18 @@ def _post_or_patch_or_upsert(portal: Portal, file_or_directory: str,
                              patch_delete_fields: Optional[str] = None,
                              noignore: bool = False, ignore: Optional[List[str]] = None,
                              confirm: bool = False, verbose: bool = False,
-                             quiet: bool = False, debug: bool = False) -> None:
+                             quiet: bool = False, debug: bool = False, nthreads: int = 1,
+                             nodiff: bool = False, journal: Optional[PortalUpdateJournal] = None,
+                             confirm_missing: bool = False) -> None:
+
+    # The items from all of the given files are first collected (in file and schema order), and then
+    # ordered, by their references to each other, into layers, each of which is updated concurrently
+    # (see _order_updates_into_layers), so that an item is never updated before any item it references.
+    updates = []
 
-    def post_or_patch_or_upsert(portal: Portal, file: str, schema_name: Optional[str],
-                                patch_delete_fields: Optional[str] = None,
-                                confirm: bool = False, verbose: bool = False,
-                                quiet: bool = False, debug: bool = False) -> None:
+    def collect_updates(file: str, schema_name: Optional[str], debug: bool = False) -> None:
 
-        nonlocal update_function, update_action_name
+        nonlocal update_action_name
         if not quiet:
             _print(f"Processing {update_action_name} file: {file}")
         if data := _read_json_from_file(file):
@@ -246,10 +310,7 @@ def _post_or_patch_or_upsert(portal: Portal, file_or_directory: str,
                 if isinstance(schema_name, str) and schema_name:
                     if debug:
                         _print(f"DEBUG: File ({file}) contains an object of type: {schema_name}")
-                    update_function(portal, data, schema_name, file=file,
-                                    patch_delete_fields=patch_delete_fields,
-                                    noignore=noignore, ignore=ignore,
-                                    confirm=confirm, verbose=verbose, debug=debug)
+                    updates.append(_Update(data, schema_name, file, None))
                 elif _is_schema_name_list(portal, list(data.keys())):
                     if debug:
                         _print(f"DEBUG: File ({file}) contains a dictionary of schema names.")
@@ -259,12 +320,9 @@ def _post_or_patch_or_upsert(portal: Portal, file_or_directory: str,
                         if isinstance(schema_data := data[schema_name], list):
                             schema_data = _impose_special_ordering(schema_data, schema_name)
                             if debug:
-                                _print(f"DEBUG: Processing {update_action_name}s for type: {schema_name}")
+                                _print(f"DEBUG: Collecting {update_action_name}s for type: {schema_name}")
                             for index, item in enumerate(schema_data):
-                                update_function(portal, item, schema_name, file=file, index=index,
-                                                patch_delete_fields=patch_delete_fields,
-                                                noignore=noignore, ignore=ignore,
-                                                confirm=confirm, verbose=verbose, debug=debug)
+                                updates.append(_Update(item, schema_name, file, index))
                         else:
                             _print(f"WARNING: File ({file}) contains schema item which is not a list: {schema_name}")
                 else:
@@ -274,10 +332,7 @@ def _post_or_patch_or_upsert(portal: Portal, file_or_directory: str,
                     _print(f"DEBUG: File ({file}) contains a list of objects of type: {schema_name}")
                 data = _impose_special_ordering(data, schema_name)
                 for index, item in enumerate(data):
-                    update_function(portal, item, schema_name, file=file, index=index,
-                                    patch_delete_fields=patch_delete_fields,
-                                    noignore=noignore, ignore=ignore,
-                                    confirm=confirm, verbose=verbose, debug=debug)
+                    updates.append(_Update(item, schema_name, file, index))
             if debug:
                 _print(f"DEBUG: Processing {update_action_name} file done: {file}")
 
@@ -290,24 +345,468 @@ def _post_or_patch_or_upsert(portal: Portal, file_or_directory: str,
                 if not (schema_name := file_and_schema[1]) and not (schema_name := explicit_schema_name):
                     _print(f"ERROR: Schema cannot be inferred from file name and --schema not specified: {file}")
                     continue
-                post_or_patch_or_upsert(portal, file_and_schema[0], schema_name=schema_name,
-                                        patch_delete_fields=patch_delete_fields,
-                                        confirm=confirm, quiet=quiet, verbose=verbose, debug=debug)
+                collect_updates(file_and_schema[0], schema_name=schema_name, debug=debug)
     elif os.path.isfile(file := file_or_directory):
         if ((schema_name := _get_schema_name_from_schema_named_json_file_name(portal, file)) or
             (schema_name := explicit_schema_name)):  # noqa
-            post_or_patch_or_upsert(portal, file, schema_name=schema_name,
-                                    patch_delete_fields=patch_delete_fields,
-                                    confirm=confirm, quiet=quiet, verbose=verbose, debug=debug)
+            collect_updates(file, schema_name=schema_name, debug=debug)
         else:
-            post_or_patch_or_upsert(portal, file, schema_name=schema_name,
-                                    patch_delete_fields=patch_delete_fields,
-                                    confirm=confirm, quiet=quiet, verbose=verbose, debug=debug)
+            collect_updates(file, schema_name=schema_name, debug=debug)
             # _print(f"ERROR: Schema cannot be inferred from file name and --schema not specified: {file}")
             # return
     else:
         _print(f"ERROR: Cannot find file or directory: {file_or_directory}")
 
+    if journal:
+        # Each item completed (or failed) is journaled, keyed by its file content hash; and, if resuming,
+        # items already completed (per the journal) for the same (unchanged) file content are skipped.
+        updates = _get_journaled_updates(portal, updates, journal, update_action_name)
+        if journal.resume and (journal.skipped > 0) and not quiet:
+            _print(f"{update_action_name} items already completed (resumed; skipping): {journal.skipped}")
+    if not updates:
+        return
+    if (confirm is True) or not (isinstance(nthreads, int) and (nthreads > 1)):
+        # Interactive confirmation (or a single thread) means one at a time.
+        nthreads = 1
+    layers = _order_updates_into_layers(portal, updates)
+    if verbose or debug:
+        _print(f"{update_action_name} items: {len(updates)} {chars.dot} dependency layers: {len(layers)}"
+               f" {chars.dot} threads: {nthreads}")
+    # For PATCH (and UPSERT), unless nodiff, only changed fields are sent, and unchanged items are skipped;
+    # the existing items (raw frames) to compare with are fetched from the database (see _get_patch_data).
+    diff = _PatchDiff() if (nodiff is not True) and (update_function in [_patch_data, _upsert_data]) else None
+    existence = _prefetch_existence(portal, updates, nthreads=nthreads, confirm_missing=confirm_missing)
+    if verbose or debug:
+        _print(f"{update_action_name} items existing: {existence.found}"
+               f" {chars.dot} not found{' (to confirm)' if confirm_missing else ''}: {existence.missing}"
+               f" {chars.dot} unresolved: {existence.unresolved} {chars.dot} searches: {existence.searches}")
+    for layer_number, layer in enumerate(layers, start=1):
+        if debug:
+            _print(f"DEBUG: Processing {update_action_name} layer {layer_number} of {len(layers)}:"
+                   f" {len(layer)} item{'s' if len(layer) != 1 else ''}")
+        def update_item(update: _Update) -> None:  # noqa
+            completed = update_function(portal, update.data, update.schema_name,
+                                        file=update.file, index=update.index,
+                                        patch_delete_fields=patch_delete_fields,
+                                        noignore=noignore, ignore=ignore,
+                                        confirm=confirm, verbose=verbose, debug=debug,
+                                        existence=existence, diff=diff)
+            if journal and (completed is not None) and update.journal_key:
+                journal.record(update.journal_key, update.journal_identity, completed is True)
+        run_concurrently([lambda update=update: update_item(update) for update in layer],
+                         nthreads=min(nthreads, len(layer)))
+    if verbose or debug:
+        _print(f"{update_action_name} existence checks from (bulk) searches: {existence.saved}"
+               f" {chars.dot} via GET: {existence.gets}")
+    if diff and not quiet:
+        _print(f"{update_action_name} items unchanged (PATCH skipped): {diff.unchanged}"
+               f" {chars.dot} patched: {diff.patched}"
+               f" {chars.dot} fields sent: {diff.fields_sent} of {diff.fields_given}"
+               f"{f' {chars.dot} links resolved: {diff.links_resolved}' if diff.links_resolved else ''}")
+
+
+class _Update:
+
+    def __init__(self, data: dict, schema_name: Optional[str], file: Optional[str], index: Optional[int]) -> None:
+        self.data = data
+        self.schema_name = schema_name
+        self.file = file
+        self.index = index
+        self.journal_key = None
+        self.journal_identity = None
+
+
+def _get_journaled_updates(portal: Portal, updates: List[_Update],
+                           journal: PortalUpdateJournal, update_action_name: str) -> List[_Update]:
+    # Sets the journal key (target, action, and file content hash) and identity (schema name, index within
+    # the file, and identifying path) of each of the given updates; and returns those not already completed
+    # per the journal (only if resuming). The index is included in the identity, as the same item may (though
+    # should not) appear more than once; this is stable since the file content must be unchanged to resume.
+    journal_keys = {}
+    target = _get_journal_target(portal)
+    for update in updates:
+        if (journal_key := journal_keys.get(update.file)) is None:
+            try:
+                content_hash = PortalUpdateJournal.hash_file(update.file)
+            except Exception:
+                content_hash = ""
+            journal_keys[update.file] = journal_key = (
+                PortalUpdateJournal.key(target, update_action_name, content_hash) if content_hash else "")
+        if journal_key:
+            identifying_path = portal.get_identifying_path(update.data, portal_type=update.schema_name)
+            update.journal_key = journal_key
+            update.journal_identity = (f"{update.schema_name}#{update.index if update.index is not None else 0}"
+                                       f":{identifying_path or ''}")
+    if not journal.resume:
+        return updates
+    return [update for update in updates
+            if not (update.journal_key and journal.is_completed(update.journal_key, update.journal_identity))]
+
+
+def _get_journal_target(portal: Portal, ini_file: Optional[str] = None) -> str:
+    if portal.server:
+        return portal.server
+    if isinstance(ini_file := ini_file or portal.ini_file, str) and ini_file:
+        return os.path.abspath(os.path.expanduser(ini_file))
+    return ""
+
+
+def _order_updates_into_layers(portal: Portal, updates: List[_Update]) -> List[List[_Update]]:
+    """
+    Returns the given updates (items) ordered into layers, such that the items in each layer reference
+    only items in previous layers (and/or items not among the given ones), i.e. the items within a
+    layer are independent of each other and may be updated concurrently, once all previous layers
+    are done. An item references another if any of its (string) values is an identifying value (uuid,
+    or the value of an identifying property per its schema, e.g. accession, submitted_id, aliases,
+    identifier, name) of the other item; an item which appears more than once (i.e. with the same
+    identifying value) is ordered after its previous appearances. Within each layer, the items are
+    in their given order. If there are cyclic references then (with a warning) the items are simply
+    returned in their given order, one per layer, i.e. the same as updating them serially.
+    """
+    identifying_values = [_get_item_identifying_values(portal, update.data, update.schema_name)
+                          for update in updates]
+    identifying_value_to_indices = {}
+    for index, values in enumerate(identifying_values):
+        for value in values:
+            identifying_value_to_indices.setdefault(value, []).append(index)
+    dependencies = []
+    for index, update in enumerate(updates):
+        item_dependencies = set()
+        for value in identifying_values[index]:
+            item_dependencies.update(other for other in identifying_value_to_indices[value] if other < index)
+        for value in _get_item_string_values(update.data, exclude=identifying_values[index]):
+            if (others := identifying_value_to_indices.get(value)) is None:
+                if ("/" not in value) or ((others := identifying_value_to_indices.get(
+                                           value.strip("/").split("/")[-1])) is None):  # noqa
+                    continue
+            item_dependencies.update(other for other in others if other != index)
+        dependencies.append({"index": index, "dependencies": sorted(item_dependencies)})
+    try:
+        ordered_layers = order_dictionary_by_dependency_layers(dependencies, "dependencies", "index")
+    except DependencyCycleError as e:
+        _print("WARNING: Items to update contain cyclic references; updating serially in file order.")
+        for cycle in e.cycles:
+            _print(f"- Cycle: {' -> '.join(_get_update_description(updates[index]) for index in cycle)}")
+        return [[update] for update in updates]
+    return [[updates[item["index"]] for item in layer] for layer in ordered_layers.layers]
+
+
+def _get_update_description(update: _Update) -> str:
+    description = f"{update.schema_name or 'item'}"
+    if isinstance(update.index, int):
+        description += f" #{update.index + 1}"
+    if update.file:
+        description += f" ({os.path.basename(update.file)})"
+    return description
+
+
+def _get_item_identifying_values(portal: Portal, data: dict, schema_name: Optional[str]) -> Set[str]:
+    identifying_values = set()
+    if not isinstance(data, dict):
+        return identifying_values
+    identifying_property_names = ["uuid"]
+    if schema_name and isinstance(schema := _get_schema(portal, schema_name)[0], dict):
+        if isinstance(schema_identifying_property_names := schema.get("identifyingProperties"), list):
+            identifying_property_names += schema_identifying_property_names
+    for identifying_property_name in identifying_property_names:
+        if isinstance(value := data.get(identifying_property_name), str) and value:
+            identifying_values.add(value)
+        elif isinstance(value, list):
+            identifying_values.update(element for element in value if isinstance(element, str) and element)
+    return identifying_values
+
+
+def _get_item_string_values(data: Union[dict, list], exclude: Optional[Set[str]] = None) -> Set[str]:
+    string_values = set()
+    def get_string_values(value: Any) -> None:  # noqa
+        if isinstance(value, dict):
+            for element in value.values():
+                get_string_values(element)
+        elif isinstance(value, list):
+            for element in value:
+                get_string_values(element)
+        elif isinstance(value, str) and value:
+            string_values.add(value)
+    get_string_values(data)
+    return (string_values - exclude) if exclude else string_values
+
+
+class _ExistenceIndex:
+    """
+    In-memory index of whether or not items exist in the Portal, by identifying path, populated in bulk
+    by _prefetch_existence, and updated as items are created; get returns None if not known, in which
+    case the caller should check by itself (i.e. via get_metadata) and may set the result here.
+    Items not found by the (ElasticSearch) searches are recorded as missing, and are trusted not to exist,
+    i.e. get returns False for them, so that new items (the usual case for POST) need no per-item GET;
+    though the search index lags the database, e.g. for an item created (elsewhere) moments ago, for which
+    the POST then simply fails, as it would anyway. If confirm_missing is True, get instead returns None
+    for them, i.e. they must be confirmed by the caller. The number of per-item GETs issued (gets) vs
+    those saved by the index (saved) is counted (see _exists).
+    """
+
+    def __init__(self, confirm_missing: bool = False) -> None:
+        self._exists = {}
+        self._missing = set()
+        self._confirm_missing = confirm_missing is True
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.unresolved = 0
+        self.gets = 0
+        self.saved = 0
+
+    @property
+    def found(self) -> int:
+        with self._lock:
+            return len([exists for exists in self._exists.values() if exists is True])
+
+    @property
+    def not_found(self) -> int:
+        with self._lock:
+            return len([exists for exists in self._exists.values() if exists is False])
+
+    @property
+    def missing(self) -> int:
+        # The number of items not found by the searches, i.e. (probably) new.
+        with self._lock:
+            return len(self._missing)
+
+    @property
+    def confirm_missing(self) -> bool:
+        return self._confirm_missing
+
+    def get(self, identifying_path: Optional[str]) -> Optional[bool]:
+        with self._lock:
+            if (exists := self._exists.get(identifying_path)) is None:
+                if (not self._confirm_missing) and (identifying_path in self._missing):
+                    return False
+            return exists
+
+    def set(self, identifying_path: Optional[str], exists: bool) -> None:
+        if isinstance(identifying_path, str) and identifying_path:
+            with self._lock:
+                self._exists[identifying_path] = exists is True
+
+    def set_missing(self, identifying_path: Optional[str]) -> None:
+        if isinstance(identifying_path, str) and identifying_path:
+            with self._lock:
+                self._missing.add(identifying_path)
+
+    def count(self, searches: int = 0, unresolved: int = 0, gets: int = 0, saved: int = 0) -> None:
+        with self._lock:
+            self.searches += searches
+            self.unresolved += unresolved
+            self.gets += gets
+            self.saved += saved
+
+
+def _prefetch_existence(portal: Portal, updates: List[_Update], nthreads: int = 1,
+                        batch_size: Optional[int] = None, confirm_missing: bool = False) -> _ExistenceIndex:
+    """
+    Determines, in bulk, whether or not the items for the given updates exist in the Portal, by their
+    identifying paths (per portal.get_identifying_path, as used by _post_data, _patch_data, _upsert_data),
+    and returns an _ExistenceIndex for them. The (single) identifying value of each path is mapped to
+    the identifying property of the item which has it; these are then looked up via searches (for the
+    uuid and the identifying property, and with field selection), batch_size values per search, grouped
+    by property, i.e. uuid and accession are searched across all types, and others within the item type;
+    values not found are searched for again among deleted items; those still not found are recorded as
+    missing, i.e. new, or if confirm_missing, probably new, but to be confirmed per item (see _ExistenceIndex).
+    A search with no results (a 404) is simply empty. A path whose value cannot be mapped to a (searchable)
+    property, or whose search fails, is left unresolved, i.e. to be checked per item.
+    """
+    existence = _ExistenceIndex(confirm_missing=confirm_missing)
+    if not (isinstance(batch_size, int) and (batch_size > 0)):
+        batch_size = _EXISTENCE_SEARCH_BATCH_SIZE
+    lookups = {}  # (item type, property name) -> {identifying value -> [identifying paths]}
+    for update in updates:
+        if not isinstance(update.data, dict):
+            continue
+        if not (identifying_path := portal.get_identifying_path(update.data, portal_type=update.schema_name)):
+            continue
+        if not (lookup := _get_existence_lookup(portal, update.data, update.schema_name, identifying_path)):
+            existence.count(unresolved=1)
+            continue
+        lookups.setdefault(lookup[:2], {}).setdefault(lookup[2], []).append(identifying_path)
+    def search(item_type: str, property_name: str, values: List[str]) -> None:  # noqa
+        found_values = {}
+        resolved = True
+        fields = "&field=uuid" + (f"&field={property_name}" if property_name != "uuid" else "")
+        for deleted in [False, True]:
+            if not (search_values := [value for value in values if value not in found_values]):
+                break
+            query_values = "&".join(f"{property_name}={quote(value, safe='')}" for value in search_values)
+            query = (f"/search/?type={item_type}&{query_values}{fields}"
+                     f"&limit={len(search_values)}{'&status=deleted' if deleted else ''}")
+            existence.count(searches=1)
+            if (graph := _get_search_results(portal, query)) is None:
+                resolved = False
+                break
+            for item in graph:
+                if isinstance(item, dict):
+                    if isinstance(value := item.get(property_name), list):
+                        found_values.update({element: item for element in value})
+                    elif value is not None:
+                        found_values[value] = item
+        for value in values:
+            for identifying_path in lookups[(item_type, property_name)][value]:
+                if value in found_values:
+                    existence.set(identifying_path, True)
+                elif resolved:
+                    existence.set_missing(identifying_path)
+                else:
+                    existence.count(unresolved=1)
+    functions = []
+    for (item_type, property_name), values in lookups.items():
+        values = list(values)
+        for index in range(0, len(values), batch_size):
+            functions.append(lambda item_type=item_type, property_name=property_name,
+                             values=values[index:index + batch_size]: search(item_type, property_name, values))
+    run_concurrently(functions, nthreads=max(1, min(nthreads, len(functions))))
+    return existence
+
+
+def _get_search_results(portal: Portal, query: str) -> Optional[List[dict]]:
+    # Returns the (@graph) items for the given search query; an empty list if none, since a search
+    # with no results is a 404 (Not Found); or None if the search fails.
+    try:
+        response = portal.get(query)
+        if response.status_code == 404:
+            return []
+        if (response.status_code == 200) and isinstance(graph := response.json().get("@graph"), list):
+            return graph
+    except Exception:
+        pass
+    return None
+
+
+def _get_existence_lookup(portal: Portal, data: dict, schema_name: Optional[str],
+                          identifying_path: str) -> Optional[Tuple[str, str, str]]:
+    # Returns the (item type, property name, value) with which to search for the item with the
+    # given identifying path, i.e. whose (single, last) path component is one of its identifying values.
+    if not (value := identifying_path.strip("/").split("/")[-1]):
+        return None
+    if data.get("uuid") == value:
+        return ("Item", "uuid", value)
+    if data.get("accession") == value:
+        return ("Item", "accession", value)
+    if schema_name:
+        for property_name in portal.get_identifying_property_names(schema_name):
+            if ((data.get(property_name) == value) or
+                (isinstance(values := data.get(property_name), list) and (value in values))):  # noqa
+                return (schema_name, property_name, value)
+    return None
+
+
+class _PatchDiff:
+    """
+    Counts, for PATCHes, the items which were unchanged (i.e. whose PATCH was skipped), and those which
+    were patched, with the number of fields sent vs the number of fields given; see _get_patch_data.
+    Also caches, for the comparison of link (linkTo) values, the link types of the properties of each
+    schema, and the uuid to which each (identifying) link value resolves; see resolve_link.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._link_types = {}
+        self._links = {}
+        self.unchanged = 0
+        self.patched = 0
+        self.fields_sent = 0
+        self.fields_given = 0
+        self.links_resolved = 0
+
+    def count(self, fields_sent: Optional[int] = None, fields_given: int = 0) -> None:
+        with self._lock:
+            if fields_sent is None:
+                self.unchanged += 1
+            else:
+                self.patched += 1
+                self.fields_sent += fields_sent
+            self.fields_given += fields_given
+
+    def get_link_types(self, portal: Portal, schema_name: Optional[str]) -> dict:
+        # Returns a dictionary of the (top-level) properties of the given schema which are links (or arrays of
+        # links), i.e. with a linkTo, to the list of their link types.
+        with self._lock:
+            if (link_types := self._link_types.get(schema_name)) is not None:
+                return link_types
+        link_types = {}
+        if schema_name and isinstance(schema := _get_schema(portal, schema_name)[0], dict):
+            for property_name, property_schema in (schema.get("properties") or {}).items():
+                if isinstance(property_schema, dict) and isinstance(property_schema.get("items"), dict):
+                    property_schema = property_schema["items"]
+                if isinstance(property_schema, dict):
+                    if isinstance(link_type := property_schema.get("linkTo"), str):
+                        link_types[property_name] = [link_type]
+                    elif isinstance(link_type, list) and link_type:
+                        link_types[property_name] = link_type
+        with self._lock:
+            self._link_types[schema_name] = link_types
+        return link_types
+
+    def resolve_link(self, portal: Portal, link_types: List[str], value: str) -> Optional[str]:
+        # Returns the uuid of the item, of (one of) the given link types, to which the given link value, e.g.
+        # an identifying value (such as an alias or submitted_id) as in an insert file, resolves, or None if
+        # none; a uuid is simply returned. Cached, i.e. a single GET per (distinct) link value.
+        if is_uuid(value):
+            return value
+        with self._lock:
+            if (key := (tuple(link_types), value)) in self._links:
+                return self._links[key]
+        uuid = None
+        for link_type in link_types:
+            path = value if value.startswith("/") else f"/{link_type}/{quote(value, safe='')}"
+            if isinstance(item := portal.get_metadata(path, field="uuid", raise_exception=False), dict):
+                if isinstance(uuid := item.get("uuid"), str):
+                    break
+                uuid = None
+        with self._lock:
+            self._links[key] = uuid
+            self.links_resolved += 1
+        return uuid
+
+    def is_same(self, portal: Portal, link_types: Optional[List[str]], value: Any, existing_value: Any) -> bool:
+        # Returns True iff the given value is the same as the given existing one (from the raw frame, in which
+        # links are uuids), i.e. for a link (given link types), if (each of) its value(s) resolves to its uuid.
+        if value == existing_value:
+            return True
+        if not link_types:
+            return False
+        if isinstance(value, list) and isinstance(existing_value, list):
+            return (len(value) == len(existing_value)) and all(
+                isinstance(element, str) and (self.resolve_link(portal, link_types, element) == existing_element)
+                for element, existing_element in zip(value, existing_value))
+        return isinstance(value, str) and (self.resolve_link(portal, link_types, value) == existing_value)
+
+
+def _get_patch_data(portal: Portal, identifying_path: str, data: dict, delete_fields: Optional[str] = None,
+                    diff: Optional[_PatchDiff] = None, schema_name: Optional[str] = None,
+                    existing: Optional[dict] = None) -> Optional[dict]:
+    """
+    Returns the data to PATCH for the item with the given identifying path and (pruned) data, i.e. only
+    those fields which differ from the existing item, or None if nothing differs, and none of the given
+    (comma-separated) fields to delete exist, i.e. if the PATCH would be a no-op (and so should be skipped).
+    The existing item (its raw frame) is as given, or fetched, from the database (see _get_existing_item),
+    rather than from (ElasticSearch) search results, which may be stale, and so would hide changes since the
+    last indexing. In the raw frame links are uuids, whereas the given data may have identifying values for
+    them, e.g. aliases; so a link value (per the given schema) is the same if it resolves to the existing uuid
+    (see _PatchDiff.resolve_link). If no diff is given this returns the given data.
+    """
+    if diff is None:
+        return data
+    if (existing is None) and not isinstance(existing := portal.get_metadata(identifying_path, raw=True,
+                                                                             database=True,
+                                                                             raise_exception=False), dict):
+        diff.count(len(data), len(data))
+        return data
+    link_types = diff.get_link_types(portal, schema_name)
+    changed_data = {key: value for key, value in data.items()
+                    if (key not in existing) or not diff.is_same(portal, link_types.get(key), value, existing[key])}
+    if (not changed_data) and not (delete_fields and any(field in existing for field in delete_fields.split(","))):
+        diff.count(None, len(data))
+        return None
+    diff.count(len(changed_data), len(data))
+    return changed_data
+
 
 def _impose_special_ordering(data: List[dict], schema_name: str) -> List[dict]:
     if schema_name == "FileFormat":
@@ -319,100 +818,155 @@ def _post_data(portal: Portal, data: dict, schema_name: str,
                file: Optional[str] = None, index: int = 0,
                patch_delete_fields: Optional[str] = None,
                noignore: bool = False, ignore: Optional[List[str]] = None,
-               confirm: bool = False, verbose: bool = False, debug: bool = False) -> None:
-    ignored(patch_delete_fields)
+               confirm: bool = False, verbose: bool = False, debug: bool = False,
+               existence: Optional[_ExistenceIndex] = None, diff: Optional[_PatchDiff] = None) -> Optional[bool]:
+    ignored(patch_delete_fields, diff)
     if not (identifying_path := portal.get_identifying_path(data, portal_type=schema_name)):
         if isinstance(file, str) and isinstance(index, int):
             _print(f"ERROR: Item for POST has no identifying property: {file} (#{index + 1})")
         else:
             _print(f"ERROR: Item for POST has no identifying property.")
-        return
-    if portal.get_metadata(identifying_path, raise_exception=False):
+        return False
+    if _exists(portal, identifying_path, existence):
         _print(f"ERROR: Item for POST already exists: {identifying_path}")
-        return
+        return False
     if (confirm is True) and not yes_or_no(f"POST data for: {identifying_path} ?"):
-        return
+        return None
     if verbose:
         _print(f"POST {schema_name} item: {identifying_path}")
     try:
         data = _prune_data_for_update(data, noignore=noignore, ignore=ignore)
         portal.post_metadata(schema_name, data)
+        existence.set(identifying_path, True) if existence else None
         if debug:
             _print(f"DEBUG: POST {schema_name} item done: {identifying_path}")
+        return True
     except Exception as e:
         _print(f"ERROR: Cannot POST {schema_name} item: {identifying_path}")
         _print(get_error_message(e))
-        return
+        return False
 
 
 def _patch_data(portal: Portal, data: dict, schema_name: str,
                 file: Optional[str] = None, index: int = 0,
                 patch_delete_fields: Optional[str] = None,
                 noignore: bool = False, ignore: Optional[List[str]] = None,
-                confirm: bool = False, verbose: bool = False, debug: bool = False) -> None:
+                confirm: bool = False, verbose: bool = False, debug: bool = False,
+                existence: Optional[_ExistenceIndex] = None, diff: Optional[_PatchDiff] = None) -> Optional[bool]:
     if not (identifying_path := portal.get_identifying_path(data, portal_type=schema_name)):
         if isinstance(file, str) and isinstance(index, int):
             _print(f"ERROR: Item for PATCH has no identifying property: {file} (#{index + 1})")
         else:
             _print(f"ERROR: Item for PATCH has no identifying property.")
-        return
-    if not portal.get_metadata(identifying_path, raise_exception=False):
+        return False
+    # With a diff the existing item (fetched to compare with) also serves as the existence check.
+    existing = _get_existing_item(portal, identifying_path, existence) if diff else None
+    if not ((existing is not None) if diff else _exists(portal, identifying_path, existence)):
         _print(f"ERROR: Item for PATCH does not already exist: {identifying_path}")
-        return
+        return False
+    delete_fields = _parse_delete_fields(patch_delete_fields)
+    data = _prune_data_for_update(data, noignore=noignore, ignore=ignore)
+    if (data := _get_patch_data(portal, identifying_path, data, delete_fields,
+                                diff=diff, schema_name=schema_name, existing=existing)) is None:
+        if verbose:
+            _print(f"PATCH {schema_name} item unchanged (skipped): {identifying_path}")
+        return True
     if (confirm is True) and not yes_or_no(f"PATCH data for: {identifying_path}"):
-        return
+        return None
     if verbose:
         _print(f"PATCH {schema_name} item: {identifying_path}")
     try:
-        if delete_fields := _parse_delete_fields(patch_delete_fields):
+        if delete_fields:
             identifying_path += f"?delete_fields={delete_fields}"
-        data = _prune_data_for_update(data, noignore=noignore, ignore=ignore)
         portal.patch_metadata(identifying_path, data)
         if debug:
             _print(f"DEBUG: PATCH {schema_name} item OK: {identifying_path}")
+        return True
     except Exception as e:
         _print(f"ERROR: Cannot PATCH {schema_name} item: {identifying_path}")
         _print(e)
-        return
+        return False
 
 
 def _upsert_data(portal: Portal, data: dict, schema_name: str,
                  file: Optional[str] = None, index: int = 0,
                  patch_delete_fields: Optional[str] = None,
                  noignore: bool = False, ignore: Optional[List[str]] = None,
-                 confirm: bool = False, verbose: bool = False, debug: bool = False) -> None:
+                 confirm: bool = False, verbose: bool = False, debug: bool = False,
+                 existence: Optional[_ExistenceIndex] = None, diff: Optional[_PatchDiff] = None) -> Optional[bool]:
     if not (identifying_path := portal.get_identifying_path(data, portal_type=schema_name)):
         if isinstance(file, str) and isinstance(index, int):
             _print(f"ERROR: Item for UPSERT has no identifying property: {file} (#{index + 1})")
         else:
             _print(f"ERROR: Item for UPSERT has no identifying property.")
-        return
-    exists = portal.get_metadata(identifying_path, raise_exception=False)
+        return False
+    # With a diff the existing item (fetched to compare with) also serves as the existence check.
+    existing = _get_existing_item(portal, identifying_path, existence) if diff else None
+    if exists := ((existing is not None) if diff else _exists(portal, identifying_path, existence)):
+        delete_fields = _parse_delete_fields(patch_delete_fields)
+        data = _prune_data_for_update(data, noignore=noignore, ignore=ignore)
+        if (data := _get_patch_data(portal, identifying_path, data, delete_fields,
+                                    diff=diff, schema_name=schema_name, existing=existing)) is None:
+            if verbose:
+                _print(f"PATCH {schema_name} item unchanged (skipped): {identifying_path}")
+            return True
     if ((confirm is True) and not yes_or_no(f"{'PATCH' if exists else 'POST'} data for: {identifying_path} ?")):
-        return
+        return None
     if verbose:
         _print(f"{'PATCH' if exists else 'POST'} {schema_name} item: {identifying_path}")
     try:
         if not exists:
             data = _prune_data_for_update(data, noignore=noignore, ignore=ignore)
             portal.post_metadata(schema_name, data)
+            existence.set(identifying_path, True) if existence else None
         else:
-            if delete_fields := _parse_delete_fields(patch_delete_fields):
+            if delete_fields:
                 identifying_path += f"?delete_fields={delete_fields}"
-            data = _prune_data_for_update(data, noignore=noignore, ignore=ignore)
             portal.patch_metadata(identifying_path, data)
         if debug:
             _print(f"DEBUG: UPSERT {schema_name} item OK: {identifying_path}")
+        return True
     except Exception as e:
         _print(f"ERROR: Cannot UPSERT {schema_name} item: {identifying_path}")
         _print(e)
-        return
+        return False
+
+
+def _exists(portal: Portal, identifying_path: str, existence: Optional[_ExistenceIndex] = None) -> bool:
+    # Uses the (prefetched) existence index if possible, otherwise checks (and records) via get_metadata.
+    if existence and ((exists := existence.get(identifying_path)) is not None):
+        existence.count(saved=1)
+        return exists
+    exists = bool(portal.get_metadata(identifying_path, raise_exception=False))
+    if existence:
+        existence.set(identifying_path, exists)
+        existence.count(gets=1)
+    return exists
+
+
+def _get_existing_item(portal: Portal, identifying_path: str,
+                       existence: Optional[_ExistenceIndex] = None) -> Optional[dict]:
+    # Returns the existing item (its raw frame, from the database) for the given identifying path, or None
+    # if it does not exist; i.e. a single GET, for both the existence check (recorded in the existence index)
+    # and the PATCH diff (see _get_patch_data); none if the existence index knows that it does not exist.
+    if existence and (existence.get(identifying_path) is False):
+        existence.count(saved=1)
+        return None
+    if not isinstance(existing := portal.get_metadata(identifying_path, raw=True, database=True,
+                                                      raise_exception=False), dict):
+        existing = None
+    if existence:
+        existence.set(identifying_path, existing is not None)
+        existence.count(gets=1)
+    return existing
 
 
 def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: Optional[str] = None,
                unresolved_output: Optional[str] = False,
                skip_links: bool = False, verbose: bool = False, debug: bool = False, noprogress: bool = False,
-               nohack: bool = False, _single_insert_file: Optional[str] = None) -> bool:
+               nohack: bool = False, journal: Optional[PortalUpdateJournal] = None,
+               telemetry: Optional[str] = None, telemetry_interval: Optional[float] = None,
+               _single_insert_file: Optional[str] = None) -> bool:
 
     import snovault.loadxl
     from snovault.loadxl import load_all_gen, LoadGenWrapper
@@ -449,13 +1003,45 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
     loadxl_output = []
     loadxl_total_item_count = 0
     loadxl_total_error_count = 0
+    loadxl_telemetry = None
+
+    # An item (uuid) is journaled as completed once loadxl has yielded it (without error) for each of its
+    # (two) passes, or at the end of the load for any seen only once (e.g. with skip_links); and as failed
+    # upon any error for it; the journal key is set (below) from the content hash of the input file(s).
+    journal_key = None
+    journal_seen = {}
+    journal_failures = set()
+
+    def journal_completed(identifying_value: Optional[str]) -> None:
+        nonlocal journal_key, journal_seen, journal_failures
+        if not (journal and journal_key):
+            return
+        if identifying_value is None:
+            for identity in [identity for identity in journal_seen if identity not in journal_failures]:
+                journal.record(journal_key, identity, True)
+            journal_seen = {}
+        elif (identity := identifying_value.strip("/")) and (identity not in journal_failures):
+            if (seen := journal_seen.get(identity, 0) + 1) >= 2:
+                journal.record(journal_key, identity, True)
+                del journal_seen[identity]
+            else:
+                journal_seen[identity] = seen
+
+    def journal_failed(identifying_value: str, message: str) -> None:
+        nonlocal journal_key, journal_seen, journal_failures
+        if journal and journal_key and (identity := identifying_value.strip("/")):
+            journal.record(journal_key, identity, False, message=message[:200])
+            journal_failures.add(identity)
+            journal_seen.pop(identity, None)
 
     def loadxl(portal: Portal, inserts_directory: str, schema_names_to_load: dict):
 
         nonlocal LoadGenWrapper, load_all_gen, loadxl_summary, verbose, debug, nohack
-        nonlocal loadxl_total_item_count, loadxl_total_error_count
+        nonlocal loadxl_total_item_count, loadxl_total_error_count, loadxl_telemetry
         progress_total = sum(schema_names_to_load.values()) * 2  # loadxl does two passes
         progress_bar = ProgressBar(progress_total, interrupt_exit=True) if not noprogress else None
+        load_telemetry = loadxl_telemetry = _create_load_telemetry(telemetry, telemetry_interval, progress_total,
+                                                                   progress=progress_bar is not None)
 
         def decode_bytes(str_or_bytes: Union[str, bytes], *, encoding: str = "utf-8") -> str:
             if not isinstance(encoding, str):
@@ -491,6 +1077,7 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
             if (action := LOADXL_ACTION_NAME[match.group(1).upper()]) == "Error":
                 loadxl_total_error_count += 1
                 identifying_value = match.group(2)
+                journal_failed(identifying_value, item)
                 #
                 # Example message for unresolved link ...
                 #
@@ -515,6 +1102,7 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
                 if (item_type := re.search(r"https?://.*/(.*)\?skip_indexing=.*", item)) and (len(item_type.groups()) == 1):  # noqa
                     item_type = to_snake_case(item_type.group(1))
                     identifying_value = f"/{to_camel_case(item_type)}{identifying_value}"
+                load_telemetry.record(item_type or None, match.group(1), item) if load_telemetry else None
                 unresolved_link_error_message_prefix = "Unable to resolve link:"
                 if (i := item.find(unresolved_link_error_message_prefix)) > 0:
                     unresolved_link = item[i + len(unresolved_link_error_message_prefix):].strip()
@@ -528,6 +1116,8 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
                     continue
             else:
                 item_type = match.group(3)
+                journal_completed(match.group(2))
+                load_telemetry.record(item_type, match.group(1)) if load_telemetry else None
             if current_item_type != item_type:
                 if noprogress and debug and current_item_type is not None:
                     _print()
@@ -544,6 +1134,7 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
                 progress_bar.set_progress(loadxl_total_item_count)
             elif debug:
                 _print(f"{current_item_type}: {current_item_count} or {current_item_total} ({action})")
+        journal_completed(None)
         if progress_bar:
             progress_bar.set_description("▶ Load Complete")
             progress_bar.set_progress(progress_total)
@@ -567,6 +1158,43 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
         inserts_file = load
 
     if inserts_file:
+        # A list of items, or a dictionary of lists of items by schema name, is streamed (see iterate_json_items)
+        # into schema named files in a temporary directory, from which it is loaded; anything else, e.g. a single
+        # object (or an empty list or dictionary), is simply loaded and handled below. A (dictionary) value which
+        # is not a list is ignored (skipped).
+        def skip_inserts(schema_name: str) -> None:  # noqa
+            _print(f"Unexpected value for data type ({schema_name}) in JSON data file: {inserts_file} ▶ ignoring")
+        try:
+            inserts = iterate_json_items(inserts_file, skip=skip_inserts)
+            first_insert = next(inserts, None)
+        except Exception:
+            first_insert = None
+        if first_insert and ((first_insert[0] is None) or _is_schema_name_list(portal, [first_insert[0]])):
+            schema_name = None
+            if first_insert[0] is None:
+                if not (schema_name := explicit_schema_name):
+                    if not (schema_name := _get_schema_name_from_schema_named_json_file_name(portal, inserts_file)):
+                        _print(f"Unable to determine schema name for JSON data file: {inserts_file}")
+                        return False
+                elif not (schema_name := _get_schema(portal, explicit_schema_name)[1]):
+                    _print(f"Unknown specified schema name: {explicit_schema_name}")
+                    return False
+            elif explicit_schema_name:
+                _print(f"Ignoring specify --schema: {explicit_schema_name}")
+            with temporary_directory() as tmpdir:
+                try:
+                    _write_inserts_files(chain([first_insert], inserts), tmpdir, schema_name)
+                except Exception:
+                    _print(f"Cannot load JSON data from file: {inserts_file}")
+                    return False
+                return _load_data(portal=portal, load=tmpdir, ini_file=ini_file, explicit_schema_name=schema_name,
+                                  unresolved_output=unresolved_output,
+                                  skip_links=skip_links, verbose=verbose, debug=debug, noprogress=noprogress,
+                                  nohack=nohack, journal=journal,
+                                  telemetry=telemetry, telemetry_interval=telemetry_interval,
+                                  _single_insert_file=inserts_file)
+        elif first_insert:
+            inserts.close()
         with io.open(inserts_file, "r") as f:
             try:
                 data = json.load(f)
@@ -588,7 +1216,9 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
                     return _load_data(portal=portal, load=tmpdir, ini_file=ini_file, explicit_schema_name=schema_name,
                                       unresolved_output=unresolved_output,
                                       skip_links=skip_links, verbose=verbose, debug=debug, noprogress=noprogress,
-                                      nohack=nohack, _single_insert_file=inserts_file)
+                                      nohack=nohack, journal=journal,
+                                      telemetry=telemetry, telemetry_interval=telemetry_interval,
+                                      _single_insert_file=inserts_file)
             elif isinstance(data, dict):
                 if schema_name := explicit_schema_name:
                     if _is_schema_name_list(portal, schema_names := list(data.keys())):
@@ -619,7 +1249,9 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
                         return _load_data(portal=portal, load=tmpdir, ini_file=ini_file,
                                           unresolved_output=unresolved_output,
                                           skip_links=skip_links, verbose=verbose, debug=debug, noprogress=noprogress,
-                                          nohack=nohack, _single_insert_file=inserts_file)
+                                          nohack=nohack, journal=journal,
+                                          telemetry=telemetry, telemetry_interval=telemetry_interval,
+                                          _single_insert_file=inserts_file)
                 return True
             else:
                 _print(f"Unrecognized JSON data in file: {inserts_file}")
@@ -636,66 +1268,74 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
     schema_snake_case_names = [to_snake_case(item) for item in schema_names]
     schema_names_to_load = {}
 
+    # Files are only counted here (streamed; see _count_json_items); any (single schema) inserts dictionary
+    # files, i.e. misnamed or misformatted, are streamed into schema named files below, without loading them.
     copy_to_temporary_directory = False
     data_from_misnamed_files = {}
     skip_misformated_files = []
     for json_file_path in glob.glob(os.path.join(inserts_directory, "*.json")):
         json_file_name = os.path.basename(json_file_path)
         schema_name = os.path.basename(json_file_name)[:-len(".json")]
-        if (schema_name not in schema_snake_case_names) and (schema_name not in schema_names):
-            copying_misnamed_file_data = False
-            if True:
-                with io.open(json_file_path, "r") as f:
-                    if (isinstance(data := json.load(f), dict) and (len(data) == 1) and
-                        (((schema_name := next(iter(data))) in schema_names) or
-                         (schema_name in schema_snake_case_names)) and
-                        isinstance(data[schema_name], list)):  # noqa
-                        if debug:
-                            _print(f"Reformatting misformatted {schema_name} file: {json_file_path}")
-                        schema_snake_case_name = to_snake_case(schema_name)
-                        if schema_snake_case_name not in data_from_misnamed_files:
-                            data_from_misnamed_files[schema_snake_case_name] = data[schema_name]
-                        else:
-                            data_from_misnamed_files[schema_snake_case_name].extend(data[schema_name])
-                        schema_names_to_load[schema_snake_case_name] = len(data[schema_name])
-                        copying_misnamed_file_data = True
-            if not copying_misnamed_file_data:
-                _print(f"File is not named for a known schema: {json_file_name} ▶ ignoring")
+        try:
+            counts = _count_json_items(json_file_path)
+        except Exception:
+            counts = None
+        if ((misformatted_schema_name := (next(iter(counts)) if counts and (len(counts) == 1) else None)) and
+            ((misformatted_schema_name in schema_names) or (misformatted_schema_name in schema_snake_case_names))):  # noqa
+            if debug:
+                _print(f"Reformatting misformatted {misformatted_schema_name} file: {json_file_path}")
+            schema_snake_case_name = to_snake_case(misformatted_schema_name)
+            data_from_misnamed_files.setdefault(schema_snake_case_name, []).append(
+                (json_file_path, misformatted_schema_name))
+            schema_names_to_load[schema_snake_case_name] = (
+                schema_names_to_load.get(schema_snake_case_name, 0) + counts[misformatted_schema_name])
+            if (schema_name in schema_snake_case_names) or (schema_name in schema_names):
+                if debug:
+                    _print(f"Skipping misformatted file: {json_file_path}")
+                skip_misformated_files.append(json_file_path)
+            copy_to_temporary_directory = True
+        elif (schema_name not in schema_snake_case_names) and (schema_name not in schema_names):
+            _print(f"File is not named for a known schema: {json_file_name} ▶ ignoring")
+            copy_to_temporary_directory = True
+        elif counts is None:
+            _print(f"Cannot load JSON data from file: {json_file_path} ▶ ignoring")
+            copy_to_temporary_directory = True
+        elif None not in counts:
+            _print(f"Data JSON file does not contain an array: {json_file_path} ▶ ignoring")
+            copy_to_temporary_directory = True
+        elif (nobjects := counts[None]) < 1:
+            _print(f"Data JSON file contains no items: {json_file_path} ▶ ignoring")
             copy_to_temporary_directory = True
         else:
-            try:
-                with io.open(json_file_path, "r") as f:
-                    if not isinstance(data := json.load(f), list):
-                        if (isinstance(data, dict) and (len(data) == 1) and
-                            (((schema_name := next(iter(data))) in schema_names) or
-                             (schema_name in schema_snake_case_names)) and
-                            isinstance(data[schema_name], list)):  # noqa
-                            if debug:
-                                _print(f"Reformatting misformatted file: {json_file_path}")
-                            schema_snake_case_name = to_snake_case(schema_name)
-                            if schema_snake_case_name not in data_from_misnamed_files:
-                                data_from_misnamed_files[schema_snake_case_name] = data[schema_name]
-                            else:
-                                data_from_misnamed_files[schema_snake_case_name].extend(data[schema_name])
-                            schema_names_to_load[schema_snake_case_name] = len(data[schema_name])
-                            copying_misnamed_file_data = True
-                            if debug:
-                                _print(f"Skipping misformatted file: {json_file_path}")
-                            skip_misformated_files.append(json_file_path)
-                        else:
-                            _print(f"Data JSON file does not contain an array: {json_file_path} ▶ ignoring")
-                        copy_to_temporary_directory = True
-                    elif (nobjects := len(data)) < 1:
-                        _print(f"Data JSON file contains no items: {json_file_path} ▶ ignoring")
-                        copy_to_temporary_directory = True
-                    else:
-                        schema_names_to_load[schema_name] = nobjects
-            except Exception:
-                _print(f"Cannot load JSON data from file: {json_file_path} ▶ ignoring")
-                copy_to_temporary_directory = True
+            schema_names_to_load[schema_name] = schema_names_to_load.get(schema_name, 0) + nobjects
     if not schema_names_to_load:
         _print(f"Directory contains no valid data: {inserts_directory}")
         return False
+    if journal:
+        journal_key = PortalUpdateJournal.key(
+            _get_journal_target(portal, ini_file), "LOAD",
+            PortalUpdateJournal.hash_files([_single_insert_file] if _single_insert_file
+                                           else glob.glob(os.path.join(inserts_directory, "*.json"))))
+
+    def resumable_loadxl(portal: Portal, inserts_directory: str, schema_names_to_load: dict):
+        # If resuming, loads (from a temporary directory) only the items not already completed per the journal;
+        # the telemetry summary (if any) is emitted even if the load is interrupted.
+        nonlocal journal, journal_key, loadxl_telemetry, loadxl_unresolved
+        try:
+            if not (journal and journal.resume):
+                return loadxl(portal=portal, inserts_directory=inserts_directory,
+                              schema_names_to_load=schema_names_to_load)
+            with temporary_directory() as tmpdir:
+                _copy_inserts_not_journaled(inserts_directory, tmpdir, journal, journal_key, schema_names_to_load)
+                if journal.skipped > 0:
+                    _print(f"Items already loaded (resumed; skipping): {journal.skipped}")
+                if not schema_names_to_load:
+                    _print(f"All items already loaded (per journal): {journal.file}")
+                    return
+                loadxl(portal=portal, inserts_directory=tmpdir, schema_names_to_load=schema_names_to_load)
+        finally:
+            _emit_load_telemetry(telemetry, loadxl_telemetry, loadxl_unresolved) if loadxl_telemetry else None
+
     if copy_to_temporary_directory:
         with temporary_directory() as tmpdir:
             if debug:
@@ -707,26 +1347,15 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
                 schema_name = os.path.basename(json_file_name)[:-len(".json")]
                 if (schema_name in schema_snake_case_names) or (schema_name in schema_names):
                     shutil.copy(json_file_path, tmpdir)
-            if data_from_misnamed_files:
-                for data_from_misnamed_file in data_from_misnamed_files:
-                    renamed_json_file_path = os.path.join(tmpdir, f"{data_from_misnamed_file}.json")
-                    if not os.path.exists(renamed_json_file_path):
-                        if debug:
-                            _print(f"Copying data from misnamed or misformatted file(s): {renamed_json_file_path}")
-                        with io.open(renamed_json_file_path, "w") as f:
-                            json.dump(data_from_misnamed_files[data_from_misnamed_file], f)
-                    else:
-                        if debug:
-                            _print(f"Appending data from misnamed or misformatted file(s): {renamed_json_file_path}")
-                        with io.open(renamed_json_file_path, "r") as f:
-                            existing_data_for_renamed_json_file = json.load(f)
-                            existing_data_for_renamed_json_file.extend(
-                                data_from_misnamed_files[data_from_misnamed_file])
-                        with io.open(renamed_json_file_path, "w") as f:
-                            json.dump(existing_data_for_renamed_json_file, f)
-            loadxl(portal=portal, inserts_directory=tmpdir, schema_names_to_load=schema_names_to_load)
+            for data_from_misnamed_file, sources in data_from_misnamed_files.items():
+                renamed_json_file_path = os.path.join(tmpdir, f"{data_from_misnamed_file}.json")
+                if debug:
+                    _print(f"{'Appending' if os.path.exists(renamed_json_file_path) else 'Copying'} data from"
+                           f" misnamed or misformatted file(s): {renamed_json_file_path}")
+                _append_inserts_file(renamed_json_file_path, sources)
+            resumable_loadxl(portal=portal, inserts_directory=tmpdir, schema_names_to_load=schema_names_to_load)
     else:
-        loadxl(portal=portal, inserts_directory=inserts_directory, schema_names_to_load=schema_names_to_load)
+        resumable_loadxl(portal=portal, inserts_directory=inserts_directory, schema_names_to_load=schema_names_to_load)
 
     if verbose:
         if _single_insert_file:
@@ -764,6 +1393,116 @@ def _load_data(portal: Portal, load: str, ini_file: str, explicit_schema_name: O
     return True
 
 
+def _create_load_telemetry(telemetry: Optional[str], interval: Optional[float],
+                           total: int, progress: bool = False) -> Optional[PortalLoadTelemetry]:
+    # Periodic snapshots go to the given telemetry file (NDJSON), or if none (i.e. "-") are printed
+    # to stdout, but only if there is no progress bar (which already shows progress).
+    if not telemetry:
+        return None
+    if telemetry != "-":
+        def emit(snapshot: dict) -> None:  # noqa
+            _append_load_telemetry(telemetry, {"snapshot": snapshot})
+    elif not progress:
+        def emit(snapshot: dict) -> None:  # noqa
+            _print(f"Load telemetry: {json.dumps(snapshot)}")
+    else:
+        emit = None
+    return PortalLoadTelemetry(total=total, interval=interval, emit=emit)
+
+
+def _emit_load_telemetry(telemetry: str, load_telemetry: PortalLoadTelemetry, unresolved: dict) -> None:
+    summary = load_telemetry.summary()
+    summary["errors"]["unresolved_references"] = {link: len(items) for link, items in unresolved.items()}
+    if telemetry != "-":
+        _append_load_telemetry(telemetry, {"summary": summary})
+    else:
+        _print(json.dumps({"summary": summary}, indent=4))
+
+
+def _append_load_telemetry(file: str, record: dict) -> None:
+    try:
+        with io.open(os.path.expanduser(file), "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    except Exception as e:
+        _print(f"ERROR: Cannot write load telemetry to file: {file} {chars.dot} {get_error_message(e)}")
+
+
+def _copy_inserts_not_journaled(inserts_directory: str, target_directory: str,
+                                journal: PortalUpdateJournal, journal_key: str, schema_names_to_load: dict) -> None:
+    # Copies the (schema named) JSON files in the given inserts directory to the given target directory,
+    # without the items (by uuid) already completed per the journal, updating the given schema_names_to_load
+    # counts accordingly (and removing any schema with no items left to load); streamed, an item at a time.
+    for json_file_path in glob.glob(os.path.join(inserts_directory, "*.json")):
+        schema_name = os.path.basename(json_file_path)[:-len(".json")]
+        if schema_name not in schema_names_to_load:
+            continue
+        target_file_path = os.path.join(target_directory, os.path.basename(json_file_path))
+        try:
+            with io.open(target_file_path, "w") as f, JsonArrayWriter(f) as writer:
+                for _, item in iterate_json_items(json_file_path, dictionary=False):
+                    if not (isinstance(item, dict) and isinstance(uuid := item.get("uuid"), str)
+                            and journal.is_completed(journal_key, uuid)):
+                        writer.write(item)
+        except ValueError:
+            shutil.copy(json_file_path, target_file_path)
+            continue
+        if writer.count == 0:
+            os.remove(target_file_path)
+            del schema_names_to_load[schema_name]
+            continue
+        schema_names_to_load[schema_name] = writer.count
+
+
+def _count_json_items(file: str) -> Optional[dict]:
+    # Returns the number of items (streamed; see iterate_json_items) in the given JSON file, as a dictionary
+    # with a (single) None key if it contains a list of items, or by key if a dictionary of lists of items;
+    # or None if it contains anything else (or is not valid JSON).
+    for dictionary in (False, True):
+        counts = {None: 0} if dictionary is False else {}
+        try:
+            for key, _ in iterate_json_items(file, dictionary=dictionary):
+                counts[key] = counts.get(key, 0) + 1
+            return counts
+        except ValueError:
+            pass
+    return None
+
+
+def _write_inserts_files(items: Iterable[Tuple[Optional[str], Any]], directory: str,
+                         schema_name: Optional[str] = None) -> dict:
+    # Writes the given items, as yielded by iterate_json_items, an item at a time, to schema named JSON files
+    # (for the given schema name for any items without one) in the given directory; returns their counts.
+    counts = {}
+    writers = {}
+    try:
+        for item_schema_name, item in items:
+            if (item_schema_name := to_snake_case(item_schema_name or schema_name)) not in writers:
+                f = io.open(os.path.join(directory, f"{item_schema_name}.json"), "w")
+                writers[item_schema_name] = (f, JsonArrayWriter(f))
+                counts[item_schema_name] = 0
+            writers[item_schema_name][1].write(item)
+            counts[item_schema_name] += 1
+    finally:
+        for f, writer in writers.values():
+            writer.close()
+            f.close()
+    return counts
+
+
+def _append_inserts_file(file: str, sources: List[Tuple[str, str]]) -> None:
+    # Writes (or appends to, if it exists) the given JSON file containing a list of items, the items for the
+    # given schema name from each of the given (file, schema name) sources, each a dictionary of lists of items
+    # by schema name; streamed, an item at a time, to a temporary file which replaces the given file when done.
+    with AtomicFileWriter(file) as f, JsonArrayWriter(f) as writer:
+        if os.path.exists(file):
+            for _, item in iterate_json_items(file, dictionary=False):
+                writer.write(item)
+        for source_file, source_schema_name in sources:
+            for schema_name, item in iterate_json_items(source_file, dictionary=True):
+                if schema_name == source_schema_name:
+                    writer.write(item)
+
+
 def _is_schema_name_list(portal: Portal, keys: list) -> bool:
     if isinstance(keys, list):
         for key in keys:
@@ -847,10 +1586,29 @@ def _create_portal(env: Optional[str] = None, ini: Optional[str] = None, app: Op
     return portal
 
 
-def _read_json_from_file(file: str) -> Optional[dict]:
+def _read_json_from_file(file: str) -> Optional[Union[dict, list]]:
+    # A list of items, or a dictionary of lists of items by schema name, is streamed (see iterate_json_items),
+    # so that the (possibly very large) file content is never entirely in memory along with its parsed items;
+    # anything else, e.g. a single object, is simply loaded. The items are returned (not yielded) since all of
+    # them, from all files, are needed to order them into dependency layers (see _order_updates_into_layers).
+    # A (dictionary) value which is not a list is ignored (skipped).
+    def skip(schema_name: str) -> None:  # noqa
+        _print(f"WARNING: File ({file}) contains schema item which is not a list: {schema_name}")
     try:
         if not os.path.exists(file):
             return None
+        try:
+            data = None
+            for schema_name, item in iterate_json_items(file, skip=skip):
+                if data is None:
+                    data = [] if schema_name is None else {}
+                if schema_name is None:
+                    data.append(item)
+                else:
+                    data.setdefault(schema_name, []).append(item)
+            return data
+        except ValueError:
+            pass
         with io.open(file, "r") as f:
             try:
                 return json.load(f)
@@ -69,6 +69,7 @@ from dcicutils.command_utils import yes_or_no
 from dcicutils.misc_utils import get_error_message, PRINT, to_snake_case
 from dcicutils.portal_utils import Portal
 from hms_utils.dictionary_utils import sort_dictionary
+from hms_utils.portal.portal_disk_cache import DEFAULT_PORTAL_DISK_CACHE_FILE, PortalDiskCache
 from hms_utils.threading_utils import run_concurrently
 from hms_utils.type_utils import is_uuid
 
@@ -127,6 +128,12 @@ def main():
     parser.add_argument("--force", action="store_true", required=False, default=False, help="Debugging output.")
     parser.add_argument("--sort", action="store_true", required=False, default=False, help="Sort output.")
     parser.add_argument("--terse", action="store_true", required=False, default=False, help="Terse output.")
+    parser.add_argument("--cache", action="store_true", required=False, default=False,
+                        help="Use (and update) the persistent Portal response disk cache.")
+    parser.add_argument("--cache-file", type=str, required=False, default=None,
+                        help=f"Portal response disk cache file (default: {DEFAULT_PORTAL_DISK_CACHE_FILE}).")
+    parser.add_argument("--cache-max-age", type=int, required=False, default=None,
+                        help="Maximum age (seconds) of disk cached responses before revalidation (default: 0).")
     parser.add_argument("--verbose", action="store_true", required=False, default=False, help="Verbose output.")
     parser.add_argument("--noheader", action="store_true", required=False, default=False, help="Supress header output.")
     parser.add_argument("--debug", action="store_true", required=False, default=False, help="Debugging output.")
@@ -140,6 +147,13 @@ def main():
         _print("UUID or schema or path required.")
         _exit(1)
 
+    disk_cache = None
+    if args.cache or args.cache_file:
+        try:
+            disk_cache = PortalDiskCache(portal.env or portal.server, file=args.cache_file, max_age=args.cache_max_age)
+        except Exception as e:
+            _exit(f"Cannot open Portal response disk cache: {get_error_message(e)}")
+
     if args.insert_files:
         args.inserts = True
         if args.output:
@@ -213,8 +227,8 @@ def main():
 
     data = _get_portal_object(portal=portal, uuid=args.uuid, raw=args.raw, database=args.database,
                               inserts=args.inserts, insert_files=args.insert_files,
-                              ignore=args.ignore, check=args.check,
-                              force=args.force, verbose=args.verbose, debug=args.debug)
+                              ignore=args.ignore, check=args.check, force=args.force,
+                              disk_cache=disk_cache, verbose=args.verbose, debug=args.debug)
     if args.insert_files:
         return
 
@@ -253,7 +267,7 @@ def main():
                                                raw=args.raw, database=args.database,
                                                inserts=args.inserts, insert_files=args.insert_files,
                                                ignore=args.ignore, check=args.check, force=args.force,
-                                               verbose=args.verbose, debug=args.debug))
+                                               disk_cache=disk_cache, verbose=args.verbose, debug=args.debug))
                         fetched_referenced_uuids.append(referenced_uuid)
                     fetch_reference_functions.append(
                         lambda referenced_uuid=referenced_uuid: fetch_reference(referenced_uuid))
@@ -347,6 +361,7 @@ def _get_portal_object(portal: Portal, uuid: str,
                        inserts: bool = False, insert_files: bool = False,
                        ignore: Optional[List[str]] = None,
                        check: bool = False, force: bool = False,
+                       disk_cache: Optional[PortalDiskCache] = None,
                        verbose: bool = False, debug: bool = False) -> dict:
 
     def prune_data(data: dict) -> dict:
@@ -437,6 +452,11 @@ def _get_portal_object(portal: Portal, uuid: str,
             if insert_files:
                 write_insert_files(response)
             return response
+    elif (disk_cache is not None) and ((response := _get_portal_object_from_disk_cache(
+            portal, path := uuid if uuid.startswith("/") else f"/{uuid}",
+            raw=raw or inserts, database=database, disk_cache=disk_cache)) is not None):
+        if verbose:
+            _print(f"Using Portal object from disk cache: {uuid}")
     else:
         response = None
         try:
@@ -464,7 +484,11 @@ def _get_portal_object(portal: Portal, uuid: str,
             _exit(f"Invalid status code ({response.status_code}) getting Portal object from {portal.server}: {uuid}")
         if not response.json:
             _exit(f"Invalid JSON getting Portal object: {uuid}")
+        etag = response.headers.get("ETag")
         response = response.json()
+        if disk_cache is not None:
+            disk_cache.store(path, response, frame=PortalDiskCache.frame(raw=raw or inserts, database=database),
+                             etag=etag)
 
     response_types = {}
     if inserts:
@@ -539,6 +563,24 @@ def _get_portal_object(portal: Portal, uuid: str,
     return response
 
 
+def _get_portal_object_from_disk_cache(portal: Portal, path: str, raw: bool = False, database: bool = False,
+                                       disk_cache: Optional[PortalDiskCache] = None) -> Optional[dict]:
+    def get(query: str) -> Optional[dict]:  # noqa
+        if (response := portal.get(query)) is not None and (response.status_code == 200):
+            return response.json()
+        return None
+    def revalidate(entry: PortalDiskCache.Entry) -> bool:  # noqa
+        if entry.etag:
+            # Conditional request; the Portal responds with 304 (Not Modified) if the ETag still matches.
+            return portal.get(path, raw=raw, database=database,
+                              headers={"Content-type": Portal.MIME_TYPE_JSON, "Accept": Portal.MIME_TYPE_JSON,
+                                       "If-None-Match": entry.etag}).status_code == 304
+        return PortalDiskCache.revalidate_by_date_modified(path, entry, get)
+    if disk_cache is None:
+        return None
+    return disk_cache.get(path, frame=PortalDiskCache.frame(raw=raw, database=database), revalidate=revalidate)
+
+
 def one_or_more_objects_of_types_exists(portal: Portal, schema_types: List[str], debug: bool = False) -> bool:
     for schema_type in schema_types:
         if one_or_more_objects_of_type_exists(portal, schema_type, debug=debug):
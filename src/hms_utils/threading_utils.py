@@ -1,16 +1,155 @@
+from __future__ import annotations
+import asyncio
+import collections
 import concurrent.futures
-from typing import Callable, Iterable
+import inspect
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Union
 
+_ASYNCHRONOUS_CONCURRENCY = 100
+_CONCURRENT_PENDING_PER_THREAD = 4
 
-def run_concurrently(functions: Iterable[Callable], nthreads: int = 4) -> None:
+
+def run_concurrently(functions: Iterable[Callable], nthreads: int = 4, asynchronous: bool = False,
+                     timeout: Optional[float] = None, raise_exception: bool = False) -> List[Any]:
+    """
+    Calls the given functions concurrently, with (at most) nthreads at a time, and returns their results,
+    in the same order as the given functions, which are consumed lazily (e.g. from a generator). By default
+    an exception raised by a function is ignored (and its result is None); if raise_exception is True then
+    the first such exception is raised. If asynchronous is True then the functions are run via
+    run_asynchronously (with a concurrency of nthreads), where the functions may be coroutine functions,
+    and a (per-function) timeout (in seconds) may be given; remaining functions are cancelled upon a
+    raised exception.
+    """
     # FYI: Not pulling in from dcicutils.misc_utils becausethere is
     # a call to logging.basicConfig() which is (for some reason) causing
     # exceptions within the asynchronous function calls to be output.
     if not (isinstance(nthreads, int) and (nthreads >= 0)):
         nthreads = 4
+    if asynchronous is True:
+        results = run_asynchronously(functions, concurrency=max(nthreads, 1),
+                                     timeout=timeout, return_exceptions=raise_exception is not True)
+        return [None if isinstance(result, BaseException) else result for result in results]
+    results = []
     if nthreads == 0:
         for function in functions:
-            function()
-        return
+            try:
+                results.append(function())
+            except Exception:
+                if raise_exception is True:
+                    raise
+                results.append(None)
+        return results
+    # The functions are consumed lazily, with (at most) a bounded number of them submitted but not yet done,
+    # so that they may be produced, e.g. from a (large) file being parsed, while earlier ones are running.
+    futures = collections.deque()
+    def collect_result() -> None:  # noqa
+        try:
+            results.append(futures.popleft().result())
+        except Exception:
+            if raise_exception is True:
+                for pending_future in futures:
+                    pending_future.cancel()
+                raise
+            results.append(None)
     with concurrent.futures.ThreadPoolExecutor(max_workers=nthreads) as executor:
-        concurrent.futures.as_completed([executor.submit(f) for f in functions])
+        for function in functions:
+            futures.append(executor.submit(function))
+            if len(futures) >= nthreads * _CONCURRENT_PENDING_PER_THREAD:
+                collect_result()
+        while futures:
+            collect_result()
+    return results
+
+
+def run_asynchronously(functions: Iterable[Callable], concurrency: Optional[int] = None,
+                       timeout: Optional[float] = None, return_exceptions: bool = False) -> List[Any]:
+    """
+    Synchronous wrapper for run_coroutines, i.e. runs it in a new event loop and returns its results;
+    so must not be called from a running event loop (in the same thread); use run_coroutines there.
+    """
+    return asyncio.run(run_coroutines(functions, concurrency=concurrency,
+                                      timeout=timeout, return_exceptions=return_exceptions))
+
+
+async def run_coroutines(functions: Iterable[Union[Callable[[], Union[Awaitable, Any]], Awaitable]],
+                         concurrency: Optional[int] = None, timeout: Optional[float] = None,
+                         return_exceptions: bool = False) -> List[Any]:
+    """
+    Calls the given functions, with (at most) concurrency of them in progress at a time, and returns
+    their results in the same order as the given functions. Coroutine functions (e.g. for asynchronous
+    I/O, including functools.partial objects of them), or coroutines, are awaited in this event loop;
+    other (blocking) functions are run in a pool of (concurrency) threads. If a per-function timeout
+    (in seconds) is given then a function which does not complete within it is cancelled (one running
+    in a thread is just abandoned) and raises asyncio.TimeoutError. If return_exceptions is True then
+    an exception raised by a function is returned as its result; otherwise the first exception cancels
+    the remaining functions and is raised. If this is itself cancelled then so are all of the functions
+    in progress. The given functions are consumed lazily, so only concurrency of them are pending at once.
+    """
+    if not (isinstance(concurrency, int) and (concurrency > 0)):
+        concurrency = _ASYNCHRONOUS_CONCURRENCY
+    if not (isinstance(timeout, (int, float)) and (timeout > 0)):
+        timeout = None
+    functions = enumerate(functions)
+    results = {}
+    executor = None
+    loop = asyncio.get_running_loop()
+    async def call(function: Callable) -> Any:  # noqa
+        nonlocal executor
+        if inspect.isawaitable(function):
+            return await function
+        if inspect.iscoroutinefunction(function):
+            return await function()
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+        result = await loop.run_in_executor(executor, function)
+        return (await result) if inspect.isawaitable(result) else result
+    async def worker() -> None:  # noqa
+        for index, function in functions:
+            try:
+                results[index] = await asyncio.wait_for(call(function), timeout)
+            except Exception as e:
+                if return_exceptions is not True:
+                    raise
+                results[index] = e
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return [results[index] for index in sorted(results)]
+
+
+class RateLimiter:
+    """
+    Limits the rate at which callers (from any number of threads) of wait proceed to (at most) the given
+    rate per second, i.e. each call blocks until (at least) 1/rate seconds after the previous one proceeded
+    (or was scheduled to). If no (positive) rate is given then there is no limit.
+    """
+
+    def __init__(self, rate: Optional[float] = None) -> None:
+        self._rate = rate if isinstance(rate, (int, float)) and (rate > 0) else None
+        self._interval = (1 / self._rate) if self._rate else 0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self._rate
+
+    def wait(self) -> float:
+        # Returns the number of seconds waited.
+        if not self._interval:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next)
+            self._next = scheduled + self._interval
+        if (delay := scheduled - now) > 0:
+            time.sleep(delay)
+        return delay
@@ -1,8 +1,13 @@
 import io
 import json
 import os
+import pytest
 from hms_utils.dictionary_utils import group_items_by, group_items_by_groupings
 from hms_utils.dictionary_utils import compare_dictionaries_ordered, get_properties
+from hms_utils.dictionary_utils import get_referenced_uuids, get_referenced_uuids_from_items
+from hms_utils.dictionary_utils import compile_property_path, get_property
+from hms_utils.dictionary_utils import DependencyCycleError, order_dictionary_by_dependencies
+from hms_utils.dictionary_utils import order_dictionary_by_dependency_layers
 
 
 def test_get_properties_a():
@@ -786,3 +791,110 @@ def test_group_items_by_a():
     }
     assert result == expected_result
     assert compare_dictionaries_ordered(result, expected_result)
+
+
+def test_group_items_by_groupings_c():
+    items = [
+        {"uuid": "a", "status": "released", "sets": [{"center": "c1"}, {"center": "c2"}]},
+        {"uuid": "b", "status": "released", "sets": [{"center": "c1"}]},
+        {"uuid": "c", "status": "public"},
+        {"status": "public", "sets": [{"center": "c1"}]},  # No uuid so not in sub groups.
+        {"uuid": "d", "sets": [{"center": "c2"}]}
+    ]
+    result = group_items_by_groupings(items, ["status", "sets.center"], sort=True, noitems=True)
+    assert result == {
+        "group": "status", "item_count": 5, "unique_item_count": 5, "group_count": 3,
+        "group_items": {
+            "public": {"group": "sets.center", "item_count": 1, "unique_item_count": 1, "group_count": 1,
+                       "group_items": {None: 1}},
+            "released": {"group": "sets.center", "item_count": 3, "unique_item_count": 2, "group_count": 2,
+                         "group_items": {"c1": 2, "c2": 1}},
+            None: {"group": "sets.center", "item_count": 1, "unique_item_count": 1, "group_count": 1,
+                   "group_items": {"c2": 1}}
+        }
+    }
+    assert list(result["group_items"]) == ["public", "released", None]
+    result = group_items_by_groupings(items, ["sets.center", "status"], omit_unique_items_count=True)
+    assert result["group_items"]["c1"] == {"group": "status", "item_count": 2, "group_count": 1,
+                                           "group_items": {"released": ["a", "b"]}}
+    assert list(result["group_items"]) == [None, "c1", "c2"]
+
+
+def test_compile_property_path():
+    item = {"status": "released", "last_modified": {"date_modified": "2024-11-28"},
+            "file_sets": [{"libraries": [{"code": "A"}, {"code": "B"}, {}]}, {"libraries": [{"code": "A"}]},
+                          {"libraries": []}, "not-a-dictionary", {"libraries": [{"code": ["X", "Y"]}]}]}
+    path = compile_property_path("file_sets.libraries.code")
+    assert path is compile_property_path("file_sets.libraries.code")
+    assert path.name == "file_sets.libraries.code"
+    assert path.get_all(item) == get_properties(item, "file_sets.libraries.code") == ["A", "B", ["X", "Y"]]
+    assert path.get(item) is None
+    assert compile_property_path("file_sets.libraries.missing").get_all(item) == []
+    assert compile_property_path("file_sets.missing").get_all(item, fallback="none") == []
+    assert compile_property_path("missing.libraries.code").get_all(item, fallback="none") == ["none"]
+    assert compile_property_path("file_sets.libraries.code").get_all(item, sort=False) == ["A", "B", ["X", "Y"]]
+    assert compile_property_path("last_modified.date_modified").get(item) == "2024-11-28"
+    assert get_property(item, "last_modified.date_modified") == "2024-11-28"
+    assert compile_property_path("status.date_modified").get(item, "fallback") == "fallback"
+    assert compile_property_path("").get(item, "fallback") == "fallback"
+    assert get_properties({"a": [{"b": 2}, {"b": 1}, {"b": 2}]}, "a.b", sort=True) == [1, 2]
+
+
+def test_get_referenced_uuids():
+    uuids = [f"{index:08d}-1111-2222-3333-444444444444" for index in range(6)]
+    items = [
+        {"uuid": uuids[0], "file_sets": [uuids[2], uuids[1]], "@id": f"/files/{uuids[3]}/",
+         "notes": {"text": "x" * 36, "other": f" {uuids[2]} ", "link": uuids[1]}, "submitter": (uuids[5],)},
+        {"uuid": uuids[1], "derived_from": [{"uuid": uuids[4], "file": uuids[0]}], "ignored": uuids[5]}
+    ]
+    assert get_referenced_uuids(items) == [uuids[0], uuids[2], uuids[1], uuids[5], uuids[4]]
+    assert get_referenced_uuids(items, exclude_uuid=True) == [uuids[2], uuids[5], uuids[4]]
+    assert get_referenced_uuids(items, exclude_uuid=True, include_paths=True) == \
+        [uuids[2], uuids[3], uuids[5], uuids[4]]
+    assert get_referenced_uuids(items, exclude_uuid=True, exclude_properties=["submitter", "ignored"],
+                                ignore_uuids=[uuids[4]]) == [uuids[2]]
+    assert get_referenced_uuids(items[1], exclude_uuid=True) == [uuids[4], uuids[0], uuids[5]]
+    assert get_referenced_uuids_from_items(iter(items), exclude_uuid=True) == [uuids[2], uuids[5], uuids[4]]
+    # Deeply nested items are traversed iteratively, i.e. without recursion limits.
+    deep = {"uuid": uuids[0]}
+    for _ in range(5000):
+        deep = {"child": [deep]}
+    assert get_referenced_uuids(deep) == [uuids[0]]
+
+
+def test_order_dictionary_by_dependency_layers():
+    items = [
+        {"uuid": "a", "deps": ["c", "x"]},
+        {"uuid": "b"},
+        {"uuid": "c", "deps": "b", "other": ["y", "b"]},
+        {"uuid": "d", "deps": ["a", "c"]},
+        {"uuid": "e", "deps": [None]}
+    ]
+    result = order_dictionary_by_dependency_layers(items, ["deps", "other"])
+    assert [[item["uuid"] for item in layer] for layer in result.layers] == [["b", "e"], ["c"], ["a"], ["d"]]
+    assert result.external_dependencies == {"a": ["x"], "c": ["y"]}
+    assert result.max_layer_size == 2
+    assert order_dictionary_by_dependencies(items, ["deps", "other"]) == result.items
+    assert order_dictionary_by_dependencies(items, []) == items
+    assert order_dictionary_by_dependencies(None, "deps") == []
+    result = order_dictionary_by_dependency_layers(items, lambda item: [])
+    assert result.layers == [items]
+    with pytest.raises(ValueError):
+        order_dictionary_by_dependency_layers(items + [{"uuid": "a"}], "deps")
+
+
+def test_order_dictionary_by_dependency_layers_cycles():
+    items = [
+        {"uuid": "a", "deps": ["b"]},
+        {"uuid": "b", "deps": ["c", "z"]},
+        {"uuid": "c", "deps": ["a", "b"]},
+        {"uuid": "d", "deps": ["d"]},
+        {"uuid": "e", "deps": ["a"]},
+        {"uuid": "f"}
+    ]
+    with pytest.raises(DependencyCycleError) as e:
+        order_dictionary_by_dependency_layers(items, "deps")
+    assert e.value.cycles == [["b", "c", "b"], ["d", "d"]]
+    assert "b -> c -> b" in str(e.value)
+    with pytest.raises(ValueError):
+        order_dictionary_by_dependencies(items, "deps")
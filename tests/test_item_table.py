@@ -0,0 +1,61 @@
+import pytest
+from hms_utils.item_table import ItemTable
+
+ITEMS = [
+    {"uuid": "a", "status": "released", "file_size": 300, "data_category": ["Sequencing Reads"],
+     "file_status_tracking": {"released": "2024-11-28T04:42:29.531456+00:00"}, "submitted_by": {"display_title": "X"}},
+    {"uuid": "b", "status": "public", "file_size": "100", "data_category": ["Quality Control"],
+     "file_status_tracking": {"released": "2024-10-02T12:00:00+00:00"}},
+    {"uuid": "c", "status": "released", "file_status_tracking": {"released": "not-a-date"},
+     "last_modified": {"modified_by": {"display_title": "Y"}}},
+    {"uuid": "d", "file_size": 200, "data_category": ["Sequencing Reads"],
+     "file_status_tracking": {"released": "2024-11-01T00:00:00+00:00"}},
+    "not-an-item"
+]
+
+COLUMNS = {
+    "uuid": "uuid",
+    "status": "status",
+    "size": ("file_size", int),
+    "category": "data_category",
+    "released": "file_status_tracking.released",
+    "by": ["submitted_by.display_title", "last_modified.modified_by.display_title"],
+    "uuid_upper": lambda item: item.get("uuid", "").upper() or None
+}
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_item_table(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    table = ItemTable.from_items(iter(ITEMS), COLUMNS, use_numpy=use_numpy)
+    assert len(table) == 5
+    assert table.columns == list(COLUMNS)
+    assert table.row(0) == {"uuid": "a", "status": "released", "size": 300, "category": ("Sequencing Reads",),
+                            "released": "2024-11-28T04:42:29.531456+00:00", "by": "X", "uuid_upper": "A"}
+    assert table.column("size") == [300, 100, None, 200, None]
+    assert table.column("by") == ["X", None, "Y", None, None]
+    assert table.get(4, "uuid") is None
+    assert table.group_counts("status") == {None: 2, "released": 2, "public": 1}
+    assert table.group_counts("status", sort=True) == {"released": 2, None: 2, "public": 1}
+    assert table.group_counts("status", rows=[1, 2]) == {"released": 1, "public": 1}
+    assert table.group_counts("category") == {None: 2, ("Sequencing Reads",): 2, ("Quality Control",): 1}
+    assert table.group_counts("size") == {None: 2, 300: 1, 100: 1, 200: 1}
+    assert table.group_rows("status") == {"released": [0, 2], "public": [1], None: [3, 4]}
+    assert table.sort_rows("size") == [1, 3, 0, 2, 4]
+    assert table.sort_rows("size", reverse=True) == [0, 3, 1, 2, 4]
+    assert table.sort_rows("status") == [1, 0, 2, 3, 4]
+    assert table.sort_rows("status", reverse=True) == [0, 2, 1, 3, 4]
+    assert table.sort_rows("uuid", rows=[3, 1, 2]) == [1, 2, 3]
+    assert table.month_buckets("released") == {"2024-11": [0, 3], "2024-10": [1]}
+    assert table.month_buckets("released", rows=[3, 1]) == {"2024-11": [3], "2024-10": [1]}
+    assert [row["uuid"] for row in table.rows([2, 0])] == ["c", "a"]
+
+
+def test_item_table_errors():
+    with pytest.raises(ValueError):
+        ItemTable([])
+    with pytest.raises(ValueError):
+        ItemTable({"size": ("file_size", list)})
+    with pytest.raises(KeyError):
+        ItemTable(["uuid"]).group_counts("status")
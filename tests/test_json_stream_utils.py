@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import pytest
+from hms_utils.json_stream_utils import (
+    AtomicFileWriter, JsonArraysDictionaryWriter, JsonArrayWriter,
+    iterate_json_array, iterate_json_items, iterate_ndjson)
+
+DATA = [
+    {"uuid": "a", "values": [1, 2.5, -3e10, None, True, False], "text": "with \"quotes\", [brackets] and é"},
+    12345678901234567890,
+    "string",
+    [],
+    {},
+    {"nested": {"deeper": [{"x": "y"}]}}
+]
+
+
+def test_iterate_json_array():
+    for indent in [None, 4]:
+        text = json.dumps(DATA, indent=indent)
+        for chunk_size in [1, 2, 3, 7, 64, 100000]:
+            assert list(iterate_json_array(io.StringIO(text), chunk_size=chunk_size)) == DATA
+    assert list(iterate_json_array(io.StringIO(" [ ] "), chunk_size=1)) == []
+    for invalid in ["", "{}", "[1, 2", "[1 2]", "[1,]", "[1] x"]:
+        with pytest.raises(ValueError):
+            list(iterate_json_array(io.StringIO(invalid), chunk_size=2))
+
+
+def test_json_array_writer_and_ndjson(tmp_path):
+    for indent in [None, 4]:
+        for data in [DATA, []]:
+            f = io.StringIO()
+            with JsonArrayWriter(f, indent=indent) as writer:
+                for element in data:
+                    writer.write(element)
+            assert f.getvalue() == json.dumps(data, indent=indent)
+    assert list(iterate_ndjson(io.StringIO("\n".join(json.dumps(element) for element in DATA) + "\n\n"))) == DATA
+
+    file = os.path.join(tmp_path, "items.json")
+    with AtomicFileWriter(file) as f:
+        f.write("[1]")
+    with pytest.raises(Exception):
+        with AtomicFileWriter(file) as f:
+            f.write("[2")
+            raise Exception("failed")
+    assert list(iterate_json_array(file)) == [1]
+    assert os.listdir(tmp_path) == ["items.json"]
+
+
+def test_iterate_json_items_and_arrays_dictionary_writer():
+    inserts = {"FileFormat": DATA, "Empty": [], "Library": [{"uuid": "b"}]}
+    expected = [(key, element) for key, elements in inserts.items() for element in elements]
+    for indent in [None, 4]:
+        for chunk_size in [1, 5, 100000]:
+            assert list(iterate_json_items(io.StringIO(json.dumps(inserts, indent=indent)),
+                                           chunk_size=chunk_size)) == expected
+            assert list(iterate_json_items(io.StringIO(json.dumps(DATA, indent=indent)),
+                                           chunk_size=chunk_size)) == [(None, element) for element in DATA]
+        for data in [inserts, {}]:
+            f = io.StringIO()
+            with JsonArraysDictionaryWriter(f, indent=indent) as writer:
+                for key, elements in data.items():
+                    writer.start(key)
+                    for element in elements:
+                        writer.write(element)
+            assert f.getvalue() == json.dumps(data, indent=indent)
+    assert list(iterate_json_items(io.StringIO(" { } "), dictionary=True)) == []
+    for invalid, dictionary in [("[1]", True), ("{}", False), ('{"a": 1}', None), ('{"a": [1], "b": {}}', None),
+                                ('{1: [1]}', None), ('{"a": [1]', None), ('{"a": [1]} x', None)]:
+        with pytest.raises(ValueError):
+            list(iterate_json_items(io.StringIO(invalid), dictionary=dictionary, chunk_size=2))
+    skipped = []
+    for chunk_size in [2, 100000]:
+        assert list(iterate_json_items(io.StringIO('{"a": [1], "b": {"c": [2]}, "d": "x", "e": [3]}'),
+                                       chunk_size=chunk_size, skip=skipped.append)) == [("a", 1), ("e", 3)]
+    assert skipped == ["b", "d"] * 2
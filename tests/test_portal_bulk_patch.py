@@ -0,0 +1,103 @@
+import threading
+import time
+from hms_utils.portal.portal_bulk_patch import PortalBulkPatch
+
+ITEMS = [{"uuid": f"uuid-{index:04d}", "consortia": ["smaht"] if index % 5 == 0 else None} for index in range(100)]
+
+
+class _Portal:
+    key = {"server": "https://portal"}
+    def __init__(self, failures=None, latency=0.01, status_code=500):  # noqa
+        self.failures = dict(failures or {})
+        self.status_code = status_code
+        self.latency = latency
+        self.patched = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+    def patch_metadata(self, path, data):  # noqa
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            with self.lock:
+                if self.failures.get(path, 0) > 0:
+                    self.failures[path] -= 1
+                    raise Exception(f"Bad status code for PATCH request for https://portal/{path}:"
+                                    f" {self.status_code}. Reason: Error")
+                self.patched[path] = data
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def _set_consortia(item):
+    return None if item.get("consortia") else {"consortia": ["smaht"]}
+
+
+def test_bulk_patch():
+    portal = _Portal(failures={"uuid-0001": 2, "uuid-0002": 5})
+    bulk_patch = PortalBulkPatch(portal, nthreads=8, retries=2, backoff=0.01)
+    assert bulk_patch.run(iter(ITEMS), _set_consortia) is False
+    assert (bulk_patch.items, bulk_patch.skipped, bulk_patch.patched, bulk_patch.failed) == (100, 20, 79, 1)
+    assert (bulk_patch.requests, bulk_patch.retries) == (80 + 2 + 2, 4)
+    assert "uuid-0002" not in portal.patched
+    assert portal.patched["uuid-0001"] == {"consortia": ["smaht"]}
+    assert portal.max_in_flight == 8
+
+
+def test_bulk_patch_limit_and_skip_links():
+    portal = _Portal()
+    bulk_patch = PortalBulkPatch(portal, nthreads=4, skip_links=True)
+    assert bulk_patch.run(ITEMS, _set_consortia, limit=10) is True
+    assert sorted(portal.patched) == [f"uuid-{index:04d}?skip_links=true"
+                                      for index in range(1, 13) if index not in (5, 10)]
+
+
+def test_bulk_patch_rate_limit():
+    portal = _Portal(latency=0)
+    bulk_patch = PortalBulkPatch(portal, nthreads=8, rate=200)
+    started = time.time()
+    assert bulk_patch.run(ITEMS[0:41], _set_consortia) is True
+    assert bulk_patch.patched == 32
+    assert 0.15 <= time.time() - started < 1.0
+
+
+def test_bulk_patch_dryrun():
+    portal = _Portal()
+    bulk_patch = PortalBulkPatch(portal, nthreads=10, dryrun=True, latency=0.5)
+    assert bulk_patch.run(ITEMS, _set_consortia) is True
+    assert portal.patched == {}
+    assert (bulk_patch.items, bulk_patch.patched, bulk_patch.skipped) == (100, 80, 20)
+    assert bulk_patch.projected_requests == 80
+    assert bulk_patch.projected_duration == 80 * 0.05
+    assert "projected requests: 80" in bulk_patch.summary()
+    bulk_patch = PortalBulkPatch(portal, nthreads=10, rate=5, dryrun=True)
+    bulk_patch.run(ITEMS, _set_consortia)
+    assert bulk_patch.projected_duration == 80 * 0.2
+
+
+def test_bulk_patch_client_errors_not_retried():
+    portal = _Portal(failures={"uuid-0001": 1}, status_code=422)
+    bulk_patch = PortalBulkPatch(portal, nthreads=2, retries=2, backoff=0.01)
+    assert bulk_patch.run(ITEMS[0:3], _set_consortia) is False
+    assert (bulk_patch.patched, bulk_patch.failed, bulk_patch.requests, bulk_patch.retries) == (1, 1, 2, 0)
+    portal = _Portal(failures={"uuid-0001": 1}, status_code=503)
+    bulk_patch = PortalBulkPatch(portal, nthreads=2, retries=2, backoff=0.01)
+    assert bulk_patch.run(ITEMS[0:3], _set_consortia) is True
+    assert (bulk_patch.patched, bulk_patch.requests, bulk_patch.retries) == (2, 3, 1)
+
+
+def test_bulk_patch_search(monkeypatch):
+    from hms_utils.portal import portal_bulk_patch
+    queries = []
+    def search_metadata(query, key, is_generator):  # noqa
+        queries.append(query)
+        return iter(ITEMS[0:10])
+    monkeypatch.setattr(portal_bulk_patch, "search_metadata", search_metadata)
+    portal = _Portal(latency=0)
+    bulk_patch = PortalBulkPatch(portal, nthreads=2)
+    assert bulk_patch.run("type=Item&consortia.display_title=No+value", _set_consortia, fields=["consortia"]) is True
+    assert queries == ["/search/?type=Item&consortia.display_title=No+value&field=uuid&field=%40type&field=consortia"]
+    assert bulk_patch.patched == 8
@@ -0,0 +1,86 @@
+import threading
+import time
+from hms_utils.portal.portal_cache import PortalResponseCache, portal_response_cache, set_portal_response_size
+from hms_utils.threading_utils import run_concurrently
+
+
+def test_portal_response_cache_single_flight():
+    calls = []
+    @portal_response_cache()  # noqa
+    def fetch(query: str) -> dict:
+        calls.append(query)
+        time.sleep(0.1)
+        return {"query": query}
+    results = []
+    lock = threading.Lock()
+    def fetch_and_save(query: str) -> None:  # noqa
+        result = fetch(query)
+        with lock:
+            results.append(result)
+    run_concurrently([lambda: fetch_and_save("/files")] * 8, nthreads=8)
+    assert calls == ["/files"]
+    assert results == [{"query": "/files"}] * 8
+    info = fetch.cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] + info["coalesced"] == 7
+    assert fetch("/files") == {"query": "/files"}
+    assert fetch.cache_info()["hits"] == info["hits"] + 1
+    fetch.cache_clear()
+    assert fetch.cache_info()["entries"] == 0
+    fetch("/files")
+    assert calls == ["/files", "/files"]
+
+
+def test_portal_response_cache_eviction_by_size():
+    cache = PortalResponseCache(max_bytes=10, sizeof=lambda value: len(value))
+    cache.get("a", lambda: "aaaa")
+    cache.get("b", lambda: "bbbb")
+    cache.get("a", lambda: "xxxx")  # hit; makes b the least recently used
+    cache.get("c", lambda: "cccc")  # evicts b
+    assert cache.cache_info()["entries"] == 2
+    assert cache.evictions == 1
+    assert cache.get("a", lambda: "xxxx") == "aaaa"
+    assert cache.get("b", lambda: "BBBB") == "BBBB"
+    # Too big to cache at all.
+    assert cache.get("d", lambda: "d" * 11) == "d" * 11
+    assert cache.get("d", lambda: "D") == "D"
+
+
+def test_portal_response_cache_exception_not_cached():
+    cache = PortalResponseCache()
+    def fail():  # noqa
+        raise Exception("portal error")
+    try:
+        cache.get("a", fail)
+        assert False
+    except Exception as e:
+        assert str(e) == "portal error"
+    assert cache.get("a", lambda: {"ok": True}) == {"ok": True}
+    assert cache.misses == 2
+
+
+def test_portal_response_cache_sizes():
+    sized = []
+    def sizeof(value):  # noqa
+        sized.append(value)
+        return len(value)
+    # The size given while fetching (e.g. the content length; summed if more than one) is used, not computed.
+    cache = PortalResponseCache(max_bytes=100, sizeof=sizeof)
+    def fetch():  # noqa
+        set_portal_response_size(30)
+        set_portal_response_size(12)
+        return "a"
+    assert cache.get("a", fetch) == "a"
+    assert (cache.nbytes, sized) == (42, [])
+    assert cache.get("b", lambda: "bbbb") == "bbbb"
+    assert (cache.nbytes, sized) == (46, ["bbbb"])
+    set_portal_response_size(1000)  # Not while fetching; ignored.
+    assert cache.get("c", lambda: "cc") == "cc"
+    assert cache.nbytes == 48
+    # Not even computed if caching is disabled.
+    cache = PortalResponseCache(max_bytes=0, sizeof=sizeof)
+    sized = []
+    assert cache.get("a", lambda: "aaaa") == "aaaa"
+    assert cache.get("a", lambda: "AAAA") == "AAAA"
+    assert sized == []
+    assert cache.cache_info()["entries"] == 0
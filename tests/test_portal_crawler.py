@@ -0,0 +1,63 @@
+from hms_utils.portal.portal_crawler import PortalReferenceCrawler
+from hms_utils.threading_utils import run_concurrently
+
+UUID_A = "aaaaaaaa-0000-0000-0000-000000000000"
+UUID_B = "bbbbbbbb-0000-0000-0000-000000000000"
+UUID_C = "cccccccc-0000-0000-0000-000000000000"
+UUID_D = "dddddddd-0000-0000-0000-000000000000"
+UUID_E = "eeeeeeee-0000-0000-0000-000000000000"
+
+ITEMS = {
+    UUID_A: {"uuid": UUID_A, "@type": ["FileSet"], "files": [UUID_B, UUID_C]},
+    UUID_B: {"uuid": UUID_B, "@type": ["File"], "file_set": UUID_A, "format": f"/FileFormat/{UUID_D}/"},
+    UUID_C: {"uuid": UUID_C, "@type": ["File"], "file_set": UUID_A, "software": [UUID_E]},
+    UUID_D: {"uuid": UUID_D, "@type": ["FileFormat"]},
+    UUID_E: {"uuid": UUID_E, "@type": ["Software"], "related": UUID_C}
+}
+
+
+def _fetch_items(fetched: list):
+    def fetch_items(uuids, on_item):
+        fetched.extend(uuids)
+        run_concurrently([lambda uuid=uuid: on_item(ITEMS.get(uuid)) for uuid in uuids], nthreads=4)
+    return fetch_items
+
+
+def test_portal_reference_crawler_a():
+    fetched = []
+    crawler = PortalReferenceCrawler(_fetch_items(fetched))
+    referenced_items = crawler.crawl(ITEMS[UUID_A])
+    assert sorted(item["uuid"] for item in referenced_items) == [UUID_B, UUID_C, UUID_D, UUID_E]
+    # Each item fetched exactly once, and never the starting item.
+    assert sorted(fetched) == [UUID_B, UUID_C, UUID_D, UUID_E]
+    assert crawler.depth == 2
+    assert crawler.frontier_size == 0
+    assert crawler.item_count == 4
+
+
+def test_portal_reference_crawler_depth_and_types():
+    fetched = []
+    crawler = PortalReferenceCrawler(_fetch_items(fetched), max_depth=1)
+    referenced_items = crawler.crawl([ITEMS[UUID_A]])
+    assert sorted(item["uuid"] for item in referenced_items) == [UUID_B, UUID_C]
+    assert crawler.frontier_size == 2
+
+    streamed = []
+    fetched = []
+    crawler = PortalReferenceCrawler(_fetch_items(fetched),
+                                     get_item_type=lambda item: item["@type"][0],
+                                     exclude_types=["Software"],
+                                     on_item=lambda item, depth: streamed.append((item["uuid"], depth)))
+    referenced_items = crawler.crawl([ITEMS[UUID_A]])
+    assert sorted(item["uuid"] for item in referenced_items) == [UUID_B, UUID_C, UUID_D]
+    assert sorted(streamed) == [(UUID_B, 1), (UUID_C, 1), (UUID_D, 2)]
+    assert crawler.excluded_count == 1
+
+
+def test_portal_reference_crawler_max_items_per_depth():
+    fetched = []
+    crawler = PortalReferenceCrawler(_fetch_items(fetched), max_items_per_depth=1)
+    referenced_items = crawler.crawl([ITEMS[UUID_A]])
+    # Only B at depth 1 (C truncated); then only D from B at depth 2.
+    assert [item["uuid"] for item in referenced_items] == [UUID_B, UUID_D]
+    assert crawler.truncated_count == 1
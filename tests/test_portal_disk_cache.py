@@ -0,0 +1,54 @@
+import os
+from hms_utils.portal.portal_disk_cache import PortalDiskCache
+
+UUID_A = "aaaaaaaa-0000-0000-0000-000000000000"
+UUID_B = "bbbbbbbb-0000-0000-0000-000000000000"
+
+
+def _item(uuid: str, date_modified: str) -> dict:
+    return {"uuid": uuid, "last_modified": {"date_modified": date_modified}}
+
+
+def test_portal_disk_cache_fresh_and_keys(tmp_path):
+    cache_file = os.path.join(tmp_path, "cache.sqlite")
+    cache = PortalDiskCache("smaht-test", file=cache_file, max_age=3600)
+    frame = PortalDiskCache.frame(metadata=True, raw=True)
+    assert cache.get(UUID_A, frame=frame) is None
+    cache.store(UUID_A, _item(UUID_A, "2024-01-01"), frame=frame)
+    assert cache.get(UUID_A, frame=frame) == _item(UUID_A, "2024-01-01")
+    assert cache.get(UUID_A, frame=PortalDiskCache.frame(metadata=True)) is None
+    assert cache.get(UUID_A, frame=frame, field="uuid") is None
+    assert PortalDiskCache("smaht-other", file=cache_file).get(UUID_A, frame=frame) is None
+    # Persists across instances.
+    cache.close()
+    assert PortalDiskCache("smaht-test", file=cache_file, max_age=3600).get(UUID_A, frame=frame) is not None
+
+
+def test_portal_disk_cache_revalidate_by_date_modified(tmp_path):
+    cache = PortalDiskCache("smaht-test", file=os.path.join(tmp_path, "cache.sqlite"), max_age=0)
+    cache.store(UUID_A, _item(UUID_A, "2024-01-01"))
+    current = {UUID_A: "2024-01-01"}
+    queries = []
+    def get(query):  # noqa
+        queries.append(query)
+        return {"@graph": [_item(uuid, date_modified) for uuid, date_modified in current.items()]}
+    def revalidate(entry):  # noqa
+        return PortalDiskCache.revalidate_by_date_modified(UUID_A, entry, get)
+    assert cache.get(UUID_A, revalidate=revalidate) == _item(UUID_A, "2024-01-01")
+    assert queries == [PortalDiskCache.uuids_date_modified_query([UUID_A])]
+    current[UUID_A] = "2024-02-01"
+    assert cache.get(UUID_A, revalidate=revalidate) is None
+    assert cache.cache_info()["revalidated"] == 1
+    assert cache.cache_info()["stale"] == 1
+
+    # Search (collection) response revalidated by the uuids and dates of its items, and its total.
+    current = {UUID_A: "2024-01-01", UUID_B: "2024-01-02"}
+    search = {"@graph": [_item(uuid, date_modified) for uuid, date_modified in current.items()], "total": 2}
+    cache.store("/files?limit=2", search)
+    def search_revalidate(entry):  # noqa
+        return PortalDiskCache.revalidate_by_date_modified("/files?limit=2", entry,
+                                                           lambda query: {**get(query), "total": 2})
+    assert cache.get("/files?limit=2", revalidate=search_revalidate) == search
+    assert queries[-1] == "/files?limit=2&field=uuid&field=last_modified.date_modified"
+    current[UUID_B] = "2024-03-01"
+    assert cache.get("/files?limit=2", revalidate=search_revalidate) is None
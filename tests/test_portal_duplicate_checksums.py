@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import re
+from hms_utils.portal.portal_duplicate_checksums import (
+    _get_duplicates_report, _get_records, _read_items, find_duplicates)
+
+ITEMS = [
+    {"uuid": "uuid-a", "md5sum": "md5-1", "content_md5sum": "content-1", "file_size": 100},
+    {"uuid": "uuid-b", "md5sum": "md5-1", "content_md5sum": "content-2", "file_size": 100},
+    {"uuid": "uuid-c", "md5sum": "md5-1", "content_md5sum": "content-1", "file_size": 200},
+    {"uuid": "uuid-d", "md5sum": "md5-2", "content_md5sum": "content-1", "file_size": 300},
+    {"uuid": "uuid-e", "md5sum": "md5-3", "file_size": 400},
+    {"md5sum": "md5-3"}
+]
+
+
+def test_find_duplicates_with_sorted_runs(tmp_path):
+    # Many records (in random-ish order) with a tiny memory budget, forcing many sorted runs to be merged.
+    records = [(f"md5sum:{index % 7}", f"uuid-{index:04d}", None, None, None, "test") for index in range(100)]
+    records += [("md5sum:unique", "uuid-unique", None, None, None, "test")]
+    records += [("md5sum:3", "uuid-0003", None, None, None, "again")]  # Same uuid again is not a duplicate.
+    statistics = {}
+    groups = list(find_duplicates(reversed(records), max_records=8, tmpdir=str(tmp_path), statistics=statistics))
+    assert statistics == {"records": 102, "runs": 12}
+    assert [group[0][0] for group in groups] == [f"md5sum:{index}" for index in range(7)]
+    assert [len(group) for group in groups] == [15, 15, 14, 14, 14, 14, 14]
+    assert all(len(set(record[1] for record in group)) == len(group) for group in groups)
+    assert os.listdir(tmp_path) == []
+    assert [len(group) for group in find_duplicates(records)] == [15, 15, 14, 14, 14, 14, 14]
+
+
+def test_get_records_and_report():
+    items = [(item, "test") for item in ITEMS]
+    groups = list(find_duplicates(_get_records(items, checksums=["md5sum", "content_md5sum"])))
+    assert [(group[0][0], [record[1] for record in group]) for group in groups] == [
+        ("content_md5sum:content-1", ["uuid-a", "uuid-c", "uuid-d"]),
+        ("md5sum:md5-1", ["uuid-a", "uuid-b", "uuid-c"])]
+    report = _get_duplicates_report(groups[1])
+    assert (report["checksum"], report["value"], report["count"]) == ("md5sum", "md5-1", 3)
+    assert report["same_file_size"] is False
+    assert report["same_content_md5sum"] is False
+    assert report["items"][0] == {"uuid": "uuid-a", "file_size": 100, "md5sum": "md5-1",
+                                  "content_md5sum": "content-1", "source": "test"}
+    # With file size as a tie-break only the items with the same md5sum and size are duplicates.
+    groups = list(find_duplicates(_get_records(items, checksums=["md5sum"], size=True)))
+    assert [[record[1] for record in group] for group in groups] == [["uuid-a", "uuid-b"]]
+    assert _get_duplicates_report(groups[0])["same_file_size"] is True
+
+
+def test_read_items(tmp_path):
+    with io.open(inserts_file := os.path.join(tmp_path, "inserts.json"), "w") as f:
+        json.dump({"file_submitted": ITEMS[0:2], "file_processed": ITEMS[2:3]}, f, indent=4)
+    with io.open(ndjson_file := os.path.join(tmp_path, "items.ndjson"), "w") as f:
+        for item in ITEMS[3:]:
+            f.write(json.dumps(item) + "\n")
+    items = list(_read_items([inserts_file, ndjson_file]))
+    assert [item for item, _ in items] == ITEMS
+    assert [source for _, source in items] == [inserts_file] * 3 + [ndjson_file] * 3
+
+
+def test_read_items_search():
+    class Response:  # noqa
+        def __init__(self, status_code, data):
+            self.status_code = status_code
+            self._data = data
+        def json(self):  # noqa
+            return self._data
+    class Portal:  # noqa
+        searches = []
+        def get(self, url, timeout=None):  # noqa
+            # Pages are capped at 2 items (below the requested page size), as a server may do.
+            self.searches.append(url)
+            query, limit, offset = re.match(r"^(.*)&limit=(\d+)&from=(\d+)$", url).groups()
+            assert query == "/search/?type=File&field=uuid&field=file_size&field=md5sum&field=content_md5sum"
+            graph = ITEMS[int(offset):int(offset) + min(int(limit), 2)]
+            return Response(200, {"@graph": graph, "total": len(ITEMS)}) if graph else Response(404, {})
+    items = _read_items([], portal := Portal(), query="type=File")
+    assert next(items) == (ITEMS[0], "search")
+    assert len(portal.searches) == 1  # Pages are fetched as the items are consumed.
+    assert [item for item, _ in items] == ITEMS[1:]
+    assert [int(url.split("from=")[1]) for url in portal.searches] == [0, 2, 4]
@@ -0,0 +1,29 @@
+from hms_utils.portal.portal_files import _get_file_table, _search_files
+
+
+class _Portal:
+    def __init__(self, nitems):  # noqa
+        self.items = [{"uuid": f"u-{index}", "filename": f"f-{index}.bam", "file_size": index,
+                       "file_status_tracking": {"released": f"2024-1{index % 2}-01"}} for index in range(nitems)]
+        self.queries = []
+    def get_metadata(self, query, raise_exception=True):  # noqa
+        from urllib.parse import parse_qs, urlparse
+        self.queries.append(query)
+        args = parse_qs(urlparse(query).query)
+        offset, limit = int(args["from"][0]), int(args["limit"][0])
+        if not (graph := self.items[offset:offset + limit]):
+            return None  # No results for a search is a 404.
+        return {"@graph": graph, "total": len(self.items)}
+
+
+def test_search_files():
+    portal = _Portal(10)
+    items = _search_files(portal, "/files?status=released", limit=7, offset=1, page_size=3)
+    assert next(items)["uuid"] == "u-1"
+    assert len(portal.queries) == 1  # Pages are fetched as the items are consumed (tabulated).
+    table = _get_file_table(items, "file_status_tracking.released")
+    assert table.column("uuid") == [f"u-{index}" for index in range(2, 8)]
+    assert portal.queries == ["/files?status=released&limit=3&from=1", "/files?status=released&limit=3&from=4",
+                              "/files?status=released&limit=1&from=7"]
+    assert list(table.month_buckets("released")) == ["2024-10", "2024-11"]
+    assert list(_search_files(_Portal(4), "/files", limit=200, page_size=3)) == _Portal(4).items
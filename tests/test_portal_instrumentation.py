@@ -0,0 +1,69 @@
+import time
+from hms_utils.portal.portal_instrumentation import PortalInstrumentation
+from hms_utils.threading_utils import run_concurrently
+
+
+def test_portal_instrumentation_endpoint():
+    assert PortalInstrumentation.endpoint("https://data.smaht.org/search/?type=File") == "search"
+    collections = PortalInstrumentation.collection_names(["File", "FileFormat", "Library", "Analysis"])
+    assert PortalInstrumentation.endpoint("https://data.smaht.org/files?limit=10", collections) == "search"
+    assert PortalInstrumentation.endpoint("/file-formats/?limit=10", collections) == "search"
+    assert PortalInstrumentation.endpoint("/FileFormat", collections) == "search"
+    assert PortalInstrumentation.endpoint("/libraries", collections) == "search"
+    assert PortalInstrumentation.endpoint("/analyses", collections) == "search"
+    # A single component (non-collection) path is an item, e.g. an accession or an alias.
+    assert PortalInstrumentation.endpoint("/SMAFI1234ABCD?frame=raw", collections) == "item"
+    assert PortalInstrumentation.endpoint("/some-alias", collections) == "item"
+    assert PortalInstrumentation.endpoint("/files") == "item"  # No known collections.
+    assert PortalInstrumentation.endpoint("https://data.smaht.org/profiles/?format=json") == "schema"
+    assert PortalInstrumentation.endpoint("/3968e38e-c11f-472e-8531-8650e2e296d4?frame=raw") == "item"
+    assert PortalInstrumentation.endpoint("/file-formats/vcf_gz_tbi/") == "item"
+    assert PortalInstrumentation.endpoint("/") == "other"
+
+
+def test_portal_instrumentation_report():
+    instrumentation = PortalInstrumentation(collections=["File"])
+    def request(url, status_code=200, nbytes=100):  # noqa
+        with instrumentation.request(url) as request:
+            time.sleep(0.05)
+            request.status_code = status_code
+            request.nbytes = nbytes
+    run_concurrently([lambda: request("/search/?type=File")] * 4 + [lambda: request("/profiles/", 404, 10)],
+                     nthreads=5)
+    with instrumentation.logical_request():
+        request("/files")
+        request("/files")
+    request("/SMAFI1234ABCD")
+    try:
+        with instrumentation.request("/3968e38e-c11f-472e-8531-8650e2e296d4"):
+            raise Exception("connection error")
+    except Exception:
+        pass
+    report = instrumentation.report()
+    assert report["requests"] == 9
+    assert report["bytes"] == 710
+    assert report["endpoints"]["search"]["requests"] == 6
+    assert report["endpoints"]["search"]["retries"] == 1
+    assert report["endpoints"]["search"]["status_codes"] == {"200": 6}
+    assert report["endpoints"]["schema"]["status_codes"] == {"404": 1}
+    assert report["endpoints"]["item"]["status_codes"] == {"200": 1, "error": 1}
+    assert report["endpoints"]["search"]["latency"]["p50"] >= 0.05
+    assert report["in_flight"]["max"] >= 2
+    assert 0 < report["in_flight"]["busy"] <= 1
+
+
+def test_portal_instrumentation_wrap():
+    class Response:  # noqa
+        def __init__(self, status_code, retries):  # noqa
+            self.status_code = status_code
+            self.content = b"{}"
+            self.raw = type("Raw", (), {"retries": type("Retry", (), {"history": (None,) * retries})()})()
+    instrumentation = PortalInstrumentation()
+    get = instrumentation.wrap(lambda url, **kwargs: Response(200 if "retried" not in url else 503, url.count("/")))
+    assert get("/search/?type=File").status_code == 200
+    assert get("/files/retried/").status_code == 503
+    report = instrumentation.report()
+    assert report["endpoints"]["search"]["retries"] == 2
+    assert report["endpoints"]["item"]["retries"] == 3
+    assert report["endpoints"]["item"]["status_codes"] == {"503": 1}
+    assert report["bytes"] == 4
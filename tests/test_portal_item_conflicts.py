@@ -0,0 +1,84 @@
+import os
+import pytest
+from urllib.parse import parse_qs, urlparse
+from hms_utils.portal.portal_item_conflicts import check_item_for_conflicts, PortalItemIndex
+from hms_utils.portal.portal_utils import Portal
+
+
+class _Response:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+    def json(self):  # noqa
+        return self._data
+
+
+class _Portal(Portal):
+
+    def __init__(self, existing, deleted=None):  # noqa
+        self._existing = existing
+        self._deleted = deleted or []
+        self.queries = []
+        self.max_limit = 1000
+        self.shift = 1000000
+
+    @property
+    def server(self):
+        return "https://portal"
+
+    @property
+    def env(self):
+        return "test"
+
+    def get_identifying_property_names(self, item_type):  # noqa
+        return ["uuid", "accession", "aliases"]
+
+    def get_schema(self, item_type):  # noqa
+        return {"properties": {"status": {"enum": ["released", "obsolete", "deleted"]}}}
+
+    def get(self, url):  # noqa
+        # Without a status query only the existing items are found (like the default search), otherwise
+        # those with any of the given statuses (existing items are released, unless they say otherwise).
+        self.queries.append(url)
+        args = parse_qs(urlparse(url).query)
+        items = [item for item in self._existing + self._deleted
+                 if item.get("status", "released") in args["status"]] if args.get("status") else self._existing
+        items = sorted(items, key=lambda item: item[args["sort"][0]]) if args.get("sort") else items
+        offset, limit = min(int(args["from"][0]), self.shift), min(int(args["limit"][0]), self.max_limit)
+        if not items:
+            return _Response(404, {"@graph": [], "total": 0})
+        return _Response(200, {"@graph": [{name: item[name] for name in args["field"] if name in item}
+                                          for item in items[offset:offset + limit]], "total": len(items)})
+
+    def get_metadata(self, *args, **kwargs):  # noqa
+        raise Exception("Unexpected get_metadata with index.")
+
+
+def test_portal_item_index(tmp_path):
+    existing = [{"uuid": f"u-{n:02}", "accession": f"SMA{n}", "aliases": [f"lab:{n}"], "title": "x"} for n in range(25)]
+    existing[5]["status"] = "obsolete"
+    portal = _Portal(existing, deleted=[{"uuid": "u-deleted", "accession": "SMADEL", "status": "deleted"}])
+    index = PortalItemIndex().export(portal, ["Library"], threads=4, page_size=10)
+    assert index.count == 26 and index.has_type("Library") and not index.has_type("Sample")
+    assert len(portal.queries) == 3
+    assert all("status=released&status=obsolete&status=deleted&sort=uuid&" in query for query in portal.queries)
+    assert index.get("Library", "SMA5")["uuid"] == "u-05"
+    portal.max_limit = 4  # The server caps the page size.
+    assert PortalItemIndex().export(portal, ["Library"], threads=4, page_size=10).count == 26
+    portal.shift = 15  # Pages not as expected, e.g. items removed while paging.
+    with pytest.raises(Exception, match="Unexpected number of items"):
+        PortalItemIndex().export(portal, ["Library"], threads=4, page_size=10)
+    assert index.get("Library", "lab:7") == {"uuid": "u-07", "accession": "SMA7", "aliases": ["lab:7"]}
+    assert index.get("Library", "SMADEL")["uuid"] == "u-deleted"
+    assert index.get("Library", "u-03")["accession"] == "SMA3"
+    assert index.get("Library", "SMA99") is None
+    index.save(index_file := os.path.join(tmp_path, "index.json"))
+    index = PortalItemIndex.load(index_file)
+    assert index.server == "https://portal"
+    assert (index.count, index.get("Library", "lab:24")["uuid"]) == (26, "u-24")
+    conflicts = check_item_for_conflicts(portal, {"uuid": "u-new", "accession": "SMA1"}, "Library", index=index)
+    assert conflicts[0]["conflict"]["conflicts"] == [{"identifying_property": "accession", "identifying_value": "SMA1",
+                                                      "item_uuid": "u-new", "existing_item_uuid": "u-01"}]
+    conflicts = check_item_for_conflicts(portal, {"uuid": "u-02", "accession": "SMA2", "aliases": ["lab:2"]},
+                                         "Library", index=index)
+    assert conflicts == []
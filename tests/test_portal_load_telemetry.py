@@ -0,0 +1,46 @@
+import json
+from hms_utils.portal.portal_load_telemetry import PortalLoadTelemetry
+
+
+def test_portal_load_telemetry():
+    snapshots = []
+    telemetry = PortalLoadTelemetry(total=8, interval=0.000001, emit=snapshots.append)
+    telemetry.record("file_format", "POST")
+    telemetry.record("file_format", "POST")
+    telemetry.record("library", "POST")
+    telemetry.record("file_set", "ERROR",
+                     "ERROR: /22813a02 Bad response: 422 Unprocessable Entity (not 200 OK or 3xx redirect for"
+                     " http://localhost/file_set?skip_indexing=true)b'{\"errors\": [{\"description\":"
+                     " \"Unable to resolve link: /Library/a4e8f79f\"}, {\"description\":"
+                     " \"Unable to resolve link: /Library/b5f9080a\"}]}'")
+    telemetry.record(None, "ERROR",
+                     "ERROR: /22813a03 Bad response: 404 Not Found (not 200 OK or 3xx redirect for"
+                     " http://localhost/22813a03)")
+    telemetry.record("file_format", "PATCH")
+    assert telemetry.count == 6
+    assert snapshots and snapshots[-1]["items"] == 6 and snapshots[-1]["total"] == 8
+    summary = telemetry.summary()
+    assert summary["actions"] == {"ERROR": 2, "PATCH": 1, "POST": 3}
+    assert summary["types"]["file_format"]["items"] == 3
+    assert summary["types"]["file_format"]["actions"] == {"PATCH": 1, "POST": 2}
+    assert set(summary["types"]) == {"file_format", "library", "file_set", "unknown"}
+    assert summary["errors"]["responses"] == {"422 Unprocessable Entity": 1, "404 Not Found": 1}
+    assert summary["errors"]["unresolved_links"] == {
+        "Library": {"links": 2, "items": 1, "referencing_types": {"file_set": 1}}}
+    assert summary["eta"] is not None
+    assert json.loads(json.dumps(summary))["items"] == 6
+
+
+def test_portal_load_telemetry_items_per_second(monkeypatch):
+    # The items of a type across both loadxl passes; its rate is over the time spent on them, not between them.
+    from hms_utils.portal import portal_load_telemetry
+    clock = iter([0, 1, 101, 103])
+    monkeypatch.setattr(portal_load_telemetry.time, "time", lambda: next(clock))
+    telemetry = PortalLoadTelemetry()
+    telemetry.record("file_format", "POST")
+    telemetry.record("library", "POST")
+    telemetry.record("file_format", "PATCH")
+    monkeypatch.setattr(portal_load_telemetry.time, "time", lambda: 110)
+    types = telemetry.summary()["types"]
+    assert types["file_format"]["items_per_second"] == round(2 / 3, 4) and types["file_format"]["latency"]["total"] == 3
+    assert types["library"]["items_per_second"] == 0.01
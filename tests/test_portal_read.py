@@ -0,0 +1,281 @@
+import io
+import json
+import os
+from types import SimpleNamespace
+from hms_utils.portal.portal_read import Portal, _get_portal_items_for_uuids, _portal_get
+from hms_utils.portal.portal_read import _ITEM_TYPE_PSEUDO_PROPERTY_NAME, _get_item_type_from_query, _portal_get_inserts
+from hms_utils.portal.portal_disk_cache import PortalDiskCache
+from hms_utils.portal.portal_instrumentation import PortalInstrumentation
+from hms_utils.portal.portal_read import _get_portal_referenced_items, _reorganize_item
+from hms_utils.portal.portal_read import _is_streamable_output, _open_streamed_output, _write_ndjson
+
+
+def _argv(**kwargs):
+    argv = {"inserts": False, "uuids": False, "pick": None, "yaml": False, "merge": False, "append": False,
+            "output": None, "overwrite": False, "noformat": False, "sort": False, "reorganize": False,
+            "noscrub_sids": False, "randomize_md5sum_values": False}
+    return SimpleNamespace(**{**argv, **kwargs})
+
+
+def test_streamed_output(tmp_path, capsys):
+    items = [{"uuid": "a", "sid": 1, "x": [1, 2]}, {"uuid": "b", "@type": ["File"]}]
+    assert _is_streamable_output(_argv()) is True
+    assert _is_streamable_output(_argv(inserts=True)) is False
+    assert _is_streamable_output(_argv(noformat=True)) is False
+    with _open_streamed_output(_argv()) as write_item:
+        for item in items:
+            write_item(dict(item))
+    assert json.loads(capsys.readouterr().out) == [{"uuid": "a", "x": [1, 2]}, {"uuid": "b", "@type": ["File"]}]
+    output_file = os.path.join(tmp_path, "output.json")
+    with _open_streamed_output(_argv(output=output_file, reorganize=True)) as write_item:
+        for item in items:
+            write_item(dict(item))
+    with io.open(output_file) as f:
+        assert f.read() == json.dumps([{"uuid": "a", "x": [1, 2]}, {"uuid": "b", "@type": ["File"]}], indent=4)
+    assert _is_streamable_output(_argv(output=output_file)) is False
+    assert _is_streamable_output(_argv(output=output_file, overwrite=True)) is True
+
+
+class _Portal:
+    # Stub for portal_read.Portal.GET; uuid searches do not return "hidden" items (e.g. deleted ones).
+    disk_cache = None
+    ignore_properties = []
+    def __init__(self, items, hidden=None):  # noqa
+        self.items = {item["uuid"]: item for item in items}
+        self.hidden = set(hidden or [])
+        self.queries = []
+    def GET(self, query, metadata=False, raw=False, **kwargs):  # noqa
+        from urllib.parse import parse_qs, urlparse
+        self.queries.append(query)
+        frame = "raw" if raw else "default"
+        if query.startswith("/search/"):
+            uuids = parse_qs(urlparse(query).query).get("uuid", [])
+            return {"@graph": [{**self.items[uuid], "frame": frame}
+                               for uuid in uuids if (uuid in self.items) and (uuid not in self.hidden)]}
+        if (item := self.items.get(query.strip("/"))) is None:
+            return Portal.Access.NOT_FOUND
+        return {**item, "frame": frame}
+    def get_schema_names(self):  # noqa
+        return set()
+
+
+def test_get_portal_items_for_uuids_batched():
+    uuids = [f"{index:08d}-0000-0000-0000-000000000000" for index in range(7)]
+    portal = _Portal([{"uuid": uuid, "index": index} for index, uuid in enumerate(uuids[:6])], hidden=uuids[4:6])
+    def get_items(**kwargs):  # noqa
+        _portal_get.cache_clear()
+        portal.queries = []
+        items = _get_portal_items_for_uuids(portal, uuids, nthreads=4, **kwargs)
+        return sorted([item for item in items if isinstance(item, dict)], key=lambda item: item["uuid"])
+    items = get_items(raw=True, batch_size=0)
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4, 5]
+    assert all(item["frame"] == "raw" for item in items)
+    assert get_items(raw=True, batch_size=3) == items
+    # Two searches, then individually just the two hidden items and the one which does not exist.
+    assert len([query for query in portal.queries if query.startswith("/search/")]) == 3
+    assert len([query for query in portal.queries if not query.startswith("/search/")]) == 3
+    # Not batched for the (default) frame, in which search results differ from individually fetched items.
+    items = get_items(batch_size=3)
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4, 5]
+    assert not [query for query in portal.queries if query.startswith("/search/")]
+
+
+class _CachingPortal(Portal):
+    # Stub Portal (get) for the disk cache revalidation of Portal.GET; items are changed via the items property.
+    class Response:  # noqa
+        def __init__(self, status_code, data=None, etag=None):
+            self.status_code = status_code
+            self.headers = {"ETag": etag} if etag else {}
+            self._data = data
+        def json(self):  # noqa
+            return self._data
+    def __init__(self, disk_cache, etag=False):  # noqa
+        self._get_call_count = self._get_call_duration = 0
+        self._raise_exception = False
+        self._ignore_properties = []
+        self._disk_cache = disk_cache
+        self._instrumentation = PortalInstrumentation()
+        self.etag = etag
+        self.items = {}
+        self.requests = []
+    def get(self, query, raw=False, headers=None, **kwargs):  # noqa
+        self.requests.append((query, "If-None-Match" in (headers or {})))
+        if query.startswith("/search/"):
+            return self.Response(200, {"@graph": [{"uuid": uuid, "last_modified": item["last_modified"]}
+                                                  for uuid, item in self.items.items() if f"uuid={uuid}" in query]})
+        item = self.items[query.strip("/")]
+        etag = json.dumps(item, sort_keys=True) if self.etag else None
+        if etag and headers and (headers.get("If-None-Match") == etag):
+            return self.Response(304)
+        return self.Response(200, item, etag=etag)
+
+
+def test_get_disk_cache_revalidation(tmp_path):
+    uuid = "aaaaaaaa-0000-0000-0000-000000000000"
+    item = {"uuid": uuid, "last_modified": {"date_modified": "2024-01-01"}, "embedded": {"title": "a"}}
+    disk_cache = PortalDiskCache("smaht-test", file=os.path.join(tmp_path, "cache.sqlite"), max_age=0)
+    # Raw frame: revalidated by date modified, i.e. a (cheap) search rather than refetching the item.
+    portal = _CachingPortal(disk_cache)
+    portal.items[uuid] = {"uuid": uuid, "last_modified": item["last_modified"]}
+    assert portal.GET(f"/{uuid}", raw=True) == portal.items[uuid]
+    assert portal.GET(f"/{uuid}", raw=True) == portal.items[uuid]
+    assert [query.split("?")[0] for query, _ in portal.requests] == [f"/{uuid}", "/search/"]
+    # Embedded frame (no ETag): a changed embedded item does not change the date modified; so not revalidated.
+    portal.items[uuid] = item
+    assert portal.GET(f"/{uuid}") == item
+    portal.items[uuid] = {**item, "embedded": {"title": "b"}}
+    assert portal.GET(f"/{uuid}") == portal.items[uuid]
+    # Embedded frame with ETag: a 304 uses the cache entry; a 200 is used directly, i.e. not fetched again.
+    portal = _CachingPortal(disk_cache, etag=True)
+    portal.items[uuid] = item
+    assert portal.GET(f"/{uuid}") == item
+    assert portal.GET(f"/{uuid}") == item
+    portal.items[uuid] = {**item, "embedded": {"title": "c"}}
+    assert portal.GET(f"/{uuid}") == portal.items[uuid]
+    assert portal.requests == [(f"/{uuid}", False), (f"/{uuid}", True), (f"/{uuid}", True)]
+    assert disk_cache.cache_info()["revalidated"] == 2
+
+
+class _PagingPortal(Portal):
+    # Stub Portal whose search results are capped (server side) at max_page_size items per page.
+    def __init__(self, nitems, max_page_size, total=True):  # noqa
+        self.items = [{"uuid": f"uuid-{index:04d}", "index": index} for index in range(nitems)]
+        self.max_page_size = max_page_size
+        self.total = total
+        self.requests = []
+    def GET(self, query, limit=None, offset=None, **kwargs):  # noqa
+        self.requests.append((limit, offset))
+        if query == "/single-item":
+            return self.items[0]
+        graph = self.items[offset:offset + min(limit, self.max_page_size)]
+        return {"@graph": graph, **({"total": len(self.items)} if self.total else {})}
+
+
+def test_streamed_refs_reorganize(capsys):
+    # A raw (no @type) root item, referenced back by the item it references, is written just once,
+    # i.e. reorganizing the (streamed) root item does not drop its uuid before the crawl visits it.
+    uuids = [f"{index:08d}-0000-0000-0000-000000000000" for index in range(2)]
+    item = {"x": 1, "uuid": uuids[0]}
+    assert _reorganize_item(item) == {"uuid": uuids[0], "x": 1} and item == {"x": 1, "uuid": uuids[0]}
+    portal = _Portal([{"ref": uuids[1], "uuid": uuids[0]}, {"ref": uuids[0], "uuid": uuids[1]}])
+    _portal_get.cache_clear()
+    items = [portal.GET(f"/{uuids[0]}", raw=True)]
+    with _open_streamed_output(_argv(reorganize=True)) as write_item:
+        for item in items:
+            write_item(item)
+        items.extend(_get_portal_referenced_items(portal, items, raw=True, nthreads=1,
+                                                  callback=lambda item, depth: write_item(item)))
+    assert [item["uuid"] for item in json.loads(capsys.readouterr().out)] == uuids
+    assert [item["uuid"] for item in items] == uuids
+
+
+def test_paginate():
+    for total in (True, False):
+        portal = _PagingPortal(25, max_page_size=7, total=total)
+        assert [item["index"] for item in portal.paginate("/search/", page_size=10)] == list(range(25))
+        assert [offset for _, offset in portal.requests] == [0, 7, 14, 21] + ([] if total else [25])
+        portal = _PagingPortal(25, max_page_size=7, total=total)
+        assert [item["index"] for item in portal.paginate("/search/", page_size=10, limit=12,
+                                                          prefetch=False)] == list(range(12))
+        assert portal.requests == [(10, 0), (5, 7)]
+        portal = _PagingPortal(25, max_page_size=7, total=total)
+        assert [item["index"] for item in portal.paginate("/search/", page_size=4, offset=5, limit=8)] == \
+            list(range(5, 13))
+        assert [item["index"] for item in portal.paginate("/search/", page_size=100, offset=20)] == \
+            list(range(20, 25))
+    portal = _PagingPortal(25, max_page_size=7)
+    assert list(portal.paginate("/single-item")) == [portal.items[0]]
+    assert list(portal.paginate("/search/", limit=0)) == []
+
+
+def test_paginate_shifted_items():
+    # An item created during pagination shifts the last item of a page onto the next one.
+    portal = _PagingPortal(10, max_page_size=5)
+    def get(query, limit, offset):  # noqa
+        if offset > 0:
+            portal.items.insert(0, {"uuid": "uuid-new", "index": -1})
+        return _PagingPortal.GET(portal, query, limit=limit, offset=offset)
+    assert [item["index"] for item in portal.paginate("/search/", page_size=5, prefetch=False, get=get)] == \
+        list(range(10))
+
+
+def test_write_ndjson(tmp_path, capsys):
+    argv = _argv(query="/search/", raw=False, database=False, limit=None, offset=None, deleted=False,
+                 page_size=10, noprefetch=False, nthreads=1)
+    portal = _PagingPortal(25, max_page_size=7)
+    assert _write_ndjson(portal, argv) == 0
+    assert [json.loads(line)["index"] for line in capsys.readouterr().out.splitlines()] == list(range(25))
+    argv.limit, argv.offset = 9, 3
+    output_file = os.path.join(tmp_path, "output.ndjson")
+    assert _write_ndjson(portal, _argv(**{**vars(argv), "output": output_file})) == 0
+    with io.open(output_file) as f:
+        assert [json.loads(line)["index"] for line in f] == list(range(3, 12))
+    argv.query = "/single-item"
+    assert _write_ndjson(portal, argv) == 0
+    assert [json.loads(line) for line in capsys.readouterr().out.splitlines()] == [portal.items[0]]
+    # With --sort and --reorganize the uuid (and @type) still come first, as for (streamed) JSON output.
+    portal.items[0] = {"z": 1, "@type": ["File"], "index": 0, "uuid": "uuid-0000"}
+    assert _write_ndjson(portal, _argv(**{**vars(argv), "sort": True, "reorganize": True})) == 0
+    assert list(json.loads(capsys.readouterr().out)) == ["uuid", "@type", "index", "z"]
+    with _open_streamed_output(_argv(sort=True, reorganize=True)) as write_item:
+        write_item(portal.items[0])
+    assert list(json.loads(capsys.readouterr().out)[0]) == ["uuid", "@type", "index", "z"]
+
+
+class _TypingPortal(Portal):
+    # Stub Portal for the item typing of --inserts: raw frame items have no @type, non-raw ones do.
+    def __init__(self):  # noqa
+        self.items = {"u-1": {"uuid": "u-1", "@type": ["OutputFile", "File", "Item"]},
+                      "u-2": {"uuid": "u-2", "@type": ["ReferenceFile", "File", "Item"]}}
+        self.requests = []
+        self.schemas_requests = 0
+        self._instrumentation = PortalInstrumentation()
+    def get_schemas(self):  # noqa
+        self.schemas_requests += 1
+        return {"File": {}, "OutputFile": {}, "ReferenceFile": {}}
+    def get_schema_subtype_names(self, type_name):  # noqa
+        return ["OutputFile", "ReferenceFile"] if type_name == "File" else []
+    def GET(self, query, raw=False, field=None, **kwargs):  # noqa
+        self.requests.append((query, raw))
+        def frame(item):  # noqa
+            return {"uuid": item["uuid"], "raw": True} if raw else dict(item)
+        if query.startswith("/search/"):
+            return {"@graph": [frame(item) for item in self.items.values()
+                               if f"type={item['@type'][0]}" in query or "type=File" in query]}
+        return frame(self.items[query.strip("/").split("/")[-1]])
+
+
+def test_get_item_type_from_query():
+    portal = _TypingPortal()
+    assert _get_item_type_from_query(portal, "/OutputFile/u-1") == "OutputFile"
+    assert _get_item_type_from_query(portal, "/search/?type=OutputFile&status=released") == "OutputFile"
+    assert _get_item_type_from_query(portal, "/File/u-1") is None  # Has sub-types.
+    assert _get_item_type_from_query(portal, "/search/?type=OutputFile&type=ReferenceFile") is None
+    assert _get_item_type_from_query(portal, "/search/?status=released") is None
+    assert _get_item_type_from_query(portal, "/u-1") is None
+    assert _get_item_type_from_query(portal, "u-1") is None
+    assert portal.schemas_requests == 1
+    assert (portal := _TypingPortal()).get_schema_names() == {"File", "OutputFile", "ReferenceFile"}
+    assert "outputfiles" in portal.instrumentation.collections
+
+
+def test_portal_get_inserts_item_types():
+    portal = _TypingPortal()
+    # The type is known from the query so just the one (raw) request.
+    assert _portal_get_inserts(portal, "/OutputFile/u-1", nthreads=2) == \
+        {"uuid": "u-1", "raw": True, _ITEM_TYPE_PSEUDO_PROPERTY_NAME: "OutputFile"}
+    assert portal.requests == [("/OutputFile/u-1", True)]
+    portal.requests = []
+    # Otherwise also the non-raw request for the type (by uuid).
+    assert _portal_get_inserts(portal, "/u-2", nthreads=2) == \
+        {"uuid": "u-2", "raw": True, _ITEM_TYPE_PSEUDO_PROPERTY_NAME: "ReferenceFile"}
+    assert sorted(portal.requests) == [("/u-2", False), ("/u-2", True)]
+    portal.requests = []
+    result = _portal_get_inserts(portal, "/search/?type=File", nthreads=2)
+    assert {item["uuid"]: item[_ITEM_TYPE_PSEUDO_PROPERTY_NAME] for item in result["@graph"]} == \
+        {"u-1": "OutputFile", "u-2": "ReferenceFile"}
+    assert len(portal.requests) == 2
+    portal.requests = []
+    result = _portal_get_inserts(portal, "/search/?type=OutputFile", nthreads=2)
+    assert [item[_ITEM_TYPE_PSEUDO_PROPERTY_NAME] for item in result["@graph"]] == ["OutputFile"]
+    assert portal.requests == [("/search/?type=OutputFile", True)]
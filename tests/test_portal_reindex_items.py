@@ -0,0 +1,78 @@
+import io
+import json
+import os
+import re
+from hms_utils.portal.portal_reindex_items import (
+    _get_indexing_queue_count, _read_uuids, _search_uuids, _Submission, _wait_for_indexing)
+
+UUIDS = [f"{index:08d}-1111-2222-3333-444444444444" for index in range(25)]
+
+
+class _Response:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+    def json(self):  # noqa
+        return self._data
+
+
+class _Portal:
+    def __init__(self, failures=0, statuses=None):  # noqa
+        self.failures = failures
+        self.statuses = statuses or []
+        self.reindexed = []
+        self.searches = []
+    def reindex_metadata(self, uuids, raise_exception=False):  # noqa
+        if self.failures > 0:
+            self.failures -= 1
+            raise Exception("Service Unavailable")
+        self.reindexed.extend(uuids)
+        return True
+    def get(self, url, timeout=None):  # noqa
+        if url.startswith("/search/"):
+            # Pages are capped at 3 items (below the requested page size), as a server may do.
+            self.searches.append(url)
+            query, limit, offset = re.match(r"^(.*)&limit=(\d+)&from=(\d+)$", url).groups()
+            assert query == "/search/?type=File&field=uuid"
+            if not (graph := UUIDS[20:][int(offset):int(offset) + min(int(limit), 3)]):
+                return _Response(404, {})
+            return _Response(200, {"@graph": [{"uuid": uuid} for uuid in graph], "total": len(UUIDS[20:])})
+        return _Response(200, self.statuses.pop(0))
+
+
+def test_read_uuids(tmp_path):
+    with io.open(text_file := os.path.join(tmp_path, "uuids.txt"), "w") as f:
+        f.write(f"{UUIDS[0]} {UUIDS[1]},{UUIDS[2]}\n\nnot-a-uuid\n{UUIDS[3]}\n")
+    with io.open(json_file := os.path.join(tmp_path, "uuids.json"), "w") as f:
+        json.dump([UUIDS[3], {"uuid": UUIDS[4]}, {"uuid": UUIDS[20]}], f, indent=4)
+    assert list(_read_uuids(_Portal(), uuids=[UUIDS[5], UUIDS[0]], files=[text_file, json_file],
+                            query="type=File")) == [UUIDS[5], UUIDS[0]] + UUIDS[1:5] + UUIDS[20:]
+
+
+def test_search_uuids():
+    portal = _Portal()
+    uuids = _search_uuids(portal, "type=File", page_size=4)
+    assert next(uuids) == UUIDS[20]
+    assert len(portal.searches) == 1  # Pages are fetched as the uuids are consumed.
+    assert list(uuids) == UUIDS[21:]
+    assert portal.searches == ["/search/?type=File&field=uuid&limit=4&from=0",
+                               "/search/?type=File&field=uuid&limit=4&from=3"]
+
+
+def test_submission():
+    portal = _Portal(failures=2)
+    submission = _Submission(portal, chunk_size=4, retries=2, backoff=0)
+    submission.submit(iter(UUIDS), nthreads=3)
+    assert sorted(portal.reindexed) == UUIDS
+    assert (submission.queued, submission.chunks, submission.failed, submission.retries) == (25, 7, 0, 2)
+    portal = _Portal(failures=100)
+    submission = _Submission(portal, chunk_size=10, retries=1, backoff=0)
+    submission.submit(UUIDS, nthreads=1)
+    assert (submission.queued, submission.failed, submission.retries) == (0, 25, 3)
+
+
+def test_wait_for_indexing():
+    statuses = [{"primary_waiting": 100, "primary_inflight": 10, "secondary_waiting": 5, "dlq_waiting": 1},
+                {"primary_waiting": 0, "primary_inflight": 0, "secondary_waiting": 0, "secondary_inflight": 0}]
+    assert _get_indexing_queue_count(statuses[0]) == 115
+    assert _wait_for_indexing(_Portal(statuses=statuses), interval=0.01) is True
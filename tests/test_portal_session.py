@@ -0,0 +1,89 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from hms_utils.portal.portal_instrumentation import PortalInstrumentation
+from hms_utils.portal.portal_session import PortalSession
+from hms_utils.threading_utils import run_concurrently
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failures = {}
+    def do_GET(self):  # noqa
+        if self.path.startswith("/flaky") and _Handler.failures.get(self.path, 0) < 2:
+            _Handler.failures[self.path] = _Handler.failures.get(self.path, 0) + 1
+            status, body = 503, b"{}"
+        else:
+            status, body = 200, json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    def log_message(self, *args, **kwargs):  # noqa
+        pass
+
+
+def _start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_portal_session_connection_reuse():
+    server = _start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        session = PortalSession(pool_size=4)
+        instrumentation = PortalInstrumentation()
+        session.instrument(instrumentation.wrap)
+        responses = []
+        def get(index):  # noqa
+            responses.append(session.get(f"{url}/items/{index}").json())
+        run_concurrently([lambda index=index: get(index) for index in range(40)], nthreads=4)
+        assert len(responses) == 40
+        report = session.report()
+        assert report["requests"] == 40
+        assert report["pool_size"] == 4
+        assert 1 <= report["connections"] <= 4
+        assert report["reused"] == 40 - report["connections"]
+        assert instrumentation.report()["requests"] == 40
+        session.close()
+    finally:
+        server.shutdown()
+
+
+def test_portal_session_retries():
+    server = _start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        session = PortalSession(retries=3, backoff=0)
+        assert session.get(f"{url}/flaky/1").status_code == 200
+        assert session.report()["retries"] == 2
+        session.configure(retries=1)
+        assert session.get(f"{url}/flaky/2").status_code == 503
+        session.close()
+    finally:
+        server.shutdown()
+
+
+def test_portal_session_reconfigure():
+    server = _start_server()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        session = PortalSession(pool_size=2)
+        assert session.get(f"{url}/items/1").status_code == 200
+        adapter = session._adapter
+        assert len(PortalSession._get_connection_pools(adapter)) == 1
+        session.configure(pool_size=4)
+        # The replaced adapter is closed (i.e. its connection pools cleared) and no longer counted.
+        assert session._adapter is not adapter
+        assert PortalSession._get_connection_pools(adapter) == []
+        assert session.report()["connections"] == 0
+        assert session.get(f"{url}/items/2").status_code == 200
+        assert session.report()["connections"] == 1
+        session.configure(pool_size=4)
+        assert session.report()["connections"] == 1
+        session.close()
+    finally:
+        server.shutdown()
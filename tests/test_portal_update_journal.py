@@ -0,0 +1,65 @@
+import io
+import json
+import os
+from hms_utils.portal.portal_update_journal import PortalUpdateJournal
+
+
+def test_portal_update_journal(tmp_path):
+    input_file = os.path.join(tmp_path, "file_format.json")
+    with io.open(input_file, "w") as f:
+        json.dump([{"identifier": "bam"}, {"identifier": "bai"}], f)
+    key = PortalUpdateJournal.key("https://portal", "PATCH", PortalUpdateJournal.hash_file(input_file))
+    journal_file = os.path.join(tmp_path, "journal", "journal.ndjson")
+    journal = PortalUpdateJournal(journal_file)
+    journal.record(key, "bam", True)
+    journal.record(key, "bai", False, message="Bad response")
+    journal.record(key, "cram", True)
+    journal.record(key, "cram", False)
+    journal.close()
+    assert (journal.completed, journal.failed) == (2, 2)
+    with io.open(journal_file, "a") as f:
+        f.write('{"key": "torn')  # E.g. from a crash mid-write.
+    journal = PortalUpdateJournal(journal_file, resume=True)
+    assert journal.is_completed(key, "bam") is True
+    assert journal.is_completed(key, "bai") is False
+    assert journal.is_completed(key, "cram") is False
+    assert journal.is_completed(PortalUpdateJournal.key("https://other", "PATCH", key.split("|")[-1]), "bam") is False
+    assert journal.skipped == 1
+    journal.close()
+    # Changed input file content means a different key; nothing is completed for it.
+    with io.open(input_file, "w") as f:
+        json.dump([{"identifier": "bam"}], f)
+    assert PortalUpdateJournal.hash_file(input_file) != key.split("|")[-1]
+    assert PortalUpdateJournal(journal_file).is_completed(key, "bam") is False  # Not resuming.
+
+
+def test_get_journaled_updates(tmp_path):
+    from hms_utils.portal.update_portal_object import _copy_inserts_not_journaled, _get_journaled_updates, _Update
+    class Portal:  # noqa
+        server = "https://portal"
+        def get_identifying_path(self, data, portal_type):  # noqa
+            return f"/{portal_type}/{data['identifier']}"
+    input_file = os.path.join(tmp_path, "file_format.json")
+    with io.open(input_file, "w") as f:
+        json.dump(data := [{"uuid": "u-1", "identifier": "bam"}, {"uuid": "u-2", "identifier": "bai"}], f)
+    journal_file = os.path.join(tmp_path, "journal.ndjson")
+    journal = PortalUpdateJournal(journal_file)
+    updates = _get_journaled_updates(Portal(), [_Update(item, "FileFormat", input_file, index)
+                                                for index, item in enumerate(data)], journal, "PATCH")
+    assert [update.journal_identity for update in updates] == ["FileFormat#0:/FileFormat/bam",
+                                                               "FileFormat#1:/FileFormat/bai"]
+    journal.record(updates[0].journal_key, updates[0].journal_identity, True)
+    journal.record(load_key := PortalUpdateJournal.key("/tmp/x.ini", "LOAD", "hash"), "u-2", True)
+    journal.close()
+    journal = PortalUpdateJournal(journal_file, resume=True)
+    updates = _get_journaled_updates(Portal(), [_Update(item, "FileFormat", input_file, index)
+                                                for index, item in enumerate(data)], journal, "PATCH")
+    assert [update.index for update in updates] == [1]
+    os.makedirs(target_directory := os.path.join(tmp_path, "target"))
+    schema_names_to_load = {"file_format": 2}
+    _copy_inserts_not_journaled(tmp_path, target_directory, journal, load_key, schema_names_to_load)
+    assert schema_names_to_load == {"file_format": 1}
+    with io.open(os.path.join(target_directory, "file_format.json")) as f:
+        assert json.load(f) == [data[0]]
+    assert journal.skipped == 2
+    journal.close()
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+import pytest
+from hms_utils.threading_utils import RateLimiter, run_asynchronously, run_concurrently, run_coroutines
+
+
+def test_run_concurrently_results_and_exceptions():
+    def fail():  # noqa
+        raise ValueError("fail")
+    assert run_concurrently([lambda index=index: index * 2 for index in range(20)], nthreads=4) == \
+        [index * 2 for index in range(20)]
+    assert run_concurrently([lambda: 1, fail, lambda: 3], nthreads=2) == [1, None, 3]
+    assert run_concurrently([lambda: 1, fail, lambda: 3], nthreads=0) == [1, None, 3]
+    with pytest.raises(ValueError):
+        run_concurrently([lambda: 1, fail, lambda: 3], nthreads=2, raise_exception=True)
+    assert run_concurrently([lambda: 1, fail, lambda: 3], nthreads=2, asynchronous=True) == [1, None, 3]
+    with pytest.raises(ValueError):
+        run_concurrently([lambda: 1, fail, lambda: 3], nthreads=2, asynchronous=True, raise_exception=True)
+
+
+def test_run_coroutines_bounded_concurrency():
+    in_progress = 0
+    in_progress_max = 0
+    async def fetch(index):  # noqa
+        nonlocal in_progress, in_progress_max
+        in_progress += 1
+        in_progress_max = max(in_progress_max, in_progress)
+        await asyncio.sleep(0.01)
+        in_progress -= 1
+        return index
+    results = run_asynchronously([lambda index=index: fetch(index) for index in range(50)], concurrency=10)
+    assert results == list(range(50))
+    in_progress_max = 0
+    async def run():  # noqa
+        return await run_coroutines([fetch(index) for index in range(50)], concurrency=20)
+    assert asyncio.run(run()) == list(range(50))
+    assert in_progress_max == 20
+
+
+def test_run_coroutines_timeout_and_cancellation():
+    cancelled = []
+    async def slow(index):  # noqa
+        try:
+            await asyncio.sleep(10 if index == 1 else 0.01)
+            return index
+        except asyncio.CancelledError:
+            cancelled.append(index)
+            raise
+    results = run_asynchronously([lambda index=index: slow(index) for index in range(3)],
+                                 timeout=0.2, return_exceptions=True)
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], asyncio.TimeoutError)
+    assert cancelled == [1]
+    async def fail():  # noqa
+        await asyncio.sleep(0.05)
+        raise ValueError("fail")
+    cancelled.clear()
+    started = time.time()
+    with pytest.raises(ValueError):
+        run_asynchronously([lambda: slow(1), fail, lambda: slow(1)], concurrency=3)
+    assert time.time() - started < 5
+    assert cancelled == [1, 1]
+
+
+def test_run_coroutines_blocking_functions_in_threads():
+    threads = set()
+    def blocking(index):  # noqa
+        threads.add(threading.get_ident())
+        time.sleep(0.05)
+        return index
+    started = time.time()
+    assert run_asynchronously([lambda index=index: blocking(index) for index in range(10)], concurrency=10) == \
+        list(range(10))
+    assert time.time() - started < 0.4
+    assert threading.get_ident() not in threads
+
+
+def test_run_concurrently_consumes_lazily():
+    produced = 0
+    completed = 0
+    max_pending = 0
+    lock = threading.Lock()
+    def function(value):  # noqa
+        nonlocal completed
+        time.sleep(0.001)
+        with lock:
+            completed += 1
+        return value
+    def functions():  # noqa
+        nonlocal produced, max_pending
+        for value in range(200):
+            with lock:
+                produced += 1
+                max_pending = max(max_pending, produced - completed)
+            yield lambda value=value: function(value)
+    assert run_concurrently(functions(), nthreads=4) == list(range(200))
+    assert max_pending <= 4 * 4
+
+
+def test_rate_limiter():
+    assert RateLimiter().wait() == 0
+    assert RateLimiter(0).rate is None
+    rate_limiter = RateLimiter(100)
+    started = time.monotonic()
+    run_concurrently([rate_limiter.wait for _ in range(21)], nthreads=8)
+    assert 0.19 <= time.monotonic() - started < 0.5
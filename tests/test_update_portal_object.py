@@ -0,0 +1,237 @@
+import io
+import json
+import os
+from hms_utils.portal.update_portal_object import _order_updates_into_layers, _Update
+
+
+class _Portal:
+    vapp = None
+    def get_schemas(self):  # noqa
+        return {"FileFormat": {"identifyingProperties": ["uuid", "identifier"]},
+                "SubmissionCenter": {"identifyingProperties": ["uuid", "identifier"]},
+                "User": {"identifyingProperties": ["uuid", "email"]}}
+
+
+def test_order_updates_into_layers():
+    portal = _Portal()
+    updates = [
+        _Update({"uuid": "u-user", "email": "a@b.c", "submission_centers": ["smaht"]}, "User", "a.json", 0),
+        _Update({"identifier": "bam", "extra_file_formats": ["bai"], "submission_centers": ["smaht"]},
+                "FileFormat", "b.json", 0),
+        _Update({"identifier": "bai", "submission_centers": ["/SubmissionCenter/smaht/"]}, "FileFormat", "b.json", 1),
+        _Update({"uuid": "u-center", "identifier": "smaht"}, "SubmissionCenter", "c.json", 0),
+        _Update({"identifier": "vcf", "description": "no references"}, "FileFormat", "b.json", 2),
+        _Update({"uuid": "u-center", "identifier": "smaht", "title": "again"}, "SubmissionCenter", "d.json", 0)
+    ]
+    layers = _order_updates_into_layers(portal, updates)
+    assert [[updates.index(update) for update in layer] for layer in layers] == [[3, 4], [5], [0, 2], [1]]
+
+
+def test_order_updates_into_layers_cyclic():
+    portal = _Portal()
+    updates = [
+        _Update({"identifier": "bam", "extra_file_formats": ["bai"]}, "FileFormat", "b.json", 0),
+        _Update({"identifier": "bai", "extra_file_formats": ["bam"]}, "FileFormat", "b.json", 1)
+    ]
+    assert _order_updates_into_layers(portal, updates) == [[updates[0]], [updates[1]]]
+
+
+class _Response:
+    def __init__(self, status_code, data=None):  # noqa
+        self.status_code = status_code
+        self.data = data
+    def json(self):  # noqa
+        return self.data
+
+
+class _SearchPortal(_Portal):
+    # Stub Portal whose searches (like the real ones) are a 404 if there are no results.
+    def __init__(self, existing=None, deleted=None, failing=None):  # noqa
+        self.existing = existing or []
+        self.deleted = deleted or []
+        self.failing = failing
+        self.queries = []
+    def get_identifying_path(self, data, portal_type):  # noqa
+        return f"/{portal_type}/{data['uuid']}" if data.get("uuid") else f"/{portal_type}/{data['identifier']}"
+    def get_identifying_property_names(self, schema_name):  # noqa
+        return ["uuid", "identifier"]
+    def get(self, query):  # noqa
+        from urllib.parse import parse_qs, urlparse
+        self.queries.append(query)
+        args = parse_qs(urlparse(query).query)
+        if self.failing and (self.failing in query):
+            return _Response(500)
+        items = self.deleted if args.get("status") == ["deleted"] else self.existing
+        properties = [name for name in args if name not in ["type", "field", "limit", "status", "frame"]]
+        if not (graph := [item for item in items if any(item.get(name) in args[name] for name in properties)]):
+            return _Response(404, {"@graph": [], "total": 0})
+        return _Response(200, {"@graph": graph})
+
+
+def test_prefetch_existence():
+    from hms_utils.portal.update_portal_object import _prefetch_existence
+    portal = _SearchPortal(existing=[{"uuid": "u-1", "identifier": "bam"}, {"uuid": "u-2", "identifier": "bai"}],
+                           deleted=[{"uuid": "u-3", "identifier": "cram"}])
+    updates = [_Update({"uuid": "u-1"}, "FileFormat", None, 0),
+               _Update({"identifier": "bai"}, "FileFormat", None, 1),
+               _Update({"identifier": "cram"}, "FileFormat", None, 2),
+               _Update({"uuid": "u-9"}, "FileFormat", None, 3),
+               _Update({"identifier": "vcf"}, "FileFormat", None, 4)]
+    existence = _prefetch_existence(portal, updates, nthreads=2, batch_size=1)
+    assert existence.get("/FileFormat/u-1") is True
+    assert existence.get("/FileFormat/bai") is True
+    assert existence.get("/FileFormat/cram") is True
+    # Not found by the searches, i.e. new; so no per-item GET is needed (e.g. before a POST).
+    assert existence.get("/FileFormat/u-9") is False
+    assert existence.get("/FileFormat/vcf") is False
+    assert existence.get("/FileFormat/other") is None
+    assert (existence.found, existence.missing, existence.unresolved) == (3, 2, 0)
+    assert existence.searches == len(portal.queries) == 8
+    # Unless confirm_missing, in which case they are left to be confirmed (since the search index may lag).
+    existence = _prefetch_existence(portal, updates, nthreads=2, batch_size=1, confirm_missing=True)
+    assert existence.get("/FileFormat/u-9") is None
+    assert existence.get("/FileFormat/u-1") is True
+    assert not [query for query in portal.queries if "field=uuid&field=uuid" in query]
+
+
+def test_prefetch_existence_empty_searches():
+    from hms_utils.portal.update_portal_object import _prefetch_existence
+    # Mixed batch: the deleted pass finds nothing, i.e. a 404; the found item is still recorded.
+    portal = _SearchPortal(existing=[{"uuid": "u-1", "identifier": "bam"}])
+    updates = [_Update({"uuid": "u-1"}, "FileFormat", None, 0), _Update({"uuid": "u-2"}, "FileFormat", None, 1)]
+    existence = _prefetch_existence(portal, updates)
+    assert existence.get("/FileFormat/u-1") is True
+    assert existence.get("/FileFormat/u-2") is False
+    assert (existence.found, existence.missing, existence.unresolved, existence.searches) == (1, 1, 0, 2)
+    # Batch with no hits at all, i.e. all new.
+    portal = _SearchPortal()
+    existence = _prefetch_existence(portal, updates)
+    assert (existence.found, existence.missing, existence.unresolved, existence.searches) == (0, 2, 0, 2)
+    # A failed (deleted) search leaves those not (yet) found unresolved; the found items are still recorded.
+    portal = _SearchPortal(existing=[{"uuid": "u-1", "identifier": "bam"}], failing="status=deleted")
+    existence = _prefetch_existence(portal, updates)
+    assert existence.get("/FileFormat/u-1") is True
+    assert (existence.found, existence.missing, existence.unresolved) == (1, 0, 1)
+
+
+def test_exists_confirms_missing():
+    from hms_utils.portal.update_portal_object import _ExistenceIndex, _exists
+    class Portal(_Portal):  # noqa
+        def get_metadata(self, path, raise_exception=True):  # noqa
+            return {"uuid": "u-2"} if path == "/FileFormat/u-2" else None
+    existence = _ExistenceIndex(confirm_missing=True)
+    existence.set_missing("/FileFormat/u-2")
+    existence.set_missing("/FileFormat/u-3")
+    existence.set("/FileFormat/u-1", True)
+    # E.g. created moments ago, so not yet found by the search; confirmed via get_metadata.
+    assert _exists(Portal(), "/FileFormat/u-2", existence) is True
+    assert _exists(Portal(), "/FileFormat/u-3", existence) is False
+    assert _exists(Portal(), "/FileFormat/u-1", existence) is True
+    assert (existence.get("/FileFormat/u-2"), existence.get("/FileFormat/u-3")) == (True, False)
+    assert (existence.gets, existence.saved) == (2, 1)
+    # By default those not found by the searches are trusted, i.e. no GET.
+    existence = _ExistenceIndex()
+    existence.set_missing("/FileFormat/u-2")
+    assert _exists(Portal(), "/FileFormat/u-2", existence) is False
+    assert (existence.gets, existence.saved) == (0, 1)
+
+
+def test_get_patch_data():
+    from hms_utils.portal.update_portal_object import _PatchDiff, _get_patch_data
+    class Portal(_Portal):  # noqa
+        # The existing item, from the database (raw frame); updated by each PATCH.
+        item = {"uuid": "u-1", "identifier": "bam", "description": "old", "extra_file_formats": ["bai"],
+                "status": "released"}
+        requests = []
+        def get_metadata(self, path, raw=False, database=False, field=None, raise_exception=True):  # noqa
+            self.requests.append((path, raw, database))
+            return dict(self.item) if path == "/FileFormat/bam" else None
+    portal = Portal()
+    diff = _PatchDiff()
+    data = {"identifier": "bam", "description": "old", "extra_file_formats": ["bai"]}
+    assert _get_patch_data(portal, "/FileFormat/bam", data, diff=diff) is None
+    assert portal.requests == [("/FileFormat/bam", True, True)]
+    assert _get_patch_data(portal, "/FileFormat/bam", data, "status", diff=diff) == {}
+    data = {"identifier": "bam", "description": "new", "extra_file_formats": ["bai", "csi"], "title": "BAM"}
+    assert _get_patch_data(portal, "/FileFormat/bam", data, diff=diff) == \
+        {"description": "new", "extra_file_formats": ["bai", "csi"], "title": "BAM"}
+    Portal.item = {**Portal.item, **data}
+    assert _get_patch_data(portal, "/FileFormat/bam", data, diff=diff) is None
+    assert (diff.unchanged, diff.patched, diff.fields_sent, diff.fields_given) == (2, 2, 3, 14)
+    assert _get_patch_data(portal, "/FileFormat/bam", data) == data
+    assert _get_patch_data(portal, "/FileFormat/other", data, diff=diff) == data
+
+
+def test_get_patch_data_links():
+    from hms_utils.portal.update_portal_object import _ExistenceIndex, _PatchDiff, _get_patch_data, _patch_data
+    center_uuid = "2a3e5f7c-1b4d-4c6e-8f9a-0b1c2d3e4f5a"
+    class Portal(_Portal):  # noqa
+        # The existing item (raw frame) has its links as uuids; the insert has identifying values.
+        item = {"uuid": "u-1", "identifier": "bam", "submission_centers": [center_uuid]}
+        requests = []
+        patches = []
+        def get_schemas(self):  # noqa
+            return {**super().get_schemas(),
+                    "FileFormat": {"identifyingProperties": ["uuid", "identifier"],
+                                   "properties": {"submission_centers": {"type": "array",
+                                                                         "items": {"linkTo": "SubmissionCenter"}}}}}
+        def get_identifying_path(self, data, portal_type):  # noqa
+            return f"/{portal_type}/{data['identifier']}"
+        def get_metadata(self, path, raw=False, database=False, field=None, raise_exception=True):  # noqa
+            self.requests.append(path)
+            if path == "/FileFormat/bam":
+                return dict(self.item)
+            return {"uuid": center_uuid} if path == "/SubmissionCenter/smaht" else None
+        def patch_metadata(self, path, data):  # noqa
+            self.patches.append((path, data))
+    portal = Portal()
+    diff = _PatchDiff()
+    data = {"identifier": "bam", "submission_centers": ["smaht"]}
+    assert _get_patch_data(portal, "/FileFormat/bam", data, diff=diff, schema_name="FileFormat") is None
+    assert _get_patch_data(portal, "/FileFormat/bam", {**data, "submission_centers": [center_uuid]},
+                           diff=diff, schema_name="FileFormat") is None
+    assert _get_patch_data(portal, "/FileFormat/bam", {**data, "submission_centers": ["other"]},
+                           diff=diff, schema_name="FileFormat") == {"submission_centers": ["other"]}
+    assert portal.requests.count("/SubmissionCenter/smaht") == 1
+    # A single GET serves as both the existence check and the diff.
+    portal.requests.clear()
+    existence = _ExistenceIndex()
+    assert _patch_data(portal, data, "FileFormat", existence=existence, diff=diff) is True
+    assert portal.requests == ["/FileFormat/bam"] and portal.patches == []
+    assert existence.get("/FileFormat/bam") is True
+
+
+def test_load_data_inserts_files(tmp_path):
+    from hms_utils.portal.update_portal_object import _append_inserts_file, _count_json_items, _write_inserts_files
+    from hms_utils.json_stream_utils import iterate_json_items
+    with io.open(inserts_file := os.path.join(tmp_path, "inserts.json"), "w") as f:
+        json.dump(inserts := {"FileFormat": [{"identifier": "bam"}, {"identifier": "bai"}],
+                              "User": [{"email": "someone@example.com"}]}, f)
+    with io.open(list_file := os.path.join(tmp_path, "file_format.json"), "w") as f:
+        json.dump([{"identifier": "cram"}], f)
+    with io.open(object_file := os.path.join(tmp_path, "object.json"), "w") as f:
+        json.dump({"identifier": "crai"}, f)
+    assert _count_json_items(inserts_file) == {"FileFormat": 2, "User": 1}
+    assert _count_json_items(list_file) == {None: 1}
+    assert _count_json_items(object_file) is None
+    os.makedirs(directory := os.path.join(tmp_path, "inserts"))
+    assert _write_inserts_files(iterate_json_items(inserts_file), directory) == {"file_format": 2, "user": 1}
+    with io.open(os.path.join(directory, "file_format.json")) as f:
+        assert json.load(f) == inserts["FileFormat"]
+    assert _write_inserts_files(iterate_json_items(list_file), directory, "FileFormat") == {"file_format": 1}
+    _append_inserts_file(file := os.path.join(directory, "file_format.json"), [(inserts_file, "FileFormat")])
+    with io.open(file) as f:
+        assert json.load(f) == [{"identifier": "cram"}] + inserts["FileFormat"]
+    _append_inserts_file(file := os.path.join(directory, "user.json"), [(inserts_file, "User")])
+    with io.open(file) as f:
+        assert json.load(f) == inserts["User"] * 2
+
+
+def test_read_json_from_file_skips_non_lists(tmp_path, capsys):
+    from hms_utils.portal.update_portal_object import _read_json_from_file
+    with io.open(inserts_file := os.path.join(tmp_path, "inserts.json"), "w") as f:
+        json.dump({"FileFormat": [{"identifier": "bam"}], "Other": {"identifier": "x"},
+                   "User": [{"email": "someone@example.com"}]}, f)
+    assert _read_json_from_file(inserts_file) == {"FileFormat": [{"identifier": "bam"}],
+                                                  "User": [{"email": "someone@example.com"}]}
+    assert "schema item which is not a list: Other" in capsys.readouterr().out